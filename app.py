@@ -38,6 +38,8 @@ from werkzeug.security import generate_password_hash
 
 from logger import logger
 from extensions import limiter, mail, db, migrate
+from json_provider import registrar_proveedor_json
+from perfil_sql import instalar_perfil_sql
 
 # =============================================================================
 # Carga de Variables de Entorno
@@ -77,6 +79,8 @@ from routes.admin_routes import admin_bp
 from routes.user_settings import user_settings_bp
 from routes.tareas import tareas_bp  # Sistema de Tareas Personal (Fase 11.2)
 from routes.asistente_ai import asistente_bp  # Jordy IA - Asistente con Gemini
+from routes.gestor_archivos import bp_archivos  # Gestor jerárquico de archivos (catálogo indexado)
+from routes.expedientes import bp_expedientes  # Jobs de expedientes y alta masiva
 
 
 # =============================================================================
@@ -179,6 +183,14 @@ def create_app(test_config=None):
         UPLOAD_FOLDER=os.path.join(base_dir, 'static', 'uploads'),
         MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # Límite de 16MB por archivo
         ALLOWED_EXTENSIONS={'pdf', 'jpg', 'jpeg', 'png', 'doc', 'docx', 'xls', 'xlsx', 'txt', 'csv'},
+
+        # Proveedor JSON de las respuestas (ver json_provider.py)
+        JSON_PROVIDER=os.getenv("JSON_PROVIDER", "auto"),
+
+        # Perfilado de sentencias SQL (ver perfil_sql.py): desactivado por defecto
+        SQL_PROFILING=os.getenv("SQL_PROFILING", "False").lower() == "true",
+        SQL_PROFILING_BUFFER=int(os.getenv("SQL_PROFILING_BUFFER", 5000)),
+        SQL_PROFILING_EXPLAIN_MS=float(os.getenv("SQL_PROFILING_EXPLAIN_MS", 0)),  # 0 = sin EXPLAIN
     )
 
     # 🔍 LOG para debugging de rutas críticas
@@ -192,6 +204,9 @@ def create_app(test_config=None):
 
     logger.info("Configuración de la aplicación cargada.")
 
+    # Serialización JSON: orjson si está instalado (JSON_PROVIDER='auto' | 'orjson' | 'default')
+    logger.info(f"🧾 Proveedor JSON: {registrar_proveedor_json(app)}")
+
     try:
         os.makedirs(app.instance_path, exist_ok=True)
     except OSError:
@@ -239,6 +254,7 @@ def create_app(test_config=None):
         # Importar modelos para que SQLAlchemy los reconozca
         from models import orm_models
         db.create_all()
+        instalar_perfil_sql(app, db.engine)
         logger.info("✅ Tablas de la base de datos verificadas/creadas con SQLAlchemy ORM")
 
     logger.info("CORS, CSRFProtect, Flask-Limiter, Flask-Mail, SQLAlchemy y Migrate inicializados.")
@@ -279,6 +295,8 @@ def create_app(test_config=None):
         app.register_blueprint(user_settings_bp)
         app.register_blueprint(tareas_bp)  # Sistema de Tareas Personal (Fase 11.2)
         app.register_blueprint(asistente_bp)  # Jordy IA - Asistente con Gemini
+        app.register_blueprint(bp_archivos)  # Gestor jerárquico de archivos (catálogo indexado)
+        app.register_blueprint(bp_expedientes)  # Jobs de expedientes y alta masiva
 
         logger.info("✅ Todos los blueprints han sido registrados exitosamente.")
         logger.info("✅ Módulos cargados: Auth, RPA (automation_bp), Marketing, Finance, Admin, User Settings, Tareas, Jordy IA")
@@ -288,6 +306,16 @@ def create_app(test_config=None):
         logger.critical(f"Error CRÍTICO al registrar un blueprint: {e}")
         traceback.print_exc()
 
+    # ÍNDICE DE FIRMAS (NIT -> carpeta de expediente, evita listar EMPRESAS por PDF)
+    try:
+        from indice_firmas import obtener_indice
+        from routes.formularios import BASE_DIR as BASE_EXPEDIENTES
+
+        total_empresas = obtener_indice(os.path.join(BASE_EXPEDIENTES, "EMPRESAS")).construir()
+        logger.info(f"✅ Índice de firmas de empresas construido ({total_empresas} empresas)")
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo construir el índice de firmas: {e}")
+
     # RUTAS DE VERIFICACIÓN Y CSRF
     @app.route("/hello")
     def hello():
@@ -7,7 +7,7 @@ const NOVEDADES_CONFIG = {
     // URLs de la API
     API: {
         BASE_URL: '/api/novedades', // Base (aunque no se use directamente aquí)
-        GET_ALL: '/api/novedades',      // Ruta para obtener todas las novedades
+        GET_ALL: '/api/novedades',      // Ruta para listar novedades (paginada por cursor)
         CREATE: '/api/novedades',       // Ruta para crear una novedad
         UPDATE: (id) => `/api/novedades/${id}`, // Ruta para actualizar (por ID)
         DELETE: (id) => `/api/novedades/${id}`, // Ruta para eliminar (por ID)
@@ -15,6 +15,9 @@ const NOVEDADES_CONFIG = {
         GET_USUARIOS: '/api/usuarios'       // Ruta para obtener usuarios
     },
 
+    // Filtros que el backend aplica por igualdad en GET /api/novedades
+    FILTROS: ['status', 'priority', 'assignedTo', 'client'],
+
     // Configuración de DataTables
     DATATABLE: {
         language: {
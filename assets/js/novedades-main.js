@@ -15,29 +15,27 @@ document.addEventListener('DOMContentLoaded', async function() {
         NovedadesUI.renderPriorityFilters();
         // NovedadesUI.showLoading(); // Usaremos el loader global en lugar del overlay específico
 
-        // 2. Cargar datos esenciales desde API (novedades, empresas, usuarios)
-        // Usamos Promise.all para cargar en paralelo
+        // 2. Inicializar la tabla DataTables (estructura y eventos)
+        NovedadesTable.initialize();
+
+        // 3. Cargar datos esenciales desde API en paralelo: solo la primera página
+        //    de novedades (las siguientes se piden con "Cargar más"), empresas y usuarios
         const [novedades, empresas, usuarios] = await Promise.all([
-            NovedadesAPI.getAll(),
+            NovedadesTable.loadFirstPage(), // Guarda la página en window.caseDataStore
             NovedadesAPI.getEmpresas(),
             NovedadesAPI.getUsuarios() // Cargar todos los usuarios al inicio
         ]);
 
-        // Guardar datos en caché/store global
-        window.caseDataStore = novedades;
+        // Guardar datos en caché global
         window.empresasCache = empresas;
         window.usuariosCache = usuarios; // Guardar usuarios para autocompletar
 
-        console.log(`Datos cargados: ${novedades.length} novedades, ${empresas.length} empresas, ${usuarios.length} usuarios.`);
+        console.log(`Datos cargados: ${novedades.length} novedades (primera página), ${empresas.length} empresas, ${usuarios.length} usuarios.`);
 
-        // 3. Calcular y mostrar estadísticas en el Dashboard
+        // 4. Calcular y mostrar estadísticas en el Dashboard (sobre las novedades cargadas)
         const stats = NovedadesUI.calculateStats(novedades);
         NovedadesUI.renderDashboardStats(stats);
 
-        // 4. Inicializar la tabla DataTables
-        NovedadesTable.initialize(); // Inicializar estructura y eventos
-        NovedadesTable.loadData(novedades); // Cargar los datos iniciales
-
         // 5. Inicializar la lógica de los modales
         NovedadesModals.initialize(); // Inicializar instancias y eventos
 
@@ -0,0 +1,350 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén de Blobs Direccionado por Contenido - Sistema Montero
+=============================================================
+Cada archivo subido se guarda UNA sola vez bajo su hash SHA-256
+(BLOB_STORE_FOLDER/ab/cd/abcd...), calculado mientras se copia el stream
+en bloques, sin cargar el archivo completo en memoria. El tipo MIME se
+detecta por la firma de los primeros bytes y el límite de tamaño se
+aplica a medida que llegan los bloques: la memoria usada por petición es
+de un bloque, sin importar el tamaño del archivo.
+
+Las rutas "visibles" (documentos_gestor, expedientes de usuarios y
+empresas, tutelas, incapacidades) son enlaces duros al blob: la misma
+cédula o el mismo RUT adjuntado en diez empresas ocupa disco una vez.
+Los enlaces duros solo funcionan dentro de un mismo volumen: BLOB_STORE_PATH
+debe estar en la misma unidad que los expedientes. Si no lo está,
+guardar_y_vincular() escribe el archivo directo en su destino sin pasar
+por el almacén (no hay deduplicación, pero tampoco doble copia).
+
+Reglas:
+    - Las rutas vinculadas NUNCA se abren en modo escritura; para
+      reemplazar un archivo se vuelve a llamar a vincular_blob(), que
+      sustituye el enlace de forma atómica.
+    - Borrar una ruta vinculada (os.remove) es seguro: el blob sigue vivo
+      mientras quede otro enlace. limpiar_blobs_huerfanos() elimina los
+      blobs que ya no tienen ninguna ruta apuntándoles y llevan más de
+      GRACIA_HUERFANOS_SEG sin modificarse (un blob recién guardado aún
+      no tiene enlaces: los jobs lo vinculan después).
+"""
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+from logger import logger
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BLOB_STORE_FOLDER = os.getenv("BLOB_STORE_PATH", os.path.join(BASE_DIR, "data", "BLOBS"))
+
+TAMANO_BLOQUE = 64 * 1024  # 64 KB por lectura
+TAMANO_CABECERA = 2048  # Bytes usados para detectar el tipo MIME
+GRACIA_HUERFANOS_SEG = int(os.getenv("BLOB_GRACIA_HUERFANOS_SEG", 24 * 3600))
+
+# Firmas (magic numbers) -> MIME
+FIRMAS_MIME = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+FIRMA_ZIP = b"PK\x03\x04"
+FIRMA_OLE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+# Office usa contenedores genéricos (ZIP / OLE): la extensión decide el subtipo
+MIMES_ZIP = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+MIMES_OLE = {
+    "doc": "application/msword",
+    "xls": "application/vnd.ms-excel",
+}
+EXTENSIONES_TEXTO = {"txt", "csv"}
+
+
+class ArchivoDemasiadoGrande(ValueError):
+    """El stream superó el tamaño máximo permitido durante la copia."""
+
+
+class TipoArchivoNoPermitido(ValueError):
+    """La firma de los primeros bytes no corresponde a un tipo permitido."""
+
+
+def detectar_mime(cabecera, nombre=""):
+    """
+    Detecta el tipo MIME real a partir de los primeros bytes del archivo
+    (no del Content-Type declarado por el cliente).
+
+    Args:
+        cabecera (bytes): Primeros bytes del archivo (TAMANO_CABECERA)
+        nombre (str): Nombre original, para desambiguar contenedores Office
+
+    Returns:
+        str: MIME detectado o 'application/octet-stream'
+    """
+    extension = nombre.rsplit(".", 1)[1].lower() if nombre and "." in nombre else ""
+
+    # Algunos generadores anteponen basura antes de la firma PDF
+    if b"%PDF-" in cabecera[:1024]:
+        return "application/pdf"
+    for firma, mime in FIRMAS_MIME:
+        if cabecera.startswith(firma):
+            return mime
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    if cabecera[:2] == b"BM" and cabecera[6:10] == b"\x00\x00\x00\x00":
+        return "image/bmp"
+    if cabecera.startswith(FIRMA_ZIP):
+        return MIMES_ZIP.get(extension, "application/zip")
+    if cabecera.startswith(FIRMA_OLE):
+        return MIMES_OLE.get(extension, "application/x-ole-storage")
+    if extension in EXTENSIONES_TEXTO and cabecera and b"\x00" not in cabecera:
+        return "text/plain"
+    return "application/octet-stream"
+
+
+def leer_cabecera(origen):
+    """Lee los primeros bytes sin consumir el stream (vuelve al inicio)."""
+    stream = _abrir_stream(origen)
+    cabecera = stream.read(TAMANO_CABECERA)
+    stream.seek(0)
+    return cabecera
+
+
+def _carpeta_temporal():
+    carpeta = os.path.join(BLOB_STORE_FOLDER, "tmp")
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def ruta_blob(sha256):
+    """Ruta física del blob para un hash (dos niveles de fan-out)."""
+    return os.path.join(BLOB_STORE_FOLDER, sha256[:2], sha256[2:4], sha256)
+
+
+def _abrir_stream(origen):
+    """Acepta un FileStorage de Werkzeug, un objeto tipo archivo o bytes."""
+    if isinstance(origen, (bytes, bytearray)):
+        return io.BytesIO(origen)
+    return getattr(origen, "stream", origen)
+
+
+def _copiar_stream(origen, carpeta=None, max_bytes=None, mimes_permitidos=None):
+    """
+    Copia el stream a un temporal de `carpeta` (la temporal del almacén si
+    es None) calculando el SHA-256 por bloques. Retorna (ruta_temporal, sha256, tamano, mime); si algo falla
+    el temporal se elimina.
+    """
+    stream = _abrir_stream(origen)
+    hasher = hashlib.sha256()
+    tamano = 0
+
+    # El primer bloque decide el tipo antes de tocar el disco
+    bloque = stream.read(TAMANO_BLOQUE)
+    mime = detectar_mime(bloque[:TAMANO_CABECERA], getattr(origen, "filename", "") or "")
+    if mimes_permitidos is not None and mime not in mimes_permitidos:
+        raise TipoArchivoNoPermitido(f"Tipo de contenido no permitido ({mime})")
+
+    fd, ruta_temporal = tempfile.mkstemp(dir=carpeta or _carpeta_temporal(), suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as destino:
+            while bloque:
+                tamano += len(bloque)
+                if max_bytes is not None and tamano > max_bytes:
+                    raise ArchivoDemasiadoGrande(
+                        f"El archivo excede el tamaño máximo permitido ({max_bytes} bytes)"
+                    )
+                hasher.update(bloque)
+                destino.write(bloque)
+                bloque = stream.read(TAMANO_BLOQUE)
+    except BaseException:
+        os.remove(ruta_temporal)
+        raise
+    return ruta_temporal, hasher.hexdigest(), tamano, mime
+
+
+def guardar_blob(origen, max_bytes=None, mimes_permitidos=None):
+    """
+    Copia el stream a un temporal calculando el SHA-256 por bloques y lo
+    mueve al almacén si el contenido aún no existe.
+
+    Args:
+        origen: FileStorage, objeto tipo archivo o bytes
+        max_bytes (int, optional): Límite de tamaño; se aborta al superarlo
+        mimes_permitidos (set, optional): Tipos aceptados según la firma
+            del primer bloque; se rechaza antes de escribir nada en disco
+
+    Returns:
+        dict: {"sha256", "tamano", "ruta", "nuevo", "mime"}
+
+    Raises:
+        ArchivoDemasiadoGrande: Si el contenido supera max_bytes
+        TipoArchivoNoPermitido: Si el MIME detectado no está permitido
+    """
+    ruta_temporal, sha256, tamano, mime = _copiar_stream(
+        origen, max_bytes=max_bytes, mimes_permitidos=mimes_permitidos
+    )
+    ruta = ruta_blob(sha256)
+    try:
+        if os.path.exists(ruta):
+            os.remove(ruta_temporal)
+            if os.stat(ruta).st_nlink <= 1:
+                # Huérfano: renovar el mtime para que limpiar_blobs_huerfanos()
+                # no lo borre antes de que se vincule
+                os.utime(ruta)
+            logger.debug(f"♻️ Blob deduplicado: {sha256[:16]} ({tamano} bytes)")
+            return {"sha256": sha256, "tamano": tamano, "ruta": ruta, "nuevo": False, "mime": mime}
+
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        os.replace(ruta_temporal, ruta)
+        logger.debug(f"🧱 Blob nuevo: {sha256[:16]} ({tamano} bytes)")
+        return {"sha256": sha256, "tamano": tamano, "ruta": ruta, "nuevo": True, "mime": mime}
+
+    except BaseException:
+        if os.path.exists(ruta_temporal):
+            os.remove(ruta_temporal)
+        raise
+
+
+def admite_enlaces(carpeta):
+    """True si `carpeta` está en el mismo volumen que el almacén (os.link es posible)."""
+    os.makedirs(BLOB_STORE_FOLDER, exist_ok=True)
+    return os.stat(carpeta).st_dev == os.stat(BLOB_STORE_FOLDER).st_dev
+
+
+def vincular_blob(sha256, destino):
+    """
+    Hace que `destino` apunte al blob (enlace duro, o copia si no se puede
+    enlazar). Si `destino` ya existe se sustituye de forma atómica, sin
+    truncar el contenido compartido.
+
+    Returns:
+        str: Ruta de destino
+    """
+    origen = ruta_blob(sha256)
+    carpeta = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(carpeta, exist_ok=True)
+
+    # os.replace() entre dos enlaces del mismo inodo no hace nada (POSIX)
+    if os.path.exists(destino) and os.path.samefile(origen, destino):
+        return destino
+
+    # Nombre único: dos escrituras simultáneas del mismo contenido no chocan
+    temporal = os.path.join(carpeta, f".{os.path.basename(destino)}.{uuid.uuid4().hex}.lnk")
+    try:
+        os.link(origen, temporal)
+    except OSError as e:
+        # Otra unidad o sistema de archivos sin enlaces duros: el blob queda
+        # huérfano y limpiar_blobs_huerfanos() lo elimina pasada la gracia
+        logger.warning(f"⚠️ No se pudo enlazar {sha256[:16]} en {carpeta}, se copia: {e}")
+        shutil.copyfile(origen, temporal)
+    try:
+        os.replace(temporal, destino)
+    except BaseException:
+        os.remove(temporal)
+        raise
+    return destino
+
+
+def guardar_y_vincular(origen, destino, max_bytes=None, mimes_permitidos=None):
+    """
+    Atajo: guardar_blob() + vincular_blob() hacia la ruta visible. Si el
+    destino está en otro volumen que el almacén, escribe el archivo directo
+    en su destino (atómico) sin crear el blob.
+    """
+    carpeta = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(carpeta, exist_ok=True)
+    if not admite_enlaces(carpeta):
+        ruta_temporal, sha256, tamano, mime = _copiar_stream(
+            origen, carpeta, max_bytes=max_bytes, mimes_permitidos=mimes_permitidos
+        )
+        try:
+            os.replace(ruta_temporal, destino)
+        except BaseException:
+            os.remove(ruta_temporal)
+            raise
+        return {"sha256": sha256, "tamano": tamano, "ruta": destino, "nuevo": True, "mime": mime}
+
+    blob = guardar_blob(origen, max_bytes=max_bytes, mimes_permitidos=mimes_permitidos)
+    vincular_blob(blob["sha256"], destino)
+    return blob
+
+
+def _iterar_blobs():
+    """Genera (sha256, os.stat_result) para cada blob del almacén."""
+    if not os.path.isdir(BLOB_STORE_FOLDER):
+        return
+    for nivel1 in os.scandir(BLOB_STORE_FOLDER):
+        if not nivel1.is_dir() or nivel1.name == "tmp":
+            continue
+        for nivel2 in os.scandir(nivel1.path):
+            if not nivel2.is_dir():
+                continue
+            for entrada in os.scandir(nivel2.path):
+                if entrada.is_file():
+                    yield entrada.name, entrada.stat()
+
+
+def reporte_deduplicacion():
+    """
+    Resume el ahorro de disco del almacén.
+
+    bytes_logicos: lo que ocuparían todas las rutas vinculadas como copias
+    independientes. bytes_fisicos: lo que realmente ocupan los blobs.
+
+    Returns:
+        dict: blobs, referencias, bytes_fisicos, bytes_logicos,
+              bytes_ahorrados, blobs_compartidos, blobs_huerfanos
+    """
+    reporte = {
+        "blobs": 0,
+        "referencias": 0,
+        "bytes_fisicos": 0,
+        "bytes_logicos": 0,
+        "bytes_ahorrados": 0,
+        "blobs_compartidos": 0,
+        "blobs_huerfanos": 0,
+    }
+
+    for _, stat in _iterar_blobs():
+        # st_nlink cuenta el propio blob: los enlaces externos son nlink - 1
+        referencias = max(stat.st_nlink - 1, 0)
+        reporte["blobs"] += 1
+        reporte["referencias"] += referencias
+        reporte["bytes_fisicos"] += stat.st_size
+        reporte["bytes_logicos"] += stat.st_size * referencias
+        if referencias > 1:
+            reporte["blobs_compartidos"] += 1
+        elif referencias == 0:
+            reporte["blobs_huerfanos"] += 1
+
+    reporte["bytes_ahorrados"] = max(reporte["bytes_logicos"] - reporte["bytes_fisicos"], 0)
+    return reporte
+
+
+def limpiar_blobs_huerfanos(gracia_seg=None):
+    """
+    Elimina los blobs sin ninguna ruta vinculada que llevan más de
+    `gracia_seg` (GRACIA_HUERFANOS_SEG por defecto) sin modificarse: un blob
+    recién guardado todavía no tiene enlaces y no debe borrarse.
+
+    Returns:
+        int: Bytes liberados
+    """
+    gracia_seg = GRACIA_HUERFANOS_SEG if gracia_seg is None else gracia_seg
+    limite = time.time() - gracia_seg
+    liberados = 0
+    for sha256, stat in list(_iterar_blobs()):
+        if stat.st_nlink <= 1 and stat.st_mtime < limite:
+            try:
+                os.remove(ruta_blob(sha256))
+                liberados += stat.st_size
+            except OSError as e:
+                logger.warning(f"⚠️ No se pudo eliminar el blob {sha256[:16]}: {e}")
+    if liberados:
+        logger.info(f"🧹 Blobs huérfanos eliminados: {liberados} bytes liberados")
+    return liberados
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+busqueda_fts.py - Búsqueda de texto completo (FTS5) sobre usuarios y empresas
+============================================================================
+
+Índices FTS5 de contenido externo ('content=usuarios'): guardan solo los
+términos, las filas siguen en la tabla original y triggers AFTER INSERT /
+DELETE / UPDATE OF <columnas> los mantienen sincronizados con cualquier
+escritura (ORM, SQL directo, scripts).
+
+    usuarios_fts: nombres, apellidos, numeroId, correoElectronico
+    empresas_fts: nombre_empresa, nit, correo_empresa
+
+El tokenizador 'unicode61 remove_diacritics 2' ignora tildes y mayúsculas
+("jose pena" encuentra "José Peña") y 'prefix' indexa prefijos de 2 y 3
+caracteres para que el autocompletado no recorra todo el vocabulario.
+
+expresion_match() convierte el texto del usuario en una consulta de
+prefijos ('jos gom' -> "jos"* AND "gom"*); cada término va entre comillas
+para que la sintaxis de FTS5 (AND, NEAR, -, :) no se interprete.
+
+Los índices los crea la migración 20251211_busqueda_fts.sql (o
+instalar_fts() desde un script): el 'rebuild' tarda segundos con 1M de
+usuarios y no debe correr dentro de una petición. Mientras falten (o si
+la tabla se recreó sin sus triggers) fts_disponible() retorna False y los
+endpoints vuelven al LIKE.
+"""
+
+import re
+
+from logger import logger
+
+INDICES_FTS = {
+    "usuarios": (
+        "primerNombre", "segundoNombre", "primerApellido", "segundoApellido",
+        "numeroId", "correoElectronico",
+    ),
+    "empresas": ("nombre_empresa", "nit", "correo_empresa"),
+}
+
+TOKENIZADOR_FTS = "unicode61 remove_diacritics 2"
+PREFIJOS_FTS = "2 3"
+MAX_TERMINOS = 8
+# Caracteres mínimos del término más largo para sugerir: con 1-2 caracteres
+# casi todo coincide y ordenar por bm25 recorre buena parte del índice
+MIN_CARACTERES_SUGERENCIAS = 3
+
+SQL_TABLA_FTS = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS {tabla}_fts USING fts5(
+        {columnas},
+        content='{tabla}', content_rowid='id',
+        tokenize='{tokenizador}', prefix='{prefijos}'
+    )
+"""
+
+SQL_TRIGGERS_FTS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_{tabla}_fts_insert AFTER INSERT ON {tabla}
+    BEGIN
+        INSERT INTO {tabla}_fts (rowid, {columnas}) VALUES (new.id, {nuevos});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_{tabla}_fts_delete AFTER DELETE ON {tabla}
+    BEGIN
+        INSERT INTO {tabla}_fts ({tabla}_fts, rowid, {columnas}) VALUES ('delete', old.id, {viejos});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_{tabla}_fts_update AFTER UPDATE OF id, {columnas} ON {tabla}
+    BEGIN
+        INSERT INTO {tabla}_fts ({tabla}_fts, rowid, {columnas}) VALUES ('delete', old.id, {viejos});
+        INSERT INTO {tabla}_fts (rowid, {columnas}) VALUES (new.id, {nuevos});
+    END
+    """,
+)
+
+
+def _existe(conn, nombre):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (nombre,)).fetchone() is not None
+
+
+def instalar_fts(conn, tabla):
+    """
+    Crea {tabla}_fts, sus triggers y lo llena desde la tabla ('rebuild').
+    No hace nada si los triggers ya existen o la tabla no existe; si la
+    tabla se recreó (sin triggers) vuelve a crearlos y reconstruye el índice.
+    """
+    columnas = INDICES_FTS[tabla]
+    if _existe(conn, f"trg_{tabla}_fts_update") or not _existe(conn, tabla):
+        return
+    formato = {
+        "tabla": tabla,
+        "columnas": ", ".join(columnas),
+        "nuevos": ", ".join(f"new.{c}" for c in columnas),
+        "viejos": ", ".join(f"old.{c}" for c in columnas),
+        "tokenizador": TOKENIZADOR_FTS,
+        "prefijos": PREFIJOS_FTS,
+    }
+    conn.execute(SQL_TABLA_FTS.format(**formato))
+    # El trigger de UPDATE va al final: su existencia indica índice completo
+    for sql in SQL_TRIGGERS_FTS:
+        conn.execute(sql.format(**formato))
+    conn.execute(f"INSERT INTO {tabla}_fts ({tabla}_fts) VALUES ('rebuild')")
+    conn.commit()
+    logger.info(f"✅ Índice de texto completo {tabla}_fts creado")
+
+
+_avisos_sin_indice = set()
+
+
+def fts_disponible(conn, tabla):
+    """True si {tabla}_fts existe y sus triggers lo mantienen sincronizado (no lo crea)."""
+    if _existe(conn, f"trg_{tabla}_fts_update"):
+        return True
+    if tabla not in _avisos_sin_indice:
+        _avisos_sin_indice.add(tabla)
+        logger.warning(
+            f"⚠️ Sin índice {tabla}_fts, se usa LIKE: aplique migrations/20251211_busqueda_fts.sql"
+        )
+    return False
+
+
+def expresion_match(texto):
+    """
+    Texto libre -> expresión MATCH de prefijos ('José Góm' -> '"José"* AND "Góm"*').
+    None si el texto no tiene términos buscables.
+    """
+    terminos = re.findall(r"\w+", texto or "")[:MAX_TERMINOS]
+    if not terminos:
+        return None
+    return " AND ".join(f'"{termino}"*' for termino in terminos)
+
+
+def filtro_fts(tabla, alias=None):
+    """
+    Condición 'id IN (coincidencias)' para el WHERE de una consulta sobre
+    `tabla`; recibe como parámetro la expresión de expresion_match().
+    """
+    columna_id = f"{alias}.id" if alias else "id"
+    return f"{columna_id} IN (SELECT rowid FROM {tabla}_fts WHERE {tabla}_fts MATCH ?)"
+
+
+def sugerencias(conn, tabla, texto, columnas, limite=10):
+    """
+    Las `limite` filas de `tabla` que mejor coinciden con `texto` (bm25 sobre
+    todas las coincidencias), con las `columnas` pedidas. El 'ORDER BY rank
+    LIMIT k' va dentro de la subconsulta FTS5: solo se leen de `tabla` las
+    k filas ganadoras.
+    Lista vacía si ningún término tiene MIN_CARACTERES_SUGERENCIAS caracteres.
+    """
+    terminos = re.findall(r"\w+", texto or "")
+    if max(map(len, terminos), default=0) < MIN_CARACTERES_SUGERENCIAS:
+        return []
+    expresion = expresion_match(texto)
+    seleccion = ", ".join(f"t.{c}" for c in columnas)
+    return conn.execute(
+        f"""SELECT {seleccion}
+            FROM (SELECT rowid, rank FROM {tabla}_fts WHERE {tabla}_fts MATCH ?
+                  ORDER BY rank LIMIT ?) f
+            JOIN {tabla} t ON t.id = f.rowid
+            ORDER BY f.rank""",
+        (expresion, limite),
+    ).fetchall()
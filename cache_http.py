@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+cache_http.py - GET condicional (ETag / Last-Modified) para endpoints de catálogo
+=================================================================================
+
+Cada tabla de catálogo tiene un contador en 'versiones_datos' que suben
+triggers AFTER INSERT/UPDATE/DELETE, así que cualquier escritura (ORM, SQL
+directo, scripts) invalida las respuestas que dependen de ella.
+
+@respuesta_condicional("empresas", ...) lee esos contadores (una consulta
+por PK) ANTES de ejecutar la vista:
+
+    ETag          = hash(endpoint, argumentos de ruta, query string, versiones)
+    Last-Modified = última escritura en las tablas
+    If-None-Match / If-Modified-Since vigentes -> 304 sin ejecutar la vista
+
+Las respuestas 200 salen con 'Cache-Control: private, no-cache' y
+'Vary: Cookie': el navegador (y el proxy cache de nginx, ver
+nginx/nginx.conf) guarda el cuerpo pero revalida siempre contra el ETag.
+
+El versionado lo instala la migración 20251210_versiones_datos.sql; sin
+ella (o si una tabla perdió sus triggers) las vistas responden sin caché y
+no se escribe nada en la base.
+"""
+
+import hashlib
+import sqlite3
+from datetime import date, datetime, time, timezone
+from functools import wraps
+
+from flask import current_app, request
+
+from logger import logger
+from utils import buscar_bd_real
+
+TABLAS_VERSIONADAS = ("empresas", "usuarios", "documentos_gestor")
+
+CACHE_CONTROL_CATALOGO = "private, no-cache"
+
+_avisos_sin_versionado = set()
+
+
+def _leer_versiones(conn, tablas):
+    """Versiones de las tablas cuyos triggers siguen instalados."""
+    marcadores = ", ".join("?" * len(tablas))
+    return conn.execute(
+        f"""SELECT tabla, version, actualizado FROM versiones_datos v
+            WHERE tabla IN ({marcadores})
+              AND EXISTS (SELECT 1 FROM sqlite_master
+                          WHERE type = 'trigger' AND name = 'trg_version_' || v.tabla || '_delete')""",
+        tablas,
+    ).fetchall()
+
+
+def versiones_tablas(conn, tablas):
+    """
+    {tabla: (version, actualizado)} de las tablas pedidas (solo lectura).
+    None si alguna no está versionada: falta la migración o sus triggers.
+    """
+    try:
+        filas = _leer_versiones(conn, tablas)
+    except sqlite3.OperationalError:
+        filas = []
+    if len(filas) < len(tablas):
+        if tuple(tablas) not in _avisos_sin_versionado:
+            _avisos_sin_versionado.add(tuple(tablas))
+            logger.warning(
+                f"⚠️ Sin versionado para {tablas}, se responde sin caché: "
+                "aplique migrations/20251210_versiones_datos.sql"
+            )
+        return None
+    return {fila[0]: (fila[1], fila[2]) for fila in filas}
+
+
+def _ultima_modificacion(versiones, por_dia=False):
+    ultima = max(actualizado for _, actualizado in versiones.values())
+    ultima = datetime.strptime(ultima, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    if por_dia:
+        # La representación cambia al cambiar el día aunque no haya escrituras
+        ultima = max(ultima, datetime.combine(date.today(), time.min).astimezone(timezone.utc))
+    return ultima
+
+
+def calcular_etag(versiones, por_dia=False):
+    """ETag de la petición actual para las versiones dadas."""
+    clave = repr((
+        request.endpoint,
+        sorted((request.view_args or {}).items()),
+        sorted(request.args.items(multi=True)),
+        sorted((tabla, version) for tabla, (version, _) in versiones.items()),
+        date.today().isoformat() if por_dia else None,
+    ))
+    return hashlib.sha1(clave.encode("utf-8")).hexdigest()[:24]
+
+
+def _vigente(etag, ultima_modificacion):
+    """True si la copia del cliente sigue vigente (If-None-Match tiene prioridad)."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return ultima_modificacion <= request.if_modified_since
+    return False
+
+
+def respuesta_condicional(*tablas, por_dia=False):
+    """
+    Decorador de vistas GET de solo lectura que dependen de `tablas`.
+
+    por_dia=True agrega la fecha al ETag (vistas con campos calculados a
+    partir de hoy, p.ej. la edad en la unificación master).
+    """
+    tablas = tuple(tablas)
+    no_versionadas = set(tablas) - set(TABLAS_VERSIONADAS)
+    if no_versionadas:
+        raise ValueError(f"Tablas no versionadas: {sorted(no_versionadas)}")
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if request.method != "GET":
+                return vista(*args, **kwargs)
+
+            conn = None
+            try:
+                # Conexión propia: la vista puede cerrar la suya (g.db) al terminar
+                conn = sqlite3.connect(current_app.config.get("DATABASE_PATH") or buscar_bd_real())
+                versiones = versiones_tablas(conn, tablas)
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Versionado de {tablas} no disponible, se responde sin caché: {e}")
+                versiones = None
+            finally:
+                if conn:
+                    conn.close()
+            if versiones is None:
+                return vista(*args, **kwargs)
+
+            etag = calcular_etag(versiones, por_dia)
+            ultima_modificacion = _ultima_modificacion(versiones, por_dia)
+            if _vigente(etag, ultima_modificacion):
+                respuesta = current_app.response_class(status=304)
+            else:
+                respuesta = current_app.make_response(vista(*args, **kwargs))
+                if respuesta.status_code != 200:
+                    return respuesta
+
+            respuesta.set_etag(etag)
+            respuesta.last_modified = ultima_modificacion
+            respuesta.headers["Cache-Control"] = CACHE_CONTROL_CATALOGO
+            respuesta.vary.add("Cookie")
+            return respuesta
+        return envoltura
+    return decorador
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de Respuestas con TTL y Coalescencia - Sistema Montero
+============================================================
+Pensada para llamadas caras e idempotentes (LLM, agregados de BD):
+
+    - Entradas con TTL y tope de tamaño (se expulsa la más antigua).
+    - Coalescencia: si llegan N peticiones idénticas mientras la primera
+      se está calculando, solo la primera ejecuta la función; las demás
+      esperan y reciben el mismo resultado (o la misma excepción).
+    - Métricas: aciertos, fallos, coalescidas, errores y tasa de aciertos.
+
+La clave la arma quien llama; normalizar_pregunta() ayuda a que preguntas
+equivalentes ("¿Cuántos usuarios hay?" / "cuantos usuarios hay") compartan
+entrada.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_SIGNOS = re.compile(r"[^\w\s]", re.UNICODE)
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_pregunta(texto):
+    """Minúsculas, sin tildes, sin signos de puntuación y espacios colapsados."""
+    texto = unicodedata.normalize("NFKD", texto or "")
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    texto = _SIGNOS.sub(" ", texto)
+    return _ESPACIOS.sub(" ", texto).strip()
+
+
+class _EnVuelo:
+    """Cálculo en curso compartido por las peticiones coalescidas."""
+
+    __slots__ = ("evento", "resultado", "error")
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class CacheRespuestas:
+    """Caché en memoria, segura entre hilos, con TTL, coalescencia y métricas."""
+
+    def __init__(self, ttl_segundos=300, max_entradas=1000, espera_maxima=120):
+        self.ttl = ttl_segundos
+        self.max_entradas = max_entradas
+        self.espera_maxima = espera_maxima
+        self._entradas = OrderedDict()  # clave -> (expira_en, valor)
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self._metricas = {"aciertos": 0, "fallos": 0, "coalescidas": 0, "errores": 0, "expiradas": 0}
+
+    def obtener(self, clave):
+        """Valor vigente o None (no cuenta en las métricas)."""
+        with self._lock:
+            return self._vigente(clave)
+
+    def _vigente(self, clave):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        expira_en, valor = entrada
+        if expira_en < time.monotonic():
+            del self._entradas[clave]
+            self._metricas["expiradas"] += 1
+            return None
+        return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._entradas[clave] = (time.monotonic() + self.ttl, valor)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def obtener_o_calcular(self, clave, funcion, es_cacheable=None):
+        """
+        Devuelve (valor, origen) donde origen es "cache", "coalescida" o "calculada".
+
+        Args:
+            clave: Clave hashable
+            funcion: Callable sin argumentos que calcula el valor
+            es_cacheable: Callable(valor) -> bool; si devuelve False el valor
+                se entrega pero no se guarda (p. ej. respuestas de error)
+        """
+        with self._lock:
+            valor = self._vigente(clave)
+            if valor is not None:
+                self._metricas["aciertos"] += 1
+                return valor, "cache"
+
+            en_vuelo = self._en_vuelo.get(clave)
+            lider = en_vuelo is None
+            if lider:
+                en_vuelo = self._en_vuelo[clave] = _EnVuelo()
+                self._metricas["fallos"] += 1
+            else:
+                self._metricas["coalescidas"] += 1
+
+        if not lider:
+            if not en_vuelo.evento.wait(self.espera_maxima):
+                raise TimeoutError("Tiempo de espera agotado aguardando una respuesta en curso")
+            if en_vuelo.error is not None:
+                raise en_vuelo.error
+            return en_vuelo.resultado, "coalescida"
+
+        try:
+            valor = funcion()
+            en_vuelo.resultado = valor
+            if valor is not None and (es_cacheable is None or es_cacheable(valor)):
+                self.guardar(clave, valor)
+            return valor, "calculada"
+        except BaseException as e:
+            en_vuelo.error = e
+            with self._lock:
+                self._metricas["errores"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(clave, None)
+            en_vuelo.evento.set()
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        """Métricas acumuladas y tasa de aciertos (cache + coalescidas sobre el total)."""
+        with self._lock:
+            metricas = dict(self._metricas)
+            metricas["entradas"] = len(self._entradas)
+            metricas["en_vuelo"] = len(self._en_vuelo)
+        total = metricas["aciertos"] + metricas["fallos"] + metricas["coalescidas"]
+        metricas["solicitudes"] = total
+        metricas["tasa_aciertos"] = round((metricas["aciertos"] + metricas["coalescidas"]) / total, 4) if total else 0.0
+        return metricas
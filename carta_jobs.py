@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Generación Asíncrona de Cartas de Depuración - Sistema Montero
+==============================================================
+/api/depuraciones/generar-carta ya no rellena, firma ni combina PDFs
+dentro de la petición: valida el formulario, deja los anexos en disco
+(almacén de blobs, UNA escritura por anexo) y registra un job en la tabla
+carta_jobs. El worker genera la carta con cartas_depuracion.generar_carta_pdf
+e informa el progreso (0-100 y etapa) en la misma fila.
+
+Una solicitud es un dict serializable a JSON:
+
+    {
+        "carta_base_path": "...", "firma_path": "...",
+        "textos": [texto1, texto2, texto3, texto4],
+        "adjuntos": [["cedula", "<ruta del anexo en staging>"], ...],
+        "anexos": ["Estado de cuenta", ...],
+        "ruta_destino": ".../USUARIOS/<id>/DEPURACIONES/<archivo>.pdf",
+        "archivo": "<archivo>.pdf",
+        "staging": "<carpeta temporal de los anexos del job>"
+    }
+
+Backends (CARTAS_BACKEND):
+    - "hilos" (por defecto): ThreadPoolExecutor del proceso web
+    - "celery": celery_tasks.generar_carta_depuracion (requiere un worker
+      activo). Si el broker no responde, el job se ejecuta en un hilo.
+    - "sincrono": ejecuta en línea (scripts y pruebas)
+
+La carpeta de staging se elimina al terminar el job, con éxito o con error.
+La tabla carta_jobs la crea migrations/20251204_carta_jobs.sql; este módulo
+no ejecuta DDL.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from blob_store import guardar_y_vincular
+from cartas_depuracion import generar_carta_pdf
+from logger import logger
+
+CARTAS_BACKEND = os.getenv("CARTAS_BACKEND", "hilos")
+MAX_HILOS_CARTAS = int(os.getenv("CARTAS_MAX_HILOS", "2"))
+MIMES_ANEXO = {"application/pdf"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _conectar(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _ahora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _fila_a_dict(fila):
+    datos = dict(fila)
+    datos.pop("solicitud", None)
+    datos["resultado"] = json.loads(datos["resultado"]) if datos.get("resultado") else None
+    return datos
+
+
+# ==================== STAGING DE ANEXOS ====================
+
+
+def preparar_anexos(archivos_adjuntos, carpeta_staging):
+    """
+    Guarda los anexos subidos UNA vez en disco (almacén de blobs) y los
+    enlaza en la carpeta de staging del job. Los que no son PDF por
+    contenido se omiten.
+
+    Args:
+        archivos_adjuntos: [(nombre_campo, FileStorage), ...]
+        carpeta_staging (str): Carpeta temporal del job
+
+    Returns:
+        tuple: ([[nombre_campo, ruta], ...], [advertencias])
+    """
+    preparados = []
+    advertencias = []
+    for nombre_campo, archivo in archivos_adjuntos:
+        try:
+            ruta = os.path.join(carpeta_staging, f"{nombre_campo}.pdf")
+            guardar_y_vincular(archivo, ruta, mimes_permitidos=MIMES_ANEXO)
+        except ValueError as e:
+            logger.warning(f"⚠️ Anexo '{nombre_campo}' omitido: {e}")
+            advertencias.append(f"{nombre_campo}: {e}")
+            continue
+        preparados.append([nombre_campo, ruta])
+    return preparados, advertencias
+
+
+# ==================== EJECUCIÓN ====================
+
+
+def _actualizar(conn, job_id, **campos):
+    campos["actualizado_en"] = _ahora()
+    asignaciones = ", ".join(f"{campo} = ?" for campo in campos)
+    conn.execute(f"UPDATE carta_jobs SET {asignaciones} WHERE job_id = ?", (*campos.values(), job_id))
+    conn.commit()
+
+
+def ejecutar_job(db_path, job_id):
+    """
+    Genera la carta de un job registrado y guarda el resultado (lo usan
+    hilos y Celery). Solo un worker toma el job: un despacho duplicado que
+    lo encuentra fuera de 'pendiente' no regenera la carta ni borra el
+    staging que otro worker está leyendo.
+
+    Returns:
+        dict | None: Estado final del job (o el actual, si ya fue tomado)
+    """
+    conn = _conectar(db_path)
+    try:
+        fila = conn.execute("SELECT solicitud FROM carta_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if not fila:
+            logger.warning(f"⚠️ Job de carta inexistente: {job_id}")
+            return None
+
+        # Tomar el job de forma atómica
+        tomado = conn.execute(
+            "UPDATE carta_jobs SET estado = 'en_proceso', progreso = 0, etapa = 'inicio', error = NULL, "
+            "actualizado_en = ? WHERE job_id = ? AND estado = 'pendiente'",
+            (_ahora(), job_id),
+        ).rowcount
+        conn.commit()
+        if not tomado:
+            logger.info(f"⏳ Job de carta {job_id} ya fue tomado por otro worker")
+            return estado_job(conn, job_id)
+
+        solicitud = json.loads(fila["solicitud"])
+
+        try:
+            return _generar(conn, job_id, solicitud)
+        finally:
+            if solicitud.get("staging"):
+                shutil.rmtree(solicitud["staging"], ignore_errors=True)
+    finally:
+        conn.close()
+
+
+def _generar(conn, job_id, solicitud):
+    """Genera la carta del job y deja el estado final en la fila."""
+    try:
+        generar_carta_pdf(
+            solicitud["carta_base_path"],
+            solicitud["firma_path"],
+            tuple(solicitud["textos"]),
+            [tuple(adjunto) for adjunto in solicitud.get("adjuntos", [])],
+            solicitud.get("anexos", []),
+            ruta_destino=solicitud["ruta_destino"],
+            progreso=lambda porcentaje, etapa: _actualizar(conn, job_id, progreso=porcentaje, etapa=etapa),
+        )
+    except Exception as e:
+        logger.error(f"❌ Error generando carta del job {job_id}: {e}", exc_info=True)
+        _actualizar(conn, job_id, estado="error", etapa="error", error=str(e))
+        return estado_job(conn, job_id)
+
+    resultado = {
+        "archivo": solicitud["archivo"],
+        "ruta": solicitud["ruta_destino"],
+        "tamano": os.path.getsize(solicitud["ruta_destino"]),
+    }
+    _actualizar(
+        conn, job_id,
+        estado="completado", progreso=100, etapa="completado",
+        resultado=json.dumps(resultado, ensure_ascii=False),
+    )
+    logger.info(f"✅ Carta generada (job {job_id}): {solicitud['ruta_destino']}")
+    return estado_job(conn, job_id)
+
+
+# ==================== ENCOLADO ====================
+
+
+def _obtener_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_HILOS_CARTAS, thread_name_prefix="cartas")
+        return _executor
+
+
+def _despachar(db_path, job_id):
+    if CARTAS_BACKEND == "sincrono":
+        ejecutar_job(db_path, job_id)
+        return
+    if CARTAS_BACKEND == "celery":
+        try:
+            from celery_config import celery_app
+
+            celery_app.send_task("celery_tasks.generar_carta_depuracion", args=[db_path, job_id])
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Broker de Celery no disponible, la carta {job_id} se genera en un hilo: {e}")
+    _obtener_executor().submit(ejecutar_job, db_path, job_id)
+
+
+def crear_job(conn, db_path, solicitud, usuario_id=None):
+    """
+    Registra la solicitud y la envía al backend configurado.
+
+    Returns:
+        str: job_id
+    """
+    job_id = uuid.uuid4().hex
+    ahora = _ahora()
+    conn.execute(
+        """
+        INSERT INTO carta_jobs (job_id, estado, progreso, etapa, solicitud, usuario_id, creado_en, actualizado_en)
+        VALUES (?, 'pendiente', 0, 'en_cola', ?, ?, ?, ?)
+        """,
+        (job_id, json.dumps(solicitud, ensure_ascii=False), str(usuario_id) if usuario_id else None, ahora, ahora),
+    )
+    conn.commit()
+    _despachar(db_path, job_id)
+    logger.info(f"📨 Carta de depuración encolada (job {job_id})")
+    return job_id
+
+
+# ==================== CONSULTA DE ESTADO ====================
+
+
+def estado_job(conn, job_id):
+    fila = conn.execute("SELECT * FROM carta_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _fila_a_dict(fila) if fila else None
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Generación de Cartas de Depuración - Sistema Montero
+====================================================
+Pipeline de una carta:
+
+    1. construir_textos(): textos del escenario (COMPLETO, SIN_RETIRO, BASICO).
+    2. Overlay con ReportLab: el cuerpo se parte en líneas con una tabla de
+       anchos de la fuente precalculada (sin stringWidth palabra a palabra)
+       y la firma sale de la caché de imágenes decodificadas (indice_firmas).
+    3. generar_carta_pdf(): en UN solo PdfWriter se agregan la página base
+       con el overlay, el resto de la carta y los anexos, y se escribe UNA
+       vez (directo al archivo destino, de forma atómica).
+
+La carta base (CARTA.pdf de cada empresa) se parsea una vez por hilo y se
+reutiliza mientras su mtime/tamaño no cambien. PdfReader no es seguro entre
+hilos, por eso la caché es por hilo.
+
+Las cartas se generan fuera de la petición en los workers de carta_jobs.
+"""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+
+from pypdf import PdfReader, PdfWriter
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfgen import canvas
+
+from blob_store import detectar_mime, leer_cabecera
+from indice_firmas import cargar_firma
+from logger import logger
+
+FUENTE_CARTA = "Helvetica"
+TAMANO_FUENTE_CARTA = 10
+MARGEN_IZQUIERDO = 72
+ANCHO_CUERPO = 450
+MAX_PLANTILLAS_POR_HILO = 64
+MAX_CARTAS_LOTE = 500
+
+ESCENARIOS_CARTA = ("COMPLETO", "SIN_RETIRO", "BASICO")
+
+# Nombre del campo de archivo -> nombre del anexo en la carta
+NOMBRES_ANEXOS = {
+    "estado_cuenta": "Estado de cuenta",
+    "afiliacion": "Formulario de afiliación",
+    "ingreso": "Planilla de ingreso",
+    "retiro": "Planilla de retiro",
+    "cedula": "Cédula",
+}
+
+
+# ==================== TEXTOS DEL ESCENARIO ====================
+
+
+def construir_textos(datos, adjuntos_presentes=()):
+    """
+    Construye los cuatro bloques de texto de la carta y la lista de anexos.
+
+    Args:
+        datos (dict): Campos del formulario de generar-carta
+        adjuntos_presentes (iterable): Nombres de campo de los adjuntos recibidos
+
+    Returns:
+        tuple: ((texto1, texto2, texto3, texto4), anexos)
+
+    Raises:
+        ValueError: Si el escenario no es reconocido
+    """
+    tipo_escenario = datos.get("tipo_escenario")
+    usuario_nombre = datos.get("usuario_nombre_completo")
+    usuario_tipo_id = datos.get("usuario_tipo_id")
+    usuario_numero_id = datos.get("usuario_numero_id")
+
+    fecha_actual = datetime.now().strftime("%d de %B de %Y")
+
+    texto1 = f"{datos.get('ciudad')}, {fecha_actual}\n"
+    texto1 += f"Señores:\n{datos.get('senores')}\n"
+    texto1 += f"Departamento:\n{datos.get('departamento_entidad')}\n"
+    texto1 += "Cordial saludo"
+
+    if tipo_escenario in ["COMPLETO", "SIN_RETIRO"]:
+        texto2 = f"El motivo de esta carta es para solicitarles la corrección de mora donde nos notifica de la siguiente persona {usuario_nombre} identificado con número de {usuario_tipo_id} {usuario_numero_id}, el cual laboró desde {datos.get('fecha_inicio')} hasta {datos.get('fecha_fin')}, por lo tanto anexamos estado de cuenta, planilla con número {datos.get('numero_planilla')} y afiliación para que nos colaboren con la corrección ya que nuestra intención como empresa es estar al día con todas nuestras obligaciones."
+
+        anexos = ["Estado de cuenta", "Formulario de afiliación", "Planilla de ingreso"]
+
+        if tipo_escenario == "COMPLETO":
+            anexos.append("Planilla de retiro")
+
+    elif tipo_escenario == "BASICO":
+        texto2 = f"El motivo de esta carta es para solicitarles la corrección de mora donde nos notifica de la siguiente persona {usuario_nombre} identificado con número de {usuario_tipo_id} {usuario_numero_id}, el cual evidenciamos que no se ha realizado la solicitud de afiliación, por lo tanto anexamos estado de cuenta para que nos colaboren con el comprobante de afiliación y en caso contrario de no haber dicho documento solicitamos la anulación del reporte del estado de cuenta, ya que nuestra intención como empresa es estar al día con todas nuestras obligaciones."
+
+        anexos = ["Estado de cuenta"]
+    else:
+        raise ValueError("Escenario no reconocido")
+
+    if "cedula" in adjuntos_presentes:
+        anexos.append("Cédula")
+
+    texto3 = "Anexamos:\n" + "\n".join([f"{i+1}. {anexo}" for i, anexo in enumerate(anexos)])
+    texto3 += "\n\nMuchas gracias"
+
+    texto4 = f"{datos.get('rep_legal_nombre')}\n"
+    texto4 += f"{datos.get('rep_legal_cargo')}\n"
+    texto4 += f"Celular: {datos.get('rep_legal_celular')}\n"
+    texto4 += f"Dirección: {datos.get('rep_legal_direccion')}\n"
+    texto4 += f"Correo: {datos.get('rep_legal_correo')}"
+
+    return (texto1, texto2, texto3, texto4), anexos
+
+
+# ==================== MÉTRICAS DE FUENTE ====================
+
+
+@lru_cache(maxsize=8)
+def _tabla_anchos(fuente):
+    """Ancho (en unidades de 1/1000 de punto) de cada carácter Latin-1."""
+    return {chr(c): pdfmetrics.stringWidth(chr(c), fuente, 1000) for c in range(32, 256)}
+
+
+def _ancho_texto(texto, fuente, tabla):
+    ancho = 0.0
+    for caracter in texto:
+        valor = tabla.get(caracter)
+        if valor is None:
+            valor = tabla[caracter] = pdfmetrics.stringWidth(caracter, fuente, 1000)
+        ancho += valor
+    return ancho
+
+
+def partir_lineas(texto, max_ancho, fuente=FUENTE_CARTA, tamano=TAMANO_FUENTE_CARTA):
+    """
+    Parte un párrafo en líneas que caben en max_ancho puntos.
+
+    Mismo criterio que el cálculo original con canvas.stringWidth (la línea
+    más el espacio final debe medir menos que max_ancho), pero sumando
+    anchos precalculados por carácter y acumulando el ancho de la línea.
+
+    Returns:
+        list[str]
+    """
+    tabla = _tabla_anchos(fuente)
+    limite = max_ancho * 1000.0 / tamano
+    ancho_espacio = tabla[" "]
+
+    lineas = []
+    actual = []
+    ancho_actual = 0.0
+    for palabra in texto.split():
+        ancho_palabra = _ancho_texto(palabra, fuente, tabla) + ancho_espacio
+        if ancho_actual + ancho_palabra < limite:
+            actual.append(palabra)
+            ancho_actual += ancho_palabra
+        else:
+            lineas.append(" ".join(actual))
+            actual = [palabra]
+            ancho_actual = ancho_palabra
+    if actual:
+        lineas.append(" ".join(actual))
+    return lineas
+
+
+# ==================== CACHÉ DE CARTAS BASE ====================
+
+_local = threading.local()
+
+
+def _plantilla(carta_base_path):
+    """PdfReader de CARTA.pdf, parseado una vez por hilo mientras no cambie en disco."""
+    stat = os.stat(carta_base_path)
+    clave = (carta_base_path, stat.st_mtime_ns, stat.st_size)
+
+    cache = getattr(_local, "plantillas", None)
+    if cache is None:
+        cache = _local.plantillas = OrderedDict()
+
+    reader = cache.get(clave)
+    if reader is not None:
+        cache.move_to_end(clave)
+        return reader
+
+    with open(carta_base_path, "rb") as f:
+        reader = PdfReader(BytesIO(f.read()))
+    cache[clave] = reader
+    while len(cache) > MAX_PLANTILLAS_POR_HILO:
+        cache.popitem(last=False)
+    return reader
+
+
+def limpiar_cache_plantillas():
+    cache = getattr(_local, "plantillas", None)
+    if cache is not None:
+        cache.clear()
+
+
+# ==================== OVERLAY Y ENSAMBLADO ====================
+
+
+def renderizar_overlay(firma_path, texto1, texto2, texto3, texto4):
+    """
+    Dibuja los textos y la firma en una página tamaño carta.
+
+    Returns:
+        PdfReader: Overlay de una página listo para fusionar
+    """
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    can.setFont(FUENTE_CARTA, TAMANO_FUENTE_CARTA)
+
+    # TEXTO1 (encabezado)
+    y_pos = 600
+    for linea in texto1.split("\n"):
+        can.drawString(MARGEN_IZQUIERDO, y_pos, linea)
+        y_pos -= 15
+
+    # TEXTO2 (cuerpo)
+    y_pos = 500
+    lineas = partir_lineas(texto2, ANCHO_CUERPO)
+    for linea in lineas:
+        can.drawString(MARGEN_IZQUIERDO, y_pos, linea)
+        y_pos -= 15
+    if lineas:
+        y_pos -= 15
+
+    # TEXTO3 (anexos)
+    for linea in texto3.split("\n"):
+        can.drawString(MARGEN_IZQUIERDO, y_pos, linea)
+        y_pos -= 15
+
+    y_pos -= 20
+
+    # FIRMA (imagen ya decodificada y reducida)
+    try:
+        can.drawImage(cargar_firma(firma_path), MARGEN_IZQUIERDO, y_pos - 60, width=150, height=60, preserveAspectRatio=True)
+        y_pos -= 80
+    except Exception as e:
+        logger.warning(f"No se pudo insertar firma: {e}")
+        can.drawString(MARGEN_IZQUIERDO, y_pos, "[FIRMA DIGITAL]")
+        y_pos -= 20
+
+    # TEXTO4 (datos del representante)
+    for linea in texto4.split("\n"):
+        can.drawString(MARGEN_IZQUIERDO, y_pos, linea)
+        y_pos -= 12
+
+    can.save()
+    packet.seek(0)
+    return PdfReader(packet)
+
+
+def ordenar_adjuntos(archivos_adjuntos, orden_anexos):
+    """
+    Streams de los adjuntos en el orden de los anexos de la carta.
+    Omite (con advertencia) los que no son PDF según su contenido.
+
+    Args:
+        archivos_adjuntos: [(nombre_campo, FileStorage | ruta), ...]
+        orden_anexos: Nombres de anexos en el orden de la carta
+    """
+    streams = []
+    for anexo_nombre in orden_anexos:
+        for nombre_key, archivo in archivos_adjuntos:
+            if NOMBRES_ANEXOS.get(nombre_key) == anexo_nombre:
+                if isinstance(archivo, str):
+                    streams.append(archivo)
+                    break
+                if detectar_mime(leer_cabecera(archivo), getattr(archivo, "filename", "") or "") != "application/pdf":
+                    logger.warning(f"⚠️ Anexo '{nombre_key}' omitido: el contenido no es un PDF")
+                    break
+                stream = getattr(archivo, "stream", archivo)
+                stream.seek(0)
+                streams.append(stream)
+                break
+    return streams
+
+
+def escribir_pdf(writer, ruta_destino=None):
+    """Escribe el PdfWriter a ruta_destino (temporal + os.replace) o a un BytesIO."""
+    if ruta_destino:
+        fd, ruta_temporal = tempfile.mkstemp(dir=os.path.dirname(ruta_destino), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as destino:
+                writer.write(destino)
+            writer.close()
+            os.replace(ruta_temporal, ruta_destino)
+        except BaseException:
+            if os.path.exists(ruta_temporal):
+                os.remove(ruta_temporal)
+            raise
+        return ruta_destino
+
+    output = BytesIO()
+    writer.write(output)
+    writer.close()
+    output.seek(0)
+    return output
+
+
+def _avisar(progreso, porcentaje, etapa):
+    if progreso is not None:
+        progreso(int(porcentaje), etapa)
+
+
+def generar_carta_pdf(carta_base_path, firma_path, textos, archivos_adjuntos=(), orden_anexos=(), ruta_destino=None,
+                      progreso=None):
+    """
+    Genera la carta completa (base + overlay + anexos) en una sola escritura.
+
+    Args:
+        carta_base_path (str): CARTA.pdf de la empresa
+        firma_path (str): PNG de la firma
+        textos (tuple): (texto1, texto2, texto3, texto4)
+        archivos_adjuntos: [(nombre_campo, FileStorage | ruta), ...]
+        orden_anexos: Nombres de anexos en el orden de la carta
+        ruta_destino (str, optional): Archivo final; si se omite se devuelve un BytesIO
+        progreso (callable, optional): progreso(porcentaje, etapa) en cada fase
+
+    Returns:
+        str | BytesIO
+    """
+    base = _plantilla(carta_base_path)
+    _avisar(progreso, 10, "carta_base")
+    overlay = renderizar_overlay(firma_path, *textos)
+    _avisar(progreso, 30, "textos_y_firma")
+
+    writer = PdfWriter()
+    # add_page clona la página en el writer: la plantilla cacheada no se modifica
+    primera = writer.add_page(base.pages[0])
+    primera.merge_page(overlay.pages[0])
+    for pagina in base.pages[1:]:
+        writer.add_page(pagina)
+
+    adjuntos = ordenar_adjuntos(archivos_adjuntos, orden_anexos)
+    for numero, adjunto in enumerate(adjuntos, start=1):
+        writer.append(adjunto)
+        _avisar(progreso, 30 + 50 * numero / len(adjuntos), "anexos")
+
+    _avisar(progreso, 85, "escritura")
+    return escribir_pdf(writer, ruta_destino)
@@ -1,7 +1,9 @@
 # celery_config.py
 import os
+import re
 
 from celery import Celery
+from celery.schedules import crontab
 from kombu import Exchange, Queue
 
 # Cargar variables de entorno (asumiendo que Redis está configurado en .env)
@@ -9,6 +11,34 @@ from kombu import Exchange, Queue
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
 CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
 
+CAMPOS_CRONTAB = ("minute", "hour", "day_of_month", "month_of_year", "day_of_week")
+
+
+def programacion_desde_env(variable, **por_defecto):
+    """
+    crontab(**por_defecto), o el valor de la variable de entorno si está definida.
+    Acepta los campos con nombre ('minute=30, hour=0', también envueltos en
+    'crontab(...)') o las 5 posiciones de cron ('30 0 * * *').
+    """
+    valor = os.getenv(variable, "").strip()
+    if not valor:
+        return crontab(**por_defecto)
+    valor = re.sub(r"^crontab\((.*)\)$", r"\1", valor).strip()
+    if "=" in valor:
+        campos = {}
+        for parte in valor.split(","):
+            nombre, _, dato = parte.partition("=")
+            nombre = nombre.strip()
+            if nombre not in CAMPOS_CRONTAB:
+                raise ValueError(f"{variable}: campo '{nombre}' inválido; use {', '.join(CAMPOS_CRONTAB)}")
+            campos[nombre] = dato.strip().strip("'\"")
+        return crontab(**campos)
+    posiciones = valor.split()
+    if len(posiciones) != len(CAMPOS_CRONTAB):
+        raise ValueError(f"{variable}: se esperaban 5 campos de cron ('30 0 * * *'), llegó '{valor}'")
+    return crontab(**dict(zip(CAMPOS_CRONTAB, posiciones)))
+
+
 # Inicialización de la aplicación Celery
 celery_app = Celery(
     "montero_notificaciones",
@@ -36,22 +66,32 @@ celery_app.conf.update(
         # Tarea 1: Verificar Tutelas Próximas a Vencer (Diaria a las 08:00 AM)
         "check-expiring-tutelas-daily": {
             "task": "celery_tasks.check_expiring_tutelas",
-            "schedule": os.getenv("TUTELAS_SCHEDULE", "crontab(minute=0, hour=8)"),
+            "schedule": programacion_desde_env("TUTELAS_SCHEDULE", minute=0, hour=8),
         },
         # Tarea 2: Enviar Reporte Mensual (El primer día del mes a las 09:00 AM)
         "send-monthly-report": {
             "task": "celery_tasks.send_monthly_report",
-            "schedule": os.getenv("REPORT_SCHEDULE", "crontab(day_of_month=1, hour=9, minute=0)"),
+            "schedule": programacion_desde_env("REPORT_SCHEDULE", day_of_month=1, hour=9, minute=0),
         },
         # Tarea 3: Limpieza de Notificaciones Antiguas (Semanal)
         "cleanup-old-notifications": {
             "task": "celery_tasks.cleanup_old_notifications",
-            "schedule": os.getenv("CLEANUP_SCHEDULE", "crontab(day_of_week=0, hour=2, minute=0)"),  # Domingo a las 2 AM
+            "schedule": programacion_desde_env("CLEANUP_SCHEDULE", day_of_week=0, hour=2, minute=0),  # Domingo a las 2 AM
         },
         # Tarea 4: Verificar Pagos Pendientes (Diaria a las 10:00 AM)
         "check-pending-payments-daily": {
             "task": "celery_tasks.check_pending_payments",
-            "schedule": os.getenv("PENDING_PAYMENTS_SCHEDULE", "crontab(minute=0, hour=10)"),
+            "schedule": programacion_desde_env("PENDING_PAYMENTS_SCHEDULE", minute=0, hour=10),
+        },
+        # Tarea 5: Recalcular días de mora y estado de la cartera (Diaria a las 00:30 AM)
+        "recalcular-mora-cartera-nightly": {
+            "task": "celery_tasks.recalcular_mora_cartera",
+            "schedule": programacion_desde_env("MORA_CARTERA_SCHEDULE", minute=30, hour=0),
+        },
+        # Tarea 6: Reindexar el catálogo del gestor de archivos (Diaria a las 01:30 AM)
+        "reindexar-catalogo-archivos-nightly": {
+            "task": "celery_tasks.reindexar_catalogo_archivos",
+            "schedule": programacion_desde_env("CATALOGO_ARCHIVOS_SCHEDULE", minute=30, hour=1),
         },
     },
 )
@@ -354,6 +354,10 @@ def check_recordatorios_cobro():
     EL DESPERTADOR: Verifica recordatorios de cobro programados para HOY
     y genera novedades automáticas para que el equipo de cobranza actúe.
 
+    Todas las alertas se arman en memoria y se insertan con un solo
+    INSERT OR IGNORE: el índice único (origen_tipo, origen_id, origen_dia)
+    de novedades descarta las que ya se crearon hoy para la misma deuda.
+
     AGENDA DE COBROS PERSONALIZADA: Ejecutar diariamente a las 8:00 AM
     """
     try:
@@ -362,61 +366,52 @@ def check_recordatorios_cobro():
         with app.app_context():
             # Fecha de hoy
             fecha_hoy = datetime.now().strftime("%Y-%m-%d")
+            ahora = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             print(f"[INFO] Tareas: Verificando recordatorios de cobro para {fecha_hoy}...")
 
-            # Consulta usando ORM: deudas con recordatorio para HOY
-            deudas_con_recordatorio = DeudaCartera.query.filter(
+            # Solo las columnas necesarias para armar la alerta
+            deudas_con_recordatorio = db.session.query(
+                DeudaCartera.id,
+                DeudaCartera.usuario_id,
+                DeudaCartera.nombre_usuario,
+                DeudaCartera.nombre_empresa,
+                DeudaCartera.monto,
+                DeudaCartera.entidad,
+                DeudaCartera.estado,
+                DeudaCartera.dias_mora,
+            ).filter(
                 DeudaCartera.fecha_recordatorio_cobro == fecha_hoy
             ).all()
 
-            if deudas_con_recordatorio:
-                print(f"[INFO] Tareas: {len(deudas_con_recordatorio)} recordatorios encontrados para hoy.")
-                alertas_creadas = 0
-                alertas_fallidas = 0
-
-                for deuda in deudas_con_recordatorio:
-                    try:
-                        # Verificar si ya existe una alerta reciente (hoy) para evitar duplicados
-                        alerta_existente = Novedad.query.filter(
-                            Novedad.subject.like(f"%RECORDATORIO COBRO%deuda #{deuda.id}%"),
-                            Novedad.creationDate >= fecha_hoy
-                        ).first()
-
-                        if alerta_existente:
-                            print(f"[INFO] Tareas: Ya existe alerta para deuda #{deuda.id}, omitiendo...")
-                            continue
-
-                        # Construir nombre del cliente
-                        nombre_cliente = deuda.nombre_usuario or f"Usuario {deuda.usuario_id}"
-                        if deuda.nombre_empresa:
-                            nombre_cliente += f" ({deuda.nombre_empresa})"
-
-                        # Crear alerta/novedad automática
-                        nueva_alerta = Novedad(
-                            subject=f"⏰ RECORDATORIO COBRO: {nombre_cliente} - deuda #{deuda.id}",
-                            description=f"Recordatorio programado para cobrar a '{nombre_cliente}' por ${float(deuda.monto):,.2f} ({deuda.entidad}). Estado: {deuda.estado}. Días de mora: {deuda.dias_mora or 0}. Programado por Admin.",
-                            status="Pendiente",
-                            priorityText="Alta",
-                            priority=3,  # Alta prioridad
-                            assignedTo="Cobranza",
-                            client=nombre_cliente,
-                            creationDate=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        )
-
-                        db.session.add(nueva_alerta)
-                        db.session.commit()
-
-                        alertas_creadas += 1
-                        print(f"[SUCCESS] Alerta creada para deuda #{deuda.id} ({nombre_cliente}) - ${float(deuda.monto):,.2f}")
-
-                    except Exception as deuda_error:
-                        print(f"[ERROR] Tareas: Error procesando deuda #{deuda.id}: {deuda_error}")
-                        db.session.rollback()
-                        alertas_fallidas += 1
-                        continue
-
-                print(f"[INFO] Tareas: Procesamiento completado. Alertas creadas: {alertas_creadas}, Fallidas: {alertas_fallidas}")
+            alertas = []
+            for deuda in deudas_con_recordatorio:
+                # Construir nombre del cliente
+                nombre_cliente = deuda.nombre_usuario or f"Usuario {deuda.usuario_id}"
+                if deuda.nombre_empresa:
+                    nombre_cliente += f" ({deuda.nombre_empresa})"
+
+                alertas.append({
+                    "subject": f"⏰ RECORDATORIO COBRO: {nombre_cliente} - deuda #{deuda.id}",
+                    "description": f"Recordatorio programado para cobrar a '{nombre_cliente}' por ${float(deuda.monto):,.2f} ({deuda.entidad}). Estado: {deuda.estado}. Días de mora: {deuda.dias_mora or 0}. Programado por Admin.",
+                    "status": "Pendiente",
+                    "priorityText": "Alta",
+                    "priority": 3,  # Alta prioridad
+                    "assignedTo": "Cobranza",
+                    "client": nombre_cliente,
+                    "creationDate": ahora,
+                    "origen_tipo": "deuda_cartera",
+                    "origen_id": str(deuda.id),
+                    "origen_dia": fecha_hoy,
+                })
+
+            alertas_creadas = 0
+            if alertas:
+                resultado = db.session.execute(Novedad.__table__.insert().prefix_with("OR IGNORE"), alertas)
+                db.session.commit()
+                alertas_creadas = resultado.rowcount
+                print(f"[INFO] Tareas: {len(alertas)} recordatorios para hoy. Alertas creadas: {alertas_creadas}, "
+                      f"ya existentes: {len(alertas) - alertas_creadas}")
             else:
                 print(f"[INFO] Tareas: No hay recordatorios programados para {fecha_hoy}.")
 
@@ -424,7 +419,8 @@ def check_recordatorios_cobro():
                 "status": "success",
                 "fecha": fecha_hoy,
                 "recordatorios_encontrados": len(deudas_con_recordatorio),
-                "alertas_creadas": alertas_creadas if deudas_con_recordatorio else 0
+                "alertas_creadas": alertas_creadas,
+                "alertas_duplicadas": len(alertas) - alertas_creadas,
             }
 
     except Exception as e:
@@ -434,6 +430,120 @@ def check_recordatorios_cobro():
         return {"status": "failed", "error": str(e)}
 
 
+@celery_app.task
+def recalcular_mora_cartera():
+    """
+    Recalcula dias_mora y estado ('Vencido') de deudas_cartera con un UPDATE
+    por conjuntos (julianday) en bloques de rowid. Ejecutar cada noche.
+    """
+    from logic.mora_cartera import recalcular_mora
+
+    try:
+        app = create_app()
+        with app.app_context():
+            resultado = recalcular_mora(db.session)
+            print(f"[INFO] Tareas: Mora de cartera recalculada al {resultado['fecha_corte']}: "
+                  f"{resultado['filas_actualizadas']} deudas actualizadas en {resultado['bloques']} bloques "
+                  f"({resultado['duracion_ms']} ms)")
+            return {"status": "success", **resultado}
+
+    except Exception as e:
+        print(f"[ERROR] Tareas: Error en recalcular_mora_cartera: {e}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "failed", "error": str(e)}
+
+
+@celery_app.task
+def reindexar_catalogo_archivos():
+    """
+    Reconstruye archivos_catalogo para todas las carpetas del gestor de
+    archivos. Recoge lo que las peticiones no detectan con el mtime de las
+    carpetas (archivos sobrescritos en su lugar). Ejecutar cada noche.
+    """
+    from routes.gestor_archivos import reindexar_todos
+
+    try:
+        app = create_app()
+        with app.app_context():
+            conexion = db.engine.raw_connection()
+            try:
+                resumen = reindexar_todos(conexion.driver_connection)
+            finally:
+                conexion.close()
+            print(f"[INFO] Tareas: Catálogo de archivos reindexado: {resumen['usuarios']} usuarios, "
+                  f"{resumen['entradas']} entradas")
+            return {"status": "success", **resumen}
+
+    except Exception as e:
+        print(f"[ERROR] Tareas: Error en reindexar_catalogo_archivos: {e}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "failed", "error": str(e)}
+
+
+# ==============================================================================
+# TAREAS BAJO DEMANDA: EXPEDIENTES (EXPEDIENTES_BACKEND=celery)
+# ==============================================================================
+
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=30)
+def generar_expediente(self, db_path, job_id):
+    """
+    Materializa el expediente de un job registrado en expediente_jobs.
+    Es idempotente: reintentar tras un fallo de red no duplica nada.
+    """
+    from expediente_jobs import ejecutar_job
+
+    try:
+        resultado = ejecutar_job(db_path, job_id)
+        print(f"[INFO] Tareas: Expediente {job_id} -> {'OK' if resultado and resultado['success'] else 'ERROR'}")
+        return {"status": "completed", "job_id": job_id, "resultado": resultado}
+    except Exception as e:
+        print(f"[ERROR] Tareas: Error en generar_expediente {job_id}: {e}")
+        raise self.retry(exc=e)
+
+
+@celery_app.task
+def generar_expedientes_lote(db_path, lote_id):
+    """Alta masiva: crea todos los directorios del lote y luego los expedientes en paralelo."""
+    from expediente_jobs import ejecutar_lote
+
+    try:
+        estado = ejecutar_lote(db_path, lote_id)
+        print(f"[INFO] Tareas: Lote {lote_id} -> {estado['estados']}")
+        return {"status": "completed", **estado}
+    except Exception as e:
+        print(f"[ERROR] Tareas: Error en generar_expedientes_lote {lote_id}: {e}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "failed", "error": str(e)}
+
+
+# ==============================================================================
+# TAREAS BAJO DEMANDA: CARTAS DE DEPURACIÓN
+# ==============================================================================
+
+
+@celery_app.task
+def generar_carta_depuracion(db_path, job_id):
+    """
+    Genera la carta de un job de carta_jobs (carta base + firma + anexos).
+    El progreso queda en la fila del job; el endpoint /jobs/<id> lo expone.
+    """
+    from carta_jobs import ejecutar_job
+
+    try:
+        estado = ejecutar_job(db_path, job_id)
+        print(f"[INFO] Tareas: Carta {job_id} -> {estado['estado'] if estado else 'inexistente'}")
+        return {"status": estado["estado"] if estado else "not_found", "job_id": job_id}
+    except Exception as e:
+        print(f"[ERROR] Tareas: Error en generar_carta_depuracion {job_id}: {e}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "failed", "error": str(e)}
+
+
 # ==============================================================================
 # HELPER PARA EJECUTAR TAREAS MANUALMENTE (Para testing y diagnóstico)
 # ==============================================================================
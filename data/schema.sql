@@ -277,6 +277,7 @@ CREATE TABLE IF NOT EXISTS documentos_gestor (
     categoria TEXT NOT NULL CHECK(categoria IN ('Legal', 'Contable', 'RRHH', 'Operativo', 'Otro')),
     tipo_mime TEXT,
     tamano_bytes INTEGER,
+    sha256 TEXT,  -- Hash del contenido (almacén de blobs)
 
     -- Auditoría
     fecha_subida TEXT DEFAULT CURRENT_TIMESTAMP,
@@ -302,6 +303,9 @@ CREATE INDEX IF NOT EXISTS idx_documentos_subido_por
 CREATE INDEX IF NOT EXISTS idx_documentos_fecha
     ON documentos_gestor(fecha_subida);
 
+CREATE INDEX IF NOT EXISTS idx_documentos_gestor_sha256
+    ON documentos_gestor(sha256);
+
 -- ================================================================
 -- TABLA: auditoria_logs
 -- Propósito: Registro de actividad y seguridad del sistema
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Generación Asíncrona de Expedientes - Sistema Montero
+=====================================================
+Los endpoints de usuarios y empresas ya no crean carpetas ni escriben
+archivos dentro del POST: construyen un PLAN (rutas, textos y blobs a
+vincular), lo registran en la tabla expediente_jobs y lo encolan.
+
+Un plan es un dict serializable a JSON:
+
+    {
+        "tipo": "usuario" | "empresa",
+        "entidad_id": "123456",
+        "carpeta": "<ruta absoluta del expediente>",
+        "directorios": ["<carpeta>", "<carpeta>/TUTELAS", ...],
+        "textos": [{"nombre": "datos.txt", "ruta": "...", "contenido": "..."}],
+        "blobs": [{"nombre": "rut.pdf", "ruta": "...", "sha256": "..."}],
+        "errores": ["errores detectados al planificar"],
+        "huella": "<sha256 de los datos de entrada>"
+    }
+
+Los adjuntos se guardan en el almacén de blobs (blob_store) al planificar,
+así el job solo vincula hashes y puede ejecutarse en otro proceso.
+
+Idempotencia: job_id = hash(tipo, entidad_id, huella). Encolar dos veces
+los mismos datos devuelve el mismo job; ejecutarlo dos veces deja el
+disco igual (mkdir tolerante, textos y enlaces reemplazados atómicamente).
+Un job en 'error', o en 'en_proceso' sin actualizarse desde hace más de
+EXPEDIENTES_TIMEOUT_SEG (el proceso que lo tomó murió), se vuelve a
+ejecutar al encolarlo de nuevo.
+
+La tabla expediente_jobs la crea migrations/20251203_expediente_jobs.sql;
+este módulo no ejecuta DDL (un executescript confirmaría la transacción
+del llamador).
+
+Backends (EXPEDIENTES_BACKEND):
+    - "hilos" (por defecto): ThreadPoolExecutor del proceso web
+    - "celery": celery_tasks.generar_expediente / generar_expedientes_lote
+    - "sincrono": ejecuta en línea (scripts y pruebas)
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from blob_store import vincular_blob
+from logger import logger
+
+EXPEDIENTES_BACKEND = os.getenv("EXPEDIENTES_BACKEND", "hilos")
+MAX_HILOS_EXPEDIENTES = int(os.getenv("EXPEDIENTES_MAX_HILOS", "8"))
+TIMEOUT_EN_PROCESO_SEG = int(os.getenv("EXPEDIENTES_TIMEOUT_SEG", "900"))
+
+# Estados que un worker puede tomar: los pendientes, los fallidos y los
+# 'en_proceso' abandonados (actualizado_en anterior al límite del parámetro)
+SQL_RECLAMABLE = "(estado IN ('pendiente', 'error') OR (estado = 'en_proceso' AND actualizado_en < ?))"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _conectar(db_path):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _ahora():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _limite_en_proceso():
+    """Un job 'en_proceso' actualizado antes de este instante se considera abandonado."""
+    return (datetime.now() - timedelta(seconds=TIMEOUT_EN_PROCESO_SEG)).isoformat(timespec="seconds")
+
+
+def calcular_huella(*partes):
+    """Hash estable de los datos de entrada de un expediente."""
+    serializado = json.dumps(partes, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+def _job_id(plan):
+    return calcular_huella(plan["tipo"], str(plan["entidad_id"]), plan["huella"])[:32]
+
+
+def _fila_a_dict(fila):
+    datos = dict(fila)
+    datos.pop("plan", None)
+    datos["resultado"] = json.loads(datos["resultado"]) if datos.get("resultado") else None
+    return datos
+
+
+# ==================== EJECUCIÓN DE PLANES ====================
+
+
+def crear_directorios(directorios):
+    """
+    Crea en lote un conjunto de directorios.
+
+    En lugar de os.makedirs por ruta (un stat por cada ancestro), se
+    procesan por profundidad: cada padre se lista UNA vez con scandir y
+    solo se hace mkdir de lo que falta. Los hijos de un directorio recién
+    creado no se consultan (se sabe que está vacío).
+
+    Returns:
+        int: Número de directorios creados
+    """
+    rutas = sorted({os.path.normpath(r) for r in directorios}, key=lambda r: (r.count(os.sep), r))
+    hijos_conocidos = {}
+    creados = 0
+
+    for ruta in rutas:
+        padre, nombre = os.path.split(ruta)
+        if padre not in hijos_conocidos:
+            os.makedirs(padre, exist_ok=True)
+            with os.scandir(padre) as entradas:
+                hijos_conocidos[padre] = {e.name for e in entradas if e.is_dir()}
+
+        if nombre in hijos_conocidos[padre]:
+            continue
+        try:
+            os.mkdir(ruta)
+            creados += 1
+        except FileExistsError:
+            pass
+        hijos_conocidos[padre].add(nombre)
+        hijos_conocidos[ruta] = set()
+
+    return creados
+
+
+def _escribir_texto_atomico(ruta, contenido):
+    fd, temporal = tempfile.mkstemp(dir=os.path.dirname(ruta), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+
+def ejecutar_plan(plan, directorios_listos=False):
+    """
+    Materializa un plan en disco. Es idempotente. success es False si
+    algún blob no se pudo vincular (el job queda en 'error' y se reintenta).
+
+    Returns:
+        dict: {"success": bool, "files_created": list, "errors": list, "path": str}
+    """
+    resultado = {
+        "success": False,
+        "files_created": [],
+        "errors": list(plan.get("errores", [])),
+        "path": plan["carpeta"],
+    }
+    vinculos_fallidos = 0
+
+    try:
+        if not directorios_listos:
+            crear_directorios(plan["directorios"])
+        resultado["files_created"].append(f"Estructura de {len(plan['directorios']) - 1} carpetas")
+
+        for texto in plan.get("textos", []):
+            _escribir_texto_atomico(texto["ruta"], texto["contenido"])
+            resultado["files_created"].append(texto["nombre"])
+
+        for blob in plan.get("blobs", []):
+            try:
+                vincular_blob(blob["sha256"], blob["ruta"])
+                resultado["files_created"].append(blob["nombre"])
+            except OSError as e:
+                logger.error(f"❌ Error al vincular {blob['nombre']}: {e}", exc_info=True)
+                resultado["errors"].append(f"Error al guardar {blob['nombre']}: {str(e)}")
+                vinculos_fallidos += 1
+
+        resultado["success"] = vinculos_fallidos == 0
+        if resultado["success"]:
+            logger.info(f"✅ Expediente {plan['tipo']} {plan['entidad_id']} generado en {plan['carpeta']}")
+        else:
+            logger.warning(
+                f"⚠️ Expediente {plan['tipo']} {plan['entidad_id']} incompleto: {vinculos_fallidos} archivo(s) sin vincular"
+            )
+
+    except Exception as e:
+        logger.error(f"❌ Error crítico al generar expediente: {e}", exc_info=True)
+        resultado["errors"].append(f"Error crítico: {str(e)}")
+
+    return resultado
+
+
+def ejecutar_job(db_path, job_id, directorios_listos=False):
+    """Ejecuta un job registrado y guarda su resultado (lo usan hilos y Celery)."""
+    conn = _conectar(db_path)
+    try:
+        fila = conn.execute(
+            "SELECT plan, estado, resultado FROM expediente_jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        if not fila:
+            logger.warning(f"⚠️ Job de expediente inexistente: {job_id}")
+            return None
+        if fila["estado"] == "completado":
+            return json.loads(fila["resultado"])
+
+        # Tomar el job de forma atómica: si otro worker lo tiene en proceso
+        # (y no está abandonado) no se ejecuta dos veces
+        tomado = conn.execute(
+            f"UPDATE expediente_jobs SET estado = 'en_proceso', intentos = intentos + 1, actualizado_en = ? "
+            f"WHERE job_id = ? AND {SQL_RECLAMABLE}",
+            (_ahora(), job_id, _limite_en_proceso()),
+        ).rowcount
+        conn.commit()
+        if not tomado:
+            logger.info(f"⏳ Job de expediente {job_id} ya está en proceso en otro worker")
+            return None
+
+        resultado = ejecutar_plan(json.loads(fila["plan"]), directorios_listos=directorios_listos)
+
+        conn.execute(
+            "UPDATE expediente_jobs SET estado = ?, resultado = ?, actualizado_en = ? WHERE job_id = ?",
+            ("completado" if resultado["success"] else "error", json.dumps(resultado, ensure_ascii=False), _ahora(), job_id),
+        )
+        conn.commit()
+        return resultado
+    finally:
+        conn.close()
+
+
+def ejecutar_lote(db_path, lote_id):
+    """
+    Ejecuta todos los jobs pendientes de un lote: primero crea TODOS los
+    directorios en una sola pasada y luego materializa los expedientes en
+    paralelo (MAX_HILOS_EXPEDIENTES).
+
+    Returns:
+        dict: Conteo por estado al terminar
+    """
+    conn = _conectar(db_path)
+    try:
+        filas = conn.execute(
+            f"SELECT job_id, plan FROM expediente_jobs WHERE lote_id = ? AND {SQL_RECLAMABLE}",
+            (lote_id, _limite_en_proceso()),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    directorios = []
+    for fila in filas:
+        directorios.extend(json.loads(fila["plan"])["directorios"])
+    creados = crear_directorios(directorios)
+    logger.info(f"📁 Lote {lote_id}: {creados} directorios creados para {len(filas)} expedientes")
+
+    with ThreadPoolExecutor(max_workers=MAX_HILOS_EXPEDIENTES) as pool:
+        list(pool.map(lambda f: ejecutar_job(db_path, f["job_id"], directorios_listos=True), filas))
+
+    conn = _conectar(db_path)
+    try:
+        return estado_lote(conn, lote_id)
+    finally:
+        conn.close()
+
+
+# ==================== ENCOLADO ====================
+
+
+def _obtener_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_HILOS_EXPEDIENTES, thread_name_prefix="expedientes")
+        return _executor
+
+
+def _despachar(db_path, job_id=None, lote_id=None):
+    if EXPEDIENTES_BACKEND == "sincrono":
+        if lote_id:
+            ejecutar_lote(db_path, lote_id)
+        else:
+            ejecutar_job(db_path, job_id)
+    elif EXPEDIENTES_BACKEND == "celery":
+        from celery_config import celery_app
+
+        if lote_id:
+            celery_app.send_task("celery_tasks.generar_expedientes_lote", args=[db_path, lote_id])
+        else:
+            celery_app.send_task("celery_tasks.generar_expediente", args=[db_path, job_id])
+    else:
+        if lote_id:
+            _obtener_executor().submit(ejecutar_lote, db_path, lote_id)
+        else:
+            _obtener_executor().submit(ejecutar_job, db_path, job_id)
+
+
+def _registrar(conn, plan, lote_id=None):
+    """
+    Inserta el job si no existe. Si ya existía lo asocia al lote (para que
+    estado_lote lo cuente) y lo devuelve a 'pendiente' si falló o quedó
+    abandonado en proceso. Devuelve (job_id, debe_ejecutarse).
+    """
+    job_id = _job_id(plan)
+    ahora = _ahora()
+    cursor = conn.execute(
+        """
+        INSERT OR IGNORE INTO expediente_jobs
+            (job_id, lote_id, tipo, entidad_id, estado, plan, creado_en, actualizado_en)
+        VALUES (?, ?, ?, ?, 'pendiente', ?, ?, ?)
+        """,
+        (job_id, lote_id, plan["tipo"], str(plan["entidad_id"]), json.dumps(plan, ensure_ascii=False), ahora, ahora),
+    )
+    if cursor.rowcount:
+        return job_id, True
+
+    if lote_id:
+        conn.execute("UPDATE expediente_jobs SET lote_id = ? WHERE job_id = ?", (lote_id, job_id))
+
+    # Ya existía: solo se reintenta si falló o si el worker que lo tomó murió
+    cursor = conn.execute(
+        f"UPDATE expediente_jobs SET estado = 'pendiente', actualizado_en = ? "
+        f"WHERE job_id = ? AND estado != 'pendiente' AND {SQL_RECLAMABLE}",
+        (ahora, job_id, _limite_en_proceso()),
+    )
+    return job_id, bool(cursor.rowcount)
+
+
+def encolar_expediente(conn, db_path, plan):
+    """
+    Registra el plan y lo envía al backend configurado.
+
+    Returns:
+        str: job_id (el mismo para datos idénticos)
+    """
+    job_id, ejecutar = _registrar(conn, plan)
+    conn.commit()
+    if ejecutar:
+        _despachar(db_path, job_id=job_id)
+        logger.info(f"📨 Expediente {plan['tipo']} {plan['entidad_id']} encolado (job {job_id})")
+    return job_id
+
+
+def encolar_lote(conn, db_path, planes):
+    """
+    Registra muchos planes bajo un mismo lote_id en una transacción y
+    despacha UNA tarea de lote.
+
+    Returns:
+        tuple: (lote_id, [job_id, ...])
+    """
+    lote_id = uuid.uuid4().hex
+    job_ids = []
+    with conn:
+        for plan in planes:
+            job_id, _ = _registrar(conn, plan, lote_id=lote_id)
+            job_ids.append(job_id)
+    _despachar(db_path, lote_id=lote_id)
+    logger.info(f"📨 Lote {lote_id} encolado con {len(job_ids)} expedientes")
+    return lote_id, job_ids
+
+
+# ==================== CONSULTA DE ESTADO ====================
+
+
+def estado_job(conn, job_id):
+    fila = conn.execute("SELECT * FROM expediente_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _fila_a_dict(fila) if fila else None
+
+
+def estado_lote(conn, lote_id):
+    conteo = {"pendiente": 0, "en_proceso": 0, "completado": 0, "error": 0}
+    for estado, total in conn.execute(
+        "SELECT estado, COUNT(*) FROM expediente_jobs WHERE lote_id = ? GROUP BY estado", (lote_id,)
+    ):
+        conteo[estado] = total
+    errores = [
+        {"job_id": f[0], "tipo": f[1], "entidad_id": f[2]}
+        for f in conn.execute(
+            "SELECT job_id, tipo, entidad_id FROM expediente_jobs WHERE lote_id = ? AND estado = 'error'", (lote_id,)
+        )
+    ]
+    return {
+        "lote_id": lote_id,
+        "total": sum(conteo.values()),
+        "terminado": conteo["pendiente"] == 0 and conteo["en_proceso"] == 0,
+        "estados": conteo,
+        "errores": errores,
+    }
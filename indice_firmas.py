@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de Firmas - Sistema Montero
+==================================
+Los expedientes de empresas viven en EMPRESAS/<NIT>_<NOMBRE>/ y la firma
+del representante en firma_representante.png. Buscar la carpeta de un NIT
+listando EMPRESAS en cada PDF generado es O(número de empresas); este
+módulo mantiene un índice NIT -> carpeta(s) en memoria:
+
+    - Se construye con un solo os.scandir (al arrancar la app o en la
+      primera consulta).
+    - Se valida por el mtime de la carpeta EMPRESAS: crear, renombrar o
+      borrar una carpeta de empresa cambia ese mtime y provoca una
+      reconstrucción. Consultar cuesta un stat de EMPRESAS y otro de la firma.
+    - Los hooks de creación/actualización de empresas (registrar_carpeta)
+      fijan la carpeta vigente de un NIT sin esperar al rescaneo.
+
+Además, cargar_firma() guarda la imagen ya decodificada y reducida como
+ImageReader de ReportLab, validada por (ruta, mtime, tamaño), para no
+decodificar el PNG completo en cada formulario.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from logger import logger
+
+NOMBRE_FIRMA_EMPRESA = "firma_representante.png"
+MAX_PX_FIRMA = 600  # Lado máximo de la firma reducida (~300 dpi en 2 pulgadas)
+MAX_FIRMAS_CACHE = 256
+
+
+class IndiceFirmasEmpresas:
+    """Índice NIT -> carpetas de expediente bajo una carpeta EMPRESAS."""
+
+    def __init__(self, carpeta_empresas):
+        self.carpeta_empresas = carpeta_empresas
+        self._lock = threading.Lock()
+        self._carpetas = {}  # nit -> [carpeta, ...]
+        self._preferidas = {}  # nit -> carpeta registrada por los hooks
+        self._mtime = None
+
+    def _mtime_actual(self):
+        try:
+            return os.stat(self.carpeta_empresas).st_mtime_ns
+        except OSError:
+            return None
+
+    def construir(self):
+        """Escanea EMPRESAS una sola vez y reemplaza el índice."""
+        mtime = self._mtime_actual()
+        carpetas = {}
+        if mtime is not None:
+            with os.scandir(self.carpeta_empresas) as entradas:
+                for entrada in entradas:
+                    nit, separador, _ = entrada.name.partition("_")
+                    if separador and entrada.is_dir():
+                        carpetas.setdefault(nit, []).append(entrada.path)
+        for lista in carpetas.values():
+            lista.sort()
+
+        with self._lock:
+            self._carpetas = carpetas
+            self._mtime = mtime
+        logger.debug(f"🗂️ Índice de firmas construido: {len(carpetas)} empresas en {self.carpeta_empresas}")
+        return len(carpetas)
+
+    def _vigente(self):
+        return self._mtime is not None and self._mtime == self._mtime_actual()
+
+    def registrar_carpeta(self, nit, carpeta):
+        """Hook de alta/actualización: la carpeta indicada pasa a ser la preferida del NIT."""
+        nit = str(nit)
+        with self._lock:
+            self._preferidas[nit] = carpeta
+            lista = self._carpetas.setdefault(nit, [])
+            if carpeta not in lista:
+                lista.append(carpeta)
+
+    def olvidar(self, nit):
+        """Hook de borrado: elimina el NIT del índice."""
+        nit = str(nit)
+        with self._lock:
+            self._preferidas.pop(nit, None)
+            self._carpetas.pop(nit, None)
+
+    def buscar(self, nit):
+        """
+        Ruta de firma_representante.png del NIT o None.
+
+        Returns:
+            str|None
+        """
+        if not self._vigente():
+            self.construir()
+
+        nit = str(nit)
+        with self._lock:
+            candidatas = list(self._carpetas.get(nit, ()))
+            preferida = self._preferidas.get(nit)
+        if preferida:
+            candidatas = [preferida] + [c for c in candidatas if c != preferida]
+
+        for carpeta in candidatas:
+            ruta = os.path.join(carpeta, NOMBRE_FIRMA_EMPRESA)
+            if os.path.isfile(ruta):
+                return ruta
+        return None
+
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def obtener_indice(carpeta_empresas):
+    """Índice (único por proceso) asociado a una carpeta EMPRESAS."""
+    clave = os.path.normpath(carpeta_empresas)
+    with _indices_lock:
+        indice = _indices.get(clave)
+        if indice is None:
+            indice = _indices[clave] = IndiceFirmasEmpresas(carpeta_empresas)
+        return indice
+
+
+def registrar_carpeta_empresa(carpeta_empresas, nit, carpeta):
+    """Atajo para los hooks de routes/empresas.py."""
+    obtener_indice(carpeta_empresas).registrar_carpeta(nit, carpeta)
+
+
+# ==================== CACHÉ DE IMÁGENES DE FIRMA ====================
+
+_cache_imagenes = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _decodificar_firma(ruta):
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    with Image.open(ruta) as imagen:
+        imagen.load()
+        if imagen.mode not in ("RGB", "RGBA", "L", "LA"):
+            imagen = imagen.convert("RGBA")
+        imagen.thumbnail((MAX_PX_FIRMA, MAX_PX_FIRMA), Image.LANCZOS)
+        return ImageReader(imagen.copy())
+
+
+def cargar_firma(ruta):
+    """
+    ImageReader de la firma reducida, desde caché si el archivo no cambió.
+
+    Args:
+        ruta (str): Ruta del PNG de la firma
+
+    Returns:
+        reportlab.lib.utils.ImageReader
+    """
+    stat = os.stat(ruta)
+    clave = (ruta, stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        imagen = _cache_imagenes.get(clave)
+        if imagen is not None:
+            _cache_imagenes.move_to_end(clave)
+            return imagen
+
+    imagen = _decodificar_firma(ruta)
+    with _cache_lock:
+        _cache_imagenes[clave] = imagen
+        while len(_cache_imagenes) > MAX_FIRMAS_CACHE:
+            _cache_imagenes.popitem(last=False)
+    return imagen
+
+
+def limpiar_cache_firmas():
+    with _cache_lock:
+        _cache_imagenes.clear()
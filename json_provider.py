@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+json_provider.py - Serialización JSON rápida para las respuestas de la API
+==========================================================================
+
+1. OrjsonProvider: proveedor JSON de Flask respaldado por orjson (opcional).
+   Mantiene el comportamiento de DefaultJSONProvider: claves ordenadas,
+   fechas en formato HTTP, Decimal/UUID como texto, indentación en debug.
+   Si orjson no puede con un objeto (p.ej. enteros de más de 64 bits) se
+   recurre al proveedor estándar. create_app() lo registra con
+   registrar_proveedor_json() según la configuración JSON_PROVIDER
+   ('auto' | 'orjson' | 'default').
+
+2. Ruta sqlite3.Row -> JSON sin diccionarios intermedios: filas_json()
+   envuelve la consulta en json_group_array(json_object(...)) para que
+   SQLite genere el texto JSON en C; respuesta_json() lo inserta tal cual
+   en la respuesta junto con los demás campos.
+"""
+
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional
+    orjson = None
+
+# json_object() recibe clave y valor por columna; SQLite admite 127 argumentos
+MAX_COLUMNAS_JSON_SQLITE = 63
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """DefaultJSONProvider con orjson para dumps/loads/response."""
+
+    def _opciones(self, sort_keys=None, indent=None):
+        opciones = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys if sort_keys is None else sort_keys:
+            opciones |= orjson.OPT_SORT_KEYS
+        if indent:
+            opciones |= orjson.OPT_INDENT_2
+        return opciones
+
+    def _a_bytes(self, obj, **kwargs):
+        """orjson.dumps con las opciones equivalentes; None si hay que usar el estándar."""
+        extras = {k: v for k, v in kwargs.items() if k not in ("sort_keys", "indent", "separators", "ensure_ascii")}
+        if extras:
+            return None
+        try:
+            return orjson.dumps(obj, default=self.default,
+                                option=self._opciones(kwargs.get("sort_keys"), kwargs.get("indent")))
+        except (orjson.JSONEncodeError, TypeError):
+            return None
+
+    def dumps(self, obj, **kwargs):
+        datos = self._a_bytes(obj, **kwargs)
+        return datos.decode("utf-8") if datos is not None else super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        datos = self._a_bytes(obj, indent=2 if indent else None)
+        if datos is None:
+            return super().response(obj)
+        return self._app.response_class(datos + b"\n", mimetype=self.mimetype)
+
+
+def registrar_proveedor_json(app):
+    """Instala el proveedor JSON según app.config['JSON_PROVIDER']; retorna su nombre."""
+    preferido = app.config.get("JSON_PROVIDER", "auto")
+    if preferido == "orjson" and orjson is None:
+        raise RuntimeError("JSON_PROVIDER='orjson' pero el paquete orjson no está instalado")
+    if preferido != "default" and orjson is not None:
+        app.json = OrjsonProvider(app)
+        return "orjson"
+    return "default"
+
+
+def _nombre_sql(nombre):
+    return '"' + nombre.replace('"', '""') + '"'
+
+
+def filas_json(conn, sql, params=()):
+    """
+    Ejecuta `sql` y retorna (texto JSON del arreglo de filas como objetos, total).
+
+    Las claves salen en el orden del SELECT y el orden de las filas es el del
+    ORDER BY de la consulta. Con más de MAX_COLUMNAS_JSON_SQLITE columnas se
+    serializa en Python.
+    """
+    columnas = [c[0] for c in conn.execute(f"SELECT * FROM ({sql}) LIMIT 0", params).description]
+    if len(columnas) > MAX_COLUMNAS_JSON_SQLITE:
+        filas = conn.execute(sql, params).fetchall()
+        datos = [dict(zip(columnas, fila)) for fila in filas]
+        return json.dumps(datos, ensure_ascii=False), len(filas)
+
+    pares = ", ".join(f"'{c.replace(chr(39), chr(39) * 2)}', {_nombre_sql(c)}" for c in columnas)
+    texto, total = conn.execute(
+        f"SELECT json_group_array(json_object({pares})), COUNT(*) FROM ({sql})", params
+    ).fetchone()
+    return texto, total
+
+
+def respuesta_json(app, datos, status=200, **fragmentos):
+    """
+    Respuesta JSON con `datos` (dict) más claves cuyo valor ya es texto JSON
+    (p.ej. el arreglo de filas_json), sin volver a decodificarlo.
+    """
+    cuerpo = app.json.dumps(datos) if datos else "{}"
+    extra = ",".join(f"{app.json.dumps(clave)}:{texto}" for clave, texto in fragmentos.items())
+    if extra:
+        cuerpo = cuerpo[:-1] + ("," if datos else "") + extra + "}"
+    return app.response_class(cuerpo + "\n", status=status, mimetype=app.json.mimetype)
+
@@ -0,0 +1,328 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+logic/auditoria_planilla.py
+===========================
+Auditoría IA por bloques de la planilla PILA completa (Jordy)
+
+Antes se enviaban a Gemini solo las primeras 10 líneas; el resto de una
+planilla grande nunca se revisaba. Ahora:
+
+    1. Puntaje de anomalía sobre TODAS las líneas con el motor de reglas
+       por columnas (logic/reglas_pila.py), sin consultar al modelo.
+    2. Solo las líneas sospechosas se ordenan por puntaje y se agrupan en
+       bloques de TAMANO_BLOQUE_AUDITORIA.
+    3. Los bloques se envían al modelo en paralelo con un pool acotado
+       (MAX_HILOS_AUDITORIA) y un tope de bloques por auditoría.
+    4. Las respuestas se fusionan en un único reporte, con métricas de
+       latencia, tokens y costo estimado.
+
+El modelo es cualquier objeto con generate_content(prompt) -> respuesta con
+.text (y opcionalmente .usage_metadata), de modo que las pruebas usan un
+modelo local.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from logic.pila_engine import ConfiguracionPILA
+from logic.reglas_pila import ColumnasPlanilla, evaluar_reglas
+
+TAMANO_BLOQUE_AUDITORIA = int(os.getenv("AUDITORIA_TAMANO_BLOQUE", "25"))
+MAX_BLOQUES_AUDITORIA = int(os.getenv("AUDITORIA_MAX_BLOQUES", "20"))
+MAX_HILOS_AUDITORIA = int(os.getenv("AUDITORIA_MAX_HILOS", "4"))
+UMBRAL_SOSPECHA = 1
+
+# Precio estimado por millón de tokens (USD); solo para el contador de costo
+COSTO_MILLON_ENTRADA = float(os.getenv("AUDITORIA_COSTO_MILLON_ENTRADA", "0.30"))
+COSTO_MILLON_SALIDA = float(os.getenv("AUDITORIA_COSTO_MILLON_SALIDA", "2.50"))
+
+# Peso de cada regla en el puntaje de anomalía
+PESOS_ANOMALIA = {
+    "ibc_bajo_minimo": 3,
+    "dias_invalidos": 3,
+    "ibc_sobre_tope": 2,
+    "salud_no_4": 2,
+    "pension_no_4": 2,
+    "tarifa_arl": 2,
+    "cotizante_duplicado": 2,
+    "ibc_atipico": 1,
+    "dias_sin_novedad": 1,
+}
+
+def puntuar_lineas(lineas: List[Dict], config: Optional[ConfiguracionPILA] = None) -> List[Dict]:
+    """
+    Puntaje de anomalía de cada línea: suma de PESOS_ANOMALIA de las reglas
+    de logic/reglas_pila.py que la marcan.
+
+    Returns:
+        Lista paralela a `lineas`: {'indice', 'puntaje', 'motivos'}
+    """
+    marcadas = evaluar_reglas(ColumnasPlanilla(lineas), config or ConfiguracionPILA(), list(PESOS_ANOMALIA))
+    return puntuar_marcadas(marcadas, len(lineas))
+
+
+def puntuar_marcadas(marcadas: Dict[str, List[int]], total: int) -> List[Dict]:
+    """Convierte {regla: [índices]} (p. ej. validar_planilla()['lineas_marcadas']) en puntajes."""
+    resultado = [{"indice": i, "puntaje": 0, "motivos": []} for i in range(total)]
+    for regla, indices in marcadas.items():
+        peso = PESOS_ANOMALIA.get(regla, 0)
+        for i in indices:
+            resultado[i]["puntaje"] += peso
+            resultado[i]["motivos"].append(regla)
+    return resultado
+
+
+def seleccionar_bloques(
+    puntuadas: List[Dict],
+    tamano_bloque: int = TAMANO_BLOQUE_AUDITORIA,
+    max_bloques: int = MAX_BLOQUES_AUDITORIA,
+    umbral: int = UMBRAL_SOSPECHA,
+):
+    """
+    Agrupa las líneas sospechosas (puntaje >= umbral) en bloques, las más
+    anómalas primero.
+
+    Returns:
+        (bloques, omitidas): lista de bloques (listas de puntuadas) y cuántas
+        líneas sospechosas quedaron fuera por el tope de bloques.
+    """
+    sospechosas = sorted(
+        (p for p in puntuadas if p["puntaje"] >= umbral), key=lambda p: (-p["puntaje"], p["indice"])
+    )
+    bloques = [sospechosas[i:i + tamano_bloque] for i in range(0, len(sospechosas), tamano_bloque)]
+    enviadas = bloques[:max_bloques]
+    omitidas = len(sospechosas) - sum(len(b) for b in enviadas)
+    return [sorted(b, key=lambda p: p["indice"]) for b in enviadas], omitidas
+
+
+def construir_prompt(bloque: List[Dict], lineas: List[Dict], contexto: Dict) -> str:
+    """Prompt de Jordy para un bloque de líneas sospechosas."""
+    resumen_lineas = []
+    for p in bloque:
+        linea = lineas[p["indice"]]
+        resumen_lineas.append({
+            "linea": p["indice"] + 1,
+            "empleado": linea.get('nombre_completo', 'SIN NOMBRE'),
+            "ibc": linea.get('ibc_calculado', 0),
+            "dias": linea.get('dias_cotizados', 0),
+            "salud_empleado": linea.get('salud_empleado'),
+            "pension_empleado": linea.get('pension_empleado'),
+            "arl_clase": linea.get('arl_clase'),
+            "arl_tarifa": linea.get('arl_tarifa'),
+            "total_aportes": linea.get('total_aportes', 0),
+            "marca_novedad": linea.get('marca_novedad', ''),
+            "alertas_previas": p["motivos"],
+        })
+
+    return f"""Actúa como Jordy, el auditor experto en PILA (seguridad social colombiana).
+
+Revisa las siguientes líneas de una planilla PILA para el mes {contexto['mes']}.
+Fueron preseleccionadas por reglas automáticas como sospechosas (ver "alertas_previas").
+
+DATOS DE LA PLANILLA:
+- Total empleados: {contexto['total_lineas']}
+- Total aportes: ${contexto['total_aportes']:,.0f}
+- Empresa NIT: {contexto['empresa_nit']}
+
+LÍNEAS A REVISAR:
+{json.dumps(resumen_lineas, indent=2, ensure_ascii=False)}
+
+TU MISIÓN:
+1. Busca errores en IBC (debe ser >= ${contexto['ibc_minimo']:,.0f} para 30 días)
+2. Verifica coherencia de días cotizados (1-30) con la marca de novedad
+3. Valida tarifas de aportes:
+   - Salud empleado: 4% del IBC
+   - Pensión empleado: 4% del IBC
+   - ARL: 0.522% - 6.960% según clase de riesgo
+4. Identifica inconsistencias en marcas de novedad (IGE, RET, LGE, etc.)
+
+Cita siempre el número de línea. RESPONDE EN FORMATO JSON:
+{{
+    "estado": "APROBADO" o "ERRORES_ENCONTRADOS",
+    "errores_criticos": ["Línea N: error"],
+    "advertencias": ["Línea N: advertencia"],
+    "sugerencias": ["sugerencia 1"],
+    "resumen": "Análisis breve (máximo 3 líneas)"
+}}"""
+
+
+def parsear_respuesta(texto: str) -> Dict:
+    """JSON de la respuesta del modelo (acepta bloques ```json); si no es JSON, resumen en texto plano."""
+    limpio = texto or ""
+    if '```json' in limpio:
+        limpio = limpio.split('```json')[1].split('```')[0].strip()
+    elif '```' in limpio:
+        limpio = limpio.split('```')[1].split('```')[0].strip()
+    try:
+        datos = json.loads(limpio)
+        if isinstance(datos, dict):
+            return datos
+    except json.JSONDecodeError:
+        pass
+    return {"estado": None, "resumen": (texto or "")[:300], "no_json": True}
+
+
+class MetricasAuditoria:
+    """Contadores de latencia, tokens y costo estimado de una auditoría."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.llamadas = 0
+        self.fallidas = 0
+        self.latencias_ms = []
+        self.tokens_entrada = 0
+        self.tokens_salida = 0
+        self.inicio = time.perf_counter()
+
+    def registrar(self, latencia_ms, tokens_entrada, tokens_salida, fallida=False):
+        with self._lock:
+            self.llamadas += 1
+            self.fallidas += int(fallida)
+            self.latencias_ms.append(latencia_ms)
+            self.tokens_entrada += tokens_entrada
+            self.tokens_salida += tokens_salida
+
+    def como_dict(self, **extra):
+        costo = (self.tokens_entrada * COSTO_MILLON_ENTRADA + self.tokens_salida * COSTO_MILLON_SALIDA) / 1_000_000
+        datos = {
+            "llamadas_modelo": self.llamadas,
+            "llamadas_fallidas": self.fallidas,
+            "latencia_total_ms": round((time.perf_counter() - self.inicio) * 1000, 1),
+            "latencia_modelo_max_ms": round(max(self.latencias_ms), 1) if self.latencias_ms else 0.0,
+            "latencia_modelo_suma_ms": round(sum(self.latencias_ms), 1),
+            "tokens_entrada": self.tokens_entrada,
+            "tokens_salida": self.tokens_salida,
+            "costo_estimado_usd": round(costo, 6),
+        }
+        datos.update(extra)
+        return datos
+
+
+def _tokens(respuesta, prompt, texto):
+    """Tokens reportados por el modelo o, si no vienen, estimados (≈4 caracteres por token)."""
+    uso = getattr(respuesta, "usage_metadata", None)
+    entrada = getattr(uso, "prompt_token_count", None)
+    salida = getattr(uso, "candidates_token_count", None)
+    return (
+        int(entrada) if entrada is not None else len(prompt) // 4,
+        int(salida) if salida is not None else len(texto) // 4,
+    )
+
+
+def _auditar_bloque(modelo, prompt, metricas):
+    inicio = time.perf_counter()
+    try:
+        respuesta = modelo.generate_content(prompt)
+        texto = respuesta.text
+    except Exception:
+        metricas.registrar((time.perf_counter() - inicio) * 1000, len(prompt) // 4, 0, fallida=True)
+        raise
+    entrada, salida = _tokens(respuesta, prompt, texto)
+    metricas.registrar((time.perf_counter() - inicio) * 1000, entrada, salida)
+    return parsear_respuesta(texto)
+
+
+def _sin_duplicados(valores):
+    vistos = set()
+    return [v for v in valores if not (v in vistos or vistos.add(v))]
+
+
+def auditar_planilla_completa(
+    lineas: List[Dict],
+    modelo,
+    validacion_basica: Dict,
+    mes: str,
+    empresa_nit: str,
+    config: Optional[ConfiguracionPILA] = None,
+    max_workers: int = MAX_HILOS_AUDITORIA,
+) -> Dict:
+    """
+    Audita todas las líneas: puntaje -> bloques sospechosos -> modelo en
+    paralelo -> reporte fusionado.
+
+    Returns:
+        {'auditoria': {...}, 'metricas': {...}} con el mismo formato de
+        'auditoria' que devolvía el endpoint.
+    """
+    config = config or ConfiguracionPILA()
+    metricas = MetricasAuditoria()
+    errores_basicos = list(validacion_basica.get('errores', []))
+    advertencias = list(validacion_basica.get('advertencias', []))
+
+    if 'lineas_marcadas' in validacion_basica:
+        puntuadas = puntuar_marcadas(validacion_basica['lineas_marcadas'], len(lineas))
+    else:
+        puntuadas = puntuar_lineas(lineas, config)
+    bloques, omitidas = seleccionar_bloques(puntuadas, TAMANO_BLOQUE_AUDITORIA, MAX_BLOQUES_AUDITORIA)
+    sospechosas = sum(1 for p in puntuadas if p["puntaje"] >= UMBRAL_SOSPECHA)
+    contexto = {
+        "mes": mes,
+        "empresa_nit": empresa_nit,
+        "total_lineas": len(lineas),
+        "total_aportes": validacion_basica.get('total_aportes', 0),
+        "ibc_minimo": float(config.IBC_MINIMO),
+    }
+
+    resultados = []
+    if bloques:
+        prompts = [construir_prompt(bloque, lineas, contexto) for bloque in bloques]
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts)))) as pool:
+            futuros = [pool.submit(_auditar_bloque, modelo, prompt, metricas) for prompt in prompts]
+            for n, futuro in enumerate(futuros, start=1):
+                try:
+                    resultados.append(futuro.result())
+                except Exception as e:
+                    advertencias.append(f"Bloque {n}: error en Gemini ({e})")
+
+    errores_ia, sugerencias, resumenes = [], [], []
+    hay_errores_ia = False
+    for resultado in resultados:
+        hay_errores_ia |= resultado.get('estado') == 'ERRORES_ENCONTRADOS'
+        errores_ia.extend(resultado.get('errores_criticos', []) or [])
+        advertencias.extend(resultado.get('advertencias', []) or [])
+        sugerencias.extend(resultado.get('sugerencias', []) or [])
+        if resultado.get('resumen'):
+            resumenes.append(resultado['resumen'])
+
+    if omitidas:
+        advertencias.append(
+            f"{omitidas} líneas sospechosas no se enviaron a Jordy (tope de {MAX_BLOQUES_AUDITORIA} bloques)"
+        )
+
+    errores = _sin_duplicados(errores_basicos + errores_ia)
+    auditadas = sum(len(b) for b in bloques)
+    if not bloques:
+        metodo = 'validacion_basica'
+        resumen = f"Ninguna de las {len(lineas)} líneas superó el umbral de anomalía; no fue necesario consultar a Jordy."
+    elif not resultados:
+        metodo = 'validacion_basica_fallback'
+        resumen = 'Error en auditoría IA. Validación básica completada.'
+    else:
+        metodo = 'gemini_ai'
+        resumen = (
+            f"Jordy revisó {auditadas} líneas sospechosas de {len(lineas)} en {len(bloques)} bloques. "
+            + " ".join(resumenes)
+        ).strip()
+
+    return {
+        'auditoria': {
+            'estado': 'ERRORES_ENCONTRADOS' if errores or hay_errores_ia else 'APROBADO',
+            'errores': errores,
+            'advertencias': _sin_duplicados(advertencias),
+            'sugerencias': _sin_duplicados(sugerencias),
+            'resumen_ia': resumen,
+            'metodo': metodo,
+            'lineas_auditadas': sorted(p["indice"] + 1 for b in bloques for p in b),
+        },
+        'metricas': metricas.como_dict(
+            lineas_totales=len(lineas),
+            lineas_sospechosas=sospechosas,
+            lineas_auditadas=auditadas,
+            bloques=len(bloques),
+        ),
+    }
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+logic/carga_cartera.py
+======================
+Carga masiva de deudas de cartera desde reportes de operadores (CSV/XLSX)
+
+El archivo se lee fila a fila (csv.reader u openpyxl en modo read-only)
+y se procesa en lotes de TAMANO_LOTE_CARGA:
+
+    1. Validación del lote con DeudaCarteraCarga (una sola llamada a pydantic)
+    2. Resolución de usuario y empresa contra diccionarios precargados
+    3. Upsert del lote con executemany y commit por lote
+
+La memoria queda acotada por el tamaño del lote, los diccionarios de
+usuarios/empresas y MAX_ERRORES_REPORTE, sin importar el número de filas.
+
+Las deudas abiertas (estado != 'Pagado') son únicas por (usuario_id,
+empresa_nit, entidad, fecha_vencimiento): la fecha de vencimiento identifica
+el periodo, así que recargar el reporte de un periodo actualiza monto y días
+de mora en vez de duplicar la deuda, y los periodos distintos quedan como
+deudas separadas. Las filas sin vencimiento comparten un mismo periodo ('').
+
+El índice único parcial lo crea la migración 20251205 (que antes depura los
+duplicados); si falta, importar_deudas() lanza MigracionCarteraPendiente.
+"""
+
+import codecs
+import csv
+import os
+import unicodedata
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import text
+
+from models.validation_models import DeudaCarteraCarga
+from validators import validate_manual
+
+TAMANO_LOTE_CARGA = int(os.getenv("CARTERA_CARGA_LOTE", "1000"))
+MAX_ERRORES_REPORTE = 1000
+
+COLUMNAS_OBLIGATORIAS = ("usuario_id", "entidad", "monto")
+
+# Encabezados habituales en los reportes de operadores -> campo del modelo
+ALIAS_COLUMNAS = {
+    "documento": "usuario_id",
+    "numeroid": "usuario_id",
+    "numero_id": "usuario_id",
+    "numero_documento": "usuario_id",
+    "cedula": "usuario_id",
+    "identificacion": "usuario_id",
+    "nit": "empresa_nit",
+    "nit_empresa": "empresa_nit",
+    "valor": "monto",
+    "valor_deuda": "monto",
+    "saldo": "monto",
+    "subsistema": "entidad",
+    "dias": "dias_mora",
+    "vencimiento": "fecha_vencimiento",
+    "nombre": "nombre_usuario",
+    "empresa": "nombre_empresa",
+}
+
+INDICE_DEUDA_ABIERTA = "uq_deudas_cartera_abierta"
+
+# Parámetros posicionales en el orden de resolver_lote (executemany directo sobre sqlite3)
+SQL_UPSERT_DEUDA = """
+    INSERT INTO deudas_cartera (
+        usuario_id, nombre_usuario, empresa_nit, nombre_empresa, entidad, monto,
+        dias_mora, estado, tipo, fecha_creacion, fecha_vencimiento, usuario_registro
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'Carga masiva', ?, ?, ?)
+    ON CONFLICT (usuario_id, empresa_nit, entidad, COALESCE(fecha_vencimiento, '')) WHERE estado != 'Pagado'
+    DO UPDATE SET
+        monto = excluded.monto,
+        dias_mora = excluded.dias_mora,
+        estado = excluded.estado,
+        nombre_usuario = excluded.nombre_usuario,
+        nombre_empresa = excluded.nombre_empresa,
+        usuario_registro = excluded.usuario_registro
+"""
+
+_VALIDADOR_LOTE = TypeAdapter(List[DeudaCarteraCarga])
+
+
+class FormatoCargaNoSoportado(ValueError):
+    """Archivo con extensión, encabezados o dependencias no soportadas."""
+
+
+class MigracionCarteraPendiente(RuntimeError):
+    """Falta el índice único de deudas abiertas (migración 20251205)."""
+
+
+# =============================================================================
+# LECTURA EN STREAMING
+# =============================================================================
+
+def normalizar_encabezado(nombre) -> str:
+    """'Número ID ' -> 'numero_id', aplicando ALIAS_COLUMNAS."""
+    if nombre is None:
+        return ""
+    limpio = unicodedata.normalize("NFKD", str(nombre)).encode("ascii", "ignore").decode()
+    limpio = "_".join(limpio.strip().lower().replace("-", " ").split())
+    return ALIAS_COLUMNAS.get(limpio, limpio)
+
+
+def _validar_encabezados(encabezados: List[str]):
+    faltantes = [c for c in COLUMNAS_OBLIGATORIAS if c not in encabezados]
+    if faltantes:
+        raise FormatoCargaNoSoportado(f"Faltan columnas obligatorias: {', '.join(faltantes)}")
+
+
+def _filas_csv(flujo) -> Iterator[Tuple[int, Dict]]:
+    # codecs solo necesita read(): el SpooledTemporaryFile de Werkzeug no
+    # tiene readable()/seekable() en Python < 3.11 y TextIOWrapper falla
+    texto = codecs.getreader("utf-8-sig")(flujo)
+    primera = texto.readline()
+    delimitador = max(",;\t", key=primera.count)
+    encabezados = [normalizar_encabezado(c) for c in next(csv.reader([primera], delimiter=delimitador), [])]
+    _validar_encabezados(encabezados)
+    for numero, valores in enumerate(csv.reader(texto, delimiter=delimitador), start=2):
+        if any(v.strip() for v in valores):
+            yield numero, dict(zip(encabezados, valores))
+
+
+def _filas_xlsx(flujo) -> Iterator[Tuple[int, Dict]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise FormatoCargaNoSoportado("La carga de XLSX requiere openpyxl; envía el reporte como CSV.")
+
+    libro = load_workbook(flujo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [normalizar_encabezado(c) for c in next(filas, ())]
+        _validar_encabezados(encabezados)
+        for numero, valores in enumerate(filas, start=2):
+            if any(v not in (None, "") for v in valores):
+                yield numero, dict(zip(encabezados, valores))
+    finally:
+        libro.close()
+
+
+def leer_filas(flujo, nombre_archivo: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    Itera (número de fila, datos) de un CSV o XLSX sin cargarlo completo.
+    La fila 1 son los encabezados; las filas vacías se omiten.
+    """
+    extension = os.path.splitext(nombre_archivo or "")[1].lower()
+    if extension in (".csv", ".txt"):
+        return _filas_csv(flujo)
+    if extension in (".xlsx", ".xlsm"):
+        return _filas_xlsx(flujo)
+    raise FormatoCargaNoSoportado(f"Formato '{extension or nombre_archivo}' no soportado. Use CSV o XLSX.")
+
+
+def filas_desde_json(deudas: Iterable[Dict]) -> Iterator[Tuple[int, Dict]]:
+    """Mismo formato que leer_filas para el cuerpo JSON {"deudas": [...]} (fila base 1)."""
+    for numero, deuda in enumerate(deudas, start=1):
+        yield numero, {normalizar_encabezado(k): v for k, v in (deuda or {}).items()}
+
+
+# =============================================================================
+# VALIDACIÓN Y RESOLUCIÓN POR LOTES
+# =============================================================================
+
+def validar_lote(lote: List[Tuple[int, Dict]]) -> Tuple[List[Tuple[int, DeudaCarteraCarga]], List[Dict]]:
+    """
+    Valida el lote en una sola llamada; solo si falla se revalidan por
+    separado las filas con error para obtener mensajes en español.
+    """
+    datos = [fila for _, fila in lote]
+    try:
+        return list(zip((n for n, _ in lote), _VALIDADOR_LOTE.validate_python(datos))), []
+    except ValidationError as e:
+        con_error = {error["loc"][0] for error in e.errors()}
+
+    errores = []
+    for posicion in sorted(con_error):
+        _, detalle = validate_manual(DeudaCarteraCarga, datos[posicion])
+        errores.append({
+            "fila": lote[posicion][0],
+            "error": "; ".join(d["mensaje"] for d in detalle or []),
+            "campos": [d["campo"] for d in detalle or []],
+        })
+    restantes = [item for posicion, item in enumerate(lote) if posicion not in con_error]
+    validas = _VALIDADOR_LOTE.validate_python([fila for _, fila in restantes]) if restantes else []
+    return list(zip((n for n, _ in restantes), validas)), errores
+
+
+def _estado(deuda: DeudaCarteraCarga, hoy: date) -> str:
+    vencida = deuda.dias_mora > 0 or (deuda.fecha_vencimiento is not None and deuda.fecha_vencimiento < hoy)
+    return "Vencido" if vencida else "Pendiente"
+
+
+def precargar_referencias(sesion) -> Tuple[Dict[str, Tuple], Dict[str, str]]:
+    """
+    Diccionarios de resolución (una consulta por tabla):
+        usuarios: numeroId -> (empresa_nit, nombre completo)
+        empresas: nit -> nombre_empresa
+    """
+    usuarios = {
+        numero_id: (empresa_nit, " ".join(p for p in (nombre, apellido) if p))
+        for numero_id, empresa_nit, nombre, apellido in sesion.execute(text(
+            "SELECT numeroId, empresa_nit, primerNombre, primerApellido FROM usuarios WHERE numeroId IS NOT NULL"
+        ))
+    }
+    empresas = dict(sesion.execute(text("SELECT nit, nombre_empresa FROM empresas WHERE nit IS NOT NULL")).all())
+    return usuarios, empresas
+
+
+def resolver_lote(validas, usuarios, empresas, usuario_registro, hoy) -> Tuple[List[Dict], List[Dict]]:
+    """Tuplas para SQL_UPSERT_DEUDA y errores de referencia (usuario/empresa)."""
+    registros, errores = [], []
+    fecha_creacion = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    for numero, deuda in validas:
+        usuario = usuarios.get(deuda.usuario_id)
+        if usuario is None:
+            errores.append({"fila": numero, "error": f"Usuario {deuda.usuario_id} no existe", "campos": ["usuario_id"]})
+            continue
+        nit = deuda.empresa_nit or usuario[0]
+        if not nit or nit not in empresas:
+            errores.append({
+                "fila": numero,
+                "error": f"Empresa {nit} no existe" if nit else "El usuario no tiene empresa; indique empresa_nit",
+                "campos": ["empresa_nit"],
+            })
+            continue
+        registros.append((
+            deuda.usuario_id,
+            deuda.nombre_usuario or usuario[1],
+            nit,
+            deuda.nombre_empresa or empresas[nit],
+            deuda.entidad,
+            float(deuda.monto),
+            deuda.dias_mora,
+            _estado(deuda, hoy),
+            fecha_creacion,
+            deuda.fecha_vencimiento.isoformat() if deuda.fecha_vencimiento else None,
+            usuario_registro,
+        ))
+    return registros, errores
+
+
+# =============================================================================
+# IMPORTACIÓN
+# =============================================================================
+
+def importar_deudas(
+    filas: Iterable[Tuple[int, Dict]],
+    sesion,
+    usuario_registro: Optional[str] = None,
+    tamano_lote: Optional[int] = None,
+    max_errores: Optional[int] = None,
+    hoy: Optional[date] = None,
+) -> Dict:
+    """
+    Importa (upsert) las deudas de `filas` en lotes, con commit por lote.
+    Lanza MigracionCarteraPendiente si la base no tiene el índice del upsert.
+
+    Returns:
+        Dict con total_procesadas, guardadas, insertadas, actualizadas,
+        errores (conteo), detalles_errores (máximo max_errores, con la fila
+        del archivo) y errores_truncados.
+    """
+    tamano_lote = tamano_lote or TAMANO_LOTE_CARGA
+    max_errores = MAX_ERRORES_REPORTE if max_errores is None else max_errores
+    hoy = hoy or date.today()
+
+    if sesion.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = :nombre"),
+        {"nombre": INDICE_DEUDA_ABIERTA},
+    ).first() is None:
+        raise MigracionCarteraPendiente(
+            "Falta el índice de deudas abiertas: aplique migrations/20251205_deudas_cartera_carga_masiva.sql"
+        )
+    usuarios, empresas = precargar_referencias(sesion)
+    total_antes = sesion.execute(text("SELECT COUNT(*) FROM deudas_cartera")).scalar()
+
+    resumen = {"total_procesadas": 0, "guardadas": 0, "errores": 0}
+    detalles_errores = []
+
+    def procesar(lote):
+        validas, errores = validar_lote(lote)
+        registros, errores_referencia = resolver_lote(validas, usuarios, empresas, usuario_registro, hoy)
+        if registros:
+            # Cursor DBAPI de la misma transacción: evita el armado de parámetros por fila del ORM
+            cursor = sesion.connection().connection.cursor()
+            try:
+                cursor.executemany(SQL_UPSERT_DEUDA, registros)
+            finally:
+                cursor.close()
+        sesion.commit()
+
+        errores += errores_referencia
+        resumen["total_procesadas"] += len(lote)
+        resumen["guardadas"] += len(registros)
+        resumen["errores"] += len(errores)
+        espacio = max_errores - len(detalles_errores)
+        if espacio > 0:
+            detalles_errores.extend(sorted(errores, key=lambda e: e["fila"])[:espacio])
+
+    lote = []
+    for item in filas:
+        lote.append(item)
+        if len(lote) >= tamano_lote:
+            procesar(lote)
+            lote = []
+    if lote:
+        procesar(lote)
+
+    insertadas = sesion.execute(text("SELECT COUNT(*) FROM deudas_cartera")).scalar() - total_antes
+    resumen.update({
+        "insertadas": insertadas,
+        "actualizadas": resumen["guardadas"] - insertadas,
+        "detalles_errores": detalles_errores,
+        "errores_truncados": resumen["errores"] > len(detalles_errores),
+    })
+    return resumen
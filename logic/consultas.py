@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+logic/consultas.py
+==================
+Helpers compartidos para consultas de estadísticas con SQLAlchemy
+
+- contar_si(): agregación condicional SUM(CASE WHEN ... THEN 1 ELSE 0 END)
+  para obtener varios conteos en una sola pasada en vez de un COUNT(*) por
+  estado; se etiqueta con .label() dentro de un mismo SELECT.
+- rango_prefijo() / rango_anio(): equivalentes a LIKE 'prefijo%' sobre
+  fechas guardadas como TEXT ('YYYY-MM-DD ...'), escritos como rango
+  semiabierto (>= y <) para que SQLite pueda usar el índice de la columna.
+- sql_sin_administradores() / sql_mes(): fragmentos de SQL directo que
+  deben escribirse IGUAL que la condición del índice parcial y la
+  expresión de los índices de orm_models para que SQLite los use
+  (tests/test_planes_consulta.py lo verifica con EXPLAIN QUERY PLAN).
+"""
+
+from sqlalchemy import and_, case, func
+
+
+def contar_si(condicion):
+    """SUM(CASE WHEN condicion THEN 1 ELSE 0 END); NULL si no hay filas."""
+    return func.sum(case((condicion, 1), else_=0))
+
+
+def conteos(consulta_fila):
+    """Convierte la fila de una consulta de contar_si/COUNT en dict con 0 en lugar de NULL."""
+    return {clave: int(valor or 0) for clave, valor in consulta_fila._mapping.items()}
+
+
+def siguiente_prefijo(prefijo: str) -> str:
+    """Menor cadena mayor que todas las que empiezan por `prefijo` ('2025' -> '2026')."""
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def rango_prefijo(columna, prefijo: str):
+    """columna LIKE 'prefijo%' como rango indexable: prefijo <= columna < siguiente."""
+    return and_(columna >= prefijo, columna < siguiente_prefijo(prefijo))
+
+
+def rango_anio(columna, anio: int):
+    """Fechas TEXT del año `anio` (equivale a LIKE '2025%')."""
+    return rango_prefijo(columna, f"{int(anio):04d}")
+
+
+ROLES_ADMINISTRATIVOS = ("admin", "superadmin", "administrador", "super")
+
+
+def sql_sin_administradores(columna="role"):
+    """Condición 'no es rol administrativo' (excluye también role NULL, como antes)."""
+    roles = ", ".join(f"'{rol}'" for rol in ROLES_ADMINISTRATIVOS)
+    return f"lower({columna}) NOT IN ({roles})"
+
+
+def sql_mes(columna):
+    """'YYYY-MM' de una fecha TEXT ISO, con la forma de los índices de expresión por mes."""
+    return f"substr({columna}, 1, 7)"
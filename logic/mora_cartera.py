@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+logic/mora_cartera.py
+=====================
+Recálculo por conjuntos de dias_mora y estado en deudas_cartera
+
+Un solo UPDATE con aritmética julianday() por bloque de rowid (id):
+
+    dias_mora = días entre fecha_vencimiento y la fecha de corte (mínimo 0)
+    estado    = 'Vencido' si la fecha de vencimiento ya pasó
+
+Solo se escriben las filas cuyo valor cambia, así que la suma de rowcount
+es el número real de deudas actualizadas. Las deudas pagadas y las que no
+tienen una fecha de vencimiento válida no se tocan. Cada bloque hace su
+propio commit para no bloquear la BD durante toda la corrida.
+
+Lo ejecuta la tarea Celery celery_tasks.recalcular_mora_cartera (beat,
+cada noche); los endpoints de cartera leen los valores precalculados.
+"""
+
+import os
+import time
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from models.orm_models import RecalculoMoraCartera
+
+TAMANO_BLOQUE_MORA = int(os.getenv("CARTERA_MORA_BLOQUE", "20000"))
+
+_DIAS_MORA = "MAX(0, CAST(julianday(:corte) - julianday(date(fecha_vencimiento)) AS INTEGER))"
+
+SQL_RECALCULAR_MORA = f"""
+    UPDATE deudas_cartera SET
+        dias_mora = {_DIAS_MORA},
+        estado = CASE WHEN {_DIAS_MORA} > 0 THEN 'Vencido' ELSE estado END
+    WHERE id BETWEEN :desde AND :hasta
+      AND estado IS NOT 'Pagado'
+      AND julianday(date(fecha_vencimiento)) IS NOT NULL
+      AND (dias_mora IS NOT {_DIAS_MORA}
+           OR ({_DIAS_MORA} > 0 AND estado IS NOT 'Vencido'))
+"""
+
+
+def recalcular_mora(sesion, hoy: Optional[date] = None, tamano_bloque: Optional[int] = None) -> Dict:
+    """
+    Recalcula dias_mora/estado de toda la cartera y registra la corrida en
+    recalculos_mora_cartera.
+
+    Returns:
+        Dict con fecha_corte, filas_actualizadas, bloques y duracion_ms
+    """
+    corte = (hoy or date.today()).isoformat()
+    tamano_bloque = tamano_bloque or TAMANO_BLOQUE_MORA
+    inicio = time.perf_counter()
+
+    minimo, maximo = sesion.execute(text("SELECT MIN(id), MAX(id) FROM deudas_cartera")).one()
+    actualizadas = bloques = 0
+    if minimo is not None:
+        for desde in range(minimo, maximo + 1, tamano_bloque):
+            resultado = sesion.execute(
+                text(SQL_RECALCULAR_MORA),
+                {"corte": corte, "desde": desde, "hasta": desde + tamano_bloque - 1},
+            )
+            sesion.commit()
+            actualizadas += resultado.rowcount
+            bloques += 1
+
+    registro = RecalculoMoraCartera(
+        fecha_corte=corte,
+        ejecutado_en=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        filas_actualizadas=actualizadas,
+        bloques=bloques,
+        duracion_ms=int((time.perf_counter() - inicio) * 1000),
+    )
+    sesion.add(registro)
+    sesion.commit()
+    return registro.to_dict()
+
+
+def ultimo_recalculo(sesion) -> Optional[Dict]:
+    """Última corrida registrada (o None si nunca se ha ejecutado)."""
+    registro = sesion.query(RecalculoMoraCartera).order_by(RecalculoMoraCartera.id.desc()).first()
+    return registro.to_dict() if registro else None
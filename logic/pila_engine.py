@@ -10,10 +10,15 @@ Autor: Senior Backend Developer & Data Scientist
 Fecha: 2025-11-30
 """
 
+import threading
 from datetime import datetime, date
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from logic.reglas_pila import MENSAJES_REGLAS, REGLAS_ERROR, ColumnasPlanilla, evaluar_reglas
 
 
 class ConfiguracionPILA:
@@ -53,6 +58,99 @@ class ConfiguracionPILA:
     DIAS_MES_ESTANDAR = 30
 
 
+_CENTAVO = Decimal('1')
+
+
+def _centavos(valor: Decimal) -> int:
+    """Decimal en pesos -> entero en centavos (ROUND_HALF_UP)."""
+    return int((valor * 100).quantize(_CENTAVO, rounding=ROUND_HALF_UP))
+
+
+@dataclass(slots=True)
+class LineaPILA:
+    """
+    Línea de planilla PILA compacta: montos en centavos enteros y sin dict
+    por instancia. Los nombres de calcular_linea se exponen como propiedades
+    en float (get() permite leerla como dict) y to_dict() arma el dict
+    completo solo en la frontera de serialización.
+    """
+    usuario_id: Optional[str]
+    nombre_completo: str
+    dias_cotizados: int
+    arl_clase: int
+    arl_tarifa: Decimal
+    ibc_base_centavos: int
+    ibc_centavos: int
+    salud_empleado_centavos: int
+    salud_empleador_centavos: int
+    pension_empleado_centavos: int
+    pension_empleador_centavos: int
+    arl_centavos: int
+    ccf_centavos: int
+    marca_novedad: str = ''
+    novedades_procesadas: Tuple[str, ...] = ()
+    alertas: Tuple[str, ...] = ()
+
+    @property
+    def total_empleado_centavos(self) -> int:
+        return self.salud_empleado_centavos + self.pension_empleado_centavos
+
+    @property
+    def total_empleador_centavos(self) -> int:
+        return (self.salud_empleador_centavos + self.pension_empleador_centavos
+                + self.arl_centavos + self.ccf_centavos)
+
+    @property
+    def total_aportes_centavos(self) -> int:
+        return self.total_empleado_centavos + self.total_empleador_centavos
+
+    @property
+    def validaciones(self) -> Tuple[str, ...]:
+        return () if self.alertas else ("Liquidación correcta",)
+
+    # Vista en pesos (float), con los nombres de calcular_linea
+    ibc_base = property(lambda self: self.ibc_base_centavos / 100)
+    ibc_calculado = property(lambda self: self.ibc_centavos / 100)
+    salud_empleado = property(lambda self: self.salud_empleado_centavos / 100)
+    salud_empleador = property(lambda self: self.salud_empleador_centavos / 100)
+    pension_empleado = property(lambda self: self.pension_empleado_centavos / 100)
+    pension_empleador = property(lambda self: self.pension_empleador_centavos / 100)
+    arl = property(lambda self: self.arl_centavos / 100)
+    ccf = property(lambda self: self.ccf_centavos / 100)
+    total_empleado = property(lambda self: self.total_empleado_centavos / 100)
+    total_empleador = property(lambda self: self.total_empleador_centavos / 100)
+    total_aportes = property(lambda self: self.total_aportes_centavos / 100)
+
+    def get(self, campo: str, defecto=None):
+        """Lectura estilo dict (la usa ColumnasPlanilla)."""
+        return getattr(self, campo, defecto)
+
+    def to_dict(self) -> Dict:
+        """Dict con las mismas claves y valores que calcular_linea."""
+        return {
+            'usuario_id': self.usuario_id,
+            'nombre_completo': self.nombre_completo,
+            'novedades_procesadas': list(self.novedades_procesadas),
+            'alertas': list(self.alertas),
+            'marca_novedad': self.marca_novedad,
+            'validaciones': list(self.validaciones),
+            'ibc_calculado': self.ibc_calculado,
+            'dias_cotizados': self.dias_cotizados,
+            'salud_empleado': self.salud_empleado,
+            'salud_empleador': self.salud_empleador,
+            'pension_empleado': self.pension_empleado,
+            'pension_empleador': self.pension_empleador,
+            'arl': self.arl,
+            'arl_clase': self.arl_clase,
+            'arl_tarifa': float(self.arl_tarifa),
+            'ccf': self.ccf,
+            'total_empleado': self.total_empleado,
+            'total_empleador': self.total_empleador,
+            'total_aportes': self.total_aportes,
+            'ibc_base': self.ibc_base,
+        }
+
+
 class LiquidadorPILA:
     """
     Motor de Liquidación PILA con lógica real de seguridad social colombiana.
@@ -106,22 +204,27 @@ class LiquidadorPILA:
                 ]
 
         Returns:
-            Dict con la línea PILA completa
+            Dict con la línea PILA completa (LineaPILA.to_dict())
         """
-        resultado = {
-            'usuario_id': usuario.get('numeroId'),
-            'nombre_completo': f"{usuario.get('primerNombre')} {usuario.get('primerApellido')}",
-            'novedades_procesadas': [],
-            'alertas': [],
-            'marca_novedad': '',
-            'validaciones': []
-        }
+        return self.calcular_linea_compacta(usuario, dias_trabajados, novedades).to_dict()
+
+    def calcular_linea_compacta(
+        self,
+        usuario: Dict,
+        dias_trabajados: int = 30,
+        novedades: Optional[List[Dict]] = None
+    ) -> "LineaPILA":
+        """
+        Igual que calcular_linea pero devuelve un LineaPILA (slots, centavos
+        enteros). Para planillas grandes: se convierte a dict solo al serializar.
+        """
+        novedades_procesadas = []
+        alertas = []
+        marca_novedad = ''
 
         # PASO 1: PROCESAR NOVEDADES
         novedades = novedades or []
         dias_ajustados = dias_trabajados
-        tiene_incapacidad = False
-        tipo_incapacidad = None
 
         for novedad in novedades:
             tipo_nov = novedad.get('tipo', '').upper()
@@ -131,29 +234,28 @@ class LiquidadorPILA:
                 if fecha_ingreso:
                     dia_ingreso = int(fecha_ingreso.split('-')[-1])
                     dias_ajustados = self.config.DIAS_MES_ESTANDAR - dia_ingreso + 1
-                    resultado['novedades_procesadas'].append(
+                    novedades_procesadas.append(
                         f"INGRESO: Día {dia_ingreso}, cotiza {dias_ajustados} días"
                     )
-                    resultado['marca_novedad'] = 'IGE'
+                    marca_novedad = 'IGE'
 
             elif tipo_nov == 'RETIRO':
                 fecha_retiro = novedad.get('fecha')
                 if fecha_retiro:
                     dia_retiro = int(fecha_retiro.split('-')[-1])
                     dias_ajustados = dia_retiro
-                    resultado['novedades_procesadas'].append(
+                    novedades_procesadas.append(
                         f"RETIRO: Día {dia_retiro}, cotiza {dias_ajustados} días"
                     )
-                    resultado['marca_novedad'] = 'RET'
+                    marca_novedad = 'RET'
 
             elif tipo_nov in ['INCAPACIDAD', 'INC']:
-                tiene_incapacidad = True
                 dias_inc = novedad.get('dias', 0)
                 tipo_incapacidad = novedad.get('tipo_incapacidad', 'EG')
 
                 if tipo_incapacidad == 'EG':
-                    resultado['marca_novedad'] = 'LGE'
-                    resultado['novedades_procesadas'].append(
+                    marca_novedad = 'LGE'
+                    novedades_procesadas.append(
                         f"INCAPACIDAD EG: {dias_inc} días (marca LGE)"
                     )
 
@@ -167,27 +269,14 @@ class LiquidadorPILA:
 
         # VALIDACIÓN: IBC mínimo
         if ibc_calculado < self.config.IBC_MINIMO and dias_ajustados >= self.config.DIAS_MES_ESTANDAR:
-            resultado['alertas'].append(
+            alertas.append(
                 f"IBC ${ibc_calculado:,.0f} menor al SMMLV"
             )
             ibc_calculado = self.config.IBC_MINIMO
 
-        resultado['ibc_calculado'] = ibc_calculado
-        resultado['dias_cotizados'] = dias_ajustados
-
-        # PASO 3: CALCULAR APORTES
-        salud_empleado = (ibc_calculado * self.config.SALUD_EMPLEADO / 100).quantize(
-            Decimal('0.01'), rounding=ROUND_HALF_UP
-        )
-        salud_empleador = (ibc_calculado * self.config.SALUD_EMPLEADOR / 100).quantize(
-            Decimal('0.01'), rounding=ROUND_HALF_UP
-        )
-        pension_empleado = (ibc_calculado * self.config.PENSION_EMPLEADO / 100).quantize(
-            Decimal('0.01'), rounding=ROUND_HALF_UP
-        )
-        pension_empleador = (ibc_calculado * self.config.PENSION_EMPLEADOR / 100).quantize(
-            Decimal('0.01'), rounding=ROUND_HALF_UP
-        )
+        # PASO 3: CALCULAR APORTES (en centavos, sobre el IBC sin redondear)
+        def aporte(tarifa):
+            return _centavos(ibc_calculado * tarifa / 100)
 
         clase_arl = usuario.get('arlClase', 1)
         tarifa_arl_map = {
@@ -198,58 +287,60 @@ class LiquidadorPILA:
             5: self.config.ARL_CLASE_5
         }
         tarifa_arl = tarifa_arl_map.get(clase_arl, self.config.ARL_CLASE_1)
-        arl = (ibc_calculado * tarifa_arl / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        ccf = (ibc_calculado * self.config.CCF_EMPLEADOR / 100).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-
-        total_empleado = salud_empleado + pension_empleado
-        total_empleador = salud_empleador + pension_empleador + arl + ccf
-        total_aportes = total_empleado + total_empleador
-
-        resultado.update({
-            'salud_empleado': float(salud_empleado),
-            'salud_empleador': float(salud_empleador),
-            'pension_empleado': float(pension_empleado),
-            'pension_empleador': float(pension_empleador),
-            'arl': float(arl),
-            'arl_clase': clase_arl,
-            'arl_tarifa': float(tarifa_arl),
-            'ccf': float(ccf),
-            'total_empleado': float(total_empleado),
-            'total_empleador': float(total_empleador),
-            'total_aportes': float(total_aportes),
-            'ibc_calculado': float(ibc_calculado),
-            'ibc_base': float(ibc_base)
-        })
-
-        if not resultado['alertas']:
-            resultado['validaciones'].append("Liquidación correcta")
 
-        return resultado
+        return LineaPILA(
+            usuario_id=usuario.get('numeroId'),
+            nombre_completo=f"{usuario.get('primerNombre')} {usuario.get('primerApellido')}",
+            dias_cotizados=dias_ajustados,
+            arl_clase=clase_arl,
+            arl_tarifa=tarifa_arl,
+            ibc_base_centavos=_centavos(ibc_base),
+            ibc_centavos=_centavos(ibc_calculado),
+            salud_empleado_centavos=aporte(self.config.SALUD_EMPLEADO),
+            salud_empleador_centavos=aporte(self.config.SALUD_EMPLEADOR),
+            pension_empleado_centavos=aporte(self.config.PENSION_EMPLEADO),
+            pension_empleador_centavos=aporte(self.config.PENSION_EMPLEADOR),
+            arl_centavos=aporte(tarifa_arl),
+            ccf_centavos=aporte(self.config.CCF_EMPLEADOR),
+            marca_novedad=marca_novedad,
+            novedades_procesadas=tuple(novedades_procesadas),
+            alertas=tuple(alertas),
+        )
 
     def validar_planilla(self, lineas: List[Dict]) -> Dict:
-        """Valida planilla completa"""
-        errores = []
-        advertencias = []
-        total_aportes = Decimal('0')
-
-        for i, linea in enumerate(lineas, start=1):
-            ibc = Decimal(str(linea.get('ibc_calculado', 0)))
-            if ibc < self.config.IBC_MINIMO:
-                errores.append(f"Línea {i}: IBC menor al mínimo legal")
+        """
+        Valida planilla completa con el motor de reglas por columnas.
 
-            dias = linea.get('dias_cotizados', 0)
-            if dias < 1 or dias > 30:
-                errores.append(f"Línea {i}: Días inválidos ({dias})")
+        Las reglas de IBC mínimo y días inválidos son errores; tarifas,
+        duplicados, IBC atípicos y días sin novedad son advertencias.
 
-            total_aportes += Decimal(str(linea.get('total_aportes', 0)))
+        Returns:
+            Dict con valida, errores, advertencias, total_aportes,
+            total_empleados, lineas_marcadas ({regla: [índices base 0]})
+            e indices_marcados (unión ordenada)
+        """
+        columnas = ColumnasPlanilla(lineas)
+        marcadas = evaluar_reglas(columnas, self.config)
+
+        mensajes = {"errores": [], "advertencias": []}
+        for regla, indices in marcadas.items():
+            destino = mensajes["errores"] if regla in REGLAS_ERROR else mensajes["advertencias"]
+            plantilla = MENSAJES_REGLAS[regla]
+            destino.extend(
+                (i, plantilla.format(linea=i + 1, dias=columnas.dias_originales[i])) for i in indices
+            )
+        # Orden estable por línea (y por regla dentro de la misma línea)
+        errores = [m for _, m in sorted(mensajes["errores"], key=lambda x: x[0])]
+        advertencias = [m for _, m in sorted(mensajes["advertencias"], key=lambda x: x[0])]
 
         return {
             'valida': len(errores) == 0,
             'errores': errores,
             'advertencias': advertencias,
-            'total_aportes': float(total_aportes),
-            'total_empleados': len(lineas)
+            'total_aportes': columnas.total_aportes,
+            'total_empleados': len(lineas),
+            'lineas_marcadas': marcadas,
+            'indices_marcados': sorted(set().union(*marcadas.values())),
         }
 
 
@@ -315,16 +406,26 @@ UMBRAL_EXONERACION_SALUD = Decimal('1300000') * 10
 # SALARIO INTEGRAL
 PORCENTAJE_IBC_SALARIO_INTEGRAL = Decimal('0.70')  # 70% del salario base
 
+# Año de los parámetros (SMMLV, tarifas, topes); forma parte de la clave de
+# memoización, así un cambio de parámetros no reutiliza resultados viejos.
+VERSION_PARAMETROS_PILA = "2025"
+
+# Tope de liquidaciones memoizadas por CalculadoraPILA.calcular()
+MAX_LIQUIDACIONES_CACHE = 4096
+
 
 # ============================================================================
 # DATACLASS para resultado de CalculadoraPILA
 # ============================================================================
 
-@dataclass
+@dataclass(frozen=True)
 class LiquidacionPILA:
     """
     Resultado completo de la liquidación de Seguridad Social
     Todos los valores en pesos colombianos (COP)
+
+    Inmutable: la misma instancia se comparte desde la caché de
+    CalculadoraPILA, así que nadie puede alterarla.
     """
     # Datos de entrada
     salario_base: Decimal
@@ -364,7 +465,60 @@ class LiquidacionPILA:
     fecha_calculo: datetime
     salario_ajustado: bool
     ibc_limitado: bool
-    advertencias: list
+    advertencias: tuple
+
+
+# ============================================================================
+# CACHÉ LRU DE LIQUIDACIONES
+# ============================================================================
+
+class CacheLRU:
+    """LRU acotada y segura entre hilos, con métricas de aciertos."""
+
+    def __init__(self, max_entradas: int = MAX_LIQUIDACIONES_CACHE):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        """Valor guardado (y lo marca como reciente) o None."""
+        with self._lock:
+            valor = self._entradas.get(clave)
+            if valor is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._entradas[clave] = valor
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = 0
+            self.fallos = 0
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                "tamano": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "tasa_aciertos": round(self.aciertos / total, 4) if total else 0.0,
+            }
+
+
+cache_liquidaciones = CacheLRU()
 
 
 # ============================================================================
@@ -386,6 +540,7 @@ class CalculadoraPILA:
         es_salario_integral: bool = False
     ):
         self.salario_base = Decimal(str(salario_base))
+        self.salario_entrada = self.salario_base  # antes del ajuste al SMMLV
         self.nivel_riesgo_arl = nivel_riesgo_arl
         self.es_empresa_exonerada = es_empresa_exonerada
         self.es_salario_integral = es_salario_integral
@@ -495,7 +650,31 @@ class CalculadoraPILA:
         }
     
     def calcular(self) -> LiquidacionPILA:
-        """Ejecuta el cálculo completo de Seguridad Social"""
+        """
+        Ejecuta el cálculo completo de Seguridad Social.
+
+        Las liquidaciones se memoizan en cache_liquidaciones por (salario,
+        nivel ARL, exonerada, integral, VERSION_PARAMETROS_PILA); la mayoría
+        de cotizantes comparten salario mínimo y pocas clases de riesgo.
+        Un acierto devuelve una copia con fecha_calculo de esta llamada.
+        """
+        clave = (
+            self.salario_entrada,
+            self.nivel_riesgo_arl,
+            bool(self.es_empresa_exonerada),
+            bool(self.es_salario_integral),
+            VERSION_PARAMETROS_PILA,
+        )
+        cacheada = cache_liquidaciones.obtener(clave)
+        if cacheada is not None:
+            return replace(cacheada, fecha_calculo=datetime.now())
+
+        resultado = self._liquidar()
+        cache_liquidaciones.guardar(clave, resultado)
+        return resultado
+
+    def _liquidar(self) -> LiquidacionPILA:
+        """Cálculo completo sin caché."""
         salud = self._calcular_salud()
         pension = self._calcular_pension()
         arl = self._calcular_arl()
@@ -536,5 +715,93 @@ class CalculadoraPILA:
             fecha_calculo=datetime.now(),
             salario_ajustado=self.salario_ajustado,
             ibc_limitado=self.ibc_limitado,
-            advertencias=self.advertencias.copy()
+            advertencias=tuple(self.advertencias)
         )
+
+
+# ============================================================================
+# SIMULACIÓN POR LOTES - Cotizaciones con varios escenarios
+# ============================================================================
+
+COLUMNAS_SIMULACION = (
+    "salario_base", "nivel_riesgo", "es_salario_integral", "es_empresa_exonerada",
+    "ibc", "salud_empleado", "salud_empleador", "pension_empleado", "pension_empleador",
+    "arl", "ccf", "sena", "icbf", "total_empleado", "total_empleador", "total_general",
+    "salario_neto", "salario_ajustado", "ibc_limitado",
+)
+
+
+@lru_cache(maxsize=1024)
+def _base_simulacion(version: str, salario_base: float, es_salario_integral: bool) -> Tuple:
+    """
+    Partes que dependen solo de (salario, integral): IBC, salud empleado,
+    pensión y parafiscales. Se comparten entre niveles de riesgo y
+    exoneración.
+    """
+    calc = CalculadoraPILA(salario_base, 1, es_empresa_exonerada=False, es_salario_integral=es_salario_integral)
+    salud = calc._calcular_salud()
+    pension = calc._calcular_pension()
+    parafiscales = calc._calcular_parafiscales()
+    return calc, salud, pension, parafiscales
+
+
+@lru_cache(maxsize=8192)
+def _fila_simulacion(
+    version: str, salario_base: float, nivel_riesgo: int, es_salario_integral: bool, es_empresa_exonerada: bool
+) -> Tuple:
+    """Fila de COLUMNAS_SIMULACION para un escenario (mismos valores que CalculadoraPILA.calcular())."""
+    if nivel_riesgo not in TABLA_ARL:
+        raise ValueError(f"Nivel de riesgo ARL inválido: {nivel_riesgo}. Debe estar entre 1 y 5.")
+
+    calc, salud, pension, parafiscales = _base_simulacion(version, salario_base, es_salario_integral)
+    if es_empresa_exonerada and calc.salario_base < UMBRAL_EXONERACION_SALUD:
+        salud_empleador = Decimal('0')
+    else:
+        salud_empleador = salud['empleador']
+    arl = calc._redondear(calc.ibc * TABLA_ARL[nivel_riesgo])
+
+    total_empleado = salud['empleado'] + pension['empleado']
+    total_empleador = salud_empleador + pension['empleador'] + arl + parafiscales['total']
+    return (
+        float(calc.salario_base), nivel_riesgo, es_salario_integral, es_empresa_exonerada,
+        float(calc.ibc), int(salud['empleado']), int(salud_empleador),
+        int(pension['empleado']), int(pension['empleador']), int(arl),
+        int(parafiscales['ccf']), int(parafiscales['sena']), int(parafiscales['icbf']),
+        int(total_empleado), int(total_empleador), int(total_empleado + total_empleador),
+        float(calc.salario_base - total_empleado), calc.salario_ajustado, calc.ibc_limitado,
+    )
+
+
+def simular_escenarios(escenarios: Iterable[Tuple[float, int, bool, bool]]) -> List[Tuple]:
+    """
+    Liquida una lista de escenarios (salario_base, nivel_riesgo, integral,
+    exonerada) en una sola pasada.
+
+    Cada (salario, integral) se calcula una vez y se reutiliza para todos sus
+    niveles de riesgo y variantes de exoneración; las filas quedan
+    memoizadas por (VERSION_PARAMETROS_PILA, entradas).
+
+    Returns:
+        Lista de filas en el orden de COLUMNAS_SIMULACION
+
+    Raises:
+        ValueError: Si algún escenario tiene salario <= 0 o nivel de riesgo inválido
+    """
+    return [
+        _fila_simulacion(VERSION_PARAMETROS_PILA, float(salario), int(nivel), bool(integral), bool(exonerada))
+        for salario, nivel, integral, exonerada in escenarios
+    ]
+
+
+def estadisticas_simulacion() -> Dict:
+    """Aciertos/fallos de la memoización de escenarios y bases de simular_escenarios()."""
+    filas = _fila_simulacion.cache_info()
+    bases = _base_simulacion.cache_info()
+    return {
+        "version_parametros": VERSION_PARAMETROS_PILA,
+        "aciertos": filas.hits,
+        "fallos": filas.misses,
+        "entradas": filas.currsize,
+        "bases_calculadas": bases.misses,
+    }
+
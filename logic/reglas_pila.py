@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+logic/reglas_pila.py
+====================
+Motor de reglas por columnas para validar líneas PILA
+
+Las líneas se convierten UNA vez en columnas (una lista por campo) y cada
+regla recorre solo las columnas que necesita,
+devolviendo los índices (base 0) de las líneas que incumple. Así 100.000
+líneas se validan en una fracción de segundo, sin Decimal por línea.
+
+Reglas:
+    ibc_bajo_minimo       IBC menor al SMMLV
+    dias_invalidos        Días fuera de 1..30
+    ibc_sobre_tope        IBC mayor a 25 SMMLV
+    salud_no_4            Salud empleado distinto del 4% del IBC (tolerancia 1 centavo)
+    pension_no_4          Pensión empleado distinta del 4% del IBC (tolerancia 1 centavo)
+    tarifa_arl            Tarifa o valor ARL que no corresponde a la clase de riesgo
+    cotizante_duplicado   Mismo documento más de una vez en la misma empresa
+    ibc_atipico           IBC 10 veces mayor o menor que la mediana de su empresa
+    dias_sin_novedad      Menos de 30 días sin marca de novedad que lo justifique
+
+Este módulo no importa pila_engine: recibe la configuración como parámetro.
+"""
+
+import math
+import statistics
+from collections import Counter, defaultdict
+from operator import itemgetter
+from typing import Dict, List, Optional
+
+FACTOR_ATIPICO = 10
+TOLERANCIA_CENTAVOS = 1
+
+# Reglas que invalidan la planilla; las demás generan advertencias
+REGLAS_ERROR = ("ibc_bajo_minimo", "dias_invalidos")
+
+MENSAJES_REGLAS = {
+    "ibc_bajo_minimo": "Línea {linea}: IBC menor al mínimo legal",
+    "dias_invalidos": "Línea {linea}: Días inválidos ({dias})",
+    "ibc_sobre_tope": "Línea {linea}: IBC supera el tope de 25 SMMLV",
+    "salud_no_4": "Línea {linea}: Salud empleado no corresponde al 4% del IBC",
+    "pension_no_4": "Línea {linea}: Pensión empleado no corresponde al 4% del IBC",
+    "tarifa_arl": "Línea {linea}: Tarifa ARL no corresponde a la clase de riesgo",
+    "cotizante_duplicado": "Línea {linea}: Cotizante duplicado en la planilla",
+    "ibc_atipico": "Línea {linea}: IBC atípico frente a la mediana de la empresa",
+    "dias_sin_novedad": "Línea {linea}: Menos de 30 días sin marca de novedad",
+}
+
+
+def _campo(lineas, campo, defecto=None):
+    """Columna `campo` de todas las líneas."""
+    return [linea.get(campo, defecto) for linea in lineas]
+
+
+def _flotantes(valores, defecto=0.0, conservar_none=False):
+    """
+    Convierte una columna a float; los valores no numéricos toman `defecto`.
+    Con conservar_none=True los None se mantienen (campo ausente).
+    """
+    try:
+        if conservar_none:
+            return [None if v is None else float(v) for v in valores]
+        return list(map(float, valores))
+    except (TypeError, ValueError):
+        salida = []
+        for v in valores:
+            if v is None and conservar_none:
+                salida.append(None)
+                continue
+            try:
+                salida.append(float(v))
+            except (TypeError, ValueError):
+                salida.append(defecto)
+        return salida
+
+
+def _clase(valor):
+    """Clase de riesgo ARL como entero (-1 si no es válida, None si no viene)."""
+    if valor is None or isinstance(valor, int):
+        return valor
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return -1
+
+
+class ColumnasPlanilla:
+    """Vista columnar de una lista de líneas PILA (dicts de calcular_linea o LineaPILA)."""
+
+    def __init__(self, lineas: List[Dict]):
+        self.total = len(lineas)
+        self.dias_originales = _campo(lineas, 'dias_cotizados', 0)
+        self.dias = _flotantes(self.dias_originales)
+        self.ibc = _flotantes(_campo(lineas, 'ibc_calculado', 0))
+        self.salud = _flotantes(_campo(lineas, 'salud_empleado'), conservar_none=True)
+        self.pension = _flotantes(_campo(lineas, 'pension_empleado'), conservar_none=True)
+        self.arl = _flotantes(_campo(lineas, 'arl'), conservar_none=True)
+        self.arl_clase = [_clase(c) for c in _campo(lineas, 'arl_clase')]
+        self.arl_tarifa = _flotantes(_campo(lineas, 'arl_tarifa'), conservar_none=True)
+        self.marca = _campo(lineas, 'marca_novedad', '')
+        self.documento = _campo(lineas, 'usuario_id')
+        self.empresa = _campo(lineas, 'empresa_nit')
+        self.una_empresa = len(set(self.empresa)) <= 1
+        self.total_aportes = round(math.fsum(_flotantes(_campo(lineas, 'total_aportes', 0))), 2)
+
+
+def _aporte_no_4(montos, col):
+    # Redondeo al centavo (hasta medio centavo) + TOLERANCIA_CENTAVOS
+    margen = (TOLERANCIA_CENTAVOS + 0.5) / 100
+    return [
+        i for i, (monto, ibc) in enumerate(zip(montos, col.ibc))
+        if monto is not None and abs(monto - ibc * 0.04) > margen
+    ]
+
+
+def regla_ibc_bajo_minimo(col, config):
+    minimo = float(config.IBC_MINIMO)
+    return [i for i, ibc in enumerate(col.ibc) if ibc < minimo]
+
+
+def regla_dias_invalidos(col, config):
+    tope = config.DIAS_MES_ESTANDAR
+    return [i for i, d in enumerate(col.dias) if d < 1 or d > tope]
+
+
+def regla_ibc_sobre_tope(col, config):
+    maximo = float(config.IBC_MAXIMO)
+    return [i for i, ibc in enumerate(col.ibc) if ibc > maximo]
+
+
+def regla_salud_no_4(col, config):
+    return _aporte_no_4(col.salud, col)
+
+
+def regla_pension_no_4(col, config):
+    return _aporte_no_4(col.pension, col)
+
+
+def regla_tarifa_arl(col, config):
+    tarifas = {clase: float(getattr(config, f'ARL_CLASE_{clase}')) for clase in range(1, 6)}
+    margen = (TOLERANCIA_CENTAVOS + 0.5) / 100
+    marcadas = []
+    for i, (clase, tarifa, arl, ibc) in enumerate(zip(col.arl_clase, col.arl_tarifa, col.arl, col.ibc)):
+        if clase is None:
+            continue
+        esperada = tarifas.get(clase)
+        if (
+            esperada is None
+            or (tarifa is not None and abs(tarifa - esperada) > 1e-9)
+            or (arl is not None and abs(arl - ibc * esperada / 100) > margen)
+        ):
+            marcadas.append(i)
+    return marcadas
+
+
+def regla_cotizante_duplicado(col, config):
+    # Con una sola empresa la clave es el documento; si no, (empresa, documento)
+    claves = col.documento if col.una_empresa else list(zip(col.empresa, col.documento))
+    documento = (lambda c: c) if col.una_empresa else itemgetter(1)
+    repetidas = {c for c, n in Counter(claves).items() if n > 1 and documento(c) not in (None, '')}
+    if not repetidas:
+        return []
+    return [i for i, c in enumerate(claves) if c in repetidas]
+
+
+def _limites_atipico(valores):
+    positivos = [v for v in valores if v > 0]
+    mediana = statistics.median(positivos) if positivos else 0
+    return (mediana / FACTOR_ATIPICO, mediana * FACTOR_ATIPICO) if mediana else (0, float('inf'))
+
+
+def regla_ibc_atipico(col, config):
+    if col.una_empresa:
+        bajo, alto = _limites_atipico(col.ibc)
+        return [i for i, ibc in enumerate(col.ibc) if ibc > alto or 0 < ibc < bajo]
+
+    por_empresa = defaultdict(list)
+    for ibc, empresa in zip(col.ibc, col.empresa):
+        por_empresa[empresa].append(ibc)
+    limites = {empresa: _limites_atipico(valores) for empresa, valores in por_empresa.items()}
+    return [
+        i for i, (ibc, empresa) in enumerate(zip(col.ibc, col.empresa))
+        if ibc > limites[empresa][1] or 0 < ibc < limites[empresa][0]
+    ]
+
+
+def regla_dias_sin_novedad(col, config):
+    tope = config.DIAS_MES_ESTANDAR
+    return [i for i, (d, marca) in enumerate(zip(col.dias, col.marca)) if 0 < d < tope and not marca]
+
+
+REGLAS_PILA = {
+    "ibc_bajo_minimo": regla_ibc_bajo_minimo,
+    "dias_invalidos": regla_dias_invalidos,
+    "ibc_sobre_tope": regla_ibc_sobre_tope,
+    "salud_no_4": regla_salud_no_4,
+    "pension_no_4": regla_pension_no_4,
+    "tarifa_arl": regla_tarifa_arl,
+    "cotizante_duplicado": regla_cotizante_duplicado,
+    "ibc_atipico": regla_ibc_atipico,
+    "dias_sin_novedad": regla_dias_sin_novedad,
+}
+
+
+def evaluar_reglas(columnas: ColumnasPlanilla, config, reglas: Optional[List[str]] = None) -> Dict[str, List[int]]:
+    """
+    Aplica las reglas indicadas (todas por defecto) sobre la vista columnar.
+
+    Returns:
+        {nombre_regla: [índices base 0 marcados]}
+    """
+    nombres = reglas or list(REGLAS_PILA)
+    return {nombre: REGLAS_PILA[nombre](columnas, config) for nombre in nombres}
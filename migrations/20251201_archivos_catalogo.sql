@@ -0,0 +1,58 @@
+-- =====================================================================
+-- MIGRACIÓN: CATÁLOGO INDEXADO DE ARCHIVOS (GESTOR DE ARCHIVOS)
+-- Fecha: 2025-12-01
+-- Descripción: Índice persistente de archivos y carpetas de usuarios para
+--              servir /api/archivos/arbol y /api/archivos/buscar sin
+--              recorrer el disco en cada petición. Incluye FTS5 sobre nombres.
+-- Nota: la aplicación no crea estas tablas; sin ellas /arbol y /buscar
+--       escanean el disco y /reindexar responde 503.
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS archivos_catalogo (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    usuario_id TEXT NOT NULL,
+    ruta_relativa TEXT NOT NULL UNIQUE,
+    ruta_padre TEXT,
+    nombre TEXT NOT NULL,
+    tipo TEXT NOT NULL CHECK(tipo IN ('archivo', 'carpeta')),
+    extension TEXT,
+    tamano INTEGER DEFAULT 0,
+    modificado REAL,
+    profundidad INTEGER NOT NULL DEFAULT 0,
+    indexado_en REAL
+);
+
+-- Índices para árbol (hijos por carpeta) y filtros por extensión
+CREATE INDEX IF NOT EXISTS idx_catalogo_usuario_padre ON archivos_catalogo(usuario_id, ruta_padre);
+CREATE INDEX IF NOT EXISTS idx_catalogo_usuario_extension ON archivos_catalogo(usuario_id, extension);
+
+-- Índice de texto completo sobre nombres (sin tildes)
+CREATE VIRTUAL TABLE IF NOT EXISTS archivos_catalogo_fts USING fts5(
+    nombre,
+    content='archivos_catalogo',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+-- Triggers para mantener el índice FTS sincronizado
+CREATE TRIGGER IF NOT EXISTS archivos_catalogo_ai AFTER INSERT ON archivos_catalogo BEGIN
+    INSERT INTO archivos_catalogo_fts(rowid, nombre) VALUES (new.id, new.nombre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS archivos_catalogo_ad AFTER DELETE ON archivos_catalogo BEGIN
+    INSERT INTO archivos_catalogo_fts(archivos_catalogo_fts, rowid, nombre) VALUES ('delete', old.id, old.nombre);
+END;
+
+CREATE TRIGGER IF NOT EXISTS archivos_catalogo_au AFTER UPDATE OF nombre ON archivos_catalogo BEGIN
+    INSERT INTO archivos_catalogo_fts(archivos_catalogo_fts, rowid, nombre) VALUES ('delete', old.id, old.nombre);
+    INSERT INTO archivos_catalogo_fts(rowid, nombre) VALUES (new.id, new.nombre);
+END;
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP TRIGGER IF EXISTS archivos_catalogo_au;
+-- DROP TRIGGER IF EXISTS archivos_catalogo_ad;
+-- DROP TRIGGER IF EXISTS archivos_catalogo_ai;
+-- DROP TABLE IF EXISTS archivos_catalogo_fts;
+-- DROP TABLE IF EXISTS archivos_catalogo;
+-- =====================================================================
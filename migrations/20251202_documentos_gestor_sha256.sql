@@ -0,0 +1,21 @@
+-- =====================================================================
+-- MIGRACIÓN: HASH DE CONTENIDO EN documentos_gestor (ALMACÉN DE BLOBS)
+-- Fecha: 2025-12-02
+-- Descripción: Cada documento del gestor queda vinculado al blob
+--              direccionado por contenido (blob_store.py) mediante su
+--              SHA-256. Permite saber qué registros comparten el mismo
+--              archivo físico y reportar el ahorro por deduplicación.
+-- =====================================================================
+
+ALTER TABLE documentos_gestor ADD COLUMN sha256 TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_documentos_gestor_sha256 ON documentos_gestor(sha256);
+
+-- Los registros anteriores conservan sha256 = NULL; sus archivos siguen
+-- siendo copias independientes hasta que se vuelvan a subir.
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS idx_documentos_gestor_sha256;
+-- ALTER TABLE documentos_gestor DROP COLUMN sha256;  -- SQLite >= 3.35
+-- =====================================================================
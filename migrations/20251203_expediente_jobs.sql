@@ -0,0 +1,34 @@
+-- =====================================================================
+-- MIGRACIÓN: COLA DE GENERACIÓN DE EXPEDIENTES
+-- Fecha: 2025-12-03
+-- Descripción: Registro de jobs de expedientes de usuarios y empresas
+--              (carpetas, datos.txt, firmas y adjuntos) que se generan
+--              fuera de la petición HTTP. job_id es un hash de los datos de
+--              entrada: encolar dos veces lo mismo no duplica el trabajo.
+-- Nota: la aplicación no crea esta tabla; sin ella los expedientes no se
+--       encolan (el usuario/empresa se guarda y la respuesta lo advierte).
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS expediente_jobs (
+    job_id TEXT PRIMARY KEY,
+    lote_id TEXT,
+    tipo TEXT NOT NULL CHECK(tipo IN ('usuario', 'empresa')),
+    entidad_id TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente'
+        CHECK(estado IN ('pendiente', 'en_proceso', 'completado', 'error')),
+    plan TEXT NOT NULL,
+    resultado TEXT,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    creado_en TEXT NOT NULL,
+    actualizado_en TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_expediente_jobs_lote ON expediente_jobs(lote_id, estado);
+CREATE INDEX IF NOT EXISTS idx_expediente_jobs_entidad ON expediente_jobs(tipo, entidad_id);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS idx_expediente_jobs_entidad;
+-- DROP INDEX IF EXISTS idx_expediente_jobs_lote;
+-- DROP TABLE IF EXISTS expediente_jobs;
+-- =====================================================================
@@ -0,0 +1,31 @@
+-- =====================================================================
+-- MIGRACIÓN: COLA DE GENERACIÓN DE CARTAS DE DEPURACIÓN
+-- Fecha: 2025-12-04
+-- Descripción: Jobs de /api/depuraciones/generar-carta. La carta se
+--              genera fuera de la petición (hilos o Celery) y el progreso (0-100),
+--              la etapa y el resultado quedan en esta tabla.
+-- Nota: la aplicación no crea esta tabla; sin ella generar-carta y la
+--       consulta de jobs responden 500.
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS carta_jobs (
+    job_id TEXT PRIMARY KEY,
+    estado TEXT NOT NULL DEFAULT 'pendiente'
+        CHECK(estado IN ('pendiente', 'en_proceso', 'completado', 'error')),
+    progreso INTEGER NOT NULL DEFAULT 0,
+    etapa TEXT,
+    solicitud TEXT NOT NULL,
+    resultado TEXT,
+    error TEXT,
+    usuario_id TEXT,
+    creado_en TEXT NOT NULL,
+    actualizado_en TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_carta_jobs_usuario ON carta_jobs(usuario_id, creado_en);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS idx_carta_jobs_usuario;
+-- DROP TABLE IF EXISTS carta_jobs;
+-- =====================================================================
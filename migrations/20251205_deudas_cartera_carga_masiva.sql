@@ -0,0 +1,61 @@
+-- =====================================================================
+-- MIGRACIÓN: CLAVE DE UPSERT PARA LA CARGA MASIVA DE CARTERA
+-- Fecha: 2025-12-05
+-- Descripción: POST /api/cartera/carga-masiva hace upsert por
+--              (usuario_id, empresa_nit, entidad, fecha_vencimiento) sobre
+--              las deudas abiertas (estado != 'Pagado'). La fecha de
+--              vencimiento identifica el periodo: recargar el reporte de un
+--              periodo actualiza su deuda y otro periodo crea una nueva.
+--              Una deuda pagada no bloquea una nueva.
+-- Nota: la carga masiva responde 503 mientras este script no se aplique.
+--       Puede ejecutarse varias veces.
+-- =====================================================================
+
+-- 1. Respaldo de las deudas abiertas duplicadas (misma clave): se conserva
+--    la más reciente (mayor id), igual que haría una recarga del reporte
+CREATE TABLE IF NOT EXISTS deudas_cartera_duplicadas AS
+    SELECT * FROM deudas_cartera WHERE 0;
+
+INSERT INTO deudas_cartera_duplicadas
+SELECT d.* FROM deudas_cartera d
+WHERE d.estado != 'Pagado'
+  AND EXISTS (
+      SELECT 1 FROM deudas_cartera r
+      WHERE r.estado != 'Pagado'
+        AND r.usuario_id = d.usuario_id
+        AND r.empresa_nit = d.empresa_nit
+        AND r.entidad = d.entidad
+        AND COALESCE(r.fecha_vencimiento, '') = COALESCE(d.fecha_vencimiento, '')
+        AND r.id > d.id
+  );
+
+-- 2. Eliminación de los duplicados respaldados
+DELETE FROM deudas_cartera
+WHERE estado != 'Pagado'
+  AND EXISTS (
+      SELECT 1 FROM deudas_cartera r
+      WHERE r.estado != 'Pagado'
+        AND r.usuario_id = deudas_cartera.usuario_id
+        AND r.empresa_nit = deudas_cartera.empresa_nit
+        AND r.entidad = deudas_cartera.entidad
+        AND COALESCE(r.fecha_vencimiento, '') = COALESCE(deudas_cartera.fecha_vencimiento, '')
+        AND r.id > deudas_cartera.id
+  );
+
+-- 3. Índice único parcial (se recrea por si existía con la clave anterior,
+--    sin fecha de vencimiento)
+DROP INDEX IF EXISTS uq_deudas_cartera_abierta;
+
+CREATE UNIQUE INDEX uq_deudas_cartera_abierta
+    ON deudas_cartera(usuario_id, empresa_nit, entidad, COALESCE(fecha_vencimiento, ''))
+    WHERE estado != 'Pagado';
+
+-- Duplicados respaldados para revisión:
+-- SELECT * FROM deudas_cartera_duplicadas ORDER BY usuario_id, entidad, id;
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS uq_deudas_cartera_abierta;
+-- INSERT INTO deudas_cartera SELECT * FROM deudas_cartera_duplicadas;
+-- DROP TABLE IF EXISTS deudas_cartera_duplicadas;
+-- =====================================================================
@@ -0,0 +1,23 @@
+-- =====================================================================
+-- MIGRACIÓN: BITÁCORA DEL RECÁLCULO NOCTURNO DE MORA DE CARTERA
+-- Fecha: 2025-12-06
+-- Descripción: celery_tasks.recalcular_mora_cartera actualiza dias_mora y
+--              estado de deudas_cartera con un UPDATE por bloques de rowid
+--              y registra aquí cada corrida (filas actualizadas, duración).
+-- Nota: db.create_all() crea la tabla (modelo RecalculoMoraCartera); este
+--       script permite crearla por adelantado.
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS recalculos_mora_cartera (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha_corte TEXT NOT NULL,
+    ejecutado_en TEXT NOT NULL,
+    filas_actualizadas INTEGER NOT NULL DEFAULT 0,
+    bloques INTEGER NOT NULL DEFAULT 0,
+    duracion_ms INTEGER
+);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP TABLE IF EXISTS recalculos_mora_cartera;
+-- =====================================================================
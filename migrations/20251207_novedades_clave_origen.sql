@@ -0,0 +1,27 @@
+-- =====================================================================
+-- MIGRACIÓN: CLAVE DE ORIGEN PARA NOVEDADES AUTOMÁTICAS
+-- Fecha: 2025-12-07
+-- Descripción: celery_tasks.check_recordatorios_cobro inserta todas las
+--              alertas del día con un solo INSERT OR IGNORE; el índice
+--              único (origen_tipo, origen_id, origen_dia) descarta las que
+--              ya existen para la misma deuda ese día.
+-- Nota: la aplicación no altera la tabla al arrancar; las bases creadas
+--       antes de 2025-12-07 necesitan este script (las nuevas reciben las
+--       columnas vía create_all). Las novedades manuales dejan las columnas
+--       en NULL y nunca chocan en el índice.
+-- =====================================================================
+
+ALTER TABLE novedades ADD COLUMN origen_tipo TEXT;
+ALTER TABLE novedades ADD COLUMN origen_id TEXT;
+ALTER TABLE novedades ADD COLUMN origen_dia TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_novedades_origen
+    ON novedades (origen_tipo, origen_id, origen_dia);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS uq_novedades_origen;
+-- ALTER TABLE novedades DROP COLUMN origen_dia;
+-- ALTER TABLE novedades DROP COLUMN origen_id;
+-- ALTER TABLE novedades DROP COLUMN origen_tipo;
+-- =====================================================================
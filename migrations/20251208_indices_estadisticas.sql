@@ -0,0 +1,20 @@
+-- =====================================================================
+-- MIGRACIÓN: ÍNDICES PARA ESTADÍSTICAS POR RANGO DE FECHA
+-- Fecha: 2025-12-08
+-- Descripción: /marketing/api/stats y /api/impuestos/balance filtran por
+--              fecha con rangos semiabiertos (>= y <) en lugar de LIKE
+--              'YYYY-...%' (logic/consultas.py); estos índices los sirven.
+-- Nota: db.create_all() no agrega índices a tablas ya existentes.
+-- =====================================================================
+
+CREATE INDEX IF NOT EXISTS idx_prospectos_fecha_registro
+    ON marketing_prospectos (fecha_registro);
+
+CREATE INDEX IF NOT EXISTS idx_impuestos_empresa_fecha
+    ON pago_impuestos (empresa_nit, fecha_limite);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS idx_prospectos_fecha_registro;
+-- DROP INDEX IF EXISTS idx_impuestos_empresa_fecha;
+-- =====================================================================
@@ -0,0 +1,17 @@
+-- =====================================================================
+-- MIGRACIÓN: ÍNDICE PARA PAGINACIÓN DE NOVEDADES
+-- Fecha: 2025-12-09
+-- Descripción: GET /api/novedades pagina por keyset ORDER BY updateDate
+--              DESC, id DESC; el índice sobre updateDate (que incluye el
+--              rowid) sirve el orden y el salto al cursor sin ordenar toda
+--              la tabla.
+-- Nota: db.create_all() no agrega índices a tablas ya existentes.
+-- =====================================================================
+
+CREATE INDEX IF NOT EXISTS idx_novedades_update
+    ON novedades (updateDate);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS idx_novedades_update;
+-- =====================================================================
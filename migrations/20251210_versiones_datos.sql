@@ -0,0 +1,55 @@
+-- =====================================================================
+-- MIGRACIÓN: VERSIONES DE DATOS PARA GET CONDICIONAL (ETag)
+-- Fecha: 2025-12-10
+-- Descripción: contador por tabla que suben triggers AFTER INSERT/UPDATE/
+--              DELETE. cache_http.respuesta_condicional lo lee antes de
+--              ejecutar la vista para responder 304 sin consultar nada.
+-- Nota: es la única forma de instalar el versionado; la aplicación no
+--       crea nada en tiempo de ejecución y, mientras falte, las vistas
+--       responden sin caché. Puede ejecutarse varias veces (p.ej. después
+--       de recrear una tabla, que pierde sus triggers).
+-- =====================================================================
+
+CREATE TABLE IF NOT EXISTS versiones_datos (
+    tabla TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    actualizado TEXT NOT NULL
+);
+
+-- Una fila por tabla. Si ya existía se sube la versión: las escrituras
+-- hechas sin triggers (tabla recreada) no quedaron contadas y los ETag
+-- emitidos antes deben invalidarse.
+INSERT INTO versiones_datos (tabla, version, actualizado)
+VALUES ('empresas', 0, datetime('now')), ('usuarios', 0, datetime('now')),
+       ('documentos_gestor', 0, datetime('now'))
+ON CONFLICT (tabla) DO UPDATE SET version = version + 1, actualizado = datetime('now');
+
+-- empresas
+CREATE TRIGGER IF NOT EXISTS trg_version_empresas_insert AFTER INSERT ON empresas
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'empresas'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_empresas_update AFTER UPDATE ON empresas
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'empresas'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_empresas_delete AFTER DELETE ON empresas
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'empresas'; END;
+
+-- usuarios
+CREATE TRIGGER IF NOT EXISTS trg_version_usuarios_insert AFTER INSERT ON usuarios
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'usuarios'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_usuarios_update AFTER UPDATE ON usuarios
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'usuarios'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_usuarios_delete AFTER DELETE ON usuarios
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'usuarios'; END;
+
+-- documentos_gestor
+CREATE TRIGGER IF NOT EXISTS trg_version_documentos_gestor_insert AFTER INSERT ON documentos_gestor
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'documentos_gestor'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_documentos_gestor_update AFTER UPDATE ON documentos_gestor
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'documentos_gestor'; END;
+CREATE TRIGGER IF NOT EXISTS trg_version_documentos_gestor_delete AFTER DELETE ON documentos_gestor
+BEGIN UPDATE versiones_datos SET version = version + 1, actualizado = datetime('now') WHERE tabla = 'documentos_gestor'; END;
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP TRIGGER IF EXISTS trg_version_empresas_insert;  (y los otros 8)
+-- DROP TABLE IF EXISTS versiones_datos;
+-- =====================================================================
@@ -0,0 +1,71 @@
+-- =====================================================================
+-- MIGRACIÓN: BÚSQUEDA DE TEXTO COMPLETO (FTS5) DE USUARIOS Y EMPRESAS
+-- Fecha: 2025-12-11
+-- Descripción: índices FTS5 de contenido externo sobre nombres, numeroId,
+--              NIT y correo, con tokenizador sin tildes y prefijos de 2-3
+--              caracteres para autocompletado. Triggers los mantienen
+--              sincronizados; 'rebuild' los llena con los datos actuales
+--              (en 1M de usuarios tarda unos segundos).
+--              También agrega el índice por numeroId para las búsquedas
+--              por cédula sin tipoId.
+-- Nota: la aplicación no crea estos índices; mientras este script no se
+--       aplique, las búsquedas y el autocompletado usan LIKE.
+-- =====================================================================
+
+CREATE INDEX IF NOT EXISTS idx_usuarios_numero_id
+    ON usuarios (numeroId);
+
+-- usuarios
+CREATE VIRTUAL TABLE IF NOT EXISTS usuarios_fts USING fts5(
+    primerNombre, segundoNombre, primerApellido, segundoApellido, numeroId, correoElectronico,
+    content='usuarios', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_insert AFTER INSERT ON usuarios
+BEGIN
+    INSERT INTO usuarios_fts (rowid, primerNombre, segundoNombre, primerApellido, segundoApellido, numeroId, correoElectronico) VALUES (new.id, new.primerNombre, new.segundoNombre, new.primerApellido, new.segundoApellido, new.numeroId, new.correoElectronico);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_delete AFTER DELETE ON usuarios
+BEGIN
+    INSERT INTO usuarios_fts (usuarios_fts, rowid, primerNombre, segundoNombre, primerApellido, segundoApellido, numeroId, correoElectronico) VALUES ('delete', old.id, old.primerNombre, old.segundoNombre, old.primerApellido, old.segundoApellido, old.numeroId, old.correoElectronico);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_usuarios_fts_update AFTER UPDATE OF id, primerNombre, segundoNombre, primerApellido, segundoApellido, numeroId, correoElectronico ON usuarios
+BEGIN
+    INSERT INTO usuarios_fts (usuarios_fts, rowid, primerNombre, segundoNombre, primerApellido, segundoApellido, numeroId, correoElectronico) VALUES ('delete', old.id, old.primerNombre, old.segundoNombre, old.primerApellido, old.segundoApellido, old.numeroId, old.correoElectronico);
+    INSERT INTO usuarios_fts (rowid, primerNombre, segundoNombre, primerApellido, segundoApellido, numeroId, correoElectronico) VALUES (new.id, new.primerNombre, new.segundoNombre, new.primerApellido, new.segundoApellido, new.numeroId, new.correoElectronico);
+END;
+INSERT INTO usuarios_fts (usuarios_fts) VALUES ('rebuild');
+
+-- empresas
+CREATE VIRTUAL TABLE IF NOT EXISTS empresas_fts USING fts5(
+    nombre_empresa, nit, correo_empresa,
+    content='empresas', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS trg_empresas_fts_insert AFTER INSERT ON empresas
+BEGIN
+    INSERT INTO empresas_fts (rowid, nombre_empresa, nit, correo_empresa) VALUES (new.id, new.nombre_empresa, new.nit, new.correo_empresa);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_empresas_fts_delete AFTER DELETE ON empresas
+BEGIN
+    INSERT INTO empresas_fts (empresas_fts, rowid, nombre_empresa, nit, correo_empresa) VALUES ('delete', old.id, old.nombre_empresa, old.nit, old.correo_empresa);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_empresas_fts_update AFTER UPDATE OF id, nombre_empresa, nit, correo_empresa ON empresas
+BEGIN
+    INSERT INTO empresas_fts (empresas_fts, rowid, nombre_empresa, nit, correo_empresa) VALUES ('delete', old.id, old.nombre_empresa, old.nit, old.correo_empresa);
+    INSERT INTO empresas_fts (rowid, nombre_empresa, nit, correo_empresa) VALUES (new.id, new.nombre_empresa, new.nit, new.correo_empresa);
+END;
+INSERT INTO empresas_fts (empresas_fts) VALUES ('rebuild');
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP TRIGGER IF EXISTS trg_usuarios_fts_insert;
+-- DROP TRIGGER IF EXISTS trg_usuarios_fts_delete;
+-- DROP TRIGGER IF EXISTS trg_usuarios_fts_update;
+-- DROP TABLE IF EXISTS usuarios_fts;
+-- DROP TRIGGER IF EXISTS trg_empresas_fts_insert;
+-- DROP TRIGGER IF EXISTS trg_empresas_fts_delete;
+-- DROP TRIGGER IF EXISTS trg_empresas_fts_update;
+-- DROP TABLE IF EXISTS empresas_fts;
+-- DROP INDEX IF EXISTS idx_usuarios_numero_id;
+-- =====================================================================
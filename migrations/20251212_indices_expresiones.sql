@@ -0,0 +1,36 @@
+-- =====================================================================
+-- MIGRACIÓN: ÍNDICES PARCIALES Y DE EXPRESIÓN PARA FILTROS DE ROL Y FECHA
+-- Fecha: 2025-12-12
+-- Descripción:
+--   - idx_usuarios_no_admin_nombre: índice parcial con la misma condición
+--     de roles que usan las consultas maestras de unificación
+--     (logic.consultas.sql_sin_administradores); el listado ordenado por
+--     nombre se lee en orden del índice, sin ordenar en memoria.
+--   - idx_usuarios_correo: login por correoElectronico sin recorrer la tabla.
+--   - idx_pagos_fecha: totales por rango de fecha_pago (cubriente con monto).
+--   - idx_pagos_mes: tendencia mensual agrupada por substr(fecha_pago, 1, 7).
+-- Nota: db.create_all() no agrega índices a tablas ya existentes. Las
+--       expresiones deben coincidir EXACTAMENTE con las de las consultas
+--       (tests/test_planes_consulta.py lo verifica).
+-- =====================================================================
+
+CREATE INDEX IF NOT EXISTS idx_usuarios_no_admin_nombre
+    ON usuarios (primerNombre, primerApellido)
+    WHERE lower(role) NOT IN ('admin', 'superadmin', 'administrador', 'super');
+
+CREATE INDEX IF NOT EXISTS idx_usuarios_correo
+    ON usuarios (correoElectronico);
+
+CREATE INDEX IF NOT EXISTS idx_pagos_fecha
+    ON pagos (fecha_pago, monto);
+
+CREATE INDEX IF NOT EXISTS idx_pagos_mes
+    ON pagos (substr(fecha_pago, 1, 7), monto);
+
+-- =====================================================================
+-- ROLLBACK (por si necesitas revertir):
+-- DROP INDEX IF EXISTS idx_usuarios_no_admin_nombre;
+-- DROP INDEX IF EXISTS idx_usuarios_correo;
+-- DROP INDEX IF EXISTS idx_pagos_fecha;
+-- DROP INDEX IF EXISTS idx_pagos_mes;
+-- =====================================================================
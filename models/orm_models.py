@@ -10,11 +10,12 @@ Fecha: 2025-11-26
 """
 
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Index, Numeric, DateTime
+from sqlalchemy import Column, Integer, String, Text, Float, ForeignKey, Index, Numeric, DateTime, text
 from sqlalchemy.orm import relationship
 
 # Importar db desde extensions para evitar instancias duplicadas
 from extensions import db
+from logic.consultas import sql_mes, sql_sin_administradores
 
 
 # =============================================================================
@@ -209,7 +210,12 @@ class Usuario(db.Model):
     __table_args__ = (
         Index('sqlite_autoindex_usuarios_1', 'tipoId', 'numeroId', unique=True),
         Index('idx_usuarios_empresa_nit', 'empresa_nit'),  # Búsqueda por empresa
+        Index('idx_usuarios_numero_id', 'numeroId'),  # Búsqueda por cédula sin tipoId (RPA, depuraciones)
         Index('idx_usuarios_nombre', 'primerNombre', 'primerApellido'),  # Búsqueda por nombre
+        Index('idx_usuarios_correo', 'correoElectronico'),  # Login por correo
+        # Listado maestro (sin administradores) ordenado por nombre, sin ordenar en memoria
+        Index('idx_usuarios_no_admin_nombre', 'primerNombre', 'primerApellido',
+              sqlite_where=text(sql_sin_administradores())),
         Index('idx_usuarios_created', 'created_at'),  # Ordenar por fecha
     )
 
@@ -465,6 +471,11 @@ class Pago(db.Model):
     referencia = Column(Text, nullable=True)
     created_at = Column(Text, nullable=True, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index('idx_pagos_fecha', 'fecha_pago', 'monto'),  # Totales por rango de fechas (cubriente)
+        Index('idx_pagos_mes', text(sql_mes('fecha_pago')), 'monto'),  # Tendencia mensual sin ordenar
+    )
+
     def __repr__(self):
         return f"<Pago {self.tipo_pago} - Usuario {self.usuario_id} - ${self.monto}>"
 
@@ -506,6 +517,7 @@ class PagoImpuesto(db.Model):
     __table_args__ = (
         Index('idx_impuestos_estado', 'estado'),
         Index('idx_impuestos_empresa_nit', 'empresa_nit'),
+        Index('idx_impuestos_empresa_fecha', 'empresa_nit', 'fecha_limite'),  # Balance anual por rango
     )
 
     def __repr__(self):
@@ -692,6 +704,12 @@ class Novedad(db.Model):
     assignedTo = Column(Text, nullable=True)
     history = Column(JSONEncodedDict, nullable=True)
 
+    # Clave de deduplicación de novedades automáticas: (tipo de origen, id de
+    # origen, día). Nulas en las novedades manuales (NULL no choca en el índice).
+    origen_tipo = Column(Text, nullable=True)
+    origen_id = Column(Text, nullable=True)
+    origen_dia = Column(Text, nullable=True)
+
     def __repr__(self):
         return f"<Novedad {self.subject} - Cliente: {self.client}>"
 
@@ -739,7 +757,9 @@ class Novedad(db.Model):
         Index('idx_novedades_status', 'status'),           # Filtrar por estado
         Index('idx_novedades_priority', 'priority'),       # Ordenar por prioridad
         Index('idx_novedades_creation', 'creationDate'),   # Ordenar por fecha
+        Index('idx_novedades_update', 'updateDate'),       # Paginación keyset (updateDate, id)
         Index('idx_novedades_assigned', 'assignedTo'),     # Filtrar por asignado
+        Index('uq_novedades_origen', 'origen_tipo', 'origen_id', 'origen_dia', unique=True),  # INSERT OR IGNORE
     )
 
 
@@ -900,6 +920,14 @@ class DeudaCartera(db.Model):
     # Relaciones
     empresa = relationship('Empresa', backref='deudas_cartera')
 
+    __table_args__ = (
+        # Una deuda abierta por (usuario, empresa, entidad, periodo de vencimiento):
+        # clave del upsert de la carga masiva
+        Index('uq_deudas_cartera_abierta', 'usuario_id', 'empresa_nit', 'entidad',
+              text("COALESCE(fecha_vencimiento, '')"),
+              unique=True, sqlite_where=text("estado != 'Pagado'")),
+    )
+
     def __repr__(self):
         return f"<DeudaCartera {self.entidad} - Usuario {self.usuario_id} - ${self.monto}>"
 
@@ -922,6 +950,34 @@ class DeudaCartera(db.Model):
         }
 
 
+class RecalculoMoraCartera(db.Model):
+    """
+    Modelo ORM para la tabla 'recalculos_mora_cartera'
+    Bitácora del recálculo nocturno de dias_mora/estado (logic/mora_cartera.py)
+    """
+    __tablename__ = 'recalculos_mora_cartera'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    fecha_corte = Column(Text, nullable=False)  # YYYY-MM-DD usada como "hoy"
+    ejecutado_en = Column(Text, nullable=False)
+    filas_actualizadas = Column(Integer, nullable=False, default=0)
+    bloques = Column(Integer, nullable=False, default=0)
+    duracion_ms = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<RecalculoMoraCartera {self.fecha_corte} - {self.filas_actualizadas} filas>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'fecha_corte': self.fecha_corte,
+            'ejecutado_en': self.ejecutado_en,
+            'filas_actualizadas': self.filas_actualizadas,
+            'bloques': self.bloques,
+            'duracion_ms': self.duracion_ms
+        }
+
+
 # =============================================================================
 # MÓDULO: EGRESOS (CAJA MENOR)
 # =============================================================================
@@ -1035,6 +1091,7 @@ class Prospecto(db.Model):
     __table_args__ = (
         Index('idx_prospectos_estado', 'estado'),
         Index('idx_prospectos_origen', 'origen'),
+        Index('idx_prospectos_fecha_registro', 'fecha_registro'),  # Nuevos del día por rango
     )
 
     def __repr__(self):
@@ -12,11 +12,12 @@ Este archivo contiene TODOS los modelos de validación:
 """
 
 import re
-from datetime import date
+from datetime import date, datetime
+from decimal import Decimal
 from typing import Optional
 
 # Se añade ConfigDict para la sintaxis moderna de Pydantic V2
-from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator, model_validator
 
 # --- Funciones de Validación Personalizadas (de tu archivo original) ---
 
@@ -192,4 +193,68 @@ class EmpresaUpdate(BaseModel):
     _validate_telefono_opcional = field_validator("telefono", mode="before")(validar_telefono)
 
 
+# --- Modelos de Cartera ---
+
+ENTIDADES_CARTERA = ("EPS", "ARL", "AFP", "CCF", "ICBF", "SENA")
+
+
+def _a_texto(v):
+    """Celdas numéricas de Excel (1234567890.0) -> '1234567890'."""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    if isinstance(v, int):
+        return str(v)
+    return v
+
+
+class DeudaCarteraCarga(BaseModel):
+    """Fila de la carga masiva de deudas de cartera (CSV, XLSX o JSON)."""
+
+    model_config = ConfigDict(str_strip_whitespace=True)
+
+    usuario_id: str = Field(..., min_length=1, max_length=20)
+    empresa_nit: Optional[str] = None
+    entidad: str
+    monto: Decimal = Field(..., gt=0, max_digits=15, decimal_places=2)
+    dias_mora: int = Field(0, ge=0)
+    fecha_vencimiento: Optional[date] = None
+    nombre_usuario: Optional[str] = None
+    nombre_empresa: Optional[str] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _vacios_a_defecto(cls, datos):
+        # En CSV las celdas vacías llegan como '' y deben tomar el valor por defecto
+        if isinstance(datos, dict):
+            return {k: v for k, v in datos.items() if v is not None and v != ""}
+        return datos
+
+    @field_validator("usuario_id", mode="before")
+    @classmethod
+    def _usuario_texto(cls, v):
+        return _a_texto(v)
+
+    @field_validator("empresa_nit", mode="before")
+    @classmethod
+    def _nit_texto(cls, v):
+        return validar_nit(_a_texto(v))
+
+    @field_validator("entidad", mode="before")
+    @classmethod
+    def _entidad_valida(cls, v):
+        entidad = str(v).strip().upper()
+        if entidad not in ENTIDADES_CARTERA:
+            raise ValueError(f"Entidad inválida. Use: {', '.join(ENTIDADES_CARTERA)}")
+        return entidad
+
+    @field_validator("fecha_vencimiento", mode="before")
+    @classmethod
+    def _fecha_flexible(cls, v):
+        if isinstance(v, datetime):
+            return v.date()
+        if isinstance(v, str) and "/" in v:
+            return datetime.strptime(v.strip(), "%d/%m/%Y").date()
+        return v
+
+
 # (Aquí puedes añadir los otros 8 modelos (Incapacidad, Pagos, etc.) cuando los necesites)
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+perfil_sql.py - Perfilado de sentencias SQL (sqlite3 directo y SQLAlchemy)
+=========================================================================
+
+Registra cada sentencia ejecutada con:
+
+    sentencia normalizada (literales y listas IN -> ?), duración, filas,
+    endpoint que la ejecutó y origen ('sqlite3' | 'orm')
+
+en un buffer circular en memoria (PerfilSQL) que se agrega al leerlo:
+top-N por tiempo total en GET /api/admin/perfil-sql.
+
+Dos puntos de enganche:
+
+1. sqlite3: get_db_connection() abre la conexión con
+   factory=ConexionPerfilada; sus cursores miden execute() y los fetch*
+   / iteración posteriores (en SQLite el trabajo de un SELECT ocurre al
+   recorrer las filas, no solo en execute()).
+2. SQLAlchemy: eventos before/after_cursor_execute del engine. Para los
+   SELECT del ORM el DB-API no informa filas (rowcount = -1).
+
+Si la duración supera SQL_PROFILING_EXPLAIN_MS se guarda una vez el
+EXPLAIN QUERY PLAN de la sentencia y se registra en el log.
+
+Desactivado por defecto (SQL_PROFILING=false): sin perfil no se usa la
+fábrica de conexiones ni se registran eventos, no hay costo.
+"""
+
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from logger import logger
+
+MAX_PLANES = 200
+SENTENCIAS_EXPLICABLES = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT", "REPLACE")
+
+_RE_TEXTO = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def normalizar_sql(sql):
+    """Sentencia sin literales ni espacios repetidos: agrupa las que solo cambian en valores."""
+    sql = _RE_TEXTO.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_ESPACIOS.sub(" ", sql).strip()
+    return _RE_LISTA.sub("(?...)", sql)
+
+
+def _endpoint_actual():
+    if has_request_context():
+        return request.endpoint or request.path
+    return threading.current_thread().name
+
+
+class PerfilSQL:
+    """Buffer circular de ejecuciones SQL más los planes de las sentencias lentas."""
+
+    def __init__(self, capacidad=5000, umbral_explain_ms=0):
+        self.capacidad = capacidad
+        self.umbral_explain_ms = umbral_explain_ms
+        self._muestras = deque(maxlen=capacidad)
+        self._planes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def registrar(self, sql, origen):
+        """
+        Agrega una ejecución y la retorna. Es una lista mutable
+        [sentencia, ms, filas, endpoint, origen] para que los fetch
+        posteriores sumen duración y filas sobre la misma muestra.
+        """
+        muestra = [normalizar_sql(sql), 0.0, 0, _endpoint_actual(), origen]
+        with self._lock:
+            self._muestras.append(muestra)
+        return muestra
+
+    def requiere_plan(self, muestra):
+        return (
+            self.umbral_explain_ms
+            and muestra[1] >= self.umbral_explain_ms
+            and muestra[0] not in self._planes
+            and muestra[0].lstrip("( ").upper().startswith(SENTENCIAS_EXPLICABLES)
+        )
+
+    def guardar_plan(self, muestra, ejecutar_explain):
+        """Guarda el EXPLAIN QUERY PLAN de una sentencia lenta (una vez por sentencia)."""
+        try:
+            plan = [fila[3] for fila in ejecutar_explain()]
+        except Exception as e:  # El EXPLAIN nunca debe romper la consulta original
+            plan = [f"(sin plan: {e})"]
+        with self._lock:
+            self._planes[muestra[0]] = plan
+            while len(self._planes) > MAX_PLANES:
+                self._planes.popitem(last=False)
+        logger.warning(f"🐢 SQL lenta {muestra[1]:.1f} ms en {muestra[3]}: {muestra[0][:300]} | plan: {plan}")
+
+    def limpiar(self):
+        with self._lock:
+            self._muestras.clear()
+            self._planes.clear()
+
+    def top(self, n=20, orden="total_ms"):
+        """Sentencias agregadas, ordenadas por total_ms | promedio_ms | max_ms | llamadas."""
+        with self._lock:
+            muestras = list(self._muestras)
+            planes = dict(self._planes)
+
+        agregados = {}
+        for sentencia, ms, filas, endpoint, origen in muestras:
+            item = agregados.get(sentencia)
+            if item is None:
+                item = agregados[sentencia] = {
+                    "sentencia": sentencia, "origen": origen, "llamadas": 0, "total_ms": 0.0,
+                    "max_ms": 0.0, "filas": 0, "endpoints": Counter(),
+                }
+            item["llamadas"] += 1
+            item["total_ms"] += ms
+            item["max_ms"] = max(item["max_ms"], ms)
+            item["filas"] += filas
+            item["endpoints"][endpoint] += 1
+
+        for item in agregados.values():
+            item["promedio_ms"] = round(item["total_ms"] / item["llamadas"], 3)
+            item["total_ms"] = round(item["total_ms"], 3)
+            item["max_ms"] = round(item["max_ms"], 3)
+            item["endpoints"] = dict(item["endpoints"].most_common(5))
+            item["plan"] = planes.get(item["sentencia"])
+
+        return sorted(agregados.values(), key=lambda item: item[orden], reverse=True)[:n]
+
+    def resumen(self):
+        with self._lock:
+            return {"muestras": len(self._muestras), "capacidad": self.capacidad,
+                    "umbral_explain_ms": self.umbral_explain_ms}
+
+
+# ==================== sqlite3 ====================
+
+
+class CursorPerfilado(sqlite3.Cursor):
+    """Cursor que mide execute() y el recorrido de sus filas."""
+
+    perfil = None
+    _muestra = None
+
+    def _medir(self, muestra, inicio, filas=0):
+        muestra[1] += (time.perf_counter() - inicio) * 1000
+        muestra[2] += filas
+        if self.perfil.requiere_plan(muestra):
+            sql, parametros = self._ultima
+            self.perfil.guardar_plan(
+                muestra,
+                lambda: sqlite3.Cursor(self.connection).execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall(),
+            )
+
+    def execute(self, sql, parametros=()):
+        self._muestra = muestra = self.perfil.registrar(sql, "sqlite3")
+        self._ultima = (sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._medir(muestra, inicio, max(self.rowcount, 0))
+
+    def executemany(self, sql, secuencia):
+        self._muestra = muestra = self.perfil.registrar(sql, "sqlite3")
+        self._ultima = (sql, ())
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, secuencia)
+        finally:
+            muestra[1] += (time.perf_counter() - inicio) * 1000
+            muestra[2] += max(self.rowcount, 0)
+
+    def executescript(self, script):
+        self._muestra = muestra = self.perfil.registrar(script, "sqlite3")
+        inicio = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            muestra[1] += (time.perf_counter() - inicio) * 1000
+
+    def fetchone(self):
+        inicio = time.perf_counter()
+        fila = super().fetchone()
+        if self._muestra is not None:
+            self._medir(self._muestra, inicio, 1 if fila is not None else 0)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        filas = super().fetchmany(*args, **kwargs)
+        if self._muestra is not None:
+            self._medir(self._muestra, inicio, len(filas))
+        return filas
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        filas = super().fetchall()
+        if self._muestra is not None:
+            self._medir(self._muestra, inicio, len(filas))
+        return filas
+
+    def __next__(self):
+        inicio = time.perf_counter()
+        try:
+            fila = super().__next__()
+        except StopIteration:
+            if self._muestra is not None:
+                self._medir(self._muestra, inicio)
+            raise
+        if self._muestra is not None:
+            self._medir(self._muestra, inicio, 1)
+        return fila
+
+
+class ConexionPerfilada(sqlite3.Connection):
+    """
+    Conexión sqlite3 cuyos cursores (incluidos los de conn.execute) se
+    perfilan. Se usa como factory= de sqlite3.connect vía conectar().
+    """
+
+    perfil = None
+
+    def cursor(self, factory=None):
+        cursor = super().cursor(factory or CursorPerfilado)
+        cursor.perfil = self.perfil
+        return cursor
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, secuencia):
+        return self.cursor().executemany(sql, secuencia)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def conectar(ruta, perfil=None, **kwargs):
+    """sqlite3.connect() perfilado si hay `perfil`, normal si es None."""
+    if perfil is None:
+        return sqlite3.connect(ruta, **kwargs)
+    conn = sqlite3.connect(ruta, factory=ConexionPerfilada, **kwargs)
+    conn.perfil = perfil
+    return conn
+
+
+# ==================== SQLAlchemy ====================
+
+
+def _instalar_eventos(engine, perfil):
+    # El inicio va en el contexto de ejecución y no en conn.info: si la
+    # sentencia falla no hay after_cursor_execute y el contexto se descarta
+    @event.listens_for(engine, "before_cursor_execute")
+    def antes(conn, cursor, sentencia, parametros, contexto, executemany):
+        if contexto is not None:
+            contexto._perfil_inicio = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def despues(conn, cursor, sentencia, parametros, contexto, executemany):
+        inicio = getattr(contexto, "_perfil_inicio", None)
+        if inicio is None:
+            return
+        muestra = perfil.registrar(sentencia, "orm")
+        muestra[1] = (time.perf_counter() - inicio) * 1000
+        muestra[2] = max(cursor.rowcount, 0)
+        if not executemany and perfil.requiere_plan(muestra):
+            perfil.guardar_plan(
+                muestra,
+                lambda: cursor.connection.execute(f"EXPLAIN QUERY PLAN {sentencia}", parametros).fetchall(),
+            )
+
+
+def instalar_perfil_sql(app, engine):
+    """
+    Activa el perfilado si SQL_PROFILING está habilitado: guarda el
+    PerfilSQL en app.extensions['perfil_sql'] y registra los eventos del
+    engine. Retorna el perfil o None.
+    """
+    if not app.config.get("SQL_PROFILING"):
+        return None
+    perfil = PerfilSQL(
+        capacidad=int(app.config.get("SQL_PROFILING_BUFFER", 5000)),
+        umbral_explain_ms=float(app.config.get("SQL_PROFILING_EXPLAIN_MS") or 0),
+    )
+    app.extensions["perfil_sql"] = perfil
+    _instalar_eventos(engine, perfil)
+    logger.info(f"⏱️ Perfilado SQL activo (buffer {perfil.capacidad}, EXPLAIN desde {perfil.umbral_explain_ms} ms)")
+    return perfil
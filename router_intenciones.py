@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Router de Intenciones Precompilado - Sistema Montero
+====================================================
+Clasifica mensajes del chat en intenciones con UNA sola pasada de regex:
+
+    - El vocabulario (intención -> palabras clave) se compila una vez en un
+      patrón combinado con un grupo nombrado por intención.
+    - El mensaje se normaliza (minúsculas, sin tildes ni signos) y se recorre
+      con finditer: costo O(largo del mensaje), sin importar cuántas
+      palabras clave existan.
+    - Las reglas (conjunto de intenciones requeridas -> manejador) se evalúan
+      en orden de prioridad; gana la primera cuyo conjunto esté contenido en
+      las intenciones detectadas.
+
+Palabras clave:
+    "hola"        palabra completa
+    "usuario*"    prefijo ("usuario", "usuarios", ...)
+    "buenos dias" frases de varias palabras
+"""
+
+import re
+
+from cache_respuestas import normalizar_pregunta
+
+
+def _alternativa(palabra):
+    base = re.escape(normalizar_pregunta(palabra.rstrip("*")))
+    return base + (r"\w*" if palabra.endswith("*") else r"\b")
+
+
+def compilar_vocabulario(vocabulario):
+    """
+    Compila {intencion: [palabras]} en (patrón, {grupo: intencion}).
+
+    Las palabras más largas van primero dentro de cada grupo para que una
+    frase ("buenos dias") no quede tapada por un prefijo más corto.
+    """
+    grupos, nombres = [], {}
+    for i, (intencion, palabras) in enumerate(vocabulario.items()):
+        if not palabras:
+            continue
+        grupo = f"i{i}"
+        nombres[grupo] = intencion
+        alternativas = sorted({_alternativa(p) for p in palabras}, key=len, reverse=True)
+        grupos.append(f"(?P<{grupo}>{'|'.join(alternativas)})")
+    patron = re.compile(r"\b(?:" + "|".join(grupos) + ")") if grupos else None
+    return patron, nombres
+
+
+class RouterIntenciones:
+    """Detecta intenciones y elige el manejador de la primera regla que aplica."""
+
+    def __init__(self, vocabulario, reglas=(), por_defecto=None):
+        """
+        Args:
+            vocabulario: dict intencion -> lista de palabras clave
+            reglas: secuencia de (intenciones_requeridas, manejador) en orden de prioridad
+            por_defecto: manejador cuando ninguna regla aplica
+        """
+        self._patron, self._nombres = compilar_vocabulario(vocabulario)
+        self._reglas = [(frozenset(requeridas), manejador) for requeridas, manejador in reglas]
+        self.por_defecto = por_defecto
+
+    def detectar(self, mensaje):
+        """Conjunto de intenciones presentes en el mensaje."""
+        if self._patron is None:
+            return frozenset()
+        texto = normalizar_pregunta(mensaje)
+        return frozenset(self._nombres[m.lastgroup] for m in self._patron.finditer(texto))
+
+    def enrutar(self, mensaje):
+        """Devuelve (manejador, intenciones) para el mensaje."""
+        intenciones = self.detectar(mensaje)
+        for requeridas, manejador in self._reglas:
+            if requeridas <= intenciones:
+                return manejador, intenciones
+        return self.por_defecto, intenciones
@@ -7,8 +7,8 @@ Gestión de documentos centralizados y registro de auditoría del sistema
 import os
 import sqlite3
 import traceback
+import uuid
 import hashlib
-import mimetypes
 from datetime import datetime
 from werkzeug.utils import secure_filename
 
@@ -29,10 +29,14 @@ from logger import logger
 #from extensions import db, mail
 try:
     from ..models.orm_models import Usuario, Empresa, Pago, Incapacidad, Tutela, Cotizacion
-    from ..utils import get_db_connection, login_required, USER_DATA_FOLDER
+    from ..utils import get_db_connection, login_required, USER_DATA_FOLDER, ALLOWED_ALL_MIMES
+    from ..blob_store import ArchivoDemasiadoGrande, TipoArchivoNoPermitido, guardar_y_vincular, limpiar_blobs_huerfanos, reporte_deduplicacion
+    from ..cache_http import respuesta_condicional
 except (ImportError, ValueError):
     from models.orm_models import Usuario, Empresa, Pago, Incapacidad, Tutela, Cotizacion
-    from utils import get_db_connection, login_required, USER_DATA_FOLDER
+    from utils import get_db_connection, login_required, USER_DATA_FOLDER, ALLOWED_ALL_MIMES
+    from blob_store import ArchivoDemasiadoGrande, TipoArchivoNoPermitido, guardar_y_vincular, limpiar_blobs_huerfanos, reporte_deduplicacion
+    from cache_http import respuesta_condicional
 # -------------------------------
 
 
@@ -42,6 +46,8 @@ except (ImportError, ValueError):
 
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB (legacy, usar app.config['MAX_CONTENT_LENGTH'])
 
+ORDENES_PERFIL_SQL = ("total_ms", "promedio_ms", "max_ms", "llamadas")
+
 
 def allowed_file(filename):
     """Verifica si la extensión del archivo está permitida"""
@@ -155,6 +161,7 @@ def auditoria():
 
 @admin_bp.route("/api/archivos", methods=["GET"])
 @login_required
+@respuesta_condicional("documentos_gestor")
 def get_archivos():
     """Obtiene la lista de archivos del gestor"""
     conn = None
@@ -224,11 +231,21 @@ def subir_archivo():
                 400,
             )
 
-        # Leer contenido del archivo
-        file_content = file.read()
-
-        # Validar tamaño
-        if len(file_content) > MAX_FILE_SIZE:
+        # Guardar en el almacén de blobs y vincular en la carpeta del gestor
+        # (usando configuración centralizada): MIME por firma del primer
+        # bloque, tamaño y hash calculados bloque a bloque. Si la carpeta está
+        # en otro volumen que el almacén se escribe una sola copia, directo.
+        # El nombre final lleva el hash, así que primero se usa uno temporal.
+        extension = file.filename.rsplit(".", 1)[1].lower()
+        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'docs')
+        ruta_temporal = os.path.join(upload_folder, f".subida_{uuid.uuid4().hex}.{extension}")
+        try:
+            blob = guardar_y_vincular(
+                file, ruta_temporal, max_bytes=MAX_FILE_SIZE, mimes_permitidos=ALLOWED_ALL_MIMES
+            )
+        except TipoArchivoNoPermitido as e:
+            return jsonify({"error": f"{e}. El archivo puede estar corrupto o ser malicioso."}), 400
+        except ArchivoDemasiadoGrande:
             return (
                 jsonify(
                     {
@@ -239,20 +256,14 @@ def subir_archivo():
             )
 
         # Generar nombre interno (hash + timestamp para evitar colisiones)
-        file_hash = get_file_hash(file_content)
+        file_hash = blob["sha256"]
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        extension = file.filename.rsplit(".", 1)[1].lower()
         nombre_interno = f"{file_hash[:16]}_{timestamp}.{extension}"
-
-        # Guardar archivo en disco (usando configuración centralizada)
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'docs')
-        os.makedirs(upload_folder, exist_ok=True)  # Asegurar que existe la carpeta
         filepath = os.path.join(upload_folder, nombre_interno)
-        with open(filepath, "wb") as f:
-            f.write(file_content)
+        os.replace(ruta_temporal, filepath)
 
-        # Obtener tipo MIME
-        tipo_mime = mimetypes.guess_type(file.filename)[0] or "application/octet-stream"
+        # Tipo MIME detectado en el contenido
+        tipo_mime = blob["mime"]
 
         # Guardar registro en base de datos
         conn = get_db_connection()
@@ -264,8 +275,9 @@ def subir_archivo():
             """
             INSERT INTO documentos_gestor (
                 nombre_archivo, nombre_interno, ruta, categoria,
-                tipo_mime, tamano_bytes, subido_por, subido_por_nombre, descripcion
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                tipo_mime, tamano_bytes, subido_por, subido_por_nombre, descripcion,
+                sha256
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
             (
                 secure_filename(file.filename),
@@ -273,10 +285,11 @@ def subir_archivo():
                 filepath,
                 categoria,
                 tipo_mime,
-                len(file_content),
+                blob["tamano"],
                 user_id,
                 user_name,
                 descripcion,
+                file_hash,
             ),
         )
         conn.commit()
@@ -289,7 +302,8 @@ def subir_archivo():
         # Registrar en auditoría
         registrar_log(
             "Subir Archivo",
-            f"Archivo: {file.filename}, Categoría: {categoria}, Tamaño: {len(file_content)} bytes",
+            f"Archivo: {file.filename}, Categoría: {categoria}, Tamaño: {blob['tamano']} bytes"
+            + ("" if blob["nuevo"] else " (deduplicado)"),
             resultado="exito",
         )
 
@@ -348,7 +362,7 @@ def eliminar_archivo(archivo_id):
         if not archivo:
             return jsonify({"error": "Archivo no encontrado."}), 404
 
-        # Eliminar archivo físico del disco
+        # Eliminar el enlace del disco (el blob sigue vivo si otra ruta lo referencia)
         try:
             if os.path.exists(archivo["ruta"]):
                 os.remove(archivo["ruta"])
@@ -438,6 +452,69 @@ def descargar_archivo(archivo_id):
             conn.close()
 
 
+@admin_bp.route("/api/archivos/deduplicacion", methods=["GET"])
+@login_required
+def reporte_deduplicacion_archivos():
+    """
+    Reporte del almacén de blobs: bytes físicos vs lógicos y ahorro por
+    deduplicación (cédulas, RUTs y demás adjuntos repetidos). Solo Admin.
+
+    Query params:
+        limpiar=1: elimina antes los blobs sin ninguna ruta vinculada
+    """
+    if session.get("role") != "admin":
+        return jsonify({"error": "No tienes permisos para ver este reporte."}), 403
+
+    try:
+        liberados = 0
+        if request.args.get("limpiar") == "1":
+            liberados = limpiar_blobs_huerfanos()
+            registrar_log("Limpiar Blobs Huérfanos", f"Bytes liberados: {liberados}")
+
+        reporte = reporte_deduplicacion()
+        reporte["bytes_liberados"] = liberados
+        reporte["porcentaje_ahorro"] = (
+            round(reporte["bytes_ahorrados"] * 100 / reporte["bytes_logicos"], 2)
+            if reporte["bytes_logicos"]
+            else 0.0
+        )
+        return jsonify(reporte), 200
+
+    except Exception as e:
+        logger.error(f"Error generando reporte de deduplicación: {e}", exc_info=True)
+        return jsonify({"error": "No se pudo generar el reporte de deduplicación."}), 500
+
+
+@admin_bp.route("/api/admin/perfil-sql", methods=["GET"])
+@login_required
+def perfil_sql_top():
+    """
+    Sentencias SQL con más tiempo acumulado en el buffer del perfilador
+    (SQL_PROFILING=true). Solo Admin.
+
+    Query params:
+        top: cantidad de sentencias (default 20, max 200)
+        orden: total_ms | promedio_ms | max_ms | llamadas (default total_ms)
+        limpiar=1: vacía el buffer después de leerlo
+    """
+    if session.get("role") != "admin":
+        return jsonify({"error": "No tienes permisos para ver el perfil SQL."}), 403
+
+    perfil = current_app.extensions.get("perfil_sql")
+    if perfil is None:
+        return jsonify({"activo": False, "sentencias": []}), 200
+
+    orden = request.args.get("orden", "total_ms")
+    if orden not in ORDENES_PERFIL_SQL:
+        return jsonify({"error": f"orden debe ser uno de: {', '.join(ORDENES_PERFIL_SQL)}"}), 400
+    top = max(1, min(request.args.get("top", 20, type=int), 200))
+
+    respuesta = {"activo": True, **perfil.resumen(), "sentencias": perfil.top(top, orden)}
+    if request.args.get("limpiar") == "1":
+        perfil.limpiar()
+    return jsonify(respuesta), 200
+
+
 # ==================== RUTAS API: AUDITORÍA ====================
 
 
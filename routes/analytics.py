@@ -6,11 +6,35 @@ Blueprint de Analytics para métricas del dashboard
 from flask import Blueprint, jsonify, g
 from datetime import datetime, timedelta
 from utils import get_db_connection, login_required
+from logic.consultas import sql_mes
 import sqlite3
 
 # Crear Blueprint
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/metrics')
 
+# Tendencias mensuales: filtro y agrupación sobre la misma expresión 'YYYY-MM'
+# para recorrer el índice de expresión en orden (idx_pagos_mes) sin ordenar en memoria
+SQL_TENDENCIA_PAGOS = f"""
+    SELECT
+        {sql_mes('fecha_pago')} as mes,
+        COUNT(*) as cantidad,
+        COALESCE(SUM(monto), 0) as monto_total
+    FROM pagos
+    WHERE {sql_mes('fecha_pago')} >= ?
+    GROUP BY {sql_mes('fecha_pago')}
+    ORDER BY mes ASC
+"""
+
+SQL_TENDENCIA_USUARIOS = f"""
+    SELECT
+        {sql_mes('created_at')} as mes,
+        COUNT(*) as nuevos_usuarios
+    FROM usuarios
+    WHERE created_at >= ?
+    GROUP BY {sql_mes('created_at')}
+    ORDER BY mes ASC
+"""
+
 
 @analytics_bp.route('/overview', methods=['GET'])
 @login_required
@@ -87,16 +111,7 @@ def get_pagos_trend():
         fecha_inicio = (datetime.now() - timedelta(days=180)).replace(day=1).strftime('%Y-%m-%d')
 
         # Query para obtener tendencia de pagos por mes
-        cursor.execute("""
-            SELECT
-                strftime('%Y-%m', fecha_pago) as mes,
-                COUNT(*) as cantidad,
-                COALESCE(SUM(monto), 0) as monto_total
-            FROM pagos
-            WHERE fecha_pago >= ?
-            GROUP BY strftime('%Y-%m', fecha_pago)
-            ORDER BY mes ASC
-        """, (fecha_inicio,))
+        cursor.execute(SQL_TENDENCIA_PAGOS, (fecha_inicio[:7],))
 
         resultados = cursor.fetchall()
         conn.close()
@@ -142,17 +157,8 @@ def get_usuarios_trend():
         # Calcular fecha de hace 6 meses
         fecha_inicio = (datetime.now() - timedelta(days=180)).replace(day=1).strftime('%Y-%m-%d')
 
-        # Query para obtener nuevos usuarios por mes
-        # Asumiendo que existe campo 'fecha_creacion' en tabla usuarios
-        cursor.execute("""
-            SELECT
-                strftime('%Y-%m', fecha_creacion) as mes,
-                COUNT(*) as nuevos_usuarios
-            FROM usuarios
-            WHERE fecha_creacion >= ?
-            GROUP BY strftime('%Y-%m', fecha_creacion)
-            ORDER BY mes ASC
-        """, (fecha_inicio,))
+        # Query para obtener nuevos usuarios por mes (rango sobre idx_usuarios_created)
+        cursor.execute(SQL_TENDENCIA_USUARIOS, (fecha_inicio,))
 
         resultados = cursor.fetchall()
 
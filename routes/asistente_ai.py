@@ -7,7 +7,7 @@ Versión 2.0: Integrado con Google Gemini AI
 Fallback a respuestas basadas en palabras clave si la API falla
 """
 
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 from logger import logger
 from datetime import datetime
 from functools import wraps
@@ -35,11 +35,23 @@ except ImportError:
 
 # --- IMPORTACIÓN CENTRALIZADA ---
 try:
+    from ..cache_respuestas import CacheRespuestas, normalizar_pregunta
+    from ..router_intenciones import RouterIntenciones
     from ..utils import get_db_connection, login_required
 except (ImportError, ValueError):
+    from cache_respuestas import CacheRespuestas, normalizar_pregunta
+    from router_intenciones import RouterIntenciones
     from utils import get_db_connection, login_required
 # -------------------------------
 
+# ==================== CACHÉ DE RESPUESTAS DEL CHAT ====================
+# Preguntas idénticas (normalizadas) sobre los mismos datos reutilizan la
+# respuesta de Gemini hasta que vence el TTL o cambia la BD.
+JORDY_CACHE_TTL = int(os.getenv("JORDY_CACHE_TTL", "300"))
+cache_chat = CacheRespuestas(ttl_segundos=JORDY_CACHE_TTL, max_entradas=500)
+
+_schema_cache = {}
+
 # ==================== DEFINICIÓN DEL BLUEPRINT ====================
 asistente_bp = Blueprint("asistente", __name__, url_prefix="/api/asistente")
 
@@ -60,6 +72,47 @@ def require_auth(f):
 
 
 # ==================== FUNCIÓN: OBTENER ESQUEMA DE BD ====================
+def _leer_schema(conn) -> str:
+    """Resumen del esquema, reutilizado mientras no cambie PRAGMA schema_version."""
+    cursor = conn.cursor()
+
+    # El esquema solo cambia con DDL: se reutiliza mientras schema_version no cambie
+    clave_schema = (current_app.config.get("DATABASE_PATH"), cursor.execute("PRAGMA schema_version").fetchone()[0])
+    if clave_schema in _schema_cache:
+        return _schema_cache[clave_schema]
+
+    # Obtener lista de tablas
+    cursor.execute("""
+        SELECT name FROM sqlite_master
+        WHERE type='table' AND name NOT LIKE 'sqlite_%'
+        ORDER BY name
+    """)
+    tablas = cursor.fetchall()
+
+    schema_parts = ["=== ESQUEMA DE BASE DE DATOS ===\n"]
+
+    for (tabla_name,) in tablas:
+        # Obtener información de columnas para cada tabla
+        cursor.execute(f"PRAGMA table_info({tabla_name})")
+        columnas = cursor.fetchall()
+
+        # Filtrar solo columnas clave (primeras 8 o las más importantes)
+        columnas_clave = []
+        for col in columnas[:8]:  # Limitar a 8 columnas por tabla
+            col_id, col_name, col_type, not_null, default_val, pk = col
+            pk_marker = " (PK)" if pk else ""
+            columnas_clave.append(f"{col_name} {col_type}{pk_marker}")
+
+        schema_parts.append(f"\nTabla: {tabla_name}")
+        schema_parts.append(f"Columnas: {', '.join(columnas_clave)}")
+
+    schema_str = "\n".join(schema_parts)
+    _schema_cache.clear()
+    _schema_cache[clave_schema] = schema_str
+    logger.info("📊 Esquema de base de datos generado exitosamente")
+    return schema_str
+
+
 def get_schema_str() -> str:
     """
     Inspecciona la base de datos y retorna un resumen del esquema.
@@ -69,37 +122,10 @@ def get_schema_str() -> str:
     """
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Obtener lista de tablas
-        cursor.execute("""
-            SELECT name FROM sqlite_master
-            WHERE type='table' AND name NOT LIKE 'sqlite_%'
-            ORDER BY name
-        """)
-        tablas = cursor.fetchall()
-
-        schema_parts = ["=== ESQUEMA DE BASE DE DATOS ===\n"]
-
-        for (tabla_name,) in tablas:
-            # Obtener información de columnas para cada tabla
-            cursor.execute(f"PRAGMA table_info({tabla_name})")
-            columnas = cursor.fetchall()
-
-            # Filtrar solo columnas clave (primeras 8 o las más importantes)
-            columnas_clave = []
-            for col in columnas[:8]:  # Limitar a 8 columnas por tabla
-                col_id, col_name, col_type, not_null, default_val, pk = col
-                pk_marker = " (PK)" if pk else ""
-                columnas_clave.append(f"{col_name} {col_type}{pk_marker}")
-
-            schema_parts.append(f"\nTabla: {tabla_name}")
-            schema_parts.append(f"Columnas: {', '.join(columnas_clave)}")
-
-        conn.close()
-
-        schema_str = "\n".join(schema_parts)
-        logger.info("📊 Esquema de base de datos generado exitosamente")
+        try:
+            schema_str = _leer_schema(conn)
+        finally:
+            conn.close()
         return schema_str
 
     except Exception as e:
@@ -185,6 +211,52 @@ def ejecutar_sql_seguro(sql_query: str) -> dict:
         }
 
 
+# ==================== FUNCIÓN: MODELO Y VERSIÓN DE DATOS ====================
+def _crear_modelo():
+    """Modelo Gemini usado por el chat (punto único para sustituirlo en pruebas)."""
+    return genai.GenerativeModel('gemini-flash-latest')
+
+
+def version_datos() -> str:
+    """
+    Sello barato de la versión de los datos: mtime y tamaño del archivo de
+    la BD y de su WAL. Cualquier escritura lo cambia, sin consultar tablas.
+    """
+    db_path = current_app.config.get("DATABASE_PATH") or ""
+    partes = []
+    for ruta in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(ruta)
+            partes.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            partes.append("-")
+    return "|".join(partes)
+
+
+def procesar_con_gemini_cacheado(mensaje: str, user_id: int = None) -> tuple:
+    """
+    procesar_con_gemini() con caché y coalescencia.
+
+    Clave: pregunta normalizada + versión de los datos + usuario y fecha
+    (ambos forman parte del prompt). Las respuestas de advertencia (⚠️) no
+    se guardan.
+
+    Returns:
+        tuple: (respuesta, origen) con origen "cache", "coalescida" o "calculada"
+    """
+    clave = (
+        normalizar_pregunta(mensaje),
+        version_datos(),
+        session.get('user_name', 'Usuario'),
+        datetime.now().strftime('%Y-%m-%d'),
+    )
+    return cache_chat.obtener_o_calcular(
+        clave,
+        lambda: procesar_con_gemini(mensaje, user_id),
+        es_cacheable=lambda respuesta: not respuesta.startswith("⚠️"),
+    )
+
+
 # ==================== FUNCIÓN: PROCESAR CON GEMINI AI ====================
 def procesar_con_gemini(mensaje: str, user_id: int = None) -> str:
     """
@@ -206,7 +278,7 @@ def procesar_con_gemini(mensaje: str, user_id: int = None) -> str:
         import re
 
         # Inicializar modelo Gemini 2.5 Flash (rápido y eficiente)
-        model = genai.GenerativeModel('gemini-flash-latest')
+        model = _crear_modelo()
 
         # Obtener contexto del usuario
         user_name = session.get('user_name', 'Usuario')
@@ -331,105 +403,41 @@ CONTEXTO ACTUAL:
         raise  # Re-lanzar para activar fallback
 
 
-# ==================== FUNCIÓN: PROCESAR MENSAJE (FALLBACK) ====================
-def procesar_mensaje_inteligente(mensaje: str, user_id: int = None) -> str:
-    """
-    Procesa el mensaje del usuario y genera una respuesta inteligente.
-    
-    Lógica actual: Palabras clave + consultas a BD
-    TODO: Reemplazar con llamada a LLM (OpenAI, Claude, etc.)
-    
-    Args:
-        mensaje: Texto del mensaje del usuario
-        user_id: ID del usuario autenticado
-        
-    Returns:
-        str: Respuesta generada por el asistente
-    """
-    mensaje_lower = mensaje.lower().strip()
-    
-    try:
-        # =========================================
-        # CATEGORÍA 1: SALUDOS
-        # =========================================
-        if any(palabra in mensaje_lower for palabra in ['hola', 'buenos días', 'buenas tardes', 'hey', 'hi']):
-            user_name = session.get('user_name', 'Usuario')
-            return f"¡Hola {user_name}! 👋 Soy el Asistente Montero, el cerebro del sistema. ¿En qué puedo ayudarte hoy?"
-        
-        # =========================================
-        # CATEGORÍA 2: CONSULTAS DE USUARIOS
-        # =========================================
-        if 'usuario' in mensaje_lower or 'empleado' in mensaje_lower:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Total de usuarios
-            if 'cuántos' in mensaje_lower or 'cantidad' in mensaje_lower or 'total' in mensaje_lower:
-                cursor.execute("SELECT COUNT(*) FROM usuarios")
-                total = cursor.fetchone()[0]
-                conn.close()
-                return f"📊 Actualmente hay **{total} usuarios** registrados en la base de datos del sistema."
-            
-            # Usuarios activos
-            if 'activo' in mensaje_lower:
-                cursor.execute("SELECT COUNT(*) FROM usuarios WHERE estado = 'activo'")
-                activos = cursor.fetchone()[0]
-                conn.close()
-                return f"✅ Hay **{activos} usuarios activos** en el sistema."
-            
-            # Listado reciente
-            if 'último' in mensaje_lower or 'reciente' in mensaje_lower:
-                cursor.execute("""
-                    SELECT nombre_completo, fecha_registro 
-                    FROM usuarios 
-                    ORDER BY fecha_registro DESC 
-                    LIMIT 5
-                """)
-                ultimos = cursor.fetchall()
-                conn.close()
-                
-                if ultimos:
-                    lista = "\n".join([f"• {u[0]} (registrado: {u[1]})" for u in ultimos])
-                    return f"📋 **Últimos 5 usuarios registrados:**\n{lista}"
-                else:
-                    return "No hay usuarios recientes registrados."
-            
-            conn.close()
-            return "Puedo ayudarte con información sobre usuarios. Pregunta por el total, activos, o los más recientes."
-        
-        # =========================================
-        # CATEGORÍA 3: CONSULTAS DE EMPRESAS
-        # =========================================
-        if 'empresa' in mensaje_lower or 'cliente' in mensaje_lower:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            if 'cuántas' in mensaje_lower or 'cantidad' in mensaje_lower or 'total' in mensaje_lower:
-                cursor.execute("SELECT COUNT(*) FROM empresas")
-                total = cursor.fetchone()[0]
-                conn.close()
-                return f"🏢 Actualmente hay **{total} empresas** registradas en el sistema."
-            
-            if 'activa' in mensaje_lower:
-                cursor.execute("SELECT COUNT(*) FROM empresas WHERE estado = 'activa'")
-                activas = cursor.fetchone()[0]
-                conn.close()
-                return f"✅ Hay **{activas} empresas activas** en el sistema."
-            
-            conn.close()
-            return "Puedo ayudarte con información sobre empresas. Pregunta por el total, activas, o detalles específicos."
-        
-        # =========================================
-        # CATEGORÍA 4: CONSULTAS DE PAGOS
-        # =========================================
-        if 'pago' in mensaje_lower or 'cartera' in mensaje_lower or 'deuda' in mensaje_lower:
-            return "💰 Para consultas sobre pagos y cartera, puedo ayudarte a:\n• Ver el estado de la cartera\n• Consultar pagos pendientes\n• Generar reportes de recaudo\n\n¿Qué información necesitas específicamente?"
-        
-        # =========================================
-        # CATEGORÍA 5: AYUDA Y GUÍA
-        # =========================================
-        if 'ayuda' in mensaje_lower or 'help' in mensaje_lower or 'qué puedes' in mensaje_lower:
-            return """🧠 **Soy el Asistente Montero**, puedo ayudarte con:
+# ==================== FALLBACK: ROUTER DE INTENCIONES ====================
+# El vocabulario se compila una sola vez en un patrón combinado; cada mensaje
+# se clasifica en una pasada y se atiende con una consulta parametrizada
+# cacheada por versión de datos (saludos y ayuda no tocan la BD).
+VOCABULARIO_CHAT = {
+    "saludo": ["hola", "buenos dias", "buenas tardes", "hey", "hi"],
+    "usuarios": ["usuario*", "empleado*"],
+    "empresas": ["empresa*", "cliente*"],
+    "pagos": ["pago*", "cartera", "deuda*"],
+    "ayuda": ["ayuda", "help", "que puedes"],
+    "despedida": ["gracias", "thank*", "adios", "chao", "bye"],
+    "conteo": ["cuantos", "cuantas", "cantidad", "total"],
+    "activos": ["activo*", "activa*"],
+    "recientes": ["ultimo*", "reciente*"],
+}
+
+CONSULTAS_CHAT = {
+    "usuarios_total": ("SELECT COUNT(*) FROM usuarios", ()),
+    "usuarios_activos": ("SELECT COUNT(*) FROM usuarios WHERE lower(estado) = ?", ("activo",)),
+    "usuarios_recientes": (
+        """SELECT TRIM(COALESCE(primerNombre, '') || ' ' || COALESCE(primerApellido, '')), created_at
+           FROM usuarios ORDER BY created_at DESC LIMIT ?""",
+        (5,),
+    ),
+    "empresas_total": ("SELECT COUNT(*) FROM empresas", ()),
+    # empresas no tiene columna estado: "activa" = con al menos un afiliado activo
+    "empresas_activas": (
+        "SELECT COUNT(DISTINCT empresa_nit) FROM usuarios WHERE lower(estado) = ? AND empresa_nit IS NOT NULL",
+        ("activo",),
+    ),
+}
+
+cache_consultas = CacheRespuestas(ttl_segundos=JORDY_CACHE_TTL, max_entradas=64)
+
+TEXTO_AYUDA = """🧠 **Soy el Asistente Montero**, puedo ayudarte con:
 
 📊 **Consultas de datos:**
 • Cantidad de usuarios, empresas, pagos
@@ -450,18 +458,123 @@ def procesar_mensaje_inteligente(mensaje: str, user_id: int = None) -> str:
 • Optimizaciones de procesos
 
 ¿En qué te ayudo hoy?"""
-        
-        # =========================================
-        # CATEGORÍA 6: DESPEDIDAS
-        # =========================================
-        if any(palabra in mensaje_lower for palabra in ['gracias', 'thank', 'adiós', 'chao', 'bye']):
-            return "¡De nada! 😊 Estoy aquí cuando me necesites. Que tengas un excelente día."
-        
-        # =========================================
-        # CATEGORÍA 7: RESPUESTA POR DEFECTO
-        # =========================================
-        return f"🤔 Entendido, estoy procesando tu solicitud: **\"{mensaje}\"**\n\nPor ahora estoy en versión beta. Pronto podré ayudarte con consultas más complejas. ¿Puedes reformular tu pregunta o intentar preguntar sobre usuarios, empresas o pagos?"
-        
+
+
+def consultar_cacheado(nombre: str) -> list:
+    """
+    Ejecuta la consulta CONSULTAS_CHAT[nombre] y devuelve sus filas como tuplas.
+    El resultado se reutiliza mientras no cambie version_datos().
+    """
+    sql, parametros = CONSULTAS_CHAT[nombre]
+
+    def ejecutar():
+        conn = get_db_connection()
+        try:
+            return [tuple(fila) for fila in conn.execute(sql, parametros).fetchall()]
+        finally:
+            conn.close()
+
+    filas, _ = cache_consultas.obtener_o_calcular((nombre, version_datos()), ejecutar)
+    return filas
+
+
+def _responder_saludo(mensaje):
+    user_name = session.get('user_name', 'Usuario')
+    return f"¡Hola {user_name}! 👋 Soy el Asistente Montero, el cerebro del sistema. ¿En qué puedo ayudarte hoy?"
+
+
+def _responder_usuarios_total(mensaje):
+    total = consultar_cacheado("usuarios_total")[0][0]
+    return f"📊 Actualmente hay **{total} usuarios** registrados en la base de datos del sistema."
+
+
+def _responder_usuarios_activos(mensaje):
+    activos = consultar_cacheado("usuarios_activos")[0][0]
+    return f"✅ Hay **{activos} usuarios activos** en el sistema."
+
+
+def _responder_usuarios_recientes(mensaje):
+    ultimos = consultar_cacheado("usuarios_recientes")
+    if not ultimos:
+        return "No hay usuarios recientes registrados."
+    lista = "\n".join([f"• {nombre} (registrado: {fecha})" for nombre, fecha in ultimos])
+    return f"📋 **Últimos {len(ultimos)} usuarios registrados:**\n{lista}"
+
+
+def _responder_usuarios(mensaje):
+    return "Puedo ayudarte con información sobre usuarios. Pregunta por el total, activos, o los más recientes."
+
+
+def _responder_empresas_total(mensaje):
+    total = consultar_cacheado("empresas_total")[0][0]
+    return f"🏢 Actualmente hay **{total} empresas** registradas en el sistema."
+
+
+def _responder_empresas_activas(mensaje):
+    activas = consultar_cacheado("empresas_activas")[0][0]
+    return f"✅ Hay **{activas} empresas activas** (con afiliados activos) en el sistema."
+
+
+def _responder_empresas(mensaje):
+    return "Puedo ayudarte con información sobre empresas. Pregunta por el total, activas, o detalles específicos."
+
+
+def _responder_pagos(mensaje):
+    return "💰 Para consultas sobre pagos y cartera, puedo ayudarte a:\n• Ver el estado de la cartera\n• Consultar pagos pendientes\n• Generar reportes de recaudo\n\n¿Qué información necesitas específicamente?"
+
+
+def _responder_ayuda(mensaje):
+    return TEXTO_AYUDA
+
+
+def _responder_despedida(mensaje):
+    return "¡De nada! 😊 Estoy aquí cuando me necesites. Que tengas un excelente día."
+
+
+def _responder_por_defecto(mensaje):
+    return f"🤔 Entendido, estoy procesando tu solicitud: **\"{mensaje}\"**\n\nPor ahora estoy en versión beta. Pronto podré ayudarte con consultas más complejas. ¿Puedes reformular tu pregunta o intentar preguntar sobre usuarios, empresas o pagos?"
+
+
+# Reglas en orden de prioridad: gana la primera cuyas intenciones estén todas presentes
+router_chat = RouterIntenciones(
+    VOCABULARIO_CHAT,
+    reglas=[
+        ({"saludo"}, _responder_saludo),
+        ({"usuarios", "conteo"}, _responder_usuarios_total),
+        ({"usuarios", "activos"}, _responder_usuarios_activos),
+        ({"usuarios", "recientes"}, _responder_usuarios_recientes),
+        ({"usuarios"}, _responder_usuarios),
+        ({"empresas", "conteo"}, _responder_empresas_total),
+        ({"empresas", "activos"}, _responder_empresas_activas),
+        ({"empresas"}, _responder_empresas),
+        ({"pagos"}, _responder_pagos),
+        ({"ayuda"}, _responder_ayuda),
+        ({"despedida"}, _responder_despedida),
+    ],
+    por_defecto=_responder_por_defecto,
+)
+
+
+# ==================== FUNCIÓN: PROCESAR MENSAJE (FALLBACK) ====================
+def procesar_mensaje_inteligente(mensaje: str, user_id: int = None) -> str:
+    """
+    Procesa el mensaje del usuario y genera una respuesta inteligente.
+
+    Lógica: router de intenciones precompilado (una pasada sobre el mensaje)
+    + consultas parametrizadas cacheadas por versión de datos.
+
+    Args:
+        mensaje: Texto del mensaje del usuario
+        user_id: ID del usuario autenticado
+
+    Returns:
+        str: Respuesta generada por el asistente
+    """
+    try:
+        manejador, intenciones = router_chat.enrutar(mensaje)
+        logger.debug(f"🧭 Intenciones detectadas: {sorted(intenciones)} -> {manejador.__name__}")
+        return manejador(mensaje.strip())
+
     except Exception as e:
         logger.error(f"❌ Error al procesar mensaje del asistente: {e}")
         return "⚠️ Lo siento, hubo un error al procesar tu mensaje. Por favor intenta nuevamente."
@@ -511,11 +624,12 @@ def chat():
         logger.info(f"🧠 Asistente - Usuario: {user_name} (ID: {user_id}) - Mensaje: {mensaje}")
 
         # Procesar mensaje y generar respuesta
-        # PRIORIDAD 1: Intentar usar Gemini AI
+        # PRIORIDAD 1: Intentar usar Gemini AI (con caché de respuestas)
+        origen = "calculada"
         if GEMINI_AVAILABLE:
             try:
-                respuesta = procesar_con_gemini(mensaje, user_id)
-                logger.info(f"✅ Gemini AI - Respuesta enviada a {user_name}")
+                respuesta, origen = procesar_con_gemini_cacheado(mensaje, user_id)
+                logger.info(f"✅ Gemini AI ({origen}) - Respuesta enviada a {user_name}")
             except Exception as gemini_error:
                 logger.warning(f"⚠️ Gemini falló, usando fallback: {gemini_error}")
                 respuesta = procesar_mensaje_inteligente(mensaje, user_id)
@@ -528,6 +642,7 @@ def chat():
         # Retornar respuesta
         return jsonify({
             'response': respuesta,
+            'cached': origen != "calculada",
             'timestamp': datetime.utcnow().isoformat()
         }), 200
         
@@ -560,11 +675,26 @@ def status():
         'ai_engine': 'Google Gemini 2.5 Flash' if GEMINI_AVAILABLE else 'Keyword-based',
         'features': ['gemini_ai', 'db_queries', 'context_aware', 'fallback'] if GEMINI_AVAILABLE else ['keywords', 'db_queries'],
         'message': '🤖 Asistente Montero con Gemini AI activo' if GEMINI_AVAILABLE else '💬 Asistente Montero (modo fallback)',
+        'cache': cache_chat.estadisticas(),
         'timestamp': datetime.utcnow().isoformat()
     }), 200
 
 
 # ==================== FUNCIÓN: RECOLECTAR DATOS DEL SISTEMA ====================
+# Rangos sobre la columna (no DATE(columna)) para que SQLite use
+# idx_usuarios_created e idx_pagos_fecha en vez de recorrer la tabla
+SQL_USUARIOS_HOY = """
+    SELECT COUNT(*) FROM usuarios
+    WHERE created_at >= date('now') AND created_at < date('now', '+1 day')
+"""
+
+SQL_PAGOS_RECIENTES = """
+    SELECT COUNT(*), SUM(monto)
+    FROM pagos
+    WHERE fecha_pago >= date('now', '-7 days')
+"""
+
+
 def recolectar_datos_sistema() -> dict:
     """
     Recolecta datos clave del sistema para generar briefing proactivo.
@@ -613,10 +743,7 @@ def recolectar_datos_sistema() -> dict:
 
         # 3. Usuarios creados hoy
         try:
-            cursor.execute("""
-                SELECT COUNT(*) FROM usuarios
-                WHERE DATE(fecha_creacion) = DATE('now')
-            """)
+            cursor.execute(SQL_USUARIOS_HOY)
             datos['usuarios_hoy'] = cursor.fetchone()[0]
         except:
             datos['usuarios_hoy'] = 0
@@ -655,11 +782,7 @@ def recolectar_datos_sistema() -> dict:
 
         # 5. Datos financieros opcionales (recaudos recientes)
         try:
-            cursor.execute("""
-                SELECT COUNT(*), SUM(monto)
-                FROM pagos
-                WHERE fecha >= date('now', '-7 days')
-            """)
+            cursor.execute(SQL_PAGOS_RECIENTES)
             pagos_data = cursor.fetchone()
             datos['pagos_recientes'] = {
                 'cantidad': pagos_data[0] or 0,
@@ -24,6 +24,10 @@ except ImportError:
 # Extensions y modelos
 from extensions import db
 from models.orm_models import DeudaCartera, Empresa, Usuario
+from logic.carga_cartera import (
+    FormatoCargaNoSoportado, MigracionCarteraPendiente, filas_desde_json, importar_deudas, leer_filas
+)
+from logic.mora_cartera import ultimo_recalculo
 
 # Utils
 try:
@@ -125,20 +129,13 @@ def obtener_morosos():
         total_morosos = len(deudas_vencidas)
         monto_total_deuda = sum(float(deuda.monto or 0) for deuda in deudas_vencidas)
 
-        # Convertir a diccionarios
+        # Convertir a diccionarios. dias_mora lo mantiene al día el recálculo
+        # nocturno (celery_tasks.recalcular_mora_cartera); dias_mora_calculados
+        # se conserva por compatibilidad con el frontend.
         deudas_list = []
         for deuda in deudas_vencidas:
             deuda_dict = deuda.to_dict()
-
-            # Calcular días de mora si no están actualizados
-            if deuda.fecha_vencimiento:
-                try:
-                    fecha_venc = datetime.strptime(deuda.fecha_vencimiento, "%Y-%m-%d").date()
-                    dias_mora_calculados = (date.today() - fecha_venc).days
-                    deuda_dict['dias_mora_calculados'] = dias_mora_calculados
-                except:
-                    deuda_dict['dias_mora_calculados'] = deuda.dias_mora or 0
-
+            deuda_dict['dias_mora_calculados'] = deuda.dias_mora or 0
             deudas_list.append(deuda_dict)
 
         logger.info(f"✅ Morosos encontrados: {total_morosos}, Monto total: ${monto_total_deuda:,.2f}")
@@ -184,7 +181,8 @@ def obtener_morosos():
                 'dias_minimos': dias_minimos,
                 'entidad': entidad_filtro,
                 'empresa_nit': empresa_nit_filtro
-            }
+            },
+            'recalculo_mora': ultimo_recalculo(db.session)
         }), 200
 
     except Exception as e:
@@ -422,5 +420,89 @@ def programar_recordatorio_cobro():
         }), 500
 
 
+# =============================================================================
+# ENDPOINT: POST /api/cartera/carga-masiva (REPORTES DE OPERADORES)
+# =============================================================================
+
+@bp_cartera.route('/carga-masiva', methods=['POST'])
+@login_required
+def carga_masiva_deudas():
+    """
+    Carga masiva (upsert) de deudas de cartera desde un reporte de operador.
+
+    Request:
+        multipart/form-data con 'archivo' (.csv o .xlsx; encabezados en la fila 1)
+        o JSON {"deudas": [{"usuario_id", "empresa_nit", "entidad", "monto",
+                            "dias_mora", "fecha_vencimiento", ...}]}
+
+    El archivo se procesa en streaming y por lotes (ver logic/carga_cartera.py).
+    Una deuda abierta existente del mismo usuario, empresa, entidad y fecha de
+    vencimiento (periodo) se actualiza; un periodo distinto crea otra deuda.
+
+    Response JSON (201 si se guardó al menos una fila, 400 si ninguna,
+    503 si falta la migración 20251205):
+        {
+            "success": true,
+            "total_procesadas": 200000,
+            "guardadas": 199990, "insertadas": 150000, "actualizadas": 49990,
+            "errores": 10,
+            "detalles_errores": [{"fila": 12, "error": "...", "campos": ["monto"]}],
+            "errores_truncados": false
+        }
+    """
+    archivo = request.files.get('archivo')
+    if archivo and archivo.filename:
+        try:
+            filas = leer_filas(archivo.stream, archivo.filename)
+        except FormatoCargaNoSoportado as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        origen = archivo.filename
+    else:
+        data = request.get_json(silent=True) or {}
+        deudas = data.get('deudas')
+        if not isinstance(deudas, list) or not deudas:
+            return jsonify({
+                'success': False,
+                'error': "Envíe un 'archivo' CSV/XLSX o un JSON con la lista 'deudas'"
+            }), 400
+        filas = filas_desde_json(deudas)
+        origen = 'JSON'
+
+    usuario_registro = session.get('user_name') or session.get('username') or str(session.get('user_id', ''))
+
+    try:
+        resultado = importar_deudas(filas, db.session, usuario_registro=usuario_registro)
+    except FormatoCargaNoSoportado as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except MigracionCarteraPendiente as e:
+        db.session.rollback()
+        logger.error(f"❌ Carga masiva de cartera no disponible: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 503
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"❌ Error en carga masiva de cartera ({origen}): {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Error en la carga masiva de cartera',
+            'detalle': str(e)
+        }), 500
+
+    logger.info(
+        f"📥 Carga masiva de cartera ({origen}): {resultado['guardadas']}/{resultado['total_procesadas']} "
+        f"filas guardadas, {resultado['errores']} con error"
+    )
+
+    respuesta = {
+        'success': resultado['guardadas'] > 0,
+        'mensaje': f"{resultado['guardadas']} deudas guardadas, {resultado['errores']} filas con error",
+        **resultado
+    }
+    if not respuesta['success']:
+        respuesta['error'] = 'Ninguna fila se pudo guardar; revise detalles_errores'
+        return jsonify(respuesta), 400
+    return jsonify(respuesta), 201
+
+
 if __name__ == "__main__":
     print("Módulo de gestión de cartera cargado correctamente")
@@ -8,6 +8,7 @@ Elimina SQL manual y usa modelos ORM al 100%.
 import os
 import traceback
 from datetime import datetime
+from itertools import product
 
 from flask import Blueprint, jsonify, request, session, current_app, render_template
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
@@ -15,7 +16,14 @@ from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from logger import logger
 from extensions import db
 from models.orm_models import Cotizacion, Empresa
-from logic.pila_engine import CalculadoraPILA
+from logic.pila_engine import (
+    COLUMNAS_SIMULACION,
+    VERSION_PARAMETROS_PILA,
+    CalculadoraPILA,
+    cache_liquidaciones,
+    estadisticas_simulacion,
+    simular_escenarios,
+)
 
 # --- IMPORTACIÓN CENTRALIZADA ---
 try:
@@ -305,6 +313,134 @@ def simular_pila():
         }), 500
 
 
+# ==================== SIMULACIÓN PILA POR LOTES ====================
+
+MAX_ESCENARIOS_SIMULACION = 5000
+
+
+def _lista(data, campo, defecto=None):
+    valores = data.get(campo, defecto)
+    if not isinstance(valores, list):
+        raise ValueError(f"'{campo}' debe ser una lista.")
+    return valores
+
+
+def _booleano(valor, campo):
+    """Solo true/false de JSON: bool("false") sería True."""
+    if not isinstance(valor, bool):
+        raise ValueError(f"'{campo}' debe ser true o false (recibido {valor!r}).")
+    return valor
+
+
+def _validar_total_escenarios(total):
+    if total > MAX_ESCENARIOS_SIMULACION:
+        raise ValueError(f"Máximo {MAX_ESCENARIOS_SIMULACION} escenarios por petición (recibidos {total}).")
+
+
+def _escenarios_desde_peticion(data):
+    """
+    Escenarios (salario, nivel, integral, exonerada) a partir de una lista
+    explícita ("escenarios") o de una grilla (producto cartesiano). El total
+    se valida antes de construir la lista.
+
+    Raises:
+        ValueError: Si faltan dimensiones, los valores no son numéricos o
+            booleanos, o se supera MAX_ESCENARIOS_SIMULACION
+    """
+    if "escenarios" in data:
+        escenarios = _lista(data, "escenarios")
+        _validar_total_escenarios(len(escenarios))
+        return [
+            (
+                float(e["salario_base"]),
+                int(e["nivel_riesgo"]),
+                _booleano(e.get("es_salario_integral", False), "es_salario_integral"),
+                _booleano(e.get("es_empresa_exonerada", True), "es_empresa_exonerada"),
+            )
+            for e in escenarios
+        ]
+
+    salarios = _lista(data, "salarios", [])
+    niveles = _lista(data, "niveles_riesgo", [])
+    if not salarios or not niveles:
+        raise ValueError("Envía 'escenarios' o una grilla con 'salarios' y 'niveles_riesgo'.")
+    integrales = _lista(data, "integral", [False])
+    exoneradas = _lista(data, "exonerada", [True])
+    _validar_total_escenarios(len(salarios) * len(niveles) * len(integrales) * len(exoneradas))
+
+    return list(product(
+        [float(v) for v in salarios],
+        [int(v) for v in niveles],
+        [_booleano(v, "integral") for v in integrales],
+        [_booleano(v, "exonerada") for v in exoneradas],
+    ))
+
+
+@bp_cotizaciones.route("/simular-pila/lote", methods=["POST"])
+@login_required
+def simular_pila_lote():
+    """
+    Simula muchos escenarios PILA en una sola petición (cotizaciones comerciales).
+
+    Request JSON (grilla, producto cartesiano):
+        {
+            "salarios": [1300000, 2500000, 4000000],
+            "niveles_riesgo": [1, 3, 5],
+            "integral": [false],          (opcional, default [false])
+            "exonerada": [true, false]    (opcional, default [true])
+        }
+    o lista explícita:
+        {"escenarios": [{"salario_base": 1300000, "nivel_riesgo": 1,
+                         "es_salario_integral": false, "es_empresa_exonerada": true}]}
+
+    Returns:
+        Matriz compacta: {"columnas": [...], "filas": [[...], ...],
+        "total_escenarios", "version_parametros", "cache"}. Las filas siguen
+        el orden de los escenarios y las columnas COLUMNAS_SIMULACION.
+    """
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({"error": "Se requiere un JSON en el cuerpo de la petición."}), 400
+
+    try:
+        escenarios = _escenarios_desde_peticion(data)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Petición simular-pila/lote inválida: {e}")
+        return jsonify({"error": f"Escenarios inválidos: {e}"}), 400
+
+    if not escenarios:
+        return jsonify({"error": "No se recibieron escenarios para simular."}), 400
+
+    try:
+        filas = simular_escenarios(escenarios)
+    except ValueError as ve:
+        logger.warning(f"Error de validación en simulación por lotes: {ve}")
+        return jsonify({"error": str(ve), "tipo": "error_validacion_motor_pila"}), 400
+    except Exception as e:
+        logger.error(f"Error inesperado en simular-pila/lote: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor al calcular PILA.", "detalle": str(e)}), 500
+
+    logger.info(f"Simulación PILA por lotes - {len(filas)} escenarios")
+    return jsonify({
+        "columnas": list(COLUMNAS_SIMULACION),
+        "filas": filas,
+        "total_escenarios": len(filas),
+        "version_parametros": VERSION_PARAMETROS_PILA,
+        "version_motor": "1.1.0",
+        "cache": estadisticas_simulacion(),
+    }), 200
+
+
+@bp_cotizaciones.route("/simular-pila/cache", methods=["GET"])
+@login_required
+def estadisticas_cache_pila():
+    """Tamaño y tasa de aciertos de las cachés del motor PILA."""
+    return jsonify({
+        "liquidaciones": cache_liquidaciones.estadisticas(),
+        "simulacion_lote": estadisticas_simulacion(),
+    }), 200
+
+
 # ==================== GUARDAR SIMULACIÓN COMO COTIZACIÓN REAL ====================
 
 @bp_cotizaciones.route("/guardar-simulacion", methods=["POST"])
@@ -5,17 +5,20 @@ Genera cartas de depuración personalizadas según 3 escenarios diferentes
 """
 
 import os
-import tempfile
+import shutil
+import uuid
 from datetime import datetime
-from io import BytesIO
 
-from flask import Blueprint, g, jsonify, request, send_file, session
-from pypdf import PdfReader, PdfWriter
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
+from flask import Blueprint, current_app, g, jsonify, request, send_file, session
 from werkzeug.utils import secure_filename
 
+from carta_jobs import crear_job, estado_job, preparar_anexos
+from cartas_depuracion import (
+    ESCENARIOS_CARTA,
+    MAX_CARTAS_LOTE,
+    NOMBRES_ANEXOS,
+    construir_textos,
+)
 from logger import logger
 
 # --- IMPORTACIÓN CENTRALIZADA ---
@@ -185,31 +188,51 @@ def resolver_depuracion(depuracion_id):
     # g.db se cierra automáticamente por app.after_request
 
 
+def resolver_recursos_empresa(empresa_nombre):
+    """
+    Ubica la carpeta de la empresa, su CARTA.pdf y su firma_empresa.png.
+
+    Returns:
+        tuple: (dict con empresa_carpeta, carta_base_path y firma_path, None)
+               o (None, mensaje de error)
+    """
+    # Normalizar nombre de empresa para buscar carpeta
+    empresa_carpeta = (empresa_nombre or "").replace(" ", "_").replace(".", "").upper()
+    ruta_empresa = os.path.join(RUTA_BASE_EMPRESAS, empresa_carpeta)
+
+    # Verificar que existe la carpeta de la empresa
+    if not empresa_carpeta or not os.path.exists(ruta_empresa):
+        logger.error(f"No se encuentra la carpeta de la empresa: {ruta_empresa}")
+        return None, f"No se encuentra la carpeta de la empresa: {empresa_carpeta}"
+
+    # Buscar PDF de carta base
+    carta_base_path = os.path.join(ruta_empresa, "CARTA.pdf")
+    if not os.path.exists(carta_base_path):
+        logger.error(f"No se encuentra el PDF CARTA.pdf en: {ruta_empresa}")
+        return None, "No se encuentra el archivo CARTA.pdf de la empresa"
+
+    # Buscar firma
+    firma_path = os.path.join(ruta_empresa, "firma_empresa.png")
+    if not os.path.exists(firma_path):
+        logger.error(f"No se encuentra la firma en: {ruta_empresa}")
+        return None, "No se encuentra la firma_empresa.png"
+
+    return {"empresa_carpeta": empresa_carpeta, "carta_base_path": carta_base_path, "firma_path": firma_path}, None
+
+
 @bp_depuraciones.route("/generar-carta", methods=["POST"])
 @login_required
 def generar_carta():
     """
-    Genera la carta de depuración según el escenario y guarda el PDF combinado.
+    Valida el formulario, deja los anexos en disco y encola la generación
+    de la carta (carta_jobs). Responde 202 con el job_id; el progreso se
+    consulta en /jobs/<job_id> y el PDF se descarga en /jobs/<job_id>/descargar.
     """
     try:
         # Obtener datos del formulario
         tipo_escenario = request.form.get("tipo_escenario")
         empresa_nombre = request.form.get("empresa_nombre")
-        empresa_numero_id = request.form.get("empresa_numero_id")
         usuario_numero_id = request.form.get("usuario_numero_id")
-        usuario_nombre = request.form.get("usuario_nombre_completo")
-        usuario_tipo_id = request.form.get("usuario_tipo_id")
-        numero_planilla = request.form.get("numero_planilla")
-        ciudad = request.form.get("ciudad")
-        senores = request.form.get("senores")
-        departamento_entidad = request.form.get("departamento_entidad")
-        fecha_inicio = request.form.get("fecha_inicio")
-        fecha_fin = request.form.get("fecha_fin")
-        rep_legal_nombre = request.form.get("rep_legal_nombre")
-        rep_legal_cargo = request.form.get("rep_legal_cargo")
-        rep_legal_celular = request.form.get("rep_legal_celular")
-        rep_legal_direccion = request.form.get("rep_legal_direccion")
-        rep_legal_correo = request.form.get("rep_legal_correo")
 
         logger.info(f"Generando carta - Escenario: {tipo_escenario}")
 
@@ -236,69 +259,18 @@ def generar_carta():
         if estado_cuenta and allowed_file(estado_cuenta.filename):
             archivos_adjuntos.append(("estado_cuenta", estado_cuenta))
 
-        # Normalizar nombre de empresa para buscar carpeta
-        empresa_carpeta = empresa_nombre.replace(" ", "_").replace(".", "").upper()
-        ruta_empresa = os.path.join(RUTA_BASE_EMPRESAS, empresa_carpeta)
-
-        # Verificar que existe la carpeta de la empresa
-        if not os.path.exists(ruta_empresa):
-            logger.error(f"No se encuentra la carpeta de la empresa: {ruta_empresa}")
-            return jsonify({"error": f"No se encuentra la carpeta de la empresa: {empresa_carpeta}"}), 404
-
-        # Buscar PDF de carta base
-        carta_base_path = os.path.join(ruta_empresa, "CARTA.pdf")
-        if not os.path.exists(carta_base_path):
-            logger.error(f"No se encuentra el PDF CARTA.pdf en: {ruta_empresa}")
-            return jsonify({"error": "No se encuentra el archivo CARTA.pdf de la empresa"}), 404
-
-        # Buscar firma
-        firma_path = os.path.join(ruta_empresa, "firma_empresa.png")
-        if not os.path.exists(firma_path):
-            logger.error(f"No se encuentra la firma en: {ruta_empresa}")
-            return jsonify({"error": "No se encuentra la firma_empresa.png"}), 404
+        recursos, error = resolver_recursos_empresa(empresa_nombre)
+        if error:
+            return jsonify({"error": error}), 404
+        empresa_carpeta = recursos["empresa_carpeta"]
+        carta_base_path = recursos["carta_base_path"]
+        firma_path = recursos["firma_path"]
 
         # Generar contenido según escenario
-        fecha_actual = datetime.now().strftime("%d de %B de %Y")
-
-        texto1 = f"{ciudad}, {fecha_actual}\n"
-        texto1 += f"Señores:\n{senores}\n"
-        texto1 += f"Departamento:\n{departamento_entidad}\n"
-        texto1 += "Cordial saludo"
-
-        if tipo_escenario in ["COMPLETO", "SIN_RETIRO"]:
-            texto2 = f"El motivo de esta carta es para solicitarles la corrección de mora donde nos notifica de la siguiente persona {usuario_nombre} identificado con número de {usuario_tipo_id} {usuario_numero_id}, el cual laboró desde {fecha_inicio} hasta {fecha_fin}, por lo tanto anexamos estado de cuenta, planilla con número {numero_planilla} y afiliación para que nos colaboren con la corrección ya que nuestra intención como empresa es estar al día con todas nuestras obligaciones."
-
-            anexos = ["Estado de cuenta", "Formulario de afiliación", "Planilla de ingreso"]
-
-            if tipo_escenario == "COMPLETO":
-                anexos.append("Planilla de retiro")
-
-            if any(nombre == "cedula" for nombre, _ in archivos_adjuntos):
-                anexos.append("Cédula")
-
-        elif tipo_escenario == "BASICO":
-            texto2 = f"El motivo de esta carta es para solicitarles la corrección de mora donde nos notifica de la siguiente persona {usuario_nombre} identificado con número de {usuario_tipo_id} {usuario_numero_id}, el cual evidenciamos que no se ha realizado la solicitud de afiliación, por lo tanto anexamos estado de cuenta para que nos colaboren con el comprobante de afiliación y en caso contrario de no haber dicho documento solicitamos la anulación del reporte del estado de cuenta, ya que nuestra intención como empresa es estar al día con todas nuestras obligaciones."
-
-            anexos = ["Estado de cuenta"]
-            if any(nombre == "cedula" for nombre, _ in archivos_adjuntos):
-                anexos.append("Cédula")
-        else:
-            return jsonify({"error": "Escenario no reconocido"}), 400
-
-        texto3 = "Anexamos:\n" + "\n".join([f"{i+1}. {anexo}" for i, anexo in enumerate(anexos)])
-        texto3 += "\n\nMuchas gracias"
-
-        texto4 = f"{rep_legal_nombre}\n"
-        texto4 += f"{rep_legal_cargo}\n"
-        texto4 += f"Celular: {rep_legal_celular}\n"
-        texto4 += f"Dirección: {rep_legal_direccion}\n"
-        texto4 += f"Correo: {rep_legal_correo}"
-
-        # Rellenar PDF base con los textos
-        pdf_rellenado = rellenar_pdf_carta(carta_base_path, firma_path, texto1, texto2, texto3, texto4)
-
-        # Crear PDF combinado (carta + anexos)
-        pdf_final = combinar_pdfs(pdf_rellenado, archivos_adjuntos, anexos)
+        try:
+            textos, anexos = construir_textos(request.form.to_dict(), [nombre for nombre, _ in archivos_adjuntos])
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
         # Guardar en carpeta del usuario
         ruta_usuario = os.path.join(RUTA_BASE_USUARIOS, usuario_numero_id, "DEPURACIONES")
@@ -306,24 +278,47 @@ def generar_carta():
 
         fecha_archivo = datetime.now().strftime("%Y%m%d_%H%M%S")
         nombre_archivo = f"{empresa_carpeta}_{fecha_archivo}.pdf"
-        ruta_final = os.path.join(ruta_usuario, nombre_archivo)
 
-        with open(ruta_final, "wb") as f:
-            f.write(pdf_final.getvalue())
+        # Anexos a disco UNA vez (el worker los lee desde ahí, no desde memoria)
+        carpeta_staging = os.path.join(ruta_usuario, ".staging", uuid.uuid4().hex)
+        adjuntos, advertencias = preparar_anexos(archivos_adjuntos, carpeta_staging)
+
+        solicitud = {
+            "carta_base_path": carta_base_path,
+            "firma_path": firma_path,
+            "textos": list(textos),
+            "adjuntos": adjuntos,
+            "anexos": anexos,
+            "ruta_destino": os.path.join(ruta_usuario, nombre_archivo),
+            "archivo": nombre_archivo,
+            "staging": carpeta_staging,
+        }
+        conn = get_db_connection()
+        try:
+            job_id = crear_job(conn, current_app.config["DATABASE_PATH"], solicitud, session.get("user_id"))
+        except Exception:
+            # Sin job nadie limpiará los anexos preparados
+            shutil.rmtree(carpeta_staging, ignore_errors=True)
+            raise
+        finally:
+            conn.close()
 
-        logger.info(f"✅ Carta generada exitosamente: {ruta_final}")
+        logger.info(f"📨 Carta en cola (job {job_id}): {nombre_archivo}")
 
         return (
             jsonify(
                 {
                     "success": True,
-                    "message": "Carta generada exitosamente",
+                    "message": "Carta en proceso de generación",
+                    "job_id": job_id,
                     "archivo": nombre_archivo,
-                    "ruta": ruta_final,
+                    "advertencias": advertencias,
+                    "status_url": f"/api/depuraciones/jobs/{job_id}",
+                    "download_url": f"/api/depuraciones/jobs/{job_id}/descargar",
                     "pdf_url": f"/api/depuraciones/descargar/{usuario_numero_id}/{nombre_archivo}",
                 }
             ),
-            200,
+            202,
         )
 
     except Exception as e:
@@ -331,136 +326,170 @@ def generar_carta():
         return jsonify({"error": f"Error al generar carta: {str(e)}"}), 500
 
 
-def rellenar_pdf_carta(carta_base_path, firma_path, texto1, texto2, texto3, texto4):
-    """
-    Rellena el PDF base con los textos y la firma.
-    Retorna un BytesIO con el PDF rellenado.
-    """
+@bp_depuraciones.route("/jobs/<job_id>", methods=["GET"])
+@login_required
+def get_estado_carta(job_id):
+    """Estado y progreso (0-100) de la generación de una carta."""
+    conn = get_db_connection()
     try:
-        # Leer PDF base
-        reader = PdfReader(carta_base_path)
-        writer = PdfWriter()
-
-        # Obtener primera página (asumiendo que la carta es de 1 página)
-        page = reader.pages[0]
-
-        # Crear un nuevo PDF con los textos superpuestos
-        packet = BytesIO()
-        can = canvas.Canvas(packet, pagesize=letter)
-
-        # Configurar fuente
-        can.setFont("Helvetica", 10)
-
-        # TEXTO1 (cuerpo principal) - posición aproximada
-        y_pos = 600
-        for linea in texto1.split("\n"):
-            can.drawString(72, y_pos, linea)
-            y_pos -= 15
-
-        # TEXTO2 (cuerpo) - justificado
-        y_pos = 500
-        max_width = 450
-        words = texto2.split()
-        line = ""
-
-        for word in words:
-            test_line = line + word + " "
-            if can.stringWidth(test_line, "Helvetica", 10) < max_width:
-                line = test_line
-            else:
-                can.drawString(72, y_pos, line)
-                y_pos -= 15
-                line = word + " "
-
-        if line:
-            can.drawString(72, y_pos, line)
-            y_pos -= 30
-
-        # TEXTO3 (anexos)
-        for linea in texto3.split("\n"):
-            can.drawString(72, y_pos, linea)
-            y_pos -= 15
-
-        y_pos -= 20
-
-        # FIRMA (imagen)
-        try:
-            img = ImageReader(firma_path)
-            can.drawImage(img, 72, y_pos - 60, width=150, height=60, preserveAspectRatio=True)
-            y_pos -= 80
-        except Exception as e:
-            logger.warning(f"No se pudo insertar firma: {e}")
-            can.drawString(72, y_pos, "[FIRMA DIGITAL]")
-            y_pos -= 20
+        job = estado_job(conn, job_id)
+        if not job:
+            return jsonify({"error": "Job de carta no encontrado"}), 404
+        if job["estado"] == "completado":
+            job["download_url"] = f"/api/depuraciones/jobs/{job_id}/descargar"
+        return jsonify(job), 200
 
-        # TEXTO4 (datos del representante)
-        for linea in texto4.split("\n"):
-            can.drawString(72, y_pos, linea)
-            y_pos -= 12
-
-        can.save()
-
-        # Combinar el nuevo contenido con la página original
-        packet.seek(0)
-        new_pdf = PdfReader(packet)
-        page.merge_page(new_pdf.pages[0])
-        writer.add_page(page)
+    except Exception as e:
+        logger.error(f"Error consultando job de carta {job_id}", exc_info=True)
+        return jsonify({"error": f"Error al consultar la carta: {str(e)}"}), 500
+    finally:
+        conn.close()
 
-        # Copiar el resto de páginas si las hay
-        for i in range(1, len(reader.pages)):
-            writer.add_page(reader.pages[i])
 
-        output = BytesIO()
-        writer.write(output)
-        output.seek(0)
+@bp_depuraciones.route("/jobs/<job_id>/descargar", methods=["GET"])
+@login_required
+def descargar_carta_job(job_id):
+    """Descarga la carta de un job terminado (409 si aún está en proceso)."""
+    conn = get_db_connection()
+    try:
+        job = estado_job(conn, job_id)
+        if not job:
+            return jsonify({"error": "Job de carta no encontrado"}), 404
+        if job["estado"] != "completado":
+            return jsonify({"error": "La carta aún no está lista", "estado": job["estado"], "progreso": job["progreso"]}), 409
+
+        resultado = job["resultado"]
+        if not os.path.exists(resultado["ruta"]):
+            return jsonify({"error": "Archivo no encontrado"}), 404
 
-        return output
+        return send_file(resultado["ruta"], as_attachment=True, download_name=resultado["archivo"])
 
     except Exception as e:
-        logger.error(f"Error rellenando PDF: {e}", exc_info=True)
-        raise
+        logger.error(f"Error descargando carta del job {job_id}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
 
 
-def combinar_pdfs(carta_pdf, archivos_adjuntos, orden_anexos):
-    """
-    Combina la carta con los archivos adjuntos en el orden especificado.
+def resolver_anexos_guardados(conn, referencias, usuario_id):
     """
-    try:
-        merger = PdfWriter()
-
-        # Agregar carta primero
-        merger.append(carta_pdf)
-
-        # Mapeo de nombres de archivos
-        mapeo = {
-            "estado_cuenta": "Estado de cuenta",
-            "afiliacion": "Formulario de afiliación",
-            "ingreso": "Planilla de ingreso",
-            "retiro": "Planilla de retiro",
-            "cedula": "Cédula",
-        }
+    Traduce {campo: id de documentos_gestor} a [(campo, ruta)].
 
-        # Agregar anexos en el orden especificado
-        for anexo_nombre in orden_anexos:
-            # Buscar el archivo correspondiente
-            for nombre_key, archivo in archivos_adjuntos:
-                if mapeo.get(nombre_key) == anexo_nombre:
-                    # Guardar temporalmente el archivo
-                    temp_file = BytesIO(archivo.read())
-                    temp_file.seek(0)
-                    merger.append(temp_file)
-                    break
+    Solo acepta PDFs subidos por el usuario de la sesión y guardados dentro
+    de la carpeta docs del gestor documental: el cliente nunca envía rutas
+    del servidor.
 
-        output = BytesIO()
-        merger.write(output)
-        merger.close()
-        output.seek(0)
+    Returns:
+        tuple: ([(campo, ruta), ...], None) o (None, mensaje de error)
+    """
+    carpeta_docs = os.path.realpath(os.path.join(current_app.config["UPLOAD_FOLDER"], "docs"))
+    adjuntos = []
+    for campo, documento_id in (referencias or {}).items():
+        if campo not in NOMBRES_ANEXOS:
+            return None, f"Anexo no reconocido: {campo}"
+        try:
+            documento_id = int(documento_id)
+        except (TypeError, ValueError):
+            return None, f"El anexo '{campo}' debe ser el id de un documento del gestor"
+
+        fila = conn.execute(
+            "SELECT ruta, tipo_mime FROM documentos_gestor WHERE id = ? AND subido_por = ?",
+            (documento_id, usuario_id),
+        ).fetchone()
+        if not fila or fila["tipo_mime"] != "application/pdf":
+            return None, f"Documento {documento_id} no encontrado o no es un PDF propio"
+
+        ruta = os.path.realpath(fila["ruta"])
+        try:
+            dentro = os.path.commonpath([ruta, carpeta_docs]) == carpeta_docs
+        except ValueError:  # Otra unidad (Windows)
+            dentro = False
+        if not dentro or not os.path.isfile(ruta):
+            logger.warning(f"⚠️ Documento {documento_id} fuera del gestor o inexistente: {fila['ruta']}")
+            return None, f"Documento {documento_id} no disponible"
+        adjuntos.append((campo, ruta))
+    return adjuntos, None
 
-        return output
+
+@bp_depuraciones.route("/generar-cartas-lote", methods=["POST"])
+@login_required
+def generar_cartas_en_lote():
+    """
+    Encola una carta por cada depuración del lote (carta_jobs): la
+    generación corre en el backend de jobs, no dentro de la petición.
+
+    Body JSON:
+        cartas: [ {mismos campos que generar-carta}, ... ]
+        Los anexos, si los hay, se indican con el id de PDFs ya subidos por
+        el usuario al gestor documental:
+        "adjuntos": {"estado_cuenta": 12, "cedula": 15, ...}
+    """
+    datos = request.get_json(silent=True) or {}
+    cartas = datos.get("cartas") or []
+    if not cartas:
+        return jsonify({"error": "No se recibieron cartas para generar"}), 400
+    if len(cartas) > MAX_CARTAS_LOTE:
+        return jsonify({"error": f"Máximo {MAX_CARTAS_LOTE} cartas por lote"}), 400
+
+    conn = get_db_connection()
+    try:
+        fecha_archivo = datetime.now().strftime("%Y%m%d_%H%M%S")
+        encoladas = []
+        rechazadas = []
+        for indice, carta in enumerate(cartas):
+            usuario_numero_id = str(carta.get("usuario_numero_id") or "")
+            if (
+                not usuario_numero_id
+                or secure_filename(usuario_numero_id) != usuario_numero_id
+                or carta.get("tipo_escenario") not in ESCENARIOS_CARTA
+            ):
+                rechazadas.append({"indice": indice, "error": "Falta usuario_numero_id o escenario no reconocido"})
+                continue
+
+            recursos, error = resolver_recursos_empresa(carta.get("empresa_nombre"))
+            if not error:
+                adjuntos, error = resolver_anexos_guardados(conn, carta.get("adjuntos"), session.get("user_id"))
+            if error:
+                rechazadas.append({"indice": indice, "error": error})
+                continue
+
+            textos, anexos = construir_textos(carta, [campo for campo, _ in adjuntos])
+
+            ruta_usuario = os.path.join(RUTA_BASE_USUARIOS, usuario_numero_id, "DEPURACIONES")
+            os.makedirs(ruta_usuario, exist_ok=True)
+            nombre_archivo = f"{recursos['empresa_carpeta']}_{fecha_archivo}_{indice}.pdf"
+
+            solicitud = {
+                "carta_base_path": recursos["carta_base_path"],
+                "firma_path": recursos["firma_path"],
+                "textos": list(textos),
+                "adjuntos": [list(adjunto) for adjunto in adjuntos],
+                "anexos": anexos,
+                "ruta_destino": os.path.join(ruta_usuario, nombre_archivo),
+                "archivo": nombre_archivo,
+            }
+            job_id = crear_job(conn, current_app.config["DATABASE_PATH"], solicitud, session.get("user_id"))
+            encoladas.append({
+                "indice": indice,
+                "job_id": job_id,
+                "archivo": nombre_archivo,
+                "status_url": f"/api/depuraciones/jobs/{job_id}",
+                "download_url": f"/api/depuraciones/jobs/{job_id}/descargar",
+            })
+
+        logger.info(f"📨 Lote de cartas: {len(encoladas)} encoladas, {len(rechazadas)} rechazadas")
+
+        return jsonify({
+            "success": True,
+            "encoladas": encoladas,
+            "rechazadas": rechazadas,
+        }), 202
 
     except Exception as e:
-        logger.error(f"Error combinando PDFs: {e}", exc_info=True)
-        raise
+        logger.error("Error encolando lote de cartas", exc_info=True)
+        return jsonify({"error": f"Error al generar lote de cartas: {str(e)}"}), 500
+    finally:
+        conn.close()
 
 
 @bp_depuraciones.route("/descargar/<usuario_id>/<archivo>", methods=["GET"])
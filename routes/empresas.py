@@ -16,6 +16,12 @@ from flask import Blueprint, current_app, g, jsonify, request, session
 from pydantic import ValidationError
 
 # (CORREGIDO: Importa la instancia global 'logger')
+from blob_store import guardar_blob
+from busqueda_fts import expresion_match, filtro_fts, fts_disponible, sugerencias
+from cache_http import respuesta_condicional
+from expediente_jobs import calcular_huella, ejecutar_plan, encolar_expediente
+from indice_firmas import registrar_carpeta_empresa
+from json_provider import filas_json, respuesta_json
 from logger import logger
 from models.validation_models import EmpresaCreate, EmpresaUpdate
 from utils import (
@@ -39,81 +45,98 @@ RUTA_BASE_EXPEDIENTES = r"D:\Mi-App-React\MONTERO_NEGOCIO\MONTERO_TOTAL\EMPRESAS
 
 
 # ==================== FUNCIÓN AUXILIAR: GENERAR EXPEDIENTE EMPRESA ====================
-def generar_expediente_empresa(empresa_data: dict, archivos_request=None) -> dict:
+SUBCARPETAS_EXPEDIENTE_EMPRESA = [
+    "COTIZACIONES",
+    "EXTRACTOS BANCARIOS",
+    "OTROS_ADJUNTOS",
+    "PAGO DE IMPUESTOS",
+    "USUARIOS Y CONTRASEÑAS"
+]
+
+ARCHIVOS_EXPEDIENTE_EMPRESA = {
+    "rut": ("rut.pdf", "ruta_rut"),
+    "camara_comercio": ("camara_comercio.pdf", "ruta_camara_comercio"),
+    "cedula_representante": ("cedula_representante.pdf", "ruta_cedula_representante"),
+    "arl": ("arl.pdf", "ruta_arl"),
+    "cuenta_bancaria": ("cuenta_bancaria.pdf", "ruta_cuenta_bancaria"),
+    "carta_autorizacion": ("carta_autorizacion.pdf", "ruta_carta_autorizacion")
+}
+
+
+def _ruta_bd(ruta):
+    return os.path.relpath(ruta, start=r"D:\Mi-App-React\MONTERO_NEGOCIO")
+
+
+def _imagen_base64_a_blob(valor_base64, etiqueta, plan):
+    """Decodifica una imagen base64 y la guarda en el almacén. Devuelve el hash o None."""
+    try:
+        if "," in valor_base64:
+            _, encoded = valor_base64.split(",", 1)
+        else:
+            encoded = valor_base64
+
+        contenido = base64.b64decode(encoded)
+
+        if len(contenido) > 5 * 1024 * 1024:  # 5MB máximo
+            plan["errores"].append(f"{etiqueta}: Tamaño excedido (máximo 5MB)")
+            return None
+        return guardar_blob(contenido)["sha256"]
+
+    except Exception as e:
+        logger.error(f"❌ Error al guardar {etiqueta.lower()}: {e}", exc_info=True)
+        plan["errores"].append(f"Error al guardar {etiqueta.lower()}: {str(e)}")
+        return None
+
+
+def planificar_expediente_empresa(empresa_data: dict, archivos_request=None) -> dict:
     """
-    Genera la estructura de carpetas y archivos para un expediente de empresa.
+    Construye el plan del expediente de una empresa sin tocar la carpeta del
+    expediente. Firma, logo y PDFs adjuntos se guardan en el almacén de
+    blobs; las rutas para la BD (rutas_bd) se calculan aquí porque son
+    deterministas y el INSERT/UPDATE no debe esperar al job.
 
     Args:
         empresa_data: Diccionario con los datos de la empresa (nit, nombre_empresa, etc.)
         archivos_request: request.files con los archivos adjuntos (PDFs, imágenes)
 
     Returns:
-        dict: {
-            "success": bool,
-            "files_created": list,
-            "errors": list,
-            "path": str,
-            "rutas_bd": {
-                "ruta_carpeta": str,
-                "ruta_firma": str,
-                "ruta_logo": str,
-                "ruta_rut": str,
-                "ruta_camara_comercio": str,
-                "ruta_cedula_representante": str,
-                "ruta_arl": str,
-                "ruta_cuenta_bancaria": str,
-                "ruta_carta_autorizacion": str
-            }
-        }
+        dict: Plan serializable (ver expediente_jobs) con la clave adicional "rutas_bd"
     """
-    resultado = {
-        "success": False,
-        "files_created": [],
-        "errors": [],
-        "path": "",
-        "rutas_bd": {}
+    nit = empresa_data.get("nit")
+    nombre_empresa = empresa_data.get("nombre_empresa", "") or ""
+
+    plan = {
+        "tipo": "empresa",
+        "entidad_id": str(nit or ""),
+        "carpeta": "",
+        "directorios": [],
+        "textos": [],
+        "blobs": [],
+        "errores": [],
+        "huella": "",
+        "rutas_bd": {},
     }
 
-    try:
-        nit = empresa_data.get("nit")
-        nombre_empresa = empresa_data.get("nombre_empresa", "")
-
-        if not nit:
-            resultado["errors"].append("NIT es obligatorio para generar expediente")
-            return resultado
-
-        # 1. CREAR CARPETA PRINCIPAL DE LA EMPRESA
-        # Generar nombre seguro: NIT_NombreEmpresa (sin caracteres especiales)
-        nombre_sanitizado = re.sub(r'[^\w\s-]', '', nombre_empresa)
-        nombre_sanitizado = re.sub(r'[-\s]+', '_', nombre_sanitizado).strip('_')
-        nombre_carpeta = f"{nit}_{nombre_sanitizado}"
-
-        carpeta_empresa = os.path.join(RUTA_BASE_EXPEDIENTES, nombre_carpeta)
-        os.makedirs(carpeta_empresa, exist_ok=True)
-        resultado["path"] = carpeta_empresa
-        resultado["rutas_bd"]["ruta_carpeta"] = os.path.relpath(carpeta_empresa, start=r"D:\Mi-App-React\MONTERO_NEGOCIO")
-        logger.info(f"📁 Carpeta empresa creada/verificada: {carpeta_empresa}")
-
-        # 2. CREAR SUBCARPETAS OBLIGATORIAS
-        subcarpetas = [
-            "COTIZACIONES",
-            "EXTRACTOS BANCARIOS",
-            "OTROS_ADJUNTOS",
-            "PAGO DE IMPUESTOS",
-            "USUARIOS Y CONTRASEÑAS"
-        ]
-
-        for subcarpeta in subcarpetas:
-            ruta_subcarpeta = os.path.join(carpeta_empresa, subcarpeta)
-            os.makedirs(ruta_subcarpeta, exist_ok=True)
-            logger.debug(f"  ✓ Subcarpeta creada: {subcarpeta}")
-
-        resultado["files_created"].append(f"Estructura de {len(subcarpetas)} carpetas")
-
-        # 3. GENERAR ARCHIVO datos.txt CON TODA LA INFORMACIÓN
-        archivo_datos = os.path.join(carpeta_empresa, "datos.txt")
-
-        contenido = f"""
+    if not nit:
+        plan["errores"].append("NIT es obligatorio para generar expediente")
+        return plan
+
+    # 1. CARPETA PRINCIPAL: NIT_NombreEmpresa (sin caracteres especiales)
+    nombre_sanitizado = re.sub(r'[^\w\s-]', '', nombre_empresa)
+    nombre_sanitizado = re.sub(r'[-\s]+', '_', nombre_sanitizado).strip('_')
+    nombre_carpeta = f"{nit}_{nombre_sanitizado}"
+
+    carpeta_empresa = os.path.join(RUTA_BASE_EXPEDIENTES, nombre_carpeta)
+    plan["carpeta"] = carpeta_empresa
+    plan["rutas_bd"]["ruta_carpeta"] = _ruta_bd(carpeta_empresa)
+
+    # 2. SUBCARPETAS OBLIGATORIAS
+    plan["directorios"] = [carpeta_empresa] + [
+        os.path.join(carpeta_empresa, subcarpeta) for subcarpeta in SUBCARPETAS_EXPEDIENTE_EMPRESA
+    ]
+
+    # 3. ARCHIVO datos.txt CON TODA LA INFORMACIÓN
+    contenido = f"""
 {'=' * 80}
                      INFORMACIÓN DE LA EMPRESA
 {'=' * 80}
@@ -166,104 +189,109 @@ Fecha de Generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 {'=' * 80}
 """
 
-        with open(archivo_datos, "w", encoding="utf-8") as f:
-            f.write(contenido)
-
-        resultado["files_created"].append("datos.txt")
-        logger.info(f"📄 Archivo datos.txt creado/actualizado")
+    plan["textos"].append({
+        "nombre": "datos.txt",
+        "ruta": os.path.join(carpeta_empresa, "datos.txt"),
+        "contenido": contenido,
+    })
+
+    # 4. FIRMA DIGITAL Y LOGO (BASE64 desde JSON)
+    imagenes = [
+        ("firma_digital", "Firma digital", "firma_representante.png", "ruta_firma"),
+        ("logo_empresa", "Logo", "logo.png", "ruta_logo"),
+    ]
+    for campo, etiqueta, nombre_archivo, campo_bd in imagenes:
+        valor = empresa_data.get(campo)
+        if valor and isinstance(valor, str):
+            sha256 = _imagen_base64_a_blob(valor, etiqueta, plan)
+            if sha256:
+                ruta_destino = os.path.join(carpeta_empresa, nombre_archivo)
+                plan["blobs"].append({"nombre": nombre_archivo, "ruta": ruta_destino, "sha256": sha256})
+                plan["rutas_bd"][campo_bd] = _ruta_bd(ruta_destino)
+
+    # 5. ARCHIVOS ADJUNTOS (PDFs desde request.files)
+    if archivos_request:
+        for field_name, (nombre_archivo, campo_bd) in ARCHIVOS_EXPEDIENTE_EMPRESA.items():
+            if field_name in archivos_request:
+                archivo = archivos_request[field_name]
+                try:
+                    # Validar extensión
+                    if not archivo.filename.lower().endswith('.pdf'):
+                        plan["errores"].append(f"{field_name}: Solo se permiten archivos PDF")
+                        continue
+
+                    # Deduplicado: el mismo RUT/cédula se almacena una sola vez
+                    ruta_destino = os.path.join(carpeta_empresa, nombre_archivo)
+                    plan["blobs"].append({
+                        "nombre": nombre_archivo,
+                        "ruta": ruta_destino,
+                        "sha256": guardar_blob(archivo)["sha256"],
+                    })
+                    plan["rutas_bd"][campo_bd] = _ruta_bd(ruta_destino)
+
+                except Exception as e:
+                    logger.error(f"❌ Error al guardar {field_name}: {e}", exc_info=True)
+                    plan["errores"].append(f"Error al guardar {field_name}: {str(e)}")
+
+    # Sin base64 en la huella (ya está representado por el hash del blob)
+    datos_huella = {k: v for k, v in empresa_data.items() if k not in ("firma_digital", "logo_empresa")}
+    plan["huella"] = calcular_huella(datos_huella, [b["sha256"] for b in plan["blobs"]])
+    return plan
 
-        # 4. GUARDAR FIRMA DIGITAL (BASE64 desde JSON)
-        firma_base64 = empresa_data.get("firma_digital")
-        if firma_base64 and isinstance(firma_base64, str):
-            try:
-                if "," in firma_base64:
-                    _, encoded = firma_base64.split(",", 1)
-                else:
-                    encoded = firma_base64
-
-                firma_bytes = base64.b64decode(encoded)
-
-                if len(firma_bytes) > 5 * 1024 * 1024:  # 5MB máximo
-                    resultado["errors"].append("Firma digital: Tamaño excedido (máximo 5MB)")
-                else:
-                    archivo_firma = os.path.join(carpeta_empresa, "firma_representante.png")
-                    with open(archivo_firma, "wb") as f:
-                        f.write(firma_bytes)
-
-                    resultado["files_created"].append("firma_representante.png")
-                    resultado["rutas_bd"]["ruta_firma"] = os.path.relpath(archivo_firma, start=r"D:\Mi-App-React\MONTERO_NEGOCIO")
-                    logger.info(f"✍️ Firma digital guardada: {len(firma_bytes)} bytes")
-
-            except Exception as e:
-                logger.error(f"❌ Error al guardar firma: {e}", exc_info=True)
-                resultado["errors"].append(f"Error al guardar firma: {str(e)}")
-
-        # 5. GUARDAR LOGO DE LA EMPRESA (BASE64 desde JSON)
-        logo_base64 = empresa_data.get("logo_empresa")
-        if logo_base64 and isinstance(logo_base64, str):
-            try:
-                if "," in logo_base64:
-                    _, encoded = logo_base64.split(",", 1)
-                else:
-                    encoded = logo_base64
-
-                logo_bytes = base64.b64decode(encoded)
-
-                if len(logo_bytes) > 5 * 1024 * 1024:  # 5MB máximo
-                    resultado["errors"].append("Logo: Tamaño excedido (máximo 5MB)")
-                else:
-                    archivo_logo = os.path.join(carpeta_empresa, "logo.png")
-                    with open(archivo_logo, "wb") as f:
-                        f.write(logo_bytes)
-
-                    resultado["files_created"].append("logo.png")
-                    resultado["rutas_bd"]["ruta_logo"] = os.path.relpath(archivo_logo, start=r"D:\Mi-App-React\MONTERO_NEGOCIO")
-                    logger.info(f"🖼️ Logo guardado: {len(logo_bytes)} bytes")
-
-            except Exception as e:
-                logger.error(f"❌ Error al guardar logo: {e}", exc_info=True)
-                resultado["errors"].append(f"Error al guardar logo: {str(e)}")
-
-        # 6. GUARDAR ARCHIVOS ADJUNTOS (PDFs desde request.files)
-        if archivos_request:
-            archivos_config = {
-                "rut": ("rut.pdf", "ruta_rut"),
-                "camara_comercio": ("camara_comercio.pdf", "ruta_camara_comercio"),
-                "cedula_representante": ("cedula_representante.pdf", "ruta_cedula_representante"),
-                "arl": ("arl.pdf", "ruta_arl"),
-                "cuenta_bancaria": ("cuenta_bancaria.pdf", "ruta_cuenta_bancaria"),
-                "carta_autorizacion": ("carta_autorizacion.pdf", "ruta_carta_autorizacion")
-            }
 
-            for field_name, (nombre_archivo, campo_bd) in archivos_config.items():
-                if field_name in archivos_request:
-                    archivo = archivos_request[field_name]
-                    try:
-                        # Validar extensión
-                        if not archivo.filename.lower().endswith('.pdf'):
-                            resultado["errors"].append(f"{field_name}: Solo se permiten archivos PDF")
-                            continue
+def generar_expediente_empresa(empresa_data: dict, archivos_request=None) -> dict:
+    """
+    Genera la estructura de carpetas y archivos para un expediente de empresa
+    de forma síncrona (los endpoints usan encolar_expediente_empresa).
 
-                        # Guardar archivo
-                        ruta_destino = os.path.join(carpeta_empresa, nombre_archivo)
-                        archivo.save(ruta_destino)
+    Args:
+        empresa_data: Diccionario con los datos de la empresa (nit, nombre_empresa, etc.)
+        archivos_request: request.files con los archivos adjuntos (PDFs, imágenes)
 
-                        resultado["files_created"].append(nombre_archivo)
-                        resultado["rutas_bd"][campo_bd] = os.path.relpath(ruta_destino, start=r"D:\Mi-App-React\MONTERO_NEGOCIO")
-                        logger.info(f"📎 Archivo guardado: {nombre_archivo}")
+    Returns:
+        dict: {"success": bool, "files_created": list, "errors": list, "path": str, "rutas_bd": dict}
+    """
+    plan = planificar_expediente_empresa(empresa_data, archivos_request)
+    if not plan["directorios"]:
+        return {"success": False, "files_created": [], "errors": plan["errores"], "path": "", "rutas_bd": {}}
+    resultado = ejecutar_plan(plan)
+    resultado["rutas_bd"] = plan["rutas_bd"]
+    registrar_carpeta_empresa(RUTA_BASE_EXPEDIENTES, plan["entidad_id"], plan["carpeta"])
+    return resultado
 
-                    except Exception as e:
-                        logger.error(f"❌ Error al guardar {field_name}: {e}", exc_info=True)
-                        resultado["errors"].append(f"Error al guardar {field_name}: {str(e)}")
 
-        resultado["success"] = True
-        logger.info(f"✅ Expediente generado exitosamente para empresa {nit}")
+def encolar_expediente_empresa(conn, plan: dict) -> dict:
+    """
+    Deja en cola (expediente_jobs) un plan de planificar_expediente_empresa.
+    Se llama después del commit de la empresa: el job no debe correr para
+    una empresa que aún no existe (o cuyo INSERT/UPDATE se revierte).
 
-    except Exception as e:
-        logger.error(f"❌ Error crítico al generar expediente: {e}", exc_info=True)
-        resultado["errors"].append(f"Error crítico: {str(e)}")
+    Returns:
+        dict: {"job_id", "path", "errors", "status_url"}; job_id es None si
+              el plan no es válido o no se pudo encolar (p. ej. falta la
+              migración 20251203_expediente_jobs.sql)
+    """
+    if not plan["directorios"]:
+        return {"job_id": None, "path": "", "errors": plan["errores"], "status_url": None}
 
-    return resultado
+    try:
+        job_id = encolar_expediente(conn, current_app.config["DATABASE_PATH"], plan)
+    except sqlite3.Error as e:
+        logger.error(f"❌ No se pudo encolar el expediente de la empresa {plan['entidad_id']}: {e}")
+        return {
+            "job_id": None,
+            "path": plan["carpeta"],
+            "errors": plan["errores"] + [f"No se pudo encolar el expediente: {e}"],
+            "status_url": None,
+        }
+    # La firma queda localizable por NIT sin rescanear EMPRESAS
+    registrar_carpeta_empresa(RUTA_BASE_EXPEDIENTES, plan["entidad_id"], plan["carpeta"])
+    return {
+        "job_id": job_id,
+        "path": plan["carpeta"],
+        "errors": plan["errores"],
+        "status_url": f"/api/expedientes/jobs/{job_id}",
+    }
 
 
 # ==============================================================================
@@ -382,18 +410,13 @@ def add_empresa():
             logger.warning(f"Intento de crear empresa con NIT duplicado: {nit}")
             return jsonify({"error": f"El NIT {nit} ya está registrado."}), 409
         
-        # ==================== FASE 3: GENERAR EXPEDIENTE FÍSICO ====================
-        logger.info(f"📁 Generando expediente físico para empresa {nit}...")
-        resultado_expediente = generar_expediente_empresa(empresa_data, archivos)
-        
-        if not resultado_expediente["success"]:
-            logger.error(f"❌ Error al generar expediente: {resultado_expediente['errors']}")
-            # No fallar la creación, pero advertir
-        
-        logger.info(f"✅ Archivos creados: {resultado_expediente['files_created']}")
+        # ==================== FASE 3: PLANIFICAR EXPEDIENTE FÍSICO ====================
+        # Las rutas para la BD salen del plan; el job se encola tras el commit
+        logger.info(f"📁 Planificando expediente físico para empresa {nit}...")
+        plan_expediente = planificar_expediente_empresa(empresa_data, archivos)
         
         # ==================== FASE 4: INSERTAR EN BASE DE DATOS ====================
-        rutas = resultado_expediente.get("rutas_bd", {})
+        rutas = plan_expediente["rutas_bd"] if plan_expediente["directorios"] else {}
         
         cursor = conn.execute(
             """
@@ -455,12 +478,22 @@ def add_empresa():
             f"✅ Nueva empresa creada: {empresa_data.get('nombre_empresa')} (ID: {nueva_empresa_id}, NIT: {nit}) por usuario {session.get('user_id')}"
         )
 
+        # ==================== FASE 5: ENCOLAR EXPEDIENTE FÍSICO ====================
+        resultado_expediente = encolar_expediente_empresa(conn, plan_expediente)
+        
+        if resultado_expediente["errors"]:
+            logger.error(f"❌ Error al generar expediente: {resultado_expediente['errors']}")
+            # No fallar la creación, pero advertir
+        
+        logger.info(f"✅ Expediente encolado: job {resultado_expediente['job_id']}")
+
         return jsonify({
             "message": "Empresa creada exitosamente.",
             "id": nueva_empresa_id,
             "nit": nit,
             "expediente": {
-                "archivos_creados": resultado_expediente["files_created"],
+                "job_id": resultado_expediente["job_id"],
+                "status_url": resultado_expediente["status_url"],
                 "errores": resultado_expediente["errors"],
                 "ruta": resultado_expediente["path"]
             }
@@ -485,6 +518,7 @@ def add_empresa():
 
 @empresas_bp.route("", methods=["GET"])
 @login_required
+@respuesta_condicional("empresas")
 def get_empresas():
     """
     Obtiene lista de empresas con paginación opcional.
@@ -505,38 +539,46 @@ def get_empresas():
         offset = (page - 1) * per_page
         
         # Construir query con búsqueda opcional
+        expresion = expresion_match(search) if search else None
+        if expresion and fts_disponible(conn, "empresas"):
+            # Índice FTS5: prefijos por palabra, sin distinguir tildes
+            condicion, search_params = filtro_fts("empresas"), (expresion,)
+        elif search:
+            condicion = "nombre_empresa LIKE ? OR nit LIKE ?"
+            search_params = (f"%{search}%",) * 2
+
         if search:
-            count_query = "SELECT COUNT(*) FROM empresas WHERE nombre_empresa LIKE ? OR nit LIKE ?"
-            search_param = f"%{search}%"
-            total = conn.execute(count_query, (search_param, search_param)).fetchone()[0]
+            total = conn.execute(f"SELECT COUNT(*) FROM empresas WHERE {condicion}", search_params).fetchone()[0]
             
-            empresas = conn.execute(
-                """SELECT nit, nombre_empresa, ciudad_empresa, created_at 
+            # Las filas se serializan a JSON dentro de SQLite (sin dict por fila)
+            items_json, cantidad = filas_json(
+                conn,
+                f"""SELECT nit, nombre_empresa, ciudad_empresa, created_at 
                    FROM empresas 
-                   WHERE nombre_empresa LIKE ? OR nit LIKE ?
+                   WHERE {condicion}
                    ORDER BY nombre_empresa 
                    LIMIT ? OFFSET ?""",
-                (search_param, search_param, per_page, offset)
-            ).fetchall()
+                search_params + (per_page, offset)
+            )
         else:
             total = conn.execute("SELECT COUNT(*) FROM empresas").fetchone()[0]
-            empresas = conn.execute(
+            items_json, cantidad = filas_json(
+                conn,
                 """SELECT nit, nombre_empresa, ciudad_empresa, created_at 
                    FROM empresas 
                    ORDER BY nombre_empresa 
                    LIMIT ? OFFSET ?""",
                 (per_page, offset)
-            ).fetchall()
+            )
 
-        logger.debug(f"✅ Se consultaron {len(empresas)} empresas (página {page})")
+        logger.debug(f"✅ Se consultaron {cantidad} empresas (página {page})")
 
-        return jsonify({
-            "items": [dict(row) for row in empresas],
+        return respuesta_json(current_app, {
             "total_items": total,
             "page": page,
             "per_page": per_page,
             "total_pages": (total + per_page - 1) // per_page
-        }), 200
+        }, items=items_json)
 
     except Exception as e:
         logger.error(f"❌ Error al obtener lista de empresas: {e}", exc_info=True)
@@ -549,8 +591,51 @@ def get_empresas():
             conn.close()
 
 
+@empresas_bp.route("/sugerencias", methods=["GET"])
+@login_required
+@respuesta_condicional("empresas")
+def get_sugerencias_empresas():
+    """
+    Autocompletado de empresas por nombre, NIT o correo (índice FTS5).
+    Query params:
+      - q: texto escrito (prefijos por palabra, sin distinguir tildes); sin
+        sugerencias hasta que una palabra tenga 3 caracteres
+      - limit: máximo de sugerencias (default: 10, max: 50)
+    Ordenadas por relevancia (bm25) entre todas las coincidencias.
+    """
+    conn = None
+    try:
+        texto = request.args.get("q", "", type=str).strip()
+        limite = max(1, min(request.args.get("limit", 10, type=int), 50))
+        columnas = ("nit", "nombre_empresa", "ciudad_empresa")
+
+        conn = get_db_connection()
+        if fts_disponible(conn, "empresas"):
+            filas = sugerencias(conn, "empresas", texto, columnas, limite)
+        elif texto:
+            filas = conn.execute(
+                f"""SELECT {', '.join(columnas)} FROM empresas
+                    WHERE nombre_empresa LIKE ? OR nit LIKE ?
+                    ORDER BY nombre_empresa LIMIT ?""",
+                (f"{texto}%", f"{texto}%", limite),
+            ).fetchall()
+        else:
+            filas = []
+
+        items = [dict(fila) for fila in filas]
+        return jsonify({"items": items, "total_items": len(items)})
+
+    except Exception as e:
+        logger.error(f"❌ Error en sugerencias de empresas: {e}", exc_info=True)
+        return jsonify({"error": "Error interno del servidor al buscar empresas."}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @empresas_bp.route("/<string:nit>", methods=["GET"])
 @login_required
+@respuesta_condicional("empresas")
 def get_empresa_by_nit(nit):
     """
     Obtiene los detalles de una empresa específica por su NIT.
@@ -732,17 +817,13 @@ def update_empresa(nit):
                 logger.warning(f"Conflicto de NIT. {nuevo_nit} ya existe.")
                 return jsonify({"error": f"El nuevo NIT {nuevo_nit} ya está en uso."}), 409
         
-        # ==================== FASE 3: ACTUALIZAR EXPEDIENTE FÍSICO ====================
-        logger.info(f"📁 Actualizando expediente físico...")
-        resultado_expediente = generar_expediente_empresa(empresa_data, archivos)
-        
-        if not resultado_expediente["success"]:
-            logger.warning(f"⚠️ Errores en expediente: {resultado_expediente['errors']}")
-        
-        logger.info(f"✅ Archivos actualizados: {resultado_expediente['files_created']}")
+        # ==================== FASE 3: PLANIFICAR ACTUALIZACIÓN DEL EXPEDIENTE ====================
+        # Las rutas para la BD salen del plan; el job se encola tras el commit
+        logger.info(f"📁 Planificando actualización del expediente físico...")
+        plan_expediente = planificar_expediente_empresa(empresa_data, archivos)
         
         # ==================== FASE 4: ACTUALIZAR BASE DE DATOS ====================
-        rutas = resultado_expediente.get("rutas_bd", {})
+        rutas = plan_expediente["rutas_bd"] if plan_expediente["directorios"] else {}
         
         # Construir consulta dinámica solo con campos proporcionados
         update_fields = []
@@ -810,12 +891,21 @@ def update_empresa(nit):
         conn.commit()
         
         logger.info(f"✅ Empresa actualizada: NIT {nit} → {nuevo_nit or nit} por usuario {session.get('user_id')}")
+
+        # ==================== FASE 5: ENCOLAR ACTUALIZACIÓN DEL EXPEDIENTE ====================
+        resultado_expediente = encolar_expediente_empresa(conn, plan_expediente)
+        
+        if resultado_expediente["errors"]:
+            logger.warning(f"⚠️ Errores en expediente: {resultado_expediente['errors']}")
+        
+        logger.info(f"✅ Actualización de expediente encolada: job {resultado_expediente['job_id']}")
         
         return jsonify({
             "message": "Empresa actualizada exitosamente.",
             "nit": nuevo_nit or nit,
             "expediente": {
-                "archivos_actualizados": resultado_expediente["files_created"],
+                "job_id": resultado_expediente["job_id"],
+                "status_url": resultado_expediente["status_url"],
                 "errores": resultado_expediente["errors"]
             }
         }), 200
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+expedientes.py - Estado de jobs de expedientes y alta masiva
+============================================================
+La generación física de expedientes (carpetas, datos.txt, firmas y
+adjuntos) corre fuera de la petición (ver expediente_jobs.py). Este
+blueprint expone:
+
+    GET  /api/expedientes/jobs/<job_id>   Estado de un expediente
+    POST /api/expedientes/lote            Alta masiva (cientos a la vez)
+    GET  /api/expedientes/lote/<lote_id>  Progreso del lote
+"""
+from flask import Blueprint, current_app, jsonify, request
+
+from logger import logger
+
+# --- IMPORTACIÓN CENTRALIZADA ---
+try:
+    from ..expediente_jobs import encolar_lote, estado_job, estado_lote
+    from ..utils import get_db_connection, login_required
+    from .empresas import planificar_expediente_empresa
+    from .usuarios import planificar_expediente_usuario
+except (ImportError, ValueError):
+    from expediente_jobs import encolar_lote, estado_job, estado_lote
+    from utils import get_db_connection, login_required
+    from routes.empresas import planificar_expediente_empresa
+    from routes.usuarios import planificar_expediente_usuario
+# -------------------------------
+
+bp_expedientes = Blueprint("bp_expedientes", __name__, url_prefix="/api/expedientes")
+
+MAX_EXPEDIENTES_LOTE = 2000
+TAMANO_BLOQUE_IN = 500  # Límite prudente de parámetros por IN (...)
+
+
+def _filas_por_clave(conn, tabla, columna, valores):
+    """SELECT * FROM tabla WHERE columna IN (...) por bloques."""
+    filas = []
+    for inicio in range(0, len(valores), TAMANO_BLOQUE_IN):
+        bloque = valores[inicio:inicio + TAMANO_BLOQUE_IN]
+        marcadores = ", ".join("?" for _ in bloque)
+        filas.extend(
+            dict(f) for f in conn.execute(f"SELECT * FROM {tabla} WHERE {columna} IN ({marcadores})", bloque)
+        )
+    return filas
+
+
+@bp_expedientes.route("/jobs/<job_id>", methods=["GET"])
+@login_required
+def get_estado_job(job_id):
+    """Estado de un job de expediente (pendiente, en_proceso, completado, error)."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        job = estado_job(conn, job_id)
+        if not job:
+            return jsonify({"error": "Job de expediente no encontrado"}), 404
+        return jsonify(job), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error consultando job de expediente {job_id}: {e}", exc_info=True)
+        return jsonify({"error": "No se pudo consultar el estado del expediente"}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+@bp_expedientes.route("/lote", methods=["POST"])
+@login_required
+def crear_lote_expedientes():
+    """
+    Alta masiva de expedientes. Todos los directorios del lote se crean en
+    una sola pasada y los expedientes se materializan en paralelo.
+
+    Body JSON (cualquier combinación):
+        usuarios:   [ {datos del usuario, numeroId obligatorio}, ... ]
+        empresas:   [ {datos de la empresa, nit obligatorio}, ... ]
+        numeros_id: [ "123", ... ]  usuarios ya registrados en la BD
+        nits:       [ "900...", ... ] empresas ya registradas en la BD
+    """
+    conn = None
+    try:
+        datos = request.get_json(silent=True) or {}
+        usuarios = list(datos.get("usuarios") or [])
+        empresas = list(datos.get("empresas") or [])
+        numeros_id = [str(n) for n in datos.get("numeros_id") or []]
+        nits = [str(n) for n in datos.get("nits") or []]
+
+        if len(usuarios) + len(empresas) + len(numeros_id) + len(nits) > MAX_EXPEDIENTES_LOTE:
+            return jsonify({"error": f"Máximo {MAX_EXPEDIENTES_LOTE} expedientes por lote"}), 400
+
+        conn = get_db_connection()
+        if numeros_id:
+            usuarios.extend(_filas_por_clave(conn, "usuarios", "numeroId", numeros_id))
+        if nits:
+            empresas.extend(_filas_por_clave(conn, "empresas", "nit", nits))
+
+        planes = []
+        rechazados = []
+        for usuario in usuarios:
+            plan = planificar_expediente_usuario(usuario, usuario.get("firma_digital"))
+            if plan["directorios"]:
+                planes.append(plan)
+            else:
+                rechazados.append({"tipo": "usuario", "datos": usuario.get("numeroId"), "errores": plan["errores"]})
+        for empresa in empresas:
+            plan = planificar_expediente_empresa(empresa)
+            plan.pop("rutas_bd", None)
+            if plan["directorios"]:
+                planes.append(plan)
+            else:
+                rechazados.append({"tipo": "empresa", "datos": empresa.get("nit"), "errores": plan["errores"]})
+
+        if not planes:
+            return jsonify({"error": "No hay expedientes válidos en el lote", "rechazados": rechazados}), 400
+
+        lote_id, job_ids = encolar_lote(conn, current_app.config["DATABASE_PATH"], planes)
+        logger.info(f"📦 Lote de expedientes {lote_id}: {len(job_ids)} encolados, {len(rechazados)} rechazados")
+
+        return jsonify({
+            "success": True,
+            "lote_id": lote_id,
+            "encolados": len(job_ids),
+            "job_ids": job_ids,
+            "rechazados": rechazados,
+            "status_url": f"/api/expedientes/lote/{lote_id}",
+        }), 202
+
+    except Exception as e:
+        logger.error(f"❌ Error creando lote de expedientes: {e}", exc_info=True)
+        return jsonify({"error": f"Error creando lote de expedientes: {str(e)}"}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+@bp_expedientes.route("/lote/<lote_id>", methods=["GET"])
+@login_required
+def get_estado_lote(lote_id):
+    """Progreso de un lote: conteo por estado y expedientes con error."""
+    conn = None
+    try:
+        conn = get_db_connection()
+        estado = estado_lote(conn, lote_id)
+        if not estado["total"]:
+            return jsonify({"error": "Lote no encontrado"}), 404
+        return jsonify(estado), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error consultando lote {lote_id}: {e}", exc_info=True)
+        return jsonify({"error": "No se pudo consultar el lote"}), 500
+    finally:
+        if conn:
+            conn.close()
@@ -25,8 +25,10 @@ from logger import logger
 
 # ==================== IMPORTACIÓN DE UTILIDADES ====================
 try:
+    from ..indice_firmas import cargar_firma, obtener_indice
     from ..utils import get_db_connection, login_required
 except (ImportError, ValueError):
+    from indice_firmas import cargar_firma, obtener_indice
     from utils import get_db_connection, login_required
 
 # ==================== BLUEPRINTS ====================
@@ -89,15 +91,11 @@ def buscar_ruta_firma(tipo, id_clave):
         
         elif tipo == 'empresa':
             # Ruta: .../EMPRESAS/<NIT_NOMBRE>/firma_representante.png
-            ruta_empresas = os.path.join(BASE_DIR, 'EMPRESAS')
-            if os.path.exists(ruta_empresas):
-                # Buscar carpeta que empiece con el NIT
-                for carpeta in os.listdir(ruta_empresas):
-                    if carpeta.startswith(f"{id_clave}_"):
-                        ruta = os.path.join(ruta_empresas, carpeta, 'firma_representante.png')
-                        if os.path.exists(ruta):
-                            logger.info(f"✅ Firma Empresa encontrada: {ruta}")
-                            return ruta
+            # Índice NIT -> carpeta validado por mtime (sin listar EMPRESAS)
+            ruta = obtener_indice(os.path.join(BASE_DIR, 'EMPRESAS')).buscar(id_clave)
+            if ruta:
+                logger.info(f"✅ Firma Empresa encontrada: {ruta}")
+                return ruta
     except Exception as e:
         logger.warning(f"⚠️ Error buscando firma {tipo}: {e}")
     
@@ -330,8 +328,9 @@ def generar_pdf():
                             width = x2 - x1
                             height = y2 - y1
                             
+                            # Imagen ya decodificada y reducida (caché por mtime)
                             can.drawImage(
-                                firma_info['path'], 
+                                cargar_firma(firma_info['path']), 
                                 x1, y1, 
                                 width=width, 
                                 height=height, 
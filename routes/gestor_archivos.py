@@ -11,7 +11,12 @@ Fecha: 2025-11-30
 """
 
 import os
-from flask import Blueprint, request, jsonify, send_file, session
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, current_app, request, jsonify, send_file, session
 from functools import wraps
 from pathlib import Path
 
@@ -22,12 +27,21 @@ except ImportError:
     import logging
     logger = logging.getLogger(__name__)
 
+from utils import get_db_connection
+
 # Blueprint
 bp_archivos = Blueprint('archivos', __name__, url_prefix='/api/archivos')
 
 # Ruta base de archivos (configurable)
 BASE_UPLOADS_PATH = os.path.join('static', 'uploads', 'usuarios')
 
+# Límite de resultados devueltos por /buscar
+LIMITE_BUSQUEDA = 500
+
+# Escaneo en vivo: a partir de cuántas subcarpetas se reparte el trabajo en hilos
+UMBRAL_DIRECTORIO_ANCHO = 32
+MAX_HILOS_ESCANEO = min(8, (os.cpu_count() or 2) * 2)
+
 
 # =============================================================================
 # DECORADOR: AUTENTICACIÓN
@@ -51,13 +65,38 @@ def login_required(f):
 # FUNCIONES AUXILIARES
 # =============================================================================
 
-def construir_arbol_archivos(ruta_base: str, nivel_maximo: int = 5) -> dict:
+def _nodo_archivo(ruta: str, nombre: str, stat) -> dict:
+    """Arma el nodo de un archivo a partir de un único stat()."""
+    return {
+        'nombre': nombre,
+        'tipo': 'archivo',
+        'extension': os.path.splitext(nombre)[1].lower(),
+        'tamano': stat.st_size,
+        'tamano_legible': formato_tamano(stat.st_size),
+        'ruta_relativa': ruta.replace('\\', '/'),
+        'modificado': stat.st_mtime
+    }
+
+
+def _listar_entradas(ruta: str) -> list:
+    """Lista un directorio con os.scandir, ordenado por nombre."""
+    with os.scandir(ruta) as entradas:
+        return sorted(entradas, key=lambda entrada: entrada.name)
+
+
+def construir_arbol_archivos(ruta_base: str, nivel_maximo: int = 5, paralelo: bool = True) -> dict:
     """
-    Construye un árbol jerárquico de archivos y carpetas.
+    Construye un árbol jerárquico de archivos y carpetas escaneando el disco.
+
+    Usa os.scandir y reutiliza el stat de cada DirEntry (una llamada por
+    entrada). Los totales de cada carpeta se calculan a partir de los de sus
+    hijos, sin volver a recorrer el subárbol. Las carpetas con muchas
+    subcarpetas se escanean en paralelo con un pool de hilos.
 
     Args:
         ruta_base: Ruta raíz desde donde escanear
         nivel_maximo: Profundidad máxima a escanear (evita recursión infinita)
+        paralelo: Si es False, escanea todo en el hilo actual
 
     Returns:
         dict: Estructura de árbol
@@ -82,82 +121,119 @@ def construir_arbol_archivos(ruta_base: str, nivel_maximo: int = 5) -> dict:
                 ]
             }
     """
-    def escanear_directorio(ruta, nivel=0):
-        """Escanea recursivamente un directorio"""
-        if nivel > nivel_maximo:
+    def escanear_directorio(ruta, nivel, pool):
+        """Escanea un directorio; devuelve el nodo carpeta o None si no se puede leer"""
+        try:
+            entradas = _listar_entradas(ruta) if nivel < nivel_maximo else []
+        except PermissionError:
+            logger.warning(f"Sin permisos para leer: {ruta}")
             return None
 
-        if not os.path.exists(ruta):
-            return None
-
-        nombre = os.path.basename(ruta)
-
-        # Si es un archivo
-        if os.path.isfile(ruta):
-            extension = os.path.splitext(nombre)[1].lower()
-            tamano = os.path.getsize(ruta)
-
-            return {
-                'nombre': nombre,
-                'tipo': 'archivo',
-                'extension': extension,
-                'tamano': tamano,
-                'tamano_legible': formato_tamano(tamano),
-                'ruta_relativa': ruta.replace('\\', '/'),
-                'modificado': os.path.getmtime(ruta)
-            }
-
-        # Si es un directorio
-        elif os.path.isdir(ruta):
-            hijos = []
-
+        hijos = []
+        subcarpetas = []
+        for entrada in entradas:
+            ruta_completa = os.path.join(ruta, entrada.name)
             try:
-                for item in sorted(os.listdir(ruta)):
-                    ruta_completa = os.path.join(ruta, item)
-                    hijo = escanear_directorio(ruta_completa, nivel + 1)
-
-                    if hijo:
-                        hijos.append(hijo)
+                if entrada.is_dir():
+                    subcarpetas.append((len(hijos), ruta_completa))
+                    hijos.append(None)
+                elif entrada.is_file():
+                    hijos.append(_nodo_archivo(ruta_completa, entrada.name, entrada.stat()))
+            except OSError:
+                continue
+
+        # Solo el primer nivel "ancho" usa el pool; los hilos escanean su
+        # subárbol en serie para no bloquearse esperando al propio pool
+        if pool is not None and len(subcarpetas) >= UMBRAL_DIRECTORIO_ANCHO:
+            futuros = [(i, pool.submit(escanear_directorio, r, nivel + 1, None)) for i, r in subcarpetas]
+            for i, futuro in futuros:
+                hijos[i] = futuro.result()
+        else:
+            for i, ruta_sub in subcarpetas:
+                hijos[i] = escanear_directorio(ruta_sub, nivel + 1, pool)
+
+        hijos = [hijo for hijo in hijos if hijo]
+        total_archivos = 0
+        total_carpetas = 0
+        for hijo in hijos:
+            if hijo['tipo'] == 'archivo':
+                total_archivos += 1
+            else:
+                total_archivos += hijo['total_archivos']
+                total_carpetas += hijo['total_carpetas'] + 1
+
+        return {
+            'nombre': os.path.basename(ruta),
+            'tipo': 'carpeta',
+            'ruta_relativa': ruta.replace('\\', '/'),
+            'hijos': hijos,
+            'total_archivos': total_archivos,
+            'total_carpetas': total_carpetas
+        }
 
-            except PermissionError:
-                logger.warning(f"Sin permisos para leer: {ruta}")
-                return None
+    if os.path.isfile(ruta_base):
+        return _nodo_archivo(ruta_base, os.path.basename(ruta_base), os.stat(ruta_base))
+    if not os.path.isdir(ruta_base):
+        return None
 
-            return {
-                'nombre': nombre,
-                'tipo': 'carpeta',
-                'ruta_relativa': ruta.replace('\\', '/'),
-                'hijos': hijos,
-                'total_archivos': contar_archivos(hijos),
-                'total_carpetas': contar_carpetas(hijos)
-            }
+    if not paralelo:
+        return escanear_directorio(ruta_base, 0, None)
+    with ThreadPoolExecutor(max_workers=MAX_HILOS_ESCANEO) as pool:
+        return escanear_directorio(ruta_base, 0, pool)
 
-        return None
 
-    return escanear_directorio(ruta_base)
+def expandir_carpeta(ruta_carpeta: str) -> list:
+    """
+    Lista solo el primer nivel de una carpeta (expansión perezosa del árbol).
+    Las subcarpetas se devuelven sin hijos y con 'expandible': True.
+    """
+    hijos = []
+    for entrada in _listar_entradas(ruta_carpeta):
+        ruta_completa = os.path.join(ruta_carpeta, entrada.name)
+        try:
+            if entrada.is_dir():
+                hijos.append({
+                    'nombre': entrada.name,
+                    'tipo': 'carpeta',
+                    'ruta_relativa': ruta_completa.replace('\\', '/'),
+                    'expandible': True
+                })
+            elif entrada.is_file():
+                hijos.append(_nodo_archivo(ruta_completa, entrada.name, entrada.stat()))
+        except OSError:
+            continue
+    return hijos
 
 
 def contar_archivos(hijos: list) -> int:
-    """Cuenta recursivamente el total de archivos"""
+    """Cuenta el total de archivos usando los totales ya calculados de cada carpeta"""
     total = 0
     for hijo in hijos:
         if hijo['tipo'] == 'archivo':
             total += 1
         elif hijo['tipo'] == 'carpeta':
-            total += contar_archivos(hijo.get('hijos', []))
+            total += hijo.get('total_archivos', 0)
     return total
 
 
 def contar_carpetas(hijos: list) -> int:
-    """Cuenta recursivamente el total de carpetas"""
+    """Cuenta el total de carpetas usando los totales ya calculados de cada carpeta"""
     total = 0
     for hijo in hijos:
         if hijo['tipo'] == 'carpeta':
-            total += 1
-            total += contar_carpetas(hijo.get('hijos', []))
+            total += 1 + hijo.get('total_carpetas', 0)
     return total
 
 
+def _tamano_arbol(nodo: dict) -> int:
+    """Suma el tamaño de los archivos de un árbol escaneado."""
+    if not nodo:
+        return 0
+    if nodo['tipo'] == 'archivo':
+        return nodo['tamano']
+    return sum(_tamano_arbol(hijo) for hijo in nodo['hijos'])
+
+
 def formato_tamano(bytes_size: int) -> str:
     """
     Convierte bytes a formato legible (KB, MB, GB).
@@ -175,6 +251,351 @@ def formato_tamano(bytes_size: int) -> str:
     return f"{bytes_size:.1f} PB"
 
 
+# =============================================================================
+# CATÁLOGO INDEXADO DE ARCHIVOS
+# =============================================================================
+# El árbol y la búsqueda se sirven desde la tabla archivos_catalogo (migración
+# 20251201_archivos_catalogo.sql) en lugar de recorrer el disco en cada
+# petición. Las peticiones solo leen el catálogo y comparan el mtime de las
+# carpetas; el catálogo se reconstruye con indexar_usuario():
+#   - en segundo plano (programar_reindexado) cuando una carpeta cambió
+#   - cada noche para todos los usuarios (celery_tasks.reindexar_catalogo_archivos),
+#     que también recoge archivos sobrescritos en su lugar
+#   - bajo demanda con POST /api/archivos/reindexar/<usuario_id>
+
+SQL_INSERTAR_CATALOGO = """
+    INSERT INTO archivos_catalogo (
+        usuario_id, ruta_relativa, ruta_padre, nombre, tipo,
+        extension, tamano, modificado, profundidad, indexado_en
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(ruta_relativa) DO UPDATE SET
+        tipo = excluded.tipo,
+        extension = excluded.extension,
+        tamano = excluded.tamano,
+        modificado = excluded.modificado,
+        indexado_en = excluded.indexado_en
+"""
+
+MAX_HILOS_REINDEXADO = 2
+
+_reindexado_executor = None
+_reindexado_pendientes = set()
+_reindexado_lock = threading.Lock()
+
+
+def estado_catalogo(conn) -> tuple:
+    """
+    Lee en sqlite_master si la migración del catálogo está aplicada.
+
+    Returns:
+        tuple: (catalogo_disponible, fts_disponible)
+    """
+    tablas = {
+        fila[0] for fila in conn.execute(
+            "SELECT name FROM sqlite_master WHERE name IN ('archivos_catalogo', 'archivos_catalogo_fts')"
+        )
+    }
+    if 'archivos_catalogo' not in tablas:
+        logger.warning("⚠️ Falta archivos_catalogo: aplique migrations/20251201_archivos_catalogo.sql")
+    return 'archivos_catalogo' in tablas, 'archivos_catalogo_fts' in tablas
+
+
+def _normalizar_ruta(ruta: str) -> str:
+    return ruta.replace('\\', '/')
+
+
+def _fila_catalogo(usuario_id, ruta, ruta_padre, profundidad, es_carpeta, stat, ahora):
+    """Arma la tupla de inserción para una entrada del disco."""
+    nombre = os.path.basename(ruta)
+    return (
+        usuario_id,
+        _normalizar_ruta(ruta),
+        _normalizar_ruta(ruta_padre) if ruta_padre else None,
+        nombre,
+        'carpeta' if es_carpeta else 'archivo',
+        None if es_carpeta else os.path.splitext(nombre)[1].lower(),
+        0 if es_carpeta else stat.st_size,
+        stat.st_mtime,
+        profundidad,
+        ahora,
+    )
+
+
+def _recorrer_para_catalogo(usuario_id: str, ruta_usuario: str):
+    """
+    Recorre la carpeta del usuario con os.scandir y produce filas del catálogo.
+    Usa el stat del DirEntry, así que cada entrada cuesta una sola llamada.
+    """
+    ahora = time.time()
+    yield _fila_catalogo(usuario_id, ruta_usuario, None, 0, True, os.stat(ruta_usuario), ahora)
+
+    pendientes = [(ruta_usuario, 1)]
+    while pendientes:
+        carpeta, profundidad = pendientes.pop()
+        try:
+            with os.scandir(carpeta) as entradas:
+                for entrada in entradas:
+                    try:
+                        es_carpeta = entrada.is_dir(follow_symlinks=False)
+                        if not es_carpeta and not entrada.is_file():
+                            continue
+                        stat = entrada.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    ruta = os.path.join(carpeta, entrada.name)
+                    yield _fila_catalogo(usuario_id, ruta, carpeta, profundidad, es_carpeta, stat, ahora)
+                    if es_carpeta:
+                        pendientes.append((ruta, profundidad + 1))
+        except PermissionError:
+            logger.warning(f"Sin permisos para leer: {carpeta}")
+
+
+def indexar_usuario(conn, usuario_id: str, ruta_usuario: str = None) -> int:
+    """
+    Reconstruye el catálogo de un usuario a partir del disco en una sola transacción.
+
+    Returns:
+        int: Número de entradas (archivos + carpetas) indexadas
+    """
+    if ruta_usuario is None:
+        ruta_usuario = os.path.join(BASE_UPLOADS_PATH, usuario_id)
+
+    filas = list(_recorrer_para_catalogo(usuario_id, ruta_usuario)) if os.path.isdir(ruta_usuario) else []
+
+    with conn:
+        conn.execute("DELETE FROM archivos_catalogo WHERE usuario_id = ?", (usuario_id,))
+        conn.executemany(SQL_INSERTAR_CATALOGO, filas)
+
+    logger.info(f"🗂️ Catálogo de {usuario_id} reindexado: {len(filas)} entradas")
+    return len(filas)
+
+
+def catalogo_vigente(conn, usuario_id: str) -> bool:
+    """
+    Comprueba si el catálogo del usuario sigue reflejando el disco.
+
+    Solo hace stat() de las carpetas (no de cada archivo): crear, borrar o
+    renombrar una entrada cambia el mtime de la carpeta que la contiene. Un
+    archivo sobrescrito en su lugar lo recoge el reindexado nocturno.
+    """
+    carpetas = conn.execute(
+        "SELECT ruta_relativa, modificado FROM archivos_catalogo WHERE usuario_id = ? AND tipo = 'carpeta'",
+        (usuario_id,),
+    ).fetchall()
+    if not carpetas:
+        return False
+
+    for ruta, modificado in carpetas:
+        try:
+            if os.stat(ruta).st_mtime != modificado:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _reindexar_en_segundo_plano(db_path: str, usuario_id: str, ruta_usuario: str) -> None:
+    try:
+        conn = sqlite3.connect(db_path, timeout=30)
+        try:
+            indexar_usuario(conn, usuario_id, ruta_usuario)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"❌ Error reindexando el catálogo de {usuario_id}: {e}", exc_info=True)
+    finally:
+        with _reindexado_lock:
+            _reindexado_pendientes.discard(usuario_id)
+
+
+def programar_reindexado(db_path: str, usuario_id: str, ruta_usuario: str = None) -> bool:
+    """
+    Encola indexar_usuario() en un hilo de fondo (uno a la vez por usuario)
+    para que la petición que detectó el cambio no escanee el disco.
+
+    Returns:
+        bool: False si ya había un reindexado pendiente para el usuario
+    """
+    global _reindexado_executor
+    if ruta_usuario is None:
+        ruta_usuario = os.path.join(BASE_UPLOADS_PATH, usuario_id)
+    with _reindexado_lock:
+        if usuario_id in _reindexado_pendientes:
+            return False
+        _reindexado_pendientes.add(usuario_id)
+        if _reindexado_executor is None:
+            _reindexado_executor = ThreadPoolExecutor(
+                max_workers=MAX_HILOS_REINDEXADO, thread_name_prefix="catalogo"
+            )
+    _reindexado_executor.submit(_reindexar_en_segundo_plano, db_path, usuario_id, ruta_usuario)
+    return True
+
+
+def reindexar_todos(conn) -> dict:
+    """Reindexa cada carpeta de usuario bajo BASE_UPLOADS_PATH (tarea nocturna)."""
+    resumen = {'usuarios': 0, 'entradas': 0}
+    if not os.path.isdir(BASE_UPLOADS_PATH):
+        return resumen
+    with os.scandir(BASE_UPLOADS_PATH) as entradas:
+        usuarios = sorted(entrada.name for entrada in entradas if entrada.is_dir())
+    for usuario_id in usuarios:
+        resumen['entradas'] += indexar_usuario(conn, usuario_id)
+        resumen['usuarios'] += 1
+    # Usuarios cuya carpeta ya no existe
+    with conn:
+        conn.execute(
+            f"DELETE FROM archivos_catalogo WHERE usuario_id NOT IN ({', '.join('?' * len(usuarios))})",
+            usuarios,
+        )
+    return resumen
+
+
+def _buscar_en_arbol(arbol: dict, texto: str = '', extension: str = '', limite: int = LIMITE_BUSQUEDA) -> list:
+    """Búsqueda por subcadena sobre un árbol escaneado (usuario aún sin catálogo)."""
+    resultados = []
+    pendientes = [arbol] if arbol else []
+    while pendientes:
+        nodo = pendientes.pop()
+        for hijo in nodo.get('hijos', []):
+            if hijo['tipo'] == 'carpeta':
+                pendientes.append(hijo)
+            elif (not texto or texto.lower() in hijo['nombre'].lower()) and (not extension or hijo['extension'] == extension):
+                resultados.append({
+                    'nombre': hijo['nombre'],
+                    'ruta_relativa': hijo['ruta_relativa'],
+                    'carpeta': os.path.dirname(hijo['ruta_relativa']),
+                    'extension': hijo['extension'],
+                    'tamano': hijo['tamano'],
+                    'tamano_legible': hijo['tamano_legible'],
+                })
+    resultados.sort(key=lambda r: r['ruta_relativa'])
+    return resultados[:limite]
+
+
+def construir_arbol_desde_catalogo(conn, usuario_id: str, nivel_maximo: int = 5):
+    """
+    Construye el mismo árbol que construir_arbol_archivos() pero con una sola
+    consulta al catálogo. Los totales se acumulan de abajo hacia arriba.
+
+    Returns:
+        tuple: (arbol, tamano_total_bytes) o (None, 0) si el usuario no está indexado
+    """
+    filas = conn.execute(
+        """
+        SELECT ruta_relativa, ruta_padre, nombre, tipo, extension, tamano, modificado
+        FROM archivos_catalogo
+        WHERE usuario_id = ? AND profundidad <= ?
+        ORDER BY profundidad, nombre
+        """,
+        (usuario_id, nivel_maximo),
+    ).fetchall()
+    if not filas:
+        return None, 0
+
+    nodos = {}
+    orden = []
+    raiz = None
+    for ruta, ruta_padre, nombre, tipo, extension, tamano, modificado in filas:
+        if tipo == 'archivo':
+            nodo = {
+                'nombre': nombre,
+                'tipo': 'archivo',
+                'extension': extension,
+                'tamano': tamano,
+                'tamano_legible': formato_tamano(tamano),
+                'ruta_relativa': ruta,
+                'modificado': modificado,
+            }
+        else:
+            nodo = {
+                'nombre': nombre,
+                'tipo': 'carpeta',
+                'ruta_relativa': ruta,
+                'hijos': [],
+                'total_archivos': 0,
+                'total_carpetas': 0,
+                '_tamano': 0,
+            }
+            nodos[ruta] = nodo
+            orden.append((nodo, ruta_padre))
+
+        if ruta_padre is None:
+            raiz = nodo
+        elif ruta_padre in nodos:
+            padre = nodos[ruta_padre]
+            padre['hijos'].append(nodo)
+            if tipo == 'archivo':
+                padre['total_archivos'] += 1
+                padre['_tamano'] += tamano or 0
+
+    # Acumular totales de las subcarpetas en sus padres (de la más profunda a la raíz)
+    for nodo, ruta_padre in reversed(orden):
+        padre = nodos.get(ruta_padre)
+        if padre is not None:
+            padre['total_archivos'] += nodo['total_archivos']
+            padre['total_carpetas'] += nodo['total_carpetas'] + 1
+            padre['_tamano'] += nodo['_tamano']
+
+    tamano_total = raiz.pop('_tamano', 0) if raiz else 0
+    for nodo, _ in orden:
+        nodo.pop('_tamano', None)
+    return raiz, tamano_total
+
+
+def _consulta_fts(texto: str) -> str:
+    """Convierte el texto del usuario en una consulta FTS5 de prefijos (recibo ene → "recibo"* AND "ene"*)."""
+    tokens = re.findall(r'[^\W_]+', texto.lower())
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+def buscar_en_catalogo(conn, usuario_id: str, texto: str = '', extension: str = '',
+                       limite: int = LIMITE_BUSQUEDA, fts_disponible: bool = True) -> list:
+    """
+    Busca archivos de un usuario por nombre usando el índice FTS5 del catálogo.
+    Si FTS5 no está disponible cae a LIKE sobre el nombre.
+    """
+    condiciones = ["c.usuario_id = ?", "c.tipo = 'archivo'"]
+    params = [usuario_id]
+    desde = "archivos_catalogo c"
+
+    consulta_fts = _consulta_fts(texto) if texto else ''
+    if consulta_fts and fts_disponible:
+        desde = "archivos_catalogo_fts f JOIN archivos_catalogo c ON c.id = f.rowid"
+        condiciones.append("archivos_catalogo_fts MATCH ?")
+        params.append(consulta_fts)
+    elif texto:
+        condiciones.append("LOWER(c.nombre) LIKE ?")
+        params.append(f"%{texto.lower()}%")
+
+    if extension:
+        condiciones.append("c.extension = ?")
+        params.append(extension)
+
+    params.append(limite)
+    filas = conn.execute(
+        f"""
+        SELECT c.nombre, c.ruta_relativa, c.ruta_padre, c.extension, c.tamano
+        FROM {desde}
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY c.ruta_relativa
+        LIMIT ?
+        """,
+        params,
+    ).fetchall()
+
+    return [
+        {
+            'nombre': nombre,
+            'ruta_relativa': ruta,
+            'carpeta': ruta_padre,
+            'extension': ext,
+            'tamano': tamano,
+            'tamano_legible': formato_tamano(tamano),
+        }
+        for nombre, ruta, ruta_padre, ext, tamano in filas
+    ]
+
+
 # =============================================================================
 # ENDPOINT: GET /api/archivos/arbol/<usuario_id>
 # =============================================================================
@@ -190,6 +611,7 @@ def obtener_arbol_archivos(usuario_id):
 
     Query Params:
         - nivel_maximo: Profundidad máxima de escaneo (default: 5)
+        - refrescar: Si es 1, programa el reindexado del catálogo en segundo plano
 
     Response JSON:
         {
@@ -204,9 +626,11 @@ def obtener_arbol_archivos(usuario_id):
                 "total_archivos": 45,
                 "total_carpetas": 8,
                 "tamano_total": "15.3 MB"
-            }
+            },
+            "indexando": false   # true si el catálogo se está reconstruyendo
         }
     """
+    conn = None
     try:
         # Parámetros
         nivel_maximo = request.args.get('nivel_maximo', 5, type=int)
@@ -214,7 +638,7 @@ def obtener_arbol_archivos(usuario_id):
         # Construir ruta del usuario
         ruta_usuario = os.path.join(BASE_UPLOADS_PATH, usuario_id)
 
-        logger.info(f"📂 Escaneando archivos de usuario: {usuario_id}, ruta: {ruta_usuario}")
+        logger.info(f"📂 Consultando archivos de usuario: {usuario_id}, ruta: {ruta_usuario}")
 
         # Verificar que la carpeta existe
         if not os.path.exists(ruta_usuario):
@@ -240,8 +664,23 @@ def obtener_arbol_archivos(usuario_id):
                 'mensaje': 'Carpeta creada (estaba vacía)'
             }), 200
 
-        # Construir árbol
-        arbol = construir_arbol_archivos(ruta_usuario, nivel_maximo)
+        # Servir el árbol desde el catálogo; si el usuario no está indexado,
+        # si cambió alguna carpeta o si se pide, se reindexa en segundo plano
+        conn = get_db_connection()
+        catalogo_disponible, _ = estado_catalogo(conn)
+        refrescar = request.args.get('refrescar', '').lower() in ('1', 'true', 'si')
+        indexando = False
+        if catalogo_disponible and (refrescar or not catalogo_vigente(conn, usuario_id)):
+            programar_reindexado(current_app.config['DATABASE_PATH'], usuario_id, ruta_usuario)
+            indexando = True
+
+        arbol, tamano_total_bytes = (
+            construir_arbol_desde_catalogo(conn, usuario_id, nivel_maximo) if catalogo_disponible else (None, 0)
+        )
+        if arbol is None:
+            # Aún sin catálogo: escaneo del disco (solo lectura) mientras se indexa
+            arbol = construir_arbol_archivos(ruta_usuario, nivel_maximo)
+            tamano_total_bytes = _tamano_arbol(arbol)
 
         if not arbol:
             return jsonify({
@@ -253,20 +692,6 @@ def obtener_arbol_archivos(usuario_id):
         total_archivos = arbol.get('total_archivos', 0)
         total_carpetas = arbol.get('total_carpetas', 0)
 
-        # Calcular tamaño total
-        def calcular_tamano_total(nodo):
-            """Suma recursiva de tamaños"""
-            if nodo['tipo'] == 'archivo':
-                return nodo.get('tamano', 0)
-            elif nodo['tipo'] == 'carpeta':
-                total = 0
-                for hijo in nodo.get('hijos', []):
-                    total += calcular_tamano_total(hijo)
-                return total
-            return 0
-
-        tamano_total_bytes = calcular_tamano_total(arbol)
-
         logger.info(f"✅ Árbol construido: {total_archivos} archivos, {total_carpetas} carpetas, {formato_tamano(tamano_total_bytes)}")
 
         return jsonify({
@@ -278,7 +703,8 @@ def obtener_arbol_archivos(usuario_id):
                 'total_carpetas': total_carpetas,
                 'tamano_total': formato_tamano(tamano_total_bytes),
                 'tamano_total_bytes': tamano_total_bytes
-            }
+            },
+            'indexando': indexando
         }), 200
 
     except Exception as e:
@@ -288,6 +714,70 @@ def obtener_arbol_archivos(usuario_id):
             'error': 'Error al obtener árbol de archivos',
             'detalle': str(e)
         }), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+# =============================================================================
+# ENDPOINT: GET /api/archivos/expandir/<usuario_id>
+# =============================================================================
+
+@bp_archivos.route('/expandir/<string:usuario_id>', methods=['GET'])
+@login_required
+def expandir_arbol_archivos(usuario_id):
+    """
+    Devuelve solo los hijos directos de una carpeta del usuario, para que la UI
+    cargue el árbol bajo demanda en lugar de pedir los 5 niveles de una vez.
+
+    Query Params:
+        - ruta: Subcarpeta relativa a la carpeta del usuario (default: raíz)
+
+    Response JSON:
+        {
+            "success": true,
+            "usuario_id": "1234567890",
+            "ruta_relativa": "static/uploads/usuarios/1234567890/2024",
+            "hijos": [
+                {"nombre": "Recibos", "tipo": "carpeta", "expandible": true, ...},
+                {"nombre": "cedula.pdf", "tipo": "archivo", "tamano": 1024, ...}
+            ]
+        }
+    """
+    try:
+        ruta_usuario = os.path.join(BASE_UPLOADS_PATH, usuario_id)
+        subruta = request.args.get('ruta', '').strip('/\\')
+        ruta_carpeta = os.path.normpath(os.path.join(ruta_usuario, subruta)) if subruta else ruta_usuario
+
+        # Evitar path traversal fuera de la carpeta del usuario
+        if os.path.commonpath([os.path.abspath(ruta_usuario), os.path.abspath(ruta_carpeta)]) != os.path.abspath(ruta_usuario):
+            return jsonify({
+                'success': False,
+                'error': 'Ruta no válida'
+            }), 400
+
+        if not os.path.isdir(ruta_carpeta):
+            return jsonify({
+                'success': False,
+                'error': 'Carpeta no encontrada'
+            }), 404
+
+        hijos = expandir_carpeta(ruta_carpeta)
+
+        return jsonify({
+            'success': True,
+            'usuario_id': usuario_id,
+            'ruta_relativa': ruta_carpeta.replace('\\', '/'),
+            'hijos': hijos
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error expandiendo carpeta: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Error al expandir carpeta',
+            'detalle': str(e)
+        }), 500
 
 
 # =============================================================================
@@ -366,7 +856,7 @@ def buscar_archivos():
 
     Query Params:
         - usuario_id: ID del usuario
-        - query: Término de búsqueda
+        - query: Término de búsqueda (prefijos de palabras del nombre, sin tildes)
         - extension: Filtrar por extensión (.pdf, .jpg, etc.)
 
     Response JSON:
@@ -382,6 +872,7 @@ def buscar_archivos():
             "total": 5
         }
     """
+    conn = None
     try:
         usuario_id = request.args.get('usuario_id')
         query = request.args.get('query', '').lower()
@@ -403,31 +894,24 @@ def buscar_archivos():
                 'mensaje': 'Usuario sin archivos'
             }), 200
 
-        # Buscar archivos
-        resultados = []
-
-        for root, dirs, files in os.walk(ruta_usuario):
-            for file in files:
-                # Filtro por nombre
-                if query and query not in file.lower():
-                    continue
-
-                # Filtro por extensión
-                extension = os.path.splitext(file)[1].lower()
-                if extension_filtro and extension != extension_filtro:
-                    continue
-
-                ruta_completa = os.path.join(root, file)
-                tamano = os.path.getsize(ruta_completa)
-
-                resultados.append({
-                    'nombre': file,
-                    'ruta_relativa': ruta_completa.replace('\\', '/'),
-                    'carpeta': os.path.dirname(ruta_completa).replace('\\', '/'),
-                    'extension': extension,
-                    'tamano': tamano,
-                    'tamano_legible': formato_tamano(tamano)
-                })
+        # Buscar en el catálogo (índice FTS sobre nombres); si el usuario no
+        # está indexado o cambió alguna carpeta se reindexa en segundo plano
+        conn = get_db_connection()
+        catalogo_disponible, fts_disponible = estado_catalogo(conn)
+        indexado = catalogo_disponible and conn.execute(
+            "SELECT 1 FROM archivos_catalogo WHERE usuario_id = ? LIMIT 1", (usuario_id,)
+        ).fetchone() is not None
+        if catalogo_disponible and not catalogo_vigente(conn, usuario_id):
+            programar_reindexado(current_app.config['DATABASE_PATH'], usuario_id, ruta_usuario)
+
+        if indexado:
+            resultados = buscar_en_catalogo(
+                conn, usuario_id, query, extension_filtro, fts_disponible=fts_disponible
+            )
+        else:
+            resultados = _buscar_en_arbol(
+                construir_arbol_archivos(ruta_usuario), query, extension_filtro
+            )
 
         logger.info(f"🔍 Búsqueda: '{query}', Resultados: {len(resultados)}")
 
@@ -444,6 +928,54 @@ def buscar_archivos():
             'error': 'Error en búsqueda',
             'detalle': str(e)
         }), 500
+    finally:
+        if conn:
+            conn.close()
+
+
+# =============================================================================
+# ENDPOINT: POST /api/archivos/reindexar/<usuario_id>
+# =============================================================================
+
+@bp_archivos.route('/reindexar/<string:usuario_id>', methods=['POST'])
+@login_required
+def reindexar_archivos(usuario_id):
+    """
+    Reconstruye el catálogo de archivos de un usuario desde el disco.
+
+    Response JSON:
+        {
+            "success": true,
+            "usuario_id": "1234567890",
+            "entradas": 53
+        }
+    """
+    conn = None
+    try:
+        conn = get_db_connection()
+        if not estado_catalogo(conn)[0]:
+            return jsonify({
+                'success': False,
+                'error': 'Falta el catálogo de archivos: aplique migrations/20251201_archivos_catalogo.sql'
+            }), 503
+        entradas = indexar_usuario(conn, usuario_id)
+
+        return jsonify({
+            'success': True,
+            'usuario_id': usuario_id,
+            'entradas': entradas
+        }), 200
+
+    except Exception as e:
+        logger.error(f"❌ Error reindexando archivos: {e}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': 'Error al reindexar archivos',
+            'detalle': str(e)
+        }), 500
+    finally:
+        if conn:
+            conn.close()
 
 
 if __name__ == "__main__":
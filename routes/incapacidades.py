@@ -9,6 +9,7 @@ from datetime import datetime
 from flask import Blueprint, jsonify, request, session
 from werkzeug.utils import secure_filename
 
+from blob_store import guardar_y_vincular
 from extensions import db
 from models.orm_models import Incapacidad, Usuario, Empresa
 from utils import login_required, USER_DATA_FOLDER, sanitize_and_save_file, validate_upload
@@ -154,7 +155,7 @@ def transferir_a_cliente(id):
         upload_path = _get_user_incapacidad_folder(incapacidad.usuario_id)
         comprobante_filename = f"comprobante_pago_{id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
         filepath = os.path.join(upload_path, secure_filename(comprobante_filename))
-        file.save(filepath)
+        guardar_y_vincular(file, filepath)
         ruta_guardada = os.path.relpath(filepath, USER_DATA_FOLDER)
         
         # Actualizar incapacidad
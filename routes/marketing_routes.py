@@ -15,6 +15,7 @@ from sqlalchemy import func, and_
 # Extensions y modelos ORM
 from extensions import db
 from models.orm_models import Prospecto, RedSocial, CampanaMarketing
+from logic.consultas import rango_prefijo
 
 # Utils
 try:
@@ -398,28 +399,26 @@ def api_delete_prospecto(prospecto_id):
 @bp_marketing.route("/api/stats", methods=["GET"])
 @login_required
 def api_get_stats():
-    """GET: Obtiene estadísticas generales del módulo de marketing."""
+    """
+    GET: Obtiene estadísticas generales del módulo de marketing.
+
+    Una sola sentencia con subconsultas escalares; "nuevos hoy" usa un rango
+    sobre fecha_registro (idx_prospectos_fecha_registro) en lugar de LIKE.
+    """
     try:
         from datetime import date
         
-        # Total de prospectos
-        total_prospectos = Prospecto.query.count()
-        
-        # Prospectos nuevos hoy
         hoy = date.today().strftime("%Y-%m-%d")
-        nuevos_hoy = Prospecto.query.filter(
-            Prospecto.fecha_registro.like(f"{hoy}%")
-        ).count()
-        
-        # Campañas activas
-        campanas_activas = CampanaMarketing.query.filter(
-            CampanaMarketing.estado == 'Activa'
-        ).count()
-        
-        # Total seguidores en redes
-        total_seguidores = db.session.query(
-            func.coalesce(func.sum(RedSocial.seguidores), 0)
-        ).scalar()
+        stats = db.session.query(
+            db.session.query(func.count(Prospecto.id)).scalar_subquery().label("total_prospectos"),
+            db.session.query(func.count(Prospecto.id))
+                .filter(rango_prefijo(Prospecto.fecha_registro, hoy)).scalar_subquery().label("nuevos_hoy"),
+            db.session.query(func.count(CampanaMarketing.id))
+                .filter(CampanaMarketing.estado == 'Activa').scalar_subquery().label("campanas_activas"),
+            db.session.query(func.coalesce(func.sum(RedSocial.seguidores), 0))
+                .scalar_subquery().label("total_seguidores"),
+        ).one()
+        total_prospectos, nuevos_hoy, campanas_activas, total_seguidores = stats
         
         return jsonify({
             "total_prospectos": total_prospectos,
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import base64
 import json
 from datetime import datetime
 
 from flask import Blueprint, jsonify, request, session
+from sqlalchemy import and_, or_, tuple_
 from logger import logger
 
 from extensions import db, mail
@@ -11,13 +13,89 @@ from utils import login_required, USER_DATA_FOLDER
 
 bp_novedades = Blueprint("bp_novedades", __name__, url_prefix="/api/novedades")
 
+# Campos que expone to_dict(); las columnas origen_* son internas
+CAMPOS_NOVEDAD = tuple(c.name for c in Novedad.__table__.columns if not c.name.startswith("origen_"))
+FILTROS_NOVEDAD = ("status", "priority", "assignedTo", "client")
+LIMITE_NOVEDADES = 100
+MAX_LIMITE_NOVEDADES = 500
+
+
+def _codificar_cursor(update_date, novedad_id):
+    """Cursor opaco (base64 url-safe) con la clave de orden de la última fila."""
+    return base64.urlsafe_b64encode(json.dumps([update_date, novedad_id]).encode("utf-8")).decode("ascii")
+
+
+def _decodificar_cursor(cursor):
+    """Inverso de _codificar_cursor; ValueError si el cursor no es válido."""
+    try:
+        update_date, novedad_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception as e:
+        raise ValueError("Cursor inválido") from e
+    if not isinstance(novedad_id, int) or not (update_date is None or isinstance(update_date, str)):
+        raise ValueError("Cursor inválido")
+    return update_date, novedad_id
+
+
+def _despues_del_cursor(update_date, novedad_id):
+    """
+    Filas que van después de (update_date, id) en ORDER BY updateDate DESC, id DESC.
+    SQLite ordena los NULL al final en DESC, así que van después de cualquier fecha.
+    """
+    if update_date is None:
+        return and_(Novedad.updateDate.is_(None), Novedad.id < novedad_id)
+    return or_(tuple_(Novedad.updateDate, Novedad.id) < (update_date, novedad_id), Novedad.updateDate.is_(None))
+
+
 @bp_novedades.route("", methods=["GET"])
 @login_required
 def get_novedades():
-    """Obtiene todas las novedades de la base de datos usando ORM."""
+    """
+    Lista novedades por páginas (keyset sobre updateDate, id), más recientes primero.
+
+    Query params:
+      - limit: filas por página (default: 100, max: 500)
+      - cursor: valor de la cabecera X-Next-Cursor de la página anterior
+      - status, priority, assignedTo, client: filtros por igualdad (indexados)
+      - fields: campos separados por coma; solo esas columnas se leen y
+        solo se decodifican los JSON pedidos (beneficiaries, history).
+        id y updateDate siempre se incluyen.
+
+    La respuesta sigue siendo una lista; si hay más filas se envía la
+    cabecera X-Next-Cursor para pedir la siguiente página.
+    """
     try:
-        novedades = Novedad.query.order_by(Novedad.updateDate.desc(), Novedad.creationDate.desc()).all()
-        return jsonify([novedad.to_dict() for novedad in novedades])
+        limite = min(max(request.args.get("limit", LIMITE_NOVEDADES, type=int), 1), MAX_LIMITE_NOVEDADES)
+
+        campos = CAMPOS_NOVEDAD
+        if request.args.get("fields"):
+            pedidos = [c.strip() for c in request.args["fields"].split(",") if c.strip()]
+            desconocidos = [c for c in pedidos if c not in CAMPOS_NOVEDAD]
+            if desconocidos:
+                return jsonify({"error": f"Campos desconocidos: {', '.join(desconocidos)}"}), 400
+            campos = tuple(dict.fromkeys(["id", "updateDate", *pedidos]))
+
+        columnas = Novedad.__table__.c
+        consulta = db.select(*(columnas[c] for c in campos))
+        for filtro in FILTROS_NOVEDAD:
+            valor = request.args.get(filtro)
+            if valor is not None:
+                consulta = consulta.where(columnas[filtro] == valor)
+
+        if request.args.get("cursor"):
+            try:
+                consulta = consulta.where(_despues_del_cursor(*_decodificar_cursor(request.args["cursor"])))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        filas = db.session.execute(
+            consulta.order_by(Novedad.updateDate.desc(), Novedad.id.desc()).limit(limite + 1)
+        ).mappings().all()
+
+        respuesta = jsonify([dict(fila) for fila in filas[:limite]])
+        if len(filas) > limite:
+            ultima = filas[limite - 1]
+            respuesta.headers["X-Next-Cursor"] = _codificar_cursor(ultima["updateDate"], ultima["id"])
+        return respuesta
     except Exception as e:
         logger.error(f"Error al obtener novedades: {e}", exc_info=True)
         return jsonify({"error": f"Error interno al obtener novedades: {str(e)}"}), 500
@@ -7,6 +7,7 @@ de impuestos y la consulta de registros.
 """
 import os
 import traceback
+from collections import Counter
 from datetime import datetime
 from flask import Blueprint, jsonify, request, session
 from werkzeug.utils import secure_filename
@@ -17,10 +18,12 @@ try:
     from ..utils import login_required, COMPANY_DATA_FOLDER, sanitize_and_save_file, log_file_upload
     from ..extensions import db
     from ..models.orm_models import PagoImpuesto, Empresa, Novedad
+    from ..logic.consultas import rango_anio
 except (ImportError, ValueError):
     from utils import login_required, COMPANY_DATA_FOLDER, sanitize_and_save_file, log_file_upload
     from extensions import db
     from models.orm_models import PagoImpuesto, Empresa, Novedad
+    from logic.consultas import rango_anio
 # -------------------------------
 
 def save_text_content(content, upload_path, filename):
@@ -400,20 +403,21 @@ def get_balance_impuestos():
             logger.warning(f"Intento de consultar balance para NIT no encontrado: {empresa_nit}")
             return jsonify({"error": f"Empresa con NIT {empresa_nit} no encontrada"}), 404
 
-        # Consultar impuestos del año especificado
-        # Filtrar por año en el campo fecha_limite (formato YYYY-MM-DD)
+        # Impuestos del año: rango sobre fecha_limite (idx_impuestos_empresa_fecha)
+        # en lugar de LIKE, ya ordenado por el índice
         impuestos = PagoImpuesto.query.filter(
             PagoImpuesto.empresa_nit == empresa_nit,
-            PagoImpuesto.fecha_limite.like(f"{anio}%")
+            rango_anio(PagoImpuesto.fecha_limite, anio_int)
         ).order_by(PagoImpuesto.fecha_limite.asc()).all()
 
         logger.debug(f"Balance consultado para {empresa_nit} año {anio}: {len(impuestos)} registros")
 
-        # Construir estadísticas
+        # Construir estadísticas en una sola pasada sobre las filas ya cargadas
+        por_estado = Counter(impuesto.estado for impuesto in impuestos)
         total_impuestos = len(impuestos)
-        impuestos_pagados = len([i for i in impuestos if i.estado == 'Pagado'])
-        impuestos_pendientes = len([i for i in impuestos if i.estado == 'Pendiente de Pago'])
-        impuestos_vencidos = len([i for i in impuestos if i.estado == 'Vencido'])
+        impuestos_pagados = por_estado['Pagado']
+        impuestos_pendientes = por_estado['Pendiente de Pago']
+        impuestos_vencidos = por_estado['Vencido']
 
         # Calcular totales (si existe campo valor en el modelo, si no, usar 0)
         total_pagado = 0.0
@@ -11,7 +11,6 @@ Fecha: 2025-11-30
 """
 
 import os
-import json
 from flask import Blueprint, request, jsonify, session
 from functools import wraps
 from datetime import datetime
@@ -19,6 +18,7 @@ from datetime import datetime
 # Importar motor PILA
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logic.auditoria_planilla import auditar_planilla_completa
 from logic.pila_engine import LiquidadorPILA
 
 # Logger
@@ -50,6 +50,29 @@ def login_required(f):
     return decorated_function
 
 
+# =============================================================================
+# MODELO GEMINI
+# =============================================================================
+
+def _crear_modelo():
+    """
+    Modelo Gemini para la auditoría (punto único para sustituirlo en pruebas).
+
+    Returns:
+        El modelo, o None si falta GEMINI_API_KEY.
+
+    Raises:
+        ImportError: Si google-generativeai no está instalado
+    """
+    import google.generativeai as genai
+
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        return None
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel('gemini-pro')
+
+
 # =============================================================================
 # ENDPOINT: POST /api/planillas/auditar
 # =============================================================================
@@ -64,6 +87,10 @@ def auditar_planilla():
     generar el archivo plano. Busca errores de IBC, días incoherentes,
     tarifas erradas, etc.
 
+    Todas las líneas reciben un puntaje de anomalía; solo las sospechosas
+    se envían al modelo, en bloques y en paralelo (ver
+    logic/auditoria_planilla.py).
+
     Request JSON:
         {
             "lineas": [
@@ -89,8 +116,10 @@ def auditar_planilla():
                 "errores": [...],
                 "advertencias": [...],
                 "sugerencias": [...],
-                "resumen_ia": "Análisis de Jordy..."
-            }
+                "resumen_ia": "Análisis de Jordy...",
+                "lineas_auditadas": [3, 17, ...]
+            },
+            "metricas": {"llamadas_modelo": 2, "latencia_total_ms": 850.0, "costo_estimado_usd": 0.0004, ...}
         }
     """
     try:
@@ -125,69 +154,13 @@ def auditar_planilla():
         advertencias_basicas = validacion_basica.get('advertencias', [])
 
         # =====================================================================
-        # PASO 2: PREPARAR DATOS PARA GEMINI
-        # =====================================================================
-
-        # Resumir datos para enviar a Gemini (no enviar todo el JSON)
-        resumen_lineas = []
-        for i, linea in enumerate(lineas[:10], start=1):  # Primeras 10 líneas
-            resumen_lineas.append({
-                "linea": i,
-                "empleado": linea.get('nombre_completo', 'SIN NOMBRE'),
-                "ibc": linea.get('ibc_calculado', 0),
-                "dias": linea.get('dias_cotizados', 0),
-                "total_aportes": linea.get('total_aportes', 0),
-                "marca_novedad": linea.get('marca_novedad', '')
-            })
-
-        # Construir prompt para Gemini
-        prompt_auditoria = f"""Actúa como Jordy, el auditor experto en PILA (seguridad social colombiana).
-
-Revisa las siguientes líneas de una planilla PILA para el mes {mes}:
-
-DATOS DE LA PLANILLA:
-- Total empleados: {len(lineas)}
-- Total aportes: ${validacion_basica.get('total_aportes', 0):,.0f}
-- Empresa NIT: {empresa_nit}
-
-PRIMERAS 10 LÍNEAS:
-{json.dumps(resumen_lineas, indent=2, ensure_ascii=False)}
-
-ERRORES DETECTADOS (validación básica):
-{json.dumps(errores_basicos, indent=2, ensure_ascii=False) if errores_basicos else "Ninguno"}
-
-TU MISIÓN:
-1. Busca errores en IBC (debe ser >= $1,300,000 para 30 días)
-2. Verifica coherencia de días cotizados (1-30)
-3. Valida tarifas de aportes:
-   - Salud empleado: 4% del IBC
-   - Pensión empleado: 4% del IBC
-   - ARL: 0.522% - 6.960% según clase de riesgo
-
-4. Identifica inconsistencias en marcas de novedad (IGE, RET, LGE, etc.)
-
-RESPONDE EN FORMATO JSON:
-{{
-    "estado": "APROBADO" o "ERRORES_ENCONTRADOS",
-    "errores_criticos": ["error 1", "error 2"],
-    "advertencias": ["advertencia 1"],
-    "sugerencias": ["sugerencia 1"],
-    "resumen": "Análisis breve (máximo 3 líneas)"
-}}
-
-Si todo está correcto, responde con estado "APROBADO" y resumen positivo."""
-
-        # =====================================================================
-        # PASO 3: LLAMAR A GEMINI AI
+        # PASO 2: MODELO GEMINI
         # =====================================================================
 
         try:
-            import google.generativeai as genai
-
-            # Configurar Gemini (API key debe estar en variable de entorno)
-            api_key = os.getenv('GEMINI_API_KEY')
+            model = _crear_modelo()
 
-            if not api_key:
+            if model is None:
                 logger.warning("⚠️ GEMINI_API_KEY no configurada, usando validación básica solamente")
 
                 return jsonify({
@@ -203,46 +176,27 @@ Si todo está correcto, responde con estado "APROBADO" y resumen positivo."""
                     'validacion_basica': validacion_basica
                 }), 200
 
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel('gemini-pro')
-
-            logger.info("🤖 Enviando planilla a Gemini para auditoría...")
-
-            response = model.generate_content(prompt_auditoria)
-            respuesta_texto = response.text
-
-            # Intentar parsear JSON de la respuesta
-            try:
-                # Limpiar markdown si viene con ```json
-                if '```json' in respuesta_texto:
-                    respuesta_texto = respuesta_texto.split('```json')[1].split('```')[0].strip()
-                elif '```' in respuesta_texto:
-                    respuesta_texto = respuesta_texto.split('```')[1].split('```')[0].strip()
+            # =================================================================
+            # PASO 3: AUDITORÍA POR BLOQUES (solo líneas sospechosas)
+            # =================================================================
 
-                auditoria_ia = json.loads(respuesta_texto)
+            logger.info("🤖 Enviando bloques sospechosos de la planilla a Gemini para auditoría...")
 
-            except json.JSONDecodeError:
-                logger.warning("⚠️ Respuesta de Gemini no es JSON válido, usando texto plano")
-                auditoria_ia = {
-                    'estado': 'ERRORES_ENCONTRADOS' if errores_basicos else 'APROBADO',
-                    'errores_criticos': errores_basicos,
-                    'advertencias': advertencias_basicas,
-                    'sugerencias': [],
-                    'resumen': respuesta_texto[:300]
-                }
+            reporte = auditar_planilla_completa(
+                lineas, model, validacion_basica, mes, empresa_nit, config=liquidador.config
+            )
+            metricas = reporte['metricas']
 
-            logger.info(f"✅ Auditoría IA completada: {auditoria_ia.get('estado')}")
+            logger.info(
+                f"✅ Auditoría IA completada: {reporte['auditoria']['estado']} - "
+                f"{metricas['lineas_auditadas']}/{metricas['lineas_totales']} líneas, "
+                f"{metricas['llamadas_modelo']} llamadas, {metricas['latencia_total_ms']} ms"
+            )
 
             return jsonify({
                 'success': True,
-                'auditoria': {
-                    'estado': auditoria_ia.get('estado', 'APROBADO'),
-                    'errores': auditoria_ia.get('errores_criticos', []),
-                    'advertencias': auditoria_ia.get('advertencias', []),
-                    'sugerencias': auditoria_ia.get('sugerencias', []),
-                    'resumen_ia': auditoria_ia.get('resumen', 'Sin resumen'),
-                    'metodo': 'gemini_ai'
-                },
+                'auditoria': reporte['auditoria'],
+                'metricas': metricas,
                 'validacion_basica': validacion_basica
             }), 200
 
@@ -336,8 +290,8 @@ def calcular_planilla():
         lineas = []
 
         for empleado in empleados:
-            # Calcular línea PILA para cada empleado
-            linea = liquidador.calcular_linea(
+            # Calcular línea PILA para cada empleado (compacta hasta serializar)
+            linea = liquidador.calcular_linea_compacta(
                 usuario=empleado,
                 dias_trabajados=empleado.get('dias_trabajados', 30),
                 novedades=empleado.get('novedades', [])
@@ -349,7 +303,7 @@ def calcular_planilla():
 
         return jsonify({
             'success': True,
-            'lineas': lineas,
+            'lineas': [linea.to_dict() for linea in lineas],
             'resumen': {
                 'total_empleados': len(lineas),
                 'total_aportes': validacion.get('total_aportes', 0),
@@ -15,7 +15,9 @@ Fecha: 30 de Noviembre de 2024
 
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime
+from sqlalchemy import func
 from extensions import db
+from logic.consultas import contar_si, conteos
 from models.orm_models import TareaUsuario
 from functools import wraps
 
@@ -40,6 +42,20 @@ def require_auth(f):
     return decorated_function
 
 
+# =============================================================================
+# ESTADÍSTICAS (una sola consulta con agregación condicional)
+# =============================================================================
+
+def _conteos_tareas(user_id):
+    """total/pendientes/completadas del usuario en una pasada sobre idx_tareas_user_completada."""
+    fila = db.session.query(
+        func.count(TareaUsuario.id).label('total'),
+        contar_si(TareaUsuario.completada == 0).label('pendientes'),
+        contar_si(TareaUsuario.completada == 1).label('completadas'),
+    ).filter(TareaUsuario.user_id == user_id).one()
+    return conteos(fila)
+
+
 # =============================================================================
 # ENDPOINTS
 # =============================================================================
@@ -88,15 +104,14 @@ def listar_tareas():
         tareas = query.order_by(TareaUsuario.completada.asc(), TareaUsuario.created_at.desc()).all()
         
         # Estadísticas
-        total_pendientes = TareaUsuario.query.filter_by(user_id=user_id, completada=0).count()
-        total_completadas = TareaUsuario.query.filter_by(user_id=user_id, completada=1).count()
+        stats = _conteos_tareas(user_id)
         
         return jsonify({
             'success': True,
             'tareas': [tarea.to_dict() for tarea in tareas],
             'total': len(tareas),
-            'pendientes': total_pendientes,
-            'completadas': total_completadas
+            'pendientes': stats['pendientes'],
+            'completadas': stats['completadas']
         }), 200
         
     except Exception as e:
@@ -309,9 +324,8 @@ def estadisticas_tareas():
     try:
         user_id = session.get('user_id')
         
-        total = TareaUsuario.query.filter_by(user_id=user_id).count()
-        pendientes = TareaUsuario.query.filter_by(user_id=user_id, completada=0).count()
-        completadas = TareaUsuario.query.filter_by(user_id=user_id, completada=1).count()
+        stats = _conteos_tareas(user_id)
+        total, pendientes, completadas = stats['total'], stats['pendientes'], stats['completadas']
         
         porcentaje = (completadas / total * 100) if total > 0 else 0.0
         
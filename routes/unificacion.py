@@ -7,14 +7,20 @@ Maneja la lógica de vinculación laboral y otros formularios unificados.
 import os
 import traceback
 from datetime import datetime
-from flask import Blueprint, jsonify, request, session, render_template
+from flask import Blueprint, current_app, jsonify, request, session, render_template
 from logger import logger
 
 # --- IMPORTACIÓN CENTRALIZADA ---
 try:
     from ..utils import get_db_connection, login_required
+    from ..json_provider import filas_json, respuesta_json
+    from ..cache_http import respuesta_condicional
+    from ..logic.consultas import sql_sin_administradores
 except (ImportError, ValueError):
     from utils import get_db_connection, login_required
+    from json_provider import filas_json, respuesta_json
+    from cache_http import respuesta_condicional
+    from logic.consultas import sql_sin_administradores
 # -------------------------------
 
 # ==============================================================================
@@ -24,6 +30,102 @@ except (ImportError, ValueError):
 bp_unificacion = Blueprint("bp_unificacion", __name__, url_prefix="/api/unificacion")
 
 
+# ==============================================================================
+# CONSULTAS MAESTRAS
+# ==============================================================================
+# La condición de roles se arma con sql_sin_administradores() para que
+# coincida con el índice parcial idx_usuarios_no_admin_nombre
+# (ver tests/test_planes_consulta.py)
+
+# Usuarios operativos (sin administradores) con su empresa, más recientes primero
+SQL_USUARIOS_MASTER = f"""
+            SELECT
+                u.id,
+                u.tipoId,
+                u.numeroId,
+                u.primerNombre,
+                u.segundoNombre,
+                u.primerApellido,
+                u.segundoApellido,
+                u.correoElectronico,
+                u.role,
+                u.estado,
+                u.empresa_nit,
+                u.fechaNacimiento,
+
+                -- ENTIDADES DE SEGURIDAD SOCIAL
+                u.epsNombre,
+                u.arlNombre,
+                u.claseRiesgoARL,
+                u.afpNombre,
+                u.ccfNombre,
+
+                -- DATOS LABORALES
+                u.fechaIngreso,
+                u.ibc,
+                u.administracion,
+
+                -- VALORES / COSTOS
+                u.epsCosto,
+                u.arlCosto,
+                u.afpCosto,
+                u.ccfCosto,
+
+                -- EMPRESA VINCULADA
+                e.nombre_empresa,
+                e.rep_legal_nombre,
+                e.nit as empresa_nit_verificado
+            FROM usuarios u
+            LEFT JOIN empresas e ON u.empresa_nit = e.nit
+            WHERE {sql_sin_administradores('u.role')}
+            ORDER BY u.id DESC
+        """
+
+# Igual, con alias para la vinculación masiva, ordenado por nombre (índice parcial)
+SQL_USUARIOS_MASTER_COMPLETO = f"""
+            SELECT
+                u.id,
+                u.tipoId,
+                u.numeroId,
+                u.primerNombre,
+                u.segundoNombre,
+                u.primerApellido,
+                u.segundoApellido,
+                u.correoElectronico,
+                u.role,
+                u.estado,
+                u.empresa_nit,
+                u.fechaNacimiento,
+                
+                -- SEGURIDAD SOCIAL
+                u.epsNombre as eps_nombre,
+                u.arlNombre as arl_nombre,
+                u.claseRiesgoARL as riesgo_nivel,
+                u.afpNombre as pension_nombre,
+                u.ccfNombre as caja_nombre,
+                
+                -- DATOS LABORALES
+                u.fechaIngreso as fecha_ingreso,
+                strftime('%Y-%m', u.fechaIngreso) as mes_ingreso,
+                u.ibc,
+                u.administracion,
+                
+                -- COSTOS / APORTES
+                u.epsCosto as aporte_eps,
+                u.arlCosto as aporte_arl,
+                u.afpCosto as aporte_pension,
+                u.ccfCosto as aporte_caja,
+                
+                -- EMPRESA
+                e.nombre_empresa,
+                e.nit as empresa_nit_verificado
+            FROM usuarios u
+            LEFT JOIN empresas e ON u.empresa_nit = e.nit
+            WHERE {sql_sin_administradores('u.role')}
+            ORDER BY u.primerNombre, u.primerApellido
+        """
+
+
 # ==============================================================================
 # ENDPOINTS
 # ==============================================================================
@@ -130,6 +232,7 @@ def formulario_vinculacion(user_id):
 
 @bp_unificacion.route("/master", methods=["GET"])
 @login_required
+@respuesta_condicional("usuarios", "empresas", por_dia=True)
 def get_master_unification():
     """
     Obtiene la vista maestra unificada de Usuarios y Empresas.
@@ -165,48 +268,7 @@ def get_master_unification():
         # =======================================================================
         # ✅ FILTRO CRÍTICO: Excluir admin, superadmin, administrador
         # ✅ INCLUYE: Entidades de Seguridad Social, Costos, IBC, Fechas
-        query_users = """
-            SELECT
-                u.id,
-                u.tipoId,
-                u.numeroId,
-                u.primerNombre,
-                u.segundoNombre,
-                u.primerApellido,
-                u.segundoApellido,
-                u.correoElectronico,
-                u.role,
-                u.estado,
-                u.empresa_nit,
-                u.fechaNacimiento,
-
-                -- ENTIDADES DE SEGURIDAD SOCIAL
-                u.epsNombre,
-                u.arlNombre,
-                u.claseRiesgoARL,
-                u.afpNombre,
-                u.ccfNombre,
-
-                -- DATOS LABORALES
-                u.fechaIngreso,
-                u.ibc,
-                u.administracion,
-
-                -- VALORES / COSTOS
-                u.epsCosto,
-                u.arlCosto,
-                u.afpCosto,
-                u.ccfCosto,
-
-                -- EMPRESA VINCULADA
-                e.nombre_empresa,
-                e.rep_legal_nombre,
-                e.nit as empresa_nit_verificado
-            FROM usuarios u
-            LEFT JOIN empresas e ON u.empresa_nit = e.nit
-            WHERE LOWER(u.role) NOT IN ('admin', 'superadmin', 'administrador', 'super')
-            ORDER BY u.id DESC
-        """
+        query_users = SQL_USUARIOS_MASTER
 
         logger.debug("🔍 Ejecutando consulta maestra de usuarios...")
         usuarios_raw = conn.execute(query_users).fetchall()
@@ -233,10 +295,10 @@ def get_master_unification():
         """
 
         logger.debug("🔍 Ejecutando consulta de empresas...")
-        empresas_raw = conn.execute(query_empresas).fetchall()
-        empresas = [dict(row) for row in empresas_raw]
+        # Las empresas no se modifican: SQLite genera el JSON sin dict por fila
+        empresas_json, total_empresas = filas_json(conn, query_empresas)
 
-        logger.info(f"✅ Empresas cargadas: {len(empresas)}")
+        logger.info(f"✅ Empresas cargadas: {total_empresas}")
 
         # =======================================================================
         # 3. CALCULAR ESTADÍSTICAS AVANZADAS
@@ -256,7 +318,7 @@ def get_master_unification():
         # Estadísticas consolidadas
         stats = {
             "total_usuarios": len(usuarios),
-            "total_empresas": len(empresas),
+            "total_empresas": total_empresas,
             "usuarios_con_empresa": usuarios_con_empresa,
             "usuarios_sin_empresa": usuarios_sin_empresa,
             "roles_distribution": roles_distribution,
@@ -320,13 +382,12 @@ def get_master_unification():
         # =======================================================================
         # 5. RESPUESTA JSON
         # =======================================================================
-        return jsonify({
+        return respuesta_json(current_app, {
             "success": True,
             "usuarios": usuarios,
-            "empresas": empresas,
             "stats": stats,
             "timestamp": conn.execute("SELECT datetime('now', 'localtime') as now").fetchone()['now']
-        }), 200
+        }, empresas=empresas_json)
 
     except sqlite3.Error as db_err:
         logger.error(f"❌ Error de base de datos en unificación/master: {db_err}", exc_info=True)
@@ -827,6 +888,7 @@ def update_user(user_id):
 
 @bp_unificacion.route("/master_completo", methods=["GET"])
 @login_required
+@respuesta_condicional("usuarios", "empresas", por_dia=True)
 def get_master_completo():
     """
     Obtiene TODOS los campos de usuarios y empresas para vinculación masiva.
@@ -844,48 +906,7 @@ def get_master_completo():
             raise Exception("No hay conexión a la base de datos")
 
         # Query completa con TODOS los campos
-        query_usuarios = """
-            SELECT
-                u.id,
-                u.tipoId,
-                u.numeroId,
-                u.primerNombre,
-                u.segundoNombre,
-                u.primerApellido,
-                u.segundoApellido,
-                u.correoElectronico,
-                u.role,
-                u.estado,
-                u.empresa_nit,
-                u.fechaNacimiento,
-                
-                -- SEGURIDAD SOCIAL
-                u.epsNombre as eps_nombre,
-                u.arlNombre as arl_nombre,
-                u.claseRiesgoARL as riesgo_nivel,
-                u.afpNombre as pension_nombre,
-                u.ccfNombre as caja_nombre,
-                
-                -- DATOS LABORALES
-                u.fechaIngreso as fecha_ingreso,
-                strftime('%Y-%m', u.fechaIngreso) as mes_ingreso,
-                u.ibc,
-                u.administracion,
-                
-                -- COSTOS / APORTES
-                u.epsCosto as aporte_eps,
-                u.arlCosto as aporte_arl,
-                u.afpCosto as aporte_pension,
-                u.ccfCosto as aporte_caja,
-                
-                -- EMPRESA
-                e.nombre_empresa,
-                e.nit as empresa_nit_verificado
-            FROM usuarios u
-            LEFT JOIN empresas e ON u.empresa_nit = e.nit
-            WHERE LOWER(u.role) NOT IN ('admin', 'superadmin', 'administrador', 'super')
-            ORDER BY u.primerNombre, u.primerApellido
-        """
+        query_usuarios = SQL_USUARIOS_MASTER_COMPLETO
 
         usuarios_raw = conn.execute(query_usuarios).fetchall()
         usuarios = [dict(row) for row in usuarios_raw]
@@ -1040,7 +1061,7 @@ def vincular_masivo():
                 SET empresa_nit = ?,
                     updated_at = CURRENT_TIMESTAMP
                 WHERE id IN ({placeholders_ids})
-                AND LOWER(role) NOT IN ('admin', 'superadmin', 'administrador', 'super')
+                AND {sql_sin_administradores()}
             """
 
             # Parámetros: empresa_nit + lista de IDs
@@ -4,17 +4,26 @@ usuarios.py - ACTUALIZADO con validación de archivos y logging
 ==================================================
 """
 import os
+import sqlite3
 import traceback
 import base64
 from datetime import datetime
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 from logger import logger
 
 # --- IMPORTACIÓN CENTRALIZADA ---
 try:
-    from ..utils import get_db_connection, login_required, format_key, log_file_upload, sanitize_and_save_file, validate_upload
+    from ..utils import get_db_connection, login_required, format_key, log_file_upload, validate_upload
+    from ..blob_store import guardar_blob
+    from ..busqueda_fts import fts_disponible, sugerencias
+    from ..cache_http import respuesta_condicional
+    from ..expediente_jobs import calcular_huella, ejecutar_plan, encolar_expediente
 except (ImportError, ValueError):
-    from utils import get_db_connection, login_required, format_key, log_file_upload, sanitize_and_save_file, validate_upload
+    from utils import get_db_connection, login_required, format_key, log_file_upload, validate_upload
+    from blob_store import guardar_blob
+    from busqueda_fts import fts_disponible, sugerencias
+    from cache_http import respuesta_condicional
+    from expediente_jobs import calcular_huella, ejecutar_plan, encolar_expediente
 # -------------------------------
 
 # Leer USER_DATA_FOLDER del entorno
@@ -28,62 +37,61 @@ usuarios_bp = Blueprint("usuarios", __name__, url_prefix="/api/usuarios")
 
 
 # ==================== FUNCIÓN AUXILIAR: GENERAR EXPEDIENTE ====================
-def generar_expediente_usuario(user_data: dict, firma_base64: str = None) -> dict:
+SUBCARPETAS_EXPEDIENTE_USUARIO = [
+    "BENEFICIARIOS",
+    "DEPURACIONES",
+    "EMPRESAS_AFILIADAS",
+    "INCAPACIDADES",
+    "MORAS",
+    "NOVEDADES",
+    "PLANILLAS",
+    "RECIBOS",
+    os.path.join("RECIBOS", "RECIBOS DE CAJA"),
+    os.path.join("RECIBOS", "COMPROBANTES DE CONSIGNACION"),
+    "TUTELAS",
+    "USUARIOS Y CONTRASEÑAS"
+]
+
+
+def planificar_expediente_usuario(user_data: dict, firma_base64: str = None, adjuntos: dict = None) -> dict:
     """
-    Genera la estructura de carpetas y archivos para un expediente de usuario.
+    Construye el plan del expediente de un usuario sin tocar la carpeta
+    del expediente: rutas, contenido de datos_usuario.txt, firma y adjuntos
+    (guardados en el almacén de blobs). Lo ejecuta expediente_jobs.ejecutar_plan().
 
     Args:
         user_data: Diccionario con los datos del usuario
         firma_base64: String base64 de la firma (formato data:image/png;base64,...)
+        adjuntos: {nombre_destino: FileStorage} ya validados
 
     Returns:
-        dict: {"success": bool, "files_created": list, "errors": list, "path": str}
+        dict: Plan serializable (ver expediente_jobs)
     """
-    resultado = {
-        "success": False,
-        "files_created": [],
-        "errors": [],
-        "path": ""
+    numero_id = user_data.get("numeroId") or user_data.get("numero_documento")
+    carpeta_usuario = os.path.join(RUTA_BASE_EXPEDIENTES, str(numero_id)) if numero_id else ""
+
+    plan = {
+        "tipo": "usuario",
+        "entidad_id": str(numero_id or ""),
+        "carpeta": carpeta_usuario,
+        "directorios": [],
+        "textos": [],
+        "blobs": [],
+        "errores": [],
+        "huella": "",
     }
 
-    try:
-        numero_id = user_data.get("numeroId") or user_data.get("numero_documento")
-
-        if not numero_id:
-            resultado["errors"].append("Número de identificación es obligatorio")
-            return resultado
-
-        # 1. CREAR CARPETA PRINCIPAL DEL USUARIO
-        carpeta_usuario = os.path.join(RUTA_BASE_EXPEDIENTES, str(numero_id))
-        os.makedirs(carpeta_usuario, exist_ok=True)
-        resultado["path"] = carpeta_usuario
-        logger.info(f"📁 Carpeta usuario creada/verificada: {carpeta_usuario}")
-
-        # 2. CREAR SUBCARPETAS OBLIGATORIAS
-        subcarpetas = [
-            "BENEFICIARIOS",
-            "DEPURACIONES",
-            "EMPRESAS_AFILIADAS",
-            "INCAPACIDADES",
-            "MORAS",
-            "NOVEDADES",
-            "PLANILLAS",
-            "RECIBOS",
-            "TUTELAS",
-            "USUARIOS Y CONTRASEÑAS"
-        ]
+    if not numero_id:
+        plan["errores"].append("Número de identificación es obligatorio")
+        return plan
 
-        for subcarpeta in subcarpetas:
-            ruta_subcarpeta = os.path.join(carpeta_usuario, subcarpeta)
-            os.makedirs(ruta_subcarpeta, exist_ok=True)
-            logger.debug(f"  ✓ Subcarpeta creada: {subcarpeta}")
+    # 1. CARPETA PRINCIPAL Y SUBCARPETAS OBLIGATORIAS
+    plan["directorios"] = [carpeta_usuario] + [
+        os.path.join(carpeta_usuario, subcarpeta) for subcarpeta in SUBCARPETAS_EXPEDIENTE_USUARIO
+    ]
 
-        resultado["files_created"].append(f"Estructura de {len(subcarpetas)} carpetas")
-
-        # 3. GENERAR ARCHIVO datos_usuario.txt
-        archivo_datos = os.path.join(carpeta_usuario, "datos_usuario.txt")
-
-        contenido = f"""
+    # 2. ARCHIVO datos_usuario.txt
+    contenido = f"""
 {'=' * 80}
                      INFORMACIÓN DEL USUARIO
 {'=' * 80}
@@ -137,50 +145,108 @@ Fecha de Generación: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 {'=' * 80}
 """
 
-        with open(archivo_datos, "w", encoding="utf-8") as f:
-            f.write(contenido)
+    plan["textos"].append({
+        "nombre": "datos_usuario.txt",
+        "ruta": os.path.join(carpeta_usuario, "datos_usuario.txt"),
+        "contenido": contenido,
+    })
+
+    # 3. FIRMA DIGITAL (SI SE PROPORCIONA)
+    sha_firma = None
+    if firma_base64 and isinstance(firma_base64, str):
+        try:
+            # Verificar si contiene el prefijo data:image
+            if "," in firma_base64:
+                # Formato: data:image/png;base64,iVBORw0KGgoAAAANS...
+                _, encoded = firma_base64.split(",", 1)
+            else:
+                # Ya es base64 puro
+                encoded = firma_base64
+
+            # Decodificar
+            firma_bytes = base64.b64decode(encoded)
 
-        resultado["files_created"].append("datos_usuario.txt")
-        logger.info(f"📄 Archivo datos_usuario.txt creado/actualizado")
+            # Validar tamaño (máximo 5MB)
+            if len(firma_bytes) > 5 * 1024 * 1024:
+                plan["errores"].append("Firma digital: Tamaño excedido (máximo 5MB)")
+            else:
+                sha_firma = guardar_blob(firma_bytes)["sha256"]
+                plan["blobs"].append({
+                    "nombre": "firma_usuario.png",
+                    "ruta": os.path.join(carpeta_usuario, "firma_usuario.png"),
+                    "sha256": sha_firma,
+                })
+                logger.info(f"✍️ Firma digital preparada: {len(firma_bytes)} bytes")
+
+        except Exception as e:
+            logger.error(f"❌ Error al guardar firma: {e}", exc_info=True)
+            plan["errores"].append(f"Error al guardar firma: {str(e)}")
+
+    # 4. ADJUNTOS (PDFs desde request.files)
+    for nombre_archivo, archivo in (adjuntos or {}).items():
+        try:
+            plan["blobs"].append({
+                "nombre": nombre_archivo,
+                "ruta": os.path.join(carpeta_usuario, nombre_archivo),
+                "sha256": guardar_blob(archivo)["sha256"],
+            })
+        except Exception as e:
+            logger.error(f"❌ Error al guardar {nombre_archivo}: {e}", exc_info=True)
+            plan["errores"].append(f"Error al guardar {nombre_archivo}: {str(e)}")
+
+    # La fecha de generación no forma parte de la huella: mismos datos, mismo job
+    plan["huella"] = calcular_huella(user_data, sha_firma, [b["sha256"] for b in plan["blobs"]])
+    return plan
 
-        # 4. GUARDAR FIRMA DIGITAL (SI SE PROPORCIONA)
-        if firma_base64 and isinstance(firma_base64, str):
-            try:
-                # Verificar si contiene el prefijo data:image
-                if "," in firma_base64:
-                    # Formato: data:image/png;base64,iVBORw0KGgoAAAANS...
-                    _, encoded = firma_base64.split(",", 1)
-                else:
-                    # Ya es base64 puro
-                    encoded = firma_base64
 
-                # Decodificar
-                firma_bytes = base64.b64decode(encoded)
+def generar_expediente_usuario(user_data: dict, firma_base64: str = None) -> dict:
+    """
+    Genera la estructura de carpetas y archivos para un expediente de usuario
+    de forma síncrona (los endpoints usan encolar_expediente_usuario).
 
-                # Validar tamaño (máximo 5MB)
-                if len(firma_bytes) > 5 * 1024 * 1024:
-                    resultado["errors"].append("Firma digital: Tamaño excedido (máximo 5MB)")
-                else:
-                    # Guardar archivo
-                    archivo_firma = os.path.join(carpeta_usuario, "firma_usuario.png")
-                    with open(archivo_firma, "wb") as f:
-                        f.write(firma_bytes)
+    Args:
+        user_data: Diccionario con los datos del usuario
+        firma_base64: String base64 de la firma (formato data:image/png;base64,...)
 
-                    resultado["files_created"].append("firma_usuario.png")
-                    logger.info(f"✍️ Firma digital guardada: {len(firma_bytes)} bytes")
+    Returns:
+        dict: {"success": bool, "files_created": list, "errors": list, "path": str}
+    """
+    plan = planificar_expediente_usuario(user_data, firma_base64)
+    if not plan["directorios"]:
+        return {"success": False, "files_created": [], "errors": plan["errores"], "path": ""}
+    return ejecutar_plan(plan)
 
-            except Exception as e:
-                logger.error(f"❌ Error al guardar firma: {e}", exc_info=True)
-                resultado["errors"].append(f"Error al guardar firma: {str(e)}")
 
-        resultado["success"] = True
-        logger.info(f"✅ Expediente generado exitosamente para usuario {numero_id}")
+def encolar_expediente_usuario(conn, user_data: dict, firma_base64: str = None, adjuntos: dict = None) -> dict:
+    """
+    Planifica el expediente y lo deja en cola (expediente_jobs). Se llama
+    después del commit del usuario.
 
-    except Exception as e:
-        logger.error(f"❌ Error crítico al generar expediente: {e}", exc_info=True)
-        resultado["errors"].append(f"Error crítico: {str(e)}")
+    Returns:
+        dict: {"job_id", "path", "errors", "status_url"}; job_id es None si
+              el plan no es válido o no se pudo encolar (p. ej. falta la
+              migración 20251203_expediente_jobs.sql)
+    """
+    plan = planificar_expediente_usuario(user_data, firma_base64, adjuntos)
+    if not plan["directorios"]:
+        return {"job_id": None, "path": "", "errors": plan["errores"], "status_url": None}
 
-    return resultado
+    try:
+        job_id = encolar_expediente(conn, current_app.config["DATABASE_PATH"], plan)
+    except sqlite3.Error as e:
+        logger.error(f"❌ No se pudo encolar el expediente del usuario {plan['entidad_id']}: {e}")
+        return {
+            "job_id": None,
+            "path": plan["carpeta"],
+            "errors": plan["errores"] + [f"No se pudo encolar el expediente: {e}"],
+            "status_url": None,
+        }
+    return {
+        "job_id": job_id,
+        "path": plan["carpeta"],
+        "errors": plan["errores"],
+        "status_url": f"/api/expedientes/jobs/{job_id}",
+    }
 
 
 # ==================== ENDPOINTS DE USUARIOS ====================
@@ -307,18 +373,20 @@ def add_usuario():
                 # 2. Obtener firma si existe en el JSON
                 firma_b64 = json_data.get('firma_digital') or json_data.get('firmaDigitalData')
 
-                # 3. Llamar a la función generadora
-                resultado_expediente = generar_expediente_usuario(datos_para_expediente, firma_b64)
+                # 3. Encolar la generación (se ejecuta fuera de la petición)
+                expediente = encolar_expediente_usuario(conn, datos_para_expediente, firma_b64)
 
-                if resultado_expediente['success']:
-                    logger.info(f"✅ Expediente creado en: {resultado_expediente['path']}")
-                else:
-                    logger.warning(f"⚠️ Alerta expediente: {resultado_expediente['errors']}")
+                if expediente['errors']:
+                    logger.warning(f"⚠️ Alerta expediente: {expediente['errors']}")
 
                 # ==========================================================
 
                 logger.info(f"✅ Usuario {numero_documento} creado exitosamente (modo JSON)")
-                return jsonify({"message": f"Usuario creado exitosamente", "numero_documento": numero_documento}), 201
+                return jsonify({
+                    "message": f"Usuario creado exitosamente",
+                    "numero_documento": numero_documento,
+                    "expediente": expediente
+                }), 201
 
             except sqlite3.IntegrityError as ie:
                 conn.rollback()
@@ -343,24 +411,10 @@ def add_usuario():
 
             numero_documento = numero_id
 
-            # ==================== GENERAR EXPEDIENTE FÍSICO ====================
-            # Convertir form data a diccionario para la función auxiliar
-            user_data_dict = dict(data)
-            firma_base64 = data.get("firmaDigitalData")
-
-            # Llamar a la función auxiliar para generar toda la estructura
-            expediente_result = generar_expediente_usuario(user_data_dict, firma_base64)
-
-            if not expediente_result["success"]:
-                logger.error(f"❌ Errores al generar expediente: {expediente_result['errors']}")
-                # Continuar con el proceso aunque el expediente falle (no crítico)
-
-            logger.info(f"📁 Expediente generado: {expediente_result['files_created']}")
-            user_folder_path = expediente_result["path"]
-
-            # ==================== VALIDACIÓN Y GUARDADO DE ARCHIVOS ====================
+            # ==================== VALIDACIÓN DE ARCHIVOS ====================
             saved_files = {}
-            upload_errors = expediente_result.get("errors", [])
+            upload_errors = []
+            adjuntos = {}
             user_session_id = session.get("user_id", "unknown")
 
             # 2. DOCUMENTO PDF (cédula) - VALIDACIÓN CRÍTICA
@@ -370,20 +424,10 @@ def add_usuario():
                     is_valid, error_msg = validate_upload(pdf_file, file_type="document")
 
                     if is_valid:
-                        try:
-                            custom_name = f"cedula_{numero_id}.pdf"
-                            filepath = sanitize_and_save_file(pdf_file, user_folder_path, custom_name)
-                            saved_files["cedula"] = os.path.basename(filepath)
-                            log_file_upload(pdf_file.filename, user_session_id, success=True)
-
-                        except (ValueError, IOError) as e:
-                            upload_errors.append(f"Cédula PDF: {str(e)}")
-                            log_file_upload(
-                                pdf_file.filename,
-                                user_session_id,
-                                success=False,
-                                error=str(e),
-                            )
+                        custom_name = f"cedula_{numero_id}.pdf"
+                        adjuntos[custom_name] = pdf_file
+                        saved_files["cedula"] = custom_name
+                        log_file_upload(pdf_file.filename, user_session_id, success=True)
                     else:
                         upload_errors.append(f"Cédula PDF: {error_msg}")
                         log_file_upload(
@@ -393,28 +437,6 @@ def add_usuario():
                             error=error_msg,
                         )
 
-            # Crear subcarpetas estándar
-            subfolders = [
-                "PLANILLAS",
-                "MORAS",
-                "EMPRESAS_AFILIADAS",
-                "INCAPACIDADES",
-                "BENEFICIARIOS",
-                "NOVEDADES",
-                "TUTELAS",
-                "DEPURACIONES",
-                "USUARIOS Y CONTRASEÑAS",
-                "RECIBOS",
-            ]
-            for folder in subfolders:
-                os.makedirs(os.path.join(user_folder_path, folder), exist_ok=True)
-
-            os.makedirs(os.path.join(user_folder_path, "RECIBOS", "RECIBOS DE CAJA"), exist_ok=True)
-            os.makedirs(
-                os.path.join(user_folder_path, "RECIBOS", "COMPROBANTES DE CONSIGNACION"),
-                exist_ok=True,
-            )
-
             # ==================== GUARDAR EN BASE DE DATOS ====================
             conn = get_db_connection()
             try:
@@ -494,9 +516,26 @@ def add_usuario():
 
                 logger.info(f"Usuario {numero_id} guardado exitosamente por user_id: {user_session_id}")
 
+                # ==================== GENERAR EXPEDIENTE FÍSICO ====================
+                # Se encola después del commit: el job no debe correr para un
+                # usuario que aún no existe (o cuyo INSERT se revierte)
+                user_data_dict = dict(data)
+                firma_base64 = data.get("firmaDigitalData")
+
+                # Encolar carpetas, datos_usuario.txt, firma y cédula (se generan fuera de la petición)
+                expediente_result = encolar_expediente_usuario(conn, user_data_dict, firma_base64, adjuntos)
+                upload_errors = expediente_result["errors"] + upload_errors
+
+                if expediente_result["errors"]:
+                    logger.error(f"❌ Errores al generar expediente: {expediente_result['errors']}")
+                    # Continuar con el proceso aunque el expediente falle (no crítico)
+
+                logger.info(f"📁 Expediente encolado: job {expediente_result['job_id']}")
+
                 response_data = {
                     "message": f"Usuario {numero_id} guardado exitosamente.",
                     "archivos_guardados": saved_files,
+                    "expediente": expediente_result,
                 }
 
                 if upload_errors:
@@ -627,6 +666,50 @@ def buscar_usuario():
             conn.close()
 
 
+@usuarios_bp.route("/sugerencias", methods=["GET"])
+@login_required
+@respuesta_condicional("usuarios")
+def get_sugerencias_usuarios():
+    """
+    Autocompletado de usuarios por nombres, apellidos, numeroId o correo
+    (índice FTS5: prefijos por palabra, sin distinguir tildes).
+    Query params:
+      - q: texto escrito; sin sugerencias hasta que una palabra tenga 3 caracteres
+      - limit: máximo de sugerencias (default: 10, max: 50)
+    Ordenadas por relevancia (bm25) entre todas las coincidencias.
+    """
+    conn = None
+    try:
+        texto = request.args.get("q", "", type=str).strip()
+        limite = max(1, min(request.args.get("limit", 10, type=int), 50))
+        columnas = ("id", "tipoId", "numeroId", "primerNombre", "segundoNombre",
+                    "primerApellido", "segundoApellido", "correoElectronico", "empresa_nit")
+
+        conn = get_db_connection()
+        if fts_disponible(conn, "usuarios"):
+            filas = sugerencias(conn, "usuarios", texto, columnas, limite)
+        elif texto:
+            patron = f"{texto}%"
+            filas = conn.execute(
+                f"""SELECT {', '.join(columnas)} FROM usuarios
+                    WHERE numeroId LIKE ? OR primerNombre LIKE ? OR primerApellido LIKE ? OR correoElectronico LIKE ?
+                    LIMIT ?""",
+                (patron, patron, patron, patron, limite),
+            ).fetchall()
+        else:
+            filas = []
+
+        items = [dict(fila) for fila in filas]
+        return jsonify({"items": items, "total_items": len(items)})
+
+    except Exception as e:
+        logger.error(f"❌ Error en sugerencias de usuarios: {e}", exc_info=True)
+        return jsonify({"error": "No se pudo buscar usuarios."}), 500
+    finally:
+        if conn:
+            conn.close()
+
+
 @usuarios_bp.route("/<int:user_id>", methods=["GET"])
 @login_required
 def get_usuario_by_id(user_id):
@@ -737,21 +820,17 @@ def update_usuario(user_id):
             # Obtener firma si se proporciona
             firma_base64 = data.get("firmaDigitalData")
 
-            # Regenerar expediente con datos actualizados
-            expediente_result = generar_expediente_usuario(user_data_dict, firma_base64)
+            # Regenerar expediente con datos actualizados (en segundo plano)
+            expediente_result = encolar_expediente_usuario(conn, user_data_dict, firma_base64)
 
-            if expediente_result["success"]:
-                logger.info(f"📁 Expediente actualizado: {expediente_result['files_created']}")
-            else:
+            if expediente_result["errors"]:
                 logger.warning(f"⚠️ Errores al actualizar expediente: {expediente_result['errors']}")
+            else:
+                logger.info(f"📁 Actualización de expediente encolada: job {expediente_result['job_id']}")
 
         return jsonify({
             "message": "Usuario actualizado exitosamente",
-            "expediente": {
-                "success": expediente_result.get("success", False),
-                "files_created": expediente_result.get("files_created", []),
-                "errors": expediente_result.get("errors", [])
-            }
+            "expediente": expediente_result
         }), 200
 
     except sqlite3.IntegrityError as ie:
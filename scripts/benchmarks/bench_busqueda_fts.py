@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - BÚSQUEDA DE USUARIOS (LIKE vs FTS5)
+===============================================
+Genera N usuarios sintéticos (por defecto 1.000.000) con nombres en
+español y mide, para varias consultas de autocompletado:
+
+    1. LIKE '%texto%' sobre nombres, numeroId y correo (comportamiento anterior)
+    2. sugerencias() sobre usuarios_fts (prefijos, sin tildes, top-k por bm25
+       entre todas las coincidencias: el costo crece con su número)
+
+También reporta el tiempo de construir el índice ('rebuild').
+
+Uso:
+    python scripts/benchmarks/bench_busqueda_fts.py --usuarios 1000000 --limite 10
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from busqueda_fts import expresion_match, instalar_fts, sugerencias  # noqa: E402
+
+NOMBRES = ["José", "María", "Andrés", "Sofía", "Julián", "Valentina", "Camilo", "Lucía", "Néstor", "Ángela",
+           "Sebastián", "Daniela", "Martín", "Paula", "Iván", "Mónica", "Óscar", "Natalia", "Raúl", "Inés"]
+APELLIDOS = ["Gómez", "Peña", "Rodríguez", "Martínez", "López", "Hernández", "Pérez", "Sánchez", "Ramírez",
+             "Díaz", "Muñoz", "Álvarez", "Jiménez", "Castaño", "Ordóñez", "Zúñiga", "Londoño", "Quiñónez"]
+CONSULTAS = ["jos", "jose", "jose pena", "maria gomez rod", "zuñiga", "1000123", "u12345@"]
+COLUMNAS = ("id", "numeroId", "primerNombre", "primerApellido", "correoElectronico")
+
+
+def crear_bd(usuarios, semilla=11):
+    """BD en memoria con la tabla usuarios y N filas."""
+    random.seed(semilla)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("""
+        CREATE TABLE usuarios (
+            id INTEGER PRIMARY KEY, tipoId TEXT, numeroId TEXT, primerNombre TEXT, segundoNombre TEXT,
+            primerApellido TEXT, segundoApellido TEXT, correoElectronico TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO usuarios VALUES (?, 'CC', ?, ?, ?, ?, ?, ?)",
+        (
+            (i, str(10_000_000 + i), random.choice(NOMBRES), random.choice(NOMBRES + [None]),
+             random.choice(APELLIDOS), random.choice(APELLIDOS), f"u{i}@correo.co")
+            for i in range(1, usuarios + 1)
+        ),
+    )
+    conn.commit()
+    return conn
+
+
+def buscar_like(conn, texto, limite):
+    patron = f"%{texto}%"
+    return conn.execute(
+        """SELECT id, numeroId, primerNombre, primerApellido, correoElectronico FROM usuarios
+           WHERE primerNombre LIKE ? OR primerApellido LIKE ? OR numeroId LIKE ? OR correoElectronico LIKE ?
+           LIMIT ?""",
+        (patron, patron, patron, patron, limite),
+    ).fetchall()
+
+
+def medir(nombre, funcion, repeticiones=5):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} {min(tiempos) * 1000:10.1f} ms")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=1_000_000, help="Usuarios sintéticos")
+    parser.add_argument("--limite", type=int, default=10, help="Resultados por consulta (top-k)")
+    args = parser.parse_args()
+
+    print(f"🧮 Generando {args.usuarios:,} usuarios ...")
+    conn = crear_bd(args.usuarios)
+
+    print("\n⏱️  Construcción del índice")
+    medir("instalar_fts('usuarios') (rebuild)", lambda: instalar_fts(conn, "usuarios"), repeticiones=1)
+
+    for texto in CONSULTAS:
+        print(f"\n⏱️  Consulta {texto!r}")
+        medir("LIKE '%texto%'", lambda: buscar_like(conn, texto, args.limite))
+        filas = medir("sugerencias() FTS5", lambda: sugerencias(conn, "usuarios", texto, COLUMNAS, args.limite))
+        total = conn.execute("SELECT COUNT(*) FROM usuarios_fts WHERE usuarios_fts MATCH ?",
+                             (expresion_match(texto),)).fetchone()[0]
+        print(f"  {'Coincidencias FTS5 (ordenadas por bm25)':<45} {total:10d}")
+        print(f"  {'Sugerencias devueltas (top-k)':<45} {len(filas):10d}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - CARGA MASIVA DE CARTERA EN STREAMING
+================================================
+Genera un CSV sintético de N filas (usuarios y empresas reales en una BD
+SQLite temporal, ~1% de filas inválidas y deudas repetidas que se
+actualizan) y lo importa con logic.carga_cartera.importar_deudas, midiendo
+tiempo, filas/s y pico de memoria (tracemalloc, en una segunda pasada)
+para distintos N: el pico debe mantenerse plano al crecer el archivo.
+
+Uso:
+    python scripts/benchmarks/bench_carga_cartera.py --filas 200000
+    python scripts/benchmarks/bench_carga_cartera.py --filas 200000 --lote 5000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, RAIZ)
+
+DIRECTORIO = tempfile.mkdtemp(prefix="bench_cartera_")
+os.environ["DATABASE_PATH"] = os.path.join(DIRECTORIO, "bench.db")
+
+# usuarios se crea antes de importar app: create_all() fallaría con el índice
+# 'sqlite_autoindex_usuarios_1' del modelo sobre una BD vacía
+with sqlite3.connect(os.environ["DATABASE_PATH"]) as _conn:
+    _conn.execute(
+        "CREATE TABLE IF NOT EXISTS usuarios (id INTEGER PRIMARY KEY, tipoId TEXT, numeroId TEXT, "
+        "primerNombre TEXT, primerApellido TEXT, empresa_nit TEXT, UNIQUE (tipoId, numeroId))"
+    )
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from logic import carga_cartera  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+ENTIDADES = ("EPS", "ARL", "AFP", "CCF")
+
+
+def preparar_bd(usuarios, empresas):
+    db.session.execute(text("DELETE FROM deudas_cartera"))
+    db.session.execute(text("DELETE FROM usuarios"))
+    db.session.execute(text("DELETE FROM empresas"))
+    db.session.execute(
+        text("INSERT INTO empresas (nit, nombre_empresa) VALUES (:nit, :nombre)"),
+        [{"nit": f"9{i:08d}", "nombre": f"Empresa {i}"} for i in range(empresas)],
+    )
+    db.session.execute(
+        text("INSERT INTO usuarios (tipoId, numeroId, primerNombre, primerApellido, empresa_nit) "
+             "VALUES ('CC', :doc, 'Nombre', :apellido, :nit)"),
+        [{"doc": str(10**9 + i), "apellido": str(i), "nit": f"9{i % empresas:08d}"} for i in range(usuarios)],
+    )
+    db.session.commit()
+
+
+def generar_csv(ruta, filas, usuarios, semilla=5):
+    random.seed(semilla)
+    with open(ruta, "w", encoding="utf-8") as archivo:
+        archivo.write("documento;entidad;valor;dias_mora;vencimiento\n")
+        for i in range(filas):
+            documento = str(10**9 + random.randrange(usuarios))
+            entidad = random.choice(ENTIDADES)
+            if i % 100 == 0:
+                entidad = "XYZ"  # fila inválida
+            archivo.write(f"{documento};{entidad};{random.randint(50_000, 3_000_000)};"
+                          f"{random.choice((0, 0, 15, 30, 90))};2025-{random.randint(1, 12):02d}-15\n")
+
+
+def medir_carga(ruta, tamano_lote, memoria=False):
+    db.session.execute(text("DELETE FROM deudas_cartera"))
+    db.session.commit()
+    if memoria:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    with open(ruta, "rb") as flujo:
+        resultado = carga_cartera.importar_deudas(
+            carga_cartera.leer_filas(flujo, ruta), db.session, usuario_registro="bench", tamano_lote=tamano_lote
+        )
+    duracion = time.perf_counter() - inicio
+    pico = 0
+    if memoria:
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return resultado, duracion, pico
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=200_000, help="Filas del CSV más grande")
+    parser.add_argument("--usuarios", type=int, default=50_000, help="Usuarios existentes en la BD")
+    parser.add_argument("--empresas", type=int, default=500, help="Empresas existentes en la BD")
+    parser.add_argument("--lote", type=int, default=carga_cartera.TAMANO_LOTE_CARGA, help="Filas por lote")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"🗄️  BD temporal en {DIRECTORIO} ({args.usuarios:,} usuarios, {args.empresas} empresas)")
+        preparar_bd(args.usuarios, args.empresas)
+
+        print(f"\n⏱️  Carga en lotes de {args.lote:,}")
+        for filas in sorted({args.filas // 10, args.filas // 2, args.filas}):
+            ruta = os.path.join(DIRECTORIO, f"reporte_{filas}.csv")
+            generar_csv(ruta, filas, args.usuarios)
+            resultado, duracion, _ = medir_carga(ruta, args.lote)
+            _, _, pico = medir_carga(ruta, args.lote, memoria=True)  # tracemalloc distorsiona el tiempo
+            print(f"  {filas:>9,} filas  {duracion * 1000:10.1f} ms  {filas / duracion:9,.0f} filas/s  "
+                  f"pico {pico / 2**20:6.1f} MiB  (insertadas {resultado['insertadas']:,}, "
+                  f"actualizadas {resultado['actualizadas']:,}, errores {resultado['errores']:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - GENERACIÓN DE CARTAS DE DEPURACIÓN
+==============================================
+Mide el throughput (cartas/segundo) de:
+
+    - El flujo anterior: CARTA.pdf releída en cada carta, stringWidth por
+      palabra, carta rellenada a BytesIO y luego copiada de nuevo al
+      combinar con los anexos.
+    - generar_carta_pdf(): carta base cacheada, métricas precalculadas y
+      una sola escritura con los anexos.
+
+Uso:
+    python scripts/benchmarks/bench_cartas_depuracion.py --cartas 200 --empresas 5
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from PIL import Image  # noqa: E402
+from pypdf import PdfReader, PdfWriter  # noqa: E402
+from reportlab.lib.pagesizes import letter  # noqa: E402
+from reportlab.lib.utils import ImageReader  # noqa: E402
+from reportlab.pdfgen import canvas  # noqa: E402
+
+import cartas_depuracion as cd  # noqa: E402
+
+DATOS_BASE = {
+    "tipo_escenario": "COMPLETO",
+    "usuario_nombre_completo": "Ana María Pérez Gómez",
+    "usuario_tipo_id": "CC",
+    "numero_planilla": "987654",
+    "ciudad": "Bogotá",
+    "senores": "EPS Salud Total",
+    "departamento_entidad": "Cartera",
+    "fecha_inicio": "2024-01-01",
+    "fecha_fin": "2024-06-30",
+    "rep_legal_nombre": "Luis Gómez",
+    "rep_legal_cargo": "Gerente",
+    "rep_legal_celular": "3001234567",
+    "rep_legal_direccion": "Calle 1 # 2-3",
+    "rep_legal_correo": "luis@empresa.co",
+}
+
+
+def crear_pdf(ruta, paginas):
+    """PDF con texto en cada página (más realista que páginas vacías)."""
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    for numero in range(paginas):
+        for linea in range(40):
+            can.drawString(72, 740 - linea * 16, f"Página {numero + 1} - línea {linea} " + "texto de relleno " * 5)
+        can.showPage()
+    can.save()
+    with open(ruta, "wb") as f:
+        f.write(packet.getvalue())
+    return ruta
+
+
+def preparar_empresas(directorio, total):
+    empresas = []
+    for i in range(total):
+        carpeta = os.path.join(directorio, f"EMPRESA_{i}")
+        os.makedirs(carpeta)
+        crear_pdf(os.path.join(carpeta, "CARTA.pdf"), 2)
+        firma = os.path.join(carpeta, "firma_empresa.png")
+        Image.new("RGBA", (1600, 600), (20, 20, 120, 255)).save(firma)
+        empresas.append((os.path.join(carpeta, "CARTA.pdf"), firma))
+    return empresas
+
+
+def carta_legada(carta_base_path, firma_path, textos, adjuntos, anexos, ruta_destino):
+    """Réplica del flujo anterior de rellenar_pdf_carta + combinar_pdfs."""
+    texto1, texto2, texto3, texto4 = textos
+    reader = PdfReader(carta_base_path)
+    writer = PdfWriter()
+    page = reader.pages[0]
+    packet = BytesIO()
+    can = canvas.Canvas(packet, pagesize=letter)
+    can.setFont("Helvetica", 10)
+    y_pos = 600
+    for linea in texto1.split("\n"):
+        can.drawString(72, y_pos, linea)
+        y_pos -= 15
+    y_pos = 500
+    line = ""
+    for word in texto2.split():
+        test_line = line + word + " "
+        if can.stringWidth(test_line, "Helvetica", 10) < 450:
+            line = test_line
+        else:
+            can.drawString(72, y_pos, line)
+            y_pos -= 15
+            line = word + " "
+    if line:
+        can.drawString(72, y_pos, line)
+        y_pos -= 30
+    for linea in texto3.split("\n"):
+        can.drawString(72, y_pos, linea)
+        y_pos -= 15
+    y_pos -= 20
+    can.drawImage(ImageReader(firma_path), 72, y_pos - 60, width=150, height=60, preserveAspectRatio=True)
+    y_pos -= 80
+    for linea in texto4.split("\n"):
+        can.drawString(72, y_pos, linea)
+        y_pos -= 12
+    can.save()
+    packet.seek(0)
+    page.merge_page(PdfReader(packet).pages[0])
+    writer.add_page(page)
+    for i in range(1, len(reader.pages)):
+        writer.add_page(reader.pages[i])
+    rellenado = BytesIO()
+    writer.write(rellenado)
+    rellenado.seek(0)
+
+    merger = PdfWriter()
+    merger.append(rellenado)
+    for _, ruta in adjuntos:
+        with open(ruta, "rb") as f:
+            merger.append(BytesIO(f.read()))
+    with open(ruta_destino, "wb") as f:
+        merger.write(f)
+    merger.close()
+
+
+def medir(nombre, funcion, cartas):
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {nombre:<45} {segundos * 1000:10.1f} ms   {cartas / segundos:8.1f} cartas/s")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cartas", type=int, default=200, help="Número de cartas a generar")
+    parser.add_argument("--empresas", type=int, default=5, help="Empresas distintas (cartas base)")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_cartas_")
+    try:
+        empresas = preparar_empresas(directorio, args.empresas)
+        anexo = crear_pdf(os.path.join(directorio, "estado_cuenta.pdf"), 3)
+        salida = os.path.join(directorio, "salida")
+        os.makedirs(salida)
+
+        solicitudes = []
+        for i in range(args.cartas):
+            carta, firma = empresas[i % len(empresas)]
+            textos, anexos = cd.construir_textos(dict(DATOS_BASE, usuario_numero_id=str(1000 + i)), ["estado_cuenta"])
+            solicitudes.append({
+                "carta_base_path": carta,
+                "firma_path": firma,
+                "textos": textos,
+                "adjuntos": [("estado_cuenta", anexo)],
+                "anexos": anexos,
+                "ruta_destino": os.path.join(salida, f"carta_{i}.pdf"),
+            })
+
+        print(f"✉️  {args.cartas} cartas, {args.empresas} empresas, 1 anexo de 3 páginas\n")
+        legado = medir(
+            "Flujo anterior (sin caché, doble escritura)",
+            lambda: [carta_legada(s["carta_base_path"], s["firma_path"], s["textos"], s["adjuntos"], s["anexos"],
+                                  s["ruta_destino"]) for s in solicitudes],
+            args.cartas,
+        )
+        secuencial = medir(
+            "generar_carta_pdf secuencial",
+            lambda: [cd.generar_carta_pdf(s["carta_base_path"], s["firma_path"], s["textos"], s["adjuntos"],
+                                          s["anexos"], ruta_destino=s["ruta_destino"]) for s in solicitudes],
+            args.cartas,
+        )
+        print(f"\n  Aceleración: x{legado / secuencial:.2f}")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - CATÁLOGO INDEXADO DEL GESTOR DE ARCHIVOS
+====================================================
+Compara el escaneo en vivo del disco (construir_arbol_archivos serial y
+paralelo, os.walk) contra el catálogo en SQLite (archivos_catalogo + FTS5)
+y la expansión perezosa de un nivel, sobre un árbol sintético de N archivos.
+
+Uso:
+    python scripts/benchmarks/bench_catalogo_archivos.py --archivos 100000
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from routes import gestor_archivos as ga  # noqa: E402
+
+MIGRACION = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "migrations", "20251201_archivos_catalogo.sql",
+)
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
+         "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+TIPOS = ["Recibos", "Planillas", "Incapacidades", "Certificados"]
+
+
+def crear_arbol(ruta_usuario, total_archivos):
+    """Crea AÑO/TIPO/MES/archivo_N.pdf hasta completar total_archivos."""
+    por_carpeta = max(1, total_archivos // (10 * len(TIPOS) * len(MESES)))
+    creados = 0
+    anio = 2015
+    while creados < total_archivos:
+        for tipo in TIPOS:
+            for mes in MESES:
+                carpeta = os.path.join(ruta_usuario, str(anio), tipo, mes)
+                os.makedirs(carpeta, exist_ok=True)
+                for i in range(por_carpeta):
+                    if creados >= total_archivos:
+                        return
+                    with open(os.path.join(carpeta, f"{tipo.lower()}_{mes}_{i}.pdf"), "wb") as f:
+                        f.write(b"%PDF")
+                    creados += 1
+        anio += 1
+
+
+def medir(nombre, funcion, repeticiones=3):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} {min(tiempos) * 1000:10.1f} ms")
+    return resultado
+
+
+def buscar_os_walk(ruta_usuario, query):
+    resultados = []
+    for root, _, files in os.walk(ruta_usuario):
+        for file in files:
+            if query in file.lower():
+                ruta = os.path.join(root, file)
+                resultados.append((ruta, os.path.getsize(ruta)))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archivos", type=int, default=100_000, help="Número de archivos del árbol sintético")
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix="bench_catalogo_")
+    try:
+        ga.BASE_UPLOADS_PATH = os.path.join(directorio, "usuarios")
+        ruta_usuario = os.path.join(ga.BASE_UPLOADS_PATH, "1000000")
+
+        print(f"📂 Creando árbol sintético con {args.archivos:,} archivos en {directorio} ...")
+        crear_arbol(ruta_usuario, args.archivos)
+
+        conn = sqlite3.connect(os.path.join(directorio, "catalogo.db"))
+        with open(MIGRACION, encoding="utf-8") as script:
+            conn.executescript(script.read())
+
+        print("\n⏱️  Árbol completo (nivel_maximo=5)")
+        medir("Escaneo en vivo serial", lambda: ga.construir_arbol_archivos(ruta_usuario, paralelo=False))
+        medir("Escaneo en vivo paralelo", lambda: ga.construir_arbol_archivos(ruta_usuario))
+        medir("Indexación completa (indexar_usuario)", lambda: ga.indexar_usuario(conn, "1000000"), 1)
+        medir("Validación de vigencia (catalogo_vigente)", lambda: ga.catalogo_vigente(conn, "1000000"))
+        arbol, _ = medir("Árbol desde catálogo", lambda: ga.construir_arbol_desde_catalogo(conn, "1000000"))
+        print(f"  → {arbol['total_archivos']:,} archivos, {arbol['total_carpetas']:,} carpetas")
+
+        print("\n⏱️  Expansión perezosa de un nivel")
+        medir("expandir_carpeta(raíz)", lambda: ga.expandir_carpeta(ruta_usuario))
+
+        print("\n⏱️  Búsqueda 'noviembre'")
+        medir("os.walk + substring", lambda: buscar_os_walk(ruta_usuario, "noviembre"))
+        resultados = medir("Catálogo FTS5", lambda: ga.buscar_en_catalogo(conn, "1000000", "noviembre"))
+        print(f"  → {len(resultados)} resultados (límite {ga.LIMITE_BUSQUEDA})")
+
+        conn.close()
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - ESTADÍSTICAS CON AGREGACIÓN CONDICIONAL
+===================================================
+Compara, sobre una BD SQLite temporal con N filas por tabla, las consultas
+anteriores de los dashboards con las de una sola pasada:
+
+    tareas      3 x COUNT(*)                      vs  1 x SUM(CASE ...)
+    marketing   4 consultas (LIKE 'hoy%')         vs  1 sentencia, rango indexado
+    impuestos   LIKE 'anio%' + 3 comprensiones    vs  rango indexado + 1 pasada
+
+Uso:
+    python scripts/benchmarks/bench_estadisticas.py --filas 1000000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from sqlalchemy import create_engine, func  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from logic.consultas import contar_si, conteos, rango_anio, rango_prefijo  # noqa: E402
+from models.orm_models import CampanaMarketing, PagoImpuesto, Prospecto, RedSocial, TareaUsuario  # noqa: E402
+
+ESTADOS_IMPUESTO = ["Pagado", "Pendiente de Pago", "Vencido"]
+
+
+def poblar(ruta, filas, semilla=11):
+    """Crea las tablas con sus índices del modelo y N filas en tareas, prospectos e impuestos."""
+    engine = create_engine(f"sqlite:///{ruta}")
+    for modelo in (TareaUsuario, Prospecto, CampanaMarketing, RedSocial, PagoImpuesto):
+        modelo.__table__.create(engine)
+    engine.dispose()
+
+    random.seed(semilla)
+    inicio = date(2023, 1, 1)
+    conn = sqlite3.connect(ruta)
+    conn.executemany(
+        "INSERT INTO tareas_usuario (user_id, descripcion, completada, created_at) VALUES (?, ?, ?, ?)",
+        ((random.randint(1, 500), "tarea", random.randint(0, 1), "2025-01-01 00:00:00") for _ in range(filas)),
+    )
+    conn.executemany(
+        "INSERT INTO marketing_prospectos (nombre_empresa, estado, fecha_registro) VALUES (?, ?, ?)",
+        (("P", "Nuevo", f"{inicio + timedelta(days=random.randint(0, 1095))} 09:00:00") for _ in range(filas)),
+    )
+    conn.executemany(
+        "INSERT INTO marketing_campanas (nombre_campana, estado) VALUES (?, ?)",
+        ((f"C{i}", random.choice(["Activa", "Pausada", "Finalizada"])) for i in range(1000)),
+    )
+    conn.executemany("INSERT INTO marketing_redes (plataforma, seguidores) VALUES (?, ?)",
+                     ((f"R{i}", random.randint(0, 10_000)) for i in range(50)))
+    conn.executemany(
+        "INSERT INTO pago_impuestos (empresa_nit, empresa_nombre, tipo_impuesto, periodo, fecha_limite, estado) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((f"900{random.randint(0, 1999):06d}", "E", "IVA", "P",
+          str(inicio + timedelta(days=random.randint(0, 1095))), random.choice(ESTADOS_IMPUESTO))
+         for _ in range(filas)),
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+# ------------------------------------------------------------------ tareas
+
+def tareas_anterior(sesion, user_id):
+    base = sesion.query(TareaUsuario).filter_by(user_id=user_id)
+    return base.count(), base.filter_by(completada=0).count(), base.filter_by(completada=1).count()
+
+
+def tareas_agregada(sesion, user_id):
+    return conteos(sesion.query(
+        func.count(TareaUsuario.id).label("total"),
+        contar_si(TareaUsuario.completada == 0).label("pendientes"),
+        contar_si(TareaUsuario.completada == 1).label("completadas"),
+    ).filter(TareaUsuario.user_id == user_id).one())
+
+
+# --------------------------------------------------------------- marketing
+
+def marketing_anterior(sesion, hoy):
+    return (
+        sesion.query(Prospecto).count(),
+        sesion.query(Prospecto).filter(Prospecto.fecha_registro.like(f"{hoy}%")).count(),
+        sesion.query(CampanaMarketing).filter(CampanaMarketing.estado == "Activa").count(),
+        sesion.query(func.coalesce(func.sum(RedSocial.seguidores), 0)).scalar(),
+    )
+
+
+def marketing_agregada(sesion, hoy):
+    return tuple(sesion.query(
+        sesion.query(func.count(Prospecto.id)).scalar_subquery(),
+        sesion.query(func.count(Prospecto.id)).filter(rango_prefijo(Prospecto.fecha_registro, hoy)).scalar_subquery(),
+        sesion.query(func.count(CampanaMarketing.id)).filter(CampanaMarketing.estado == "Activa").scalar_subquery(),
+        sesion.query(func.coalesce(func.sum(RedSocial.seguidores), 0)).scalar_subquery(),
+    ).one())
+
+
+# --------------------------------------------------------------- impuestos
+
+def balance_anterior(sesion, nit, anio):
+    impuestos = sesion.query(PagoImpuesto).filter(
+        PagoImpuesto.empresa_nit == nit, PagoImpuesto.fecha_limite.like(f"{anio}%")
+    ).order_by(PagoImpuesto.fecha_limite.asc()).all()
+    return (len(impuestos),) + tuple(len([i for i in impuestos if i.estado == e]) for e in ESTADOS_IMPUESTO)
+
+
+def balance_rango(sesion, nit, anio):
+    impuestos = sesion.query(PagoImpuesto).filter(
+        PagoImpuesto.empresa_nit == nit, rango_anio(PagoImpuesto.fecha_limite, anio)
+    ).order_by(PagoImpuesto.fecha_limite.asc()).all()
+    por_estado = Counter(i.estado for i in impuestos)
+    return (len(impuestos),) + tuple(por_estado[e] for e in ESTADOS_IMPUESTO)
+
+
+def medir(nombre, funcion, repeticiones=3):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} {min(tiempos) * 1000:10.1f} ms")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=1_000_000, help="Filas por tabla (tareas, prospectos, impuestos)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "bench_estadisticas.db")
+        print(f"🧮 Poblando BD temporal con {args.filas:,} filas por tabla ...")
+        poblar(ruta, args.filas)
+
+        engine = create_engine(f"sqlite:///{ruta}")
+        with Session(engine) as sesion:
+            hoy = "2024-06-15"
+            nit = "900000042"
+
+            print("\n⏱️  Tareas (usuario con ~{:,} tareas)".format(args.filas // 500))
+            a = medir("Anterior (3 x COUNT)", lambda: tareas_anterior(sesion, 42))
+            b = medir("SUM(CASE) en una pasada", lambda: tareas_agregada(sesion, 42))
+            assert a == (b["total"], b["pendientes"], b["completadas"])
+
+            print("\n⏱️  Marketing")
+            a = medir("Anterior (4 consultas, LIKE)", lambda: marketing_anterior(sesion, hoy))
+            b = medir("1 sentencia, rango indexado", lambda: marketing_agregada(sesion, hoy))
+            assert a == b
+
+            print("\n⏱️  Balance de impuestos")
+            a = medir("Anterior (LIKE + comprensiones)", lambda: balance_anterior(sesion, nit, 2024))
+            b = medir("Rango indexado + Counter", lambda: balance_rango(sesion, nit, 2024))
+            assert a == b
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
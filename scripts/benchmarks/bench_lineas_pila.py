@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - MEMORIA DE LÍNEAS PILA
+==================================
+Compara las líneas de planilla como dict (calcular_linea) contra LineaPILA
+(calcular_linea_compacta: __slots__ y centavos enteros): memoria retenida
+por línea medida con tracemalloc, tiempo de cálculo, validar_planilla sobre
+ambas formas y el costo de to_dict() en la serialización.
+
+Uso:
+    python scripts/benchmarks/bench_lineas_pila.py --lineas 100000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from logic.pila_engine import LiquidadorPILA  # noqa: E402
+
+
+def generar_empleados(total, semilla=11):
+    random.seed(semilla)
+    return [
+        {
+            'numeroId': str(10_000_000 + i),
+            'primerNombre': 'Empleado',
+            'primerApellido': str(i),
+            'ibc': random.randrange(1_300_000, 8_000_000, 1000),
+            'arlClase': random.randint(1, 5),
+        }
+        for i in range(total)
+    ]
+
+
+def medir_memoria(nombre, funcion, total):
+    """Memoria retenida por el resultado (sin contar empleados ni temporales liberados)."""
+    gc.collect()
+    tracemalloc.start()
+    resultado = funcion()
+    actual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {nombre:<45} {actual / 2**20:8.1f} MiB  {actual / total:7.0f} B/línea  (pico {pico / 2**20:.1f} MiB)")
+    return resultado
+
+
+def medir(nombre, funcion, repeticiones=3):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} {min(tiempos) * 1000:10.1f} ms")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lineas", type=int, default=100_000, help="Número de líneas de la planilla sintética")
+    args = parser.parse_args()
+
+    liquidador = LiquidadorPILA()
+    print(f"🧮 Generando {args.lineas:,} empleados sintéticos ...")
+    empleados = generar_empleados(args.lineas)
+
+    print("\n💾 Memoria retenida")
+    dicts = medir_memoria("dict (calcular_linea)",
+                          lambda: [liquidador.calcular_linea(e) for e in empleados], args.lineas)
+    compactas = medir_memoria("LineaPILA (calcular_linea_compacta)",
+                              lambda: [liquidador.calcular_linea_compacta(e) for e in empleados], args.lineas)
+
+    print("\n⏱️  Tiempo")
+    medir("calcular_linea (dict)", lambda: [liquidador.calcular_linea(e) for e in empleados], 1)
+    medir("calcular_linea_compacta", lambda: [liquidador.calcular_linea_compacta(e) for e in empleados], 1)
+    medir("validar_planilla sobre dicts", lambda: liquidador.validar_planilla(dicts))
+    medir("validar_planilla sobre LineaPILA", lambda: liquidador.validar_planilla(compactas))
+    medir("to_dict() de todas las líneas", lambda: [linea.to_dict() for linea in compactas])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - MOTOR DE REGLAS PILA POR COLUMNAS
+=============================================
+Mide LiquidadorPILA.validar_planilla (motor de reglas por columnas) sobre
+una planilla sintética de N líneas con un ~2% de anomalías sembradas, y lo
+compara con la validación anterior línea a línea con Decimal (solo IBC
+mínimo y días).
+
+Uso:
+    python scripts/benchmarks/bench_reglas_pila.py --lineas 100000
+    python scripts/benchmarks/bench_reglas_pila.py --lineas 100000 --empresas 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from logic.pila_engine import LiquidadorPILA  # noqa: E402
+from logic.reglas_pila import ColumnasPlanilla, evaluar_reglas  # noqa: E402
+
+
+def generar_planilla(liquidador, total, empresas=1, semilla=7):
+    """Líneas coherentes (aportes al 4%, tarifa ARL de la clase) repartidas en `empresas` NIT."""
+    random.seed(semilla)
+    lineas = []
+    for i in range(total):
+        ibc = random.randrange(1_300_000, 8_000_000, 1000)
+        clase = random.randint(1, 5)
+        linea = {
+            'usuario_id': str(10_000_000 + i),
+            'empresa_nit': f"900{i % empresas:06d}",
+            'ibc_calculado': float(ibc),
+            'dias_cotizados': 30,
+            'salud_empleado': ibc * 0.04,
+            'pension_empleado': ibc * 0.04,
+            'arl_clase': clase,
+            'arl_tarifa': float(getattr(liquidador.config, f'ARL_CLASE_{clase}')),
+            'arl': round(ibc * float(getattr(liquidador.config, f'ARL_CLASE_{clase}')) / 100, 2),
+            'total_aportes': ibc * 0.285,
+            'marca_novedad': '',
+        }
+        lineas.append(linea)
+
+    for i in random.sample(range(total), max(1, total // 50)):
+        anomalia = random.choice(["salud", "dias", "duplicado", "arl", "ibc"])
+        if anomalia == "salud":
+            lineas[i]['salud_empleado'] += 1500
+        elif anomalia == "dias":
+            lineas[i]['dias_cotizados'] = 12
+        elif anomalia == "duplicado":
+            lineas[i]['usuario_id'] = lineas[(i + empresas) % total]['usuario_id']
+        elif anomalia == "arl":
+            lineas[i]['arl_tarifa'] = 6.96 if lineas[i]['arl_clase'] != 5 else 0.522
+        else:
+            lineas[i]['ibc_calculado'] *= 40
+    return lineas
+
+
+def validar_anterior(liquidador, lineas):
+    """Validación previa: bucle por línea con Decimal(str(...))."""
+    errores = []
+    total_aportes = Decimal('0')
+    for i, linea in enumerate(lineas, start=1):
+        ibc = Decimal(str(linea.get('ibc_calculado', 0)))
+        if ibc < liquidador.config.IBC_MINIMO:
+            errores.append(f"Línea {i}: IBC menor al mínimo legal")
+        dias = linea.get('dias_cotizados', 0)
+        if dias < 1 or dias > 30:
+            errores.append(f"Línea {i}: Días inválidos ({dias})")
+        total_aportes += Decimal(str(linea.get('total_aportes', 0)))
+    return errores, float(total_aportes)
+
+
+def medir(nombre, funcion, repeticiones=3):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} {min(tiempos) * 1000:10.1f} ms")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lineas", type=int, default=100_000, help="Número de líneas de la planilla sintética")
+    parser.add_argument("--empresas", type=int, default=1, help="NIT distintos entre los que se reparten las líneas")
+    args = parser.parse_args()
+
+    liquidador = LiquidadorPILA()
+    print(f"🧮 Generando planilla sintética de {args.lineas:,} líneas ({args.empresas} empresas) ...")
+    lineas = generar_planilla(liquidador, args.lineas, args.empresas)
+
+    print("\n⏱️  Validación")
+    medir("Anterior (2 reglas, Decimal por línea)", lambda: validar_anterior(liquidador, lineas))
+    columnas = medir("Construcción de columnas", lambda: ColumnasPlanilla(lineas))
+    medir("evaluar_reglas (9 reglas)", lambda: evaluar_reglas(columnas, liquidador.config))
+    resultado = medir("validar_planilla completo", lambda: liquidador.validar_planilla(lineas))
+
+    print("\n📋 Líneas marcadas por regla")
+    for regla, indices in resultado['lineas_marcadas'].items():
+        print(f"  {regla:<25} {len(indices):>8,}")
+    print(f"  {'TOTAL (únicas)':<25} {len(resultado['indices_marcados']):>8,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+BENCHMARK - SERIALIZACIÓN JSON DE LISTADOS
+==========================================
+Mide el tiempo de generar el cuerpo JSON de un listado de N filas
+(por defecto 50.000, con las columnas de /api/unificacion/master):
+
+    1. dict(row) + proveedor por defecto de Flask (json stdlib)
+    2. dict(row) + OrjsonProvider
+    3. filas_json(): SQLite genera el JSON, sin dict por fila
+
+y, para los endpoints ORM (to_dict), la misma lista de dicts con ambos
+proveedores.
+
+Uso:
+    python scripts/benchmarks/bench_serializacion_json.py --filas 50000
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from json_provider import OrjsonProvider, filas_json, orjson  # noqa: E402
+
+COLUMNAS = [
+    ("id", "INTEGER"), ("tipoId", "TEXT"), ("numeroId", "TEXT"), ("primerNombre", "TEXT"),
+    ("segundoNombre", "TEXT"), ("primerApellido", "TEXT"), ("segundoApellido", "TEXT"),
+    ("correoElectronico", "TEXT"), ("role", "TEXT"), ("estado", "TEXT"), ("empresa_nit", "TEXT"),
+    ("fechaNacimiento", "TEXT"), ("epsNombre", "TEXT"), ("arlNombre", "TEXT"), ("claseRiesgoARL", "INTEGER"),
+    ("afpNombre", "TEXT"), ("ccfNombre", "TEXT"), ("fechaIngreso", "TEXT"), ("ibc", "REAL"),
+    ("epsCosto", "REAL"), ("arlCosto", "REAL"), ("afpCosto", "REAL"), ("ccfCosto", "REAL"),
+]
+SQL_LISTADO = f"SELECT {', '.join(c for c, _ in COLUMNAS)} FROM usuarios ORDER BY id DESC"
+
+
+def crear_bd(filas, semilla=5):
+    """BD en memoria con N usuarios sintéticos."""
+    random.seed(semilla)
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"CREATE TABLE usuarios ({', '.join(f'{c} {t}' for c, t in COLUMNAS)})")
+    conn.executemany(
+        f"INSERT INTO usuarios VALUES ({', '.join('?' * len(COLUMNAS))})",
+        (
+            (i, "CC", str(10_000_000 + i), "Maria", "José", "Gómez", "Peña", f"u{i}@correo.co", "empleado",
+             "Activo", f"900{i % 300:06d}", "1990-05-17", "Sura EPS", "Positiva", random.randint(1, 5),
+             "Porvenir", "Compensar", "2024-02-01", ibc, ibc * 0.085, ibc * 0.00522, ibc * 0.12, ibc * 0.04)
+            for i, ibc in ((i, float(random.randrange(1_423_500, 9_000_000, 100))) for i in range(filas))
+        ),
+    )
+    return conn
+
+
+def medir(nombre, funcion, repeticiones=3):
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    print(f"  {nombre:<45} {min(tiempos) * 1000:10.1f} ms")
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=50_000, help="Filas del listado")
+    args = parser.parse_args()
+
+    if orjson is None:
+        print("⚠️  orjson no está instalado: solo se medirán el proveedor por defecto y filas_json()")
+
+    app = Flask(__name__)
+    estandar = DefaultJSONProvider(app)
+    rapido = OrjsonProvider(app) if orjson is not None else None
+
+    print(f"🧮 Generando {args.filas:,} filas ({len(COLUMNAS)} columnas) ...")
+    conn = crear_bd(args.filas)
+
+    print("\n⏱️  Listado sqlite3.Row (consulta + serialización)")
+    a = medir("dict(row) + proveedor por defecto",
+              lambda: estandar.dumps([dict(f) for f in conn.execute(SQL_LISTADO).fetchall()]))
+    if rapido:
+        medir("dict(row) + OrjsonProvider",
+              lambda: rapido.dumps([dict(f) for f in conn.execute(SQL_LISTADO).fetchall()]))
+    b, _ = medir("filas_json (JSON generado en SQLite)", lambda: filas_json(conn, SQL_LISTADO))
+    print(f"  {'Tamaño (por defecto / filas_json)':<45} {len(a) / 1e6:7.1f} MB / {len(b) / 1e6:.1f} MB")
+
+    print("\n⏱️  Listado ORM (lista de dicts de to_dict())")
+    dicts = [dict(f) for f in conn.execute(SQL_LISTADO).fetchall()]
+    medir("Proveedor por defecto", lambda: estandar.dumps(dicts))
+    if rapido:
+        medir("OrjsonProvider", lambda: rapido.dumps(dicts))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
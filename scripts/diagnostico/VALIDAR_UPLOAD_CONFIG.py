@@ -19,7 +19,7 @@ from utils import (
     get_max_file_size, 
     get_allowed_extensions,
     is_file_allowed,
-    validate_file_size
+    validate_content_size
 )
 
 
@@ -132,7 +132,7 @@ def check_upload_config():
             
             print()
             
-            # validate_file_size - pruebas
+            # validate_content_size - pruebas
             print("📊 PRUEBAS DE VALIDACIÓN DE TAMAÑO:")
             print("-" * 80)
             
@@ -145,7 +145,7 @@ def check_upload_config():
             
             for size, expected_valid in test_sizes:
                 test_content = b'x' * size
-                is_valid, error_msg = validate_file_size(test_content)
+                is_valid, error_msg = validate_content_size(test_content)
                 status = "✅" if is_valid == expected_valid else "❌"
                 result_text = "Válido" if is_valid else f"Rechazado: {error_msg}"
                 print(f"{status} {format_size(size):10} → {result_text}")
@@ -5,12 +5,24 @@
 
 const NovedadesAPI = {
     /**
-     * Obtiene todas las novedades desde el servidor
-     * @returns {Promise<Array>} Lista de novedades
+     * Obtiene una página de novedades desde el servidor.
+     * El backend pagina por cursor (cabecera X-Next-Cursor) y filtra por
+     * igualdad en status, priority, assignedTo y client.
+     * @param {Object} filtros - Filtros {status, priority, assignedTo, client}; los vacíos se omiten
+     * @param {string|null} cursor - Cursor de la página anterior (null para la primera)
+     * @returns {Promise<{items: Array, nextCursor: (string|null)}>} Novedades de la página y cursor de la siguiente
      */
-    async getAll() {
+    async getPage(filtros = {}, cursor = null) {
         try {
-            const response = await fetch(NOVEDADES_CONFIG.API.GET_ALL, {
+            const params = new URLSearchParams();
+            NOVEDADES_CONFIG.FILTROS.forEach(campo => {
+                if (filtros[campo]) params.set(campo, filtros[campo]);
+            });
+            if (cursor) params.set('cursor', cursor);
+
+            const query = params.toString();
+            const url = query ? `${NOVEDADES_CONFIG.API.GET_ALL}?${query}` : NOVEDADES_CONFIG.API.GET_ALL;
+            const response = await fetch(url, {
                 method: 'GET',
                 credentials: 'include',
                 headers: {
@@ -22,10 +34,12 @@ const NovedadesAPI = {
                 throw new Error(`HTTP ${response.status}: ${response.statusText}`);
             }
 
-            const data = await response.json();
-            return data;
+            return {
+                items: await response.json(),
+                nextCursor: response.headers.get('X-Next-Cursor')
+            };
         } catch (error) {
-            console.error('Error en getAll():', error);
+            console.error('Error en getPage():', error);
             throw error;
         }
     },
@@ -5,6 +5,8 @@
 
 const NovedadesTable = {
     table: null, // Referencia a la instancia de DataTable
+    filtros: {}, // Filtros activos; se aplican en el servidor
+    nextCursor: null, // Cursor de la siguiente página (null si no hay más)
 
     /**
      * Inicializa la tabla DataTables con la configuración base.
@@ -133,6 +135,66 @@ const NovedadesTable = {
         console.log(`Datos cargados en DataTable: ${validData.length} filas.`);
     },
 
+    /**
+     * Carga la primera página de novedades con los filtros dados y reemplaza el store.
+     * @param {Object} filtros - Filtros {status, priority, assignedTo, client}.
+     * @returns {Promise<Array>} Novedades de la primera página.
+     */
+    async loadFirstPage(filtros = this.filtros) {
+        const { items, nextCursor } = await NovedadesAPI.getPage(filtros);
+        this.filtros = filtros;
+        this.nextCursor = nextCursor;
+        window.caseDataStore = items;
+        this.loadData(items);
+        this.updateLoadMoreButton();
+        return items;
+    },
+
+    /**
+     * Pide la siguiente página al servidor y la añade al final del store y de la tabla.
+     * Los índices ya cargados no cambian (data-index sigue apuntando a caseDataStore).
+     */
+    async loadNextPage() {
+        if (!this.table || !this.nextCursor) return;
+
+        const button = document.getElementById('load-more-novedades');
+        if (button) button.disabled = true;
+        try {
+            const { items, nextCursor } = await NovedadesAPI.getPage(this.filtros, this.nextCursor);
+            this.nextCursor = nextCursor;
+            const validData = items.filter(item => item && typeof item === 'object');
+            window.caseDataStore.push(...validData);
+            this.table.rows.add(validData).draw(false);
+            const stats = NovedadesUI.calculateStats(window.caseDataStore);
+            NovedadesUI.renderDashboardStats(stats);
+            console.log(`Página siguiente cargada: ${validData.length} novedades (total ${window.caseDataStore.length}).`);
+        } catch (error) {
+            console.error('Error al cargar más novedades:', error);
+            NovedadesUI.showError(NOVEDADES_CONFIG.MESSAGES.ERROR.LOAD + `: ${error.message}`);
+        } finally {
+            if (button) button.disabled = false;
+            this.updateLoadMoreButton();
+        }
+    },
+
+    /**
+     * Crea (una vez) el botón "Cargar más" bajo la tabla y lo muestra solo si quedan páginas.
+     */
+    updateLoadMoreButton() {
+        let button = document.getElementById('load-more-novedades');
+        if (!button) {
+            const tableContainer = document.querySelector('#novedadesTable')?.closest('.card-body');
+            if (!tableContainer) return;
+            const wrapper = document.createElement('div');
+            wrapper.className = 'text-center p-3';
+            wrapper.innerHTML = '<button type="button" class="btn btn-sm btn-light-primary" id="load-more-novedades">Cargar más</button>';
+            tableContainer.appendChild(wrapper);
+            button = wrapper.querySelector('button');
+            button.addEventListener('click', () => this.loadNextPage());
+        }
+        button.parentElement.style.display = this.nextCursor ? '' : 'none';
+    },
+
     /**
      * Adjunta los manejadores de eventos necesarios para la tabla y sus controles.
      */
@@ -217,16 +279,29 @@ const NovedadesTable = {
 
 
     /**
-     * Filtra la tabla por prioridad usando la API de DataTables.
+     * Filtra por prioridad pidiendo al servidor la primera página filtrada.
+     * El botón 'resuelto' filtra por estado (Resuelto), no por prioridad.
      * @param {string} priorityValue - Valor de la prioridad (ej: 'alta', 'media', '').
      */
-    filterByPriority(priorityValue) {
+    async filterByPriority(priorityValue) {
         if (!this.table) return;
 
-        // Columna de Prioridad es la 8va (índice 7)
-        // Buscamos el valor exacto ('baja', 'media', etc.) usando regex
-        const searchTerm = priorityValue ? `^${priorityValue}$` : ''; // Si es '', busca todo
-        this.table.column(7).search(searchTerm, true, false).draw(); // true=regex, false=smart search
+        const filtros = priorityValue === 'resuelto'
+            ? { status: 'Resuelto' }
+            : (priorityValue ? { priority: priorityValue } : {});
+
+        try {
+            NovedadesUI.showLoading();
+            const novedades = await this.loadFirstPage(filtros);
+            const stats = NovedadesUI.calculateStats(novedades);
+            NovedadesUI.renderDashboardStats(stats);
+        } catch (error) {
+            console.error('Error al filtrar novedades:', error);
+            NovedadesUI.showError(NOVEDADES_CONFIG.MESSAGES.ERROR.LOAD + `: ${error.message}`);
+            return;
+        } finally {
+            NovedadesUI.hideLoading();
+        }
 
         // Actualizar botón activo
          document.querySelectorAll('.filter-priority-btn').forEach(btn => btn.classList.remove('active'));
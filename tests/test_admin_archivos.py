@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Subida al Gestor Documental
+=======================================
+Verifica que POST /api/archivos/subir guarde el archivo una sola vez (blob
++ enlace, o escritura directa si la carpeta está en otro volumen) y
+registre el sha256 del contenido.
+"""
+import io
+import os
+
+import pytest
+
+import blob_store
+from routes import admin_routes
+
+PDF_CONTENT = b"%PDF-1.4\n1 0 obj\n<<>>\nendobj\ntrailer\n<<>>\n%%EOF\n" * 50
+
+
+@pytest.fixture
+def gestor(app, test_db, tmp_path, monkeypatch):
+    """Carpeta de subidas y almacén temporales, y la tabla del gestor."""
+    monkeypatch.setattr(blob_store, "BLOB_STORE_FOLDER", str(tmp_path / "BLOBS"))
+    # La auditoría cierra la conexión compartida de g.db; no es lo que se prueba aquí
+    monkeypatch.setattr(admin_routes, "registrar_log", lambda *args, **kwargs: None)
+    app.config["UPLOAD_FOLDER"] = str(tmp_path / "uploads")
+    test_db.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS documentos_gestor (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nombre_archivo TEXT NOT NULL,
+            nombre_interno TEXT NOT NULL UNIQUE,
+            ruta TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            tipo_mime TEXT,
+            tamano_bytes INTEGER,
+            sha256 TEXT,
+            fecha_subida TEXT DEFAULT CURRENT_TIMESTAMP,
+            subido_por INTEGER NOT NULL,
+            subido_por_nombre TEXT,
+            descripcion TEXT
+        );
+        """
+    )
+    return tmp_path
+
+
+def _subir(client):
+    return client.post(
+        "/api/archivos/subir",
+        data={"archivo": (io.BytesIO(PDF_CONTENT), "acta.pdf"), "categoria": "Legal"},
+        content_type="multipart/form-data",
+    )
+
+
+@pytest.mark.parametrize("mismo_volumen", [True, False])
+def test_subir_archivo_escribe_una_sola_copia(logged_in_client, gestor, test_db, monkeypatch, mismo_volumen):
+    monkeypatch.setattr(blob_store, "admite_enlaces", lambda carpeta: mismo_volumen)
+
+    response = _subir(logged_in_client)
+
+    assert response.status_code in (200, 201), response.get_json()
+    fila = test_db.execute("SELECT ruta, sha256, tamano_bytes FROM documentos_gestor").fetchone()
+    assert fila["tamano_bytes"] == len(PDF_CONTENT)
+    assert os.path.basename(fila["ruta"]).startswith(fila["sha256"][:16])
+    with open(fila["ruta"], "rb") as f:
+        assert f.read() == PDF_CONTENT
+    # Sin temporales en la carpeta del gestor
+    assert os.listdir(os.path.dirname(fila["ruta"])) == [os.path.basename(fila["ruta"])]
+    # En otro volumen no se crea el blob (no hay segunda escritura)
+    assert blob_store.reporte_deduplicacion()["blobs"] == (1 if mismo_volumen else 0)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Caché de Respuestas del Asistente Jordy
+===================================================
+Usa un modelo local de prueba (sin Gemini) para verificar la clave
+normalizada, la invalidación por versión de datos, el TTL, la
+coalescencia de peticiones simultáneas y las métricas.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from flask import session
+
+import cache_respuestas
+from cache_respuestas import CacheRespuestas, normalizar_pregunta
+from routes import asistente_ai
+
+
+class ModeloStub:
+    """Modelo local: cuenta llamadas y responde un texto fijo."""
+
+    def __init__(self, respuesta="👥 Hay 3 usuarios registrados.", demora=0.0):
+        self.respuesta = respuesta
+        self.demora = demora
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.llamadas += 1
+        time.sleep(self.demora)
+        return type("Respuesta", (), {"text": self.respuesta})()
+
+
+@pytest.fixture
+def modelo(monkeypatch):
+    stub = ModeloStub()
+    monkeypatch.setattr(asistente_ai, "GEMINI_AVAILABLE", True)
+    monkeypatch.setattr(asistente_ai, "_crear_modelo", lambda: stub)
+    monkeypatch.setattr(asistente_ai, "cache_chat", CacheRespuestas(ttl_segundos=60))
+    return stub
+
+
+def test_normalizar_pregunta_equivalentes():
+    assert normalizar_pregunta("¿Cuántos  usuarios hay?") == normalizar_pregunta("cuantos usuarios HAY")
+    assert normalizar_pregunta("¿Cuántos usuarios hay?") != normalizar_pregunta("¿Cuántas empresas hay?")
+
+
+def test_cache_expira_por_ttl(monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(cache_respuestas.time, "monotonic", lambda: reloj[0])
+    cache = CacheRespuestas(ttl_segundos=10)
+    cache.guardar("k", "v")
+
+    assert cache.obtener("k") == "v"
+    reloj[0] += 11
+    assert cache.obtener("k") is None
+    assert cache.estadisticas()["expiradas"] == 1
+
+
+def test_coalescencia_una_sola_llamada():
+    cache = CacheRespuestas(ttl_segundos=60)
+    inicio = threading.Event()
+    llamadas = []
+
+    def lenta():
+        llamadas.append(1)
+        inicio.wait(2)
+        return "respuesta"
+
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(cache.obtener_o_calcular("k", lenta))) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.2)
+    inicio.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert len(llamadas) == 1
+    assert sorted(origen for _, origen in resultados) == ["calculada"] + ["coalescida"] * 4
+    metricas = cache.estadisticas()
+    assert metricas["coalescidas"] == 4
+    assert metricas["tasa_aciertos"] == 0.8
+
+
+def test_errores_no_se_cachean():
+    cache = CacheRespuestas(ttl_segundos=60)
+
+    def falla():
+        raise RuntimeError("API caída")
+
+    with pytest.raises(RuntimeError):
+        cache.obtener_o_calcular("k", falla)
+
+    assert cache.obtener_o_calcular("k", lambda: "ok") == ("ok", "calculada")
+    assert cache.estadisticas()["errores"] == 1
+
+
+def test_preguntas_equivalentes_reutilizan_respuesta(app, modelo):
+    with app.test_request_context():
+        session["user_name"] = "Ana"
+        primera = asistente_ai.procesar_con_gemini_cacheado("¿Cuántos usuarios hay?")
+        segunda = asistente_ai.procesar_con_gemini_cacheado("cuantos usuarios hay")
+
+    assert primera == (modelo.respuesta, "calculada")
+    assert segunda == (modelo.respuesta, "cache")
+    assert modelo.llamadas == 1
+
+
+def test_cambio_de_datos_invalida(app, modelo):
+    db_path = app.config["DATABASE_PATH"]
+    with app.test_request_context():
+        session["user_name"] = "Ana"
+        asistente_ai.procesar_con_gemini_cacheado("¿Cuántos usuarios hay?")
+        os.utime(db_path, ns=(0, os.stat(db_path).st_mtime_ns + 10**9))
+        _, origen = asistente_ai.procesar_con_gemini_cacheado("¿Cuántos usuarios hay?")
+
+    assert origen == "calculada"
+    assert modelo.llamadas == 2
+
+
+def test_respuestas_de_advertencia_no_se_guardan(app, modelo):
+    modelo.respuesta = "⚠️ Lo siento, la consulta se volvió muy compleja."
+    with app.test_request_context():
+        session["user_name"] = "Ana"
+        asistente_ai.procesar_con_gemini_cacheado("algo raro")
+        asistente_ai.procesar_con_gemini_cacheado("algo raro")
+
+    assert modelo.llamadas == 2
+
+
+def test_esquema_cacheado_cierra_la_conexion(app, monkeypatch, tmp_path):
+    ruta = tmp_path / "esquema.db"
+    with sqlite3.connect(ruta) as conn:
+        conn.execute("CREATE TABLE pagos (id INTEGER PRIMARY KEY, monto REAL)")
+    abiertas = []
+
+    def conexion():
+        conn = sqlite3.connect(ruta)
+        abiertas.append(conn)
+        return conn
+
+    monkeypatch.setattr(asistente_ai, "get_db_connection", conexion)
+    asistente_ai._schema_cache.clear()
+    with app.app_context():
+        primero = asistente_ai.get_schema_str()
+        segundo = asistente_ai.get_schema_str()
+
+    assert primero == segundo and "Tabla: pagos" in primero
+    assert len(abiertas) == 2
+    for conn in abiertas:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+
+def test_endpoint_chat_con_modelo_stub(logged_in_client, modelo):
+    respuesta = logged_in_client.post("/api/asistente/chat", json={"message": "¿Cuántos usuarios hay?"})
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert cuerpo["response"] == modelo.respuesta
+    assert cuerpo["cached"] is False
+    assert asistente_ai.cache_chat.estadisticas()["fallos"] == 1
+
+
+def test_status_expone_metricas(logged_in_client, modelo):
+    respuesta = logged_in_client.get("/api/asistente/status")
+
+    assert set(respuesta.get_json()["cache"]) >= {"aciertos", "fallos", "coalescidas", "tasa_aciertos"}
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Auditoría IA por Bloques de Planillas
+=================================================
+Usa un modelo local (sin Gemini) con latencia simulada para verificar el
+puntaje de anomalía sobre todas las líneas, que solo los bloques
+sospechosos lleguen al modelo, la concurrencia acotada, la fusión del
+reporte y los contadores de latencia y costo.
+"""
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from logic import auditoria_planilla
+from logic.pila_engine import LiquidadorPILA
+from routes import planillas
+
+
+class ModeloFalso:
+    """Modelo local: registra prompts, simula latencia y mide concurrencia."""
+
+    def __init__(self, demora=0.05, falla_en=None):
+        self.demora = demora
+        self.falla_en = falla_en
+        self.prompts = []
+        self.activos = 0
+        self.max_activos = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.prompts.append(prompt)
+            numero = len(self.prompts)
+            self.activos += 1
+            self.max_activos = max(self.max_activos, self.activos)
+        try:
+            time.sleep(self.demora)
+            if numero == self.falla_en:
+                raise RuntimeError("cuota agotada")
+            lineas = [l["linea"] for l in json.loads(prompt.split("LÍNEAS A REVISAR:\n")[1].split("\n\nTU MISIÓN")[0])]
+            texto = "```json\n" + json.dumps({
+                "estado": "ERRORES_ENCONTRADOS",
+                "errores_criticos": [f"Línea {n}: aporte de salud incorrecto" for n in lineas],
+                "advertencias": [],
+                "sugerencias": ["Recalcular aportes"],
+                "resumen": f"Bloque con {len(lineas)} líneas revisado.",
+            }) + "\n```"
+            return type("Respuesta", (), {"text": texto})()
+        finally:
+            with self._lock:
+                self.activos -= 1
+
+
+def _planilla(n, sospechosas=()):
+    liquidador = LiquidadorPILA()
+    lineas = [
+        liquidador.calcular_linea({"numeroId": str(i), "primerNombre": "E", "primerApellido": str(i), "ibc": 2_000_000})
+        for i in range(n)
+    ]
+    for i in sospechosas:
+        lineas[i]["salud_empleado"] += 5000
+    return lineas
+
+
+def _auditar(lineas, modelo, **kwargs):
+    liquidador = LiquidadorPILA()
+    return auditoria_planilla.auditar_planilla_completa(
+        lineas, modelo, liquidador.validar_planilla(lineas), "2025-01", "900123456", **kwargs
+    )
+
+
+def test_puntaje_marca_reglas_por_linea():
+    lineas = _planilla(4)
+    lineas[1]["ibc_calculado"] = 500_000
+    lineas[2]["arl_tarifa"] = 6.96
+    lineas[3]["dias_cotizados"] = 15
+
+    puntuadas = auditoria_planilla.puntuar_lineas(lineas)
+
+    assert puntuadas[0]["puntaje"] == 0
+    assert "ibc_bajo_minimo" in puntuadas[1]["motivos"]
+    assert puntuadas[2]["motivos"] == ["tarifa_arl"]
+    assert puntuadas[3]["motivos"] == ["dias_sin_novedad"]
+
+
+def test_seleccionar_bloques_prioriza_y_respeta_tope():
+    puntuadas = [{"indice": i, "puntaje": i % 3, "motivos": []} for i in range(30)]
+
+    bloques, omitidas = auditoria_planilla.seleccionar_bloques(puntuadas, tamano_bloque=5, max_bloques=2, umbral=1)
+
+    assert [len(b) for b in bloques] == [5, 5]
+    assert all(p["puntaje"] == 2 for b in bloques for p in b)
+    assert omitidas == 10
+
+
+def test_solo_bloques_sospechosos_llegan_al_modelo(monkeypatch):
+    monkeypatch.setattr(auditoria_planilla, "TAMANO_BLOQUE_AUDITORIA", 10)
+    modelo = ModeloFalso()
+    sospechosas = [5, 150, 420, 999]
+
+    reporte = _auditar(_planilla(1000, sospechosas), modelo)
+
+    auditoria = reporte["auditoria"]
+    assert len(modelo.prompts) == 1
+    assert auditoria["lineas_auditadas"] == [n + 1 for n in sospechosas]
+    assert auditoria["estado"] == "ERRORES_ENCONTRADOS"
+    assert "Línea 1000: aporte de salud incorrecto" in auditoria["errores"]
+    assert auditoria["metodo"] == "gemini_ai"
+
+
+def test_bloques_en_paralelo_con_pool_acotado(monkeypatch):
+    monkeypatch.setattr(auditoria_planilla, "TAMANO_BLOQUE_AUDITORIA", 2)
+    modelo = ModeloFalso(demora=0.1)
+
+    inicio = time.perf_counter()
+    reporte = _auditar(_planilla(40, range(0, 40, 2)), modelo, max_workers=3)
+    duracion = time.perf_counter() - inicio
+
+    assert len(modelo.prompts) == 10
+    assert modelo.max_activos == 3
+    assert duracion < 10 * 0.1
+    assert reporte["auditoria"]["sugerencias"] == ["Recalcular aportes"]
+
+
+def test_metricas_de_latencia_y_costo(monkeypatch):
+    monkeypatch.setattr(auditoria_planilla, "TAMANO_BLOQUE_AUDITORIA", 2)
+    monkeypatch.setattr(auditoria_planilla, "COSTO_MILLON_ENTRADA", 1_000_000.0)
+    modelo = ModeloFalso(demora=0.05)
+
+    metricas = _auditar(_planilla(10, [1, 2, 3]), modelo)["metricas"]
+
+    assert metricas["llamadas_modelo"] == 2
+    assert metricas["lineas_sospechosas"] == 3
+    assert metricas["latencia_modelo_max_ms"] >= 50
+    assert metricas["latencia_total_ms"] >= metricas["latencia_modelo_max_ms"]
+    assert metricas["tokens_entrada"] == sum(len(p) // 4 for p in modelo.prompts)
+    assert metricas["costo_estimado_usd"] >= metricas["tokens_entrada"]
+
+
+def test_falla_de_un_bloque_no_tumba_la_auditoria(monkeypatch):
+    monkeypatch.setattr(auditoria_planilla, "TAMANO_BLOQUE_AUDITORIA", 1)
+    modelo = ModeloFalso(demora=0, falla_en=1)
+
+    reporte = _auditar(_planilla(5, [0, 1]), modelo, max_workers=1)
+
+    assert reporte["metricas"]["llamadas_fallidas"] == 1
+    assert any("cuota agotada" in a for a in reporte["auditoria"]["advertencias"])
+    assert reporte["auditoria"]["metodo"] == "gemini_ai"
+
+
+def test_planilla_limpia_no_consulta_modelo():
+    modelo = ModeloFalso()
+
+    reporte = _auditar(_planilla(50), modelo)
+
+    assert modelo.prompts == []
+    assert reporte["auditoria"]["estado"] == "APROBADO"
+    assert reporte["auditoria"]["metodo"] == "validacion_basica"
+
+
+@pytest.fixture
+def cliente_planillas(monkeypatch):
+    modelo = ModeloFalso(demora=0)
+    monkeypatch.setattr(planillas, "_crear_modelo", lambda: modelo)
+    app = Flask(__name__)
+    app.secret_key = "test"
+    app.register_blueprint(planillas.bp_planillas)
+    cliente = app.test_client()
+    with cliente.session_transaction() as sess:
+        sess["user_id"] = 1
+    return cliente, modelo
+
+
+def test_endpoint_auditar_toda_la_planilla(cliente_planillas):
+    cliente, modelo = cliente_planillas
+
+    respuesta = cliente.post("/api/planillas/auditar", json={"lineas": _planilla(60, [45]), "mes": "2025-01"})
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert cuerpo["auditoria"]["lineas_auditadas"] == [46]
+    assert cuerpo["metricas"]["llamadas_modelo"] == 1
+    assert len(modelo.prompts) == 1
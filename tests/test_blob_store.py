@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Almacén de Blobs (deduplicación por contenido)
+========================================================
+Verifica que el contenido repetido se guarda una sola vez, que las rutas
+visibles son enlaces al blob y que el reporte calcula el ahorro.
+"""
+import io
+import os
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import blob_store
+
+
+@pytest.fixture
+def almacen(tmp_path, monkeypatch):
+    """Redirige BLOB_STORE_FOLDER a una carpeta temporal."""
+    carpeta = tmp_path / "BLOBS"
+    monkeypatch.setattr(blob_store, "BLOB_STORE_FOLDER", str(carpeta))
+    return carpeta
+
+
+def test_guardar_blob_deduplica_contenido(almacen):
+    contenido = b"RUT" * 50_000
+
+    primero = blob_store.guardar_blob(io.BytesIO(contenido))
+    segundo = blob_store.guardar_blob(FileStorage(stream=io.BytesIO(contenido), filename="rut.pdf"))
+
+    assert primero["nuevo"] is True
+    assert segundo["nuevo"] is False
+    assert primero["sha256"] == segundo["sha256"]
+    assert primero["tamano"] == len(contenido)
+    assert os.listdir(almacen / "tmp") == []
+
+
+def test_guardar_blob_respeta_max_bytes(almacen):
+    with pytest.raises(blob_store.ArchivoDemasiadoGrande):
+        blob_store.guardar_blob(io.BytesIO(b"x" * 1000), max_bytes=999)
+
+    assert os.listdir(almacen / "tmp") == []
+    assert blob_store.reporte_deduplicacion()["blobs"] == 0
+
+
+def test_expedientes_comparten_blob_y_reporte_de_ahorro(almacen, tmp_path):
+    cedula = b"%PDF cedula representante" * 100
+    destinos = [tmp_path / "EMPRESAS" / f"900{i}" / "cedula_representante.pdf" for i in range(3)]
+
+    for destino in destinos:
+        blob_store.guardar_y_vincular(cedula, str(destino))
+
+    assert all(d.read_bytes() == cedula for d in destinos)
+    reporte = blob_store.reporte_deduplicacion()
+    assert reporte["blobs"] == 1
+    assert reporte["referencias"] == 3
+    assert reporte["bytes_fisicos"] == len(cedula)
+    assert reporte["bytes_logicos"] == 3 * len(cedula)
+    assert reporte["bytes_ahorrados"] == 2 * len(cedula)
+    assert reporte["blobs_compartidos"] == 1
+
+
+def test_reemplazar_ruta_no_altera_las_demas(almacen, tmp_path):
+    ruta_a = tmp_path / "a" / "rut.pdf"
+    ruta_b = tmp_path / "b" / "rut.pdf"
+    blob_store.guardar_y_vincular(b"version 1", str(ruta_a))
+    blob_store.guardar_y_vincular(b"version 1", str(ruta_b))
+
+    blob_store.guardar_y_vincular(b"version 2", str(ruta_a))
+
+    assert ruta_a.read_bytes() == b"version 2"
+    assert ruta_b.read_bytes() == b"version 1"
+
+
+def _envejecer(ruta, segundos):
+    hace = os.stat(ruta).st_mtime - segundos
+    os.utime(ruta, (hace, hace))
+
+
+def test_limpiar_blobs_huerfanos(almacen, tmp_path):
+    ruta = tmp_path / "docs" / "temporal.pdf"
+    blob = blob_store.guardar_y_vincular(b"borrame", str(ruta))
+    os.remove(ruta)
+
+    assert blob_store.reporte_deduplicacion()["blobs_huerfanos"] == 1
+    # Dentro del periodo de gracia (p. ej. guardado y aún no vinculado) se conserva
+    assert blob_store.limpiar_blobs_huerfanos() == 0
+
+    _envejecer(blob["ruta"], blob_store.GRACIA_HUERFANOS_SEG + 60)
+    assert blob_store.limpiar_blobs_huerfanos() == len(b"borrame")
+    assert blob_store.reporte_deduplicacion()["blobs"] == 0
+
+
+def test_deduplicar_renueva_huerfano(almacen):
+    blob = blob_store.guardar_blob(b"staging")
+    _envejecer(blob["ruta"], blob_store.GRACIA_HUERFANOS_SEG + 60)
+
+    assert blob_store.guardar_blob(b"staging")["nuevo"] is False
+    assert blob_store.limpiar_blobs_huerfanos() == 0
+
+
+def test_otro_volumen_escribe_directo_sin_blob(almacen, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_store, "admite_enlaces", lambda carpeta: False)
+    destino = tmp_path / "D" / "EMPRESAS" / "rut.pdf"
+
+    resultado = blob_store.guardar_y_vincular(b"%PDF rut", str(destino))
+
+    assert destino.read_bytes() == b"%PDF rut"
+    assert resultado["ruta"] == str(destino)
+    assert blob_store.reporte_deduplicacion()["blobs"] == 0
+    assert [p.name for p in destino.parent.iterdir()] == ["rut.pdf"]
+
+
+def test_vincular_no_deja_temporales(almacen, tmp_path):
+    blob = blob_store.guardar_blob(b"cedula")
+    destino = tmp_path / "x" / "cedula.pdf"
+
+    for _ in range(3):
+        blob_store.vincular_blob(blob["sha256"], str(destino))
+
+    assert [p.name for p in destino.parent.iterdir()] == ["cedula.pdf"]
+
+
+def test_endpoint_reporte_requiere_admin(almacen, logged_in_client):
+    respuesta = logged_in_client.get("/api/archivos/deduplicacion")
+    assert respuesta.status_code == 403
+
+
+def test_endpoint_reporte_admin(almacen, tmp_path, logged_in_client):
+    blob_store.guardar_y_vincular(b"cedula", str(tmp_path / "x" / "c1.pdf"))
+    blob_store.guardar_y_vincular(b"cedula", str(tmp_path / "y" / "c2.pdf"))
+    with logged_in_client.session_transaction() as sess:
+        sess["role"] = "admin"
+
+    respuesta = logged_in_client.get("/api/archivos/deduplicacion")
+
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos["bytes_ahorrados"] == len(b"cedula")
+    assert datos["porcentaje_ahorro"] == 50.0
+
+
+# ==================== PIPELINE DE SUBIDA EN STREAMING ====================
+
+
+def _pdf_en_blanco(paginas=1):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(paginas):
+        writer.add_blank_page(width=72, height=72)
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+def test_detectar_mime_por_firma():
+    assert blob_store.detectar_mime(b"%PDF-1.7\n...", "x.pdf") == "application/pdf"
+    assert blob_store.detectar_mime(b"\x89PNG\r\n\x1a\n....", "x.pdf") == "image/png"
+    assert blob_store.detectar_mime(b"PK\x03\x04....", "libro.xlsx").endswith("spreadsheetml.sheet")
+    assert blob_store.detectar_mime(b"hola mundo", "notas.txt") == "text/plain"
+    assert blob_store.detectar_mime(b"hola mundo", "falso.pdf") == "application/octet-stream"
+
+
+def test_guardar_blob_rechaza_mime_antes_de_escribir(almacen):
+    with pytest.raises(blob_store.TipoArchivoNoPermitido):
+        blob_store.guardar_blob(
+            FileStorage(stream=io.BytesIO(b"MZ\x90\x00ejecutable"), filename="factura.pdf"),
+            mimes_permitidos={"application/pdf"},
+        )
+
+    assert not (almacen / "tmp").exists()
+
+
+def test_validate_upload_usa_el_contenido_y_no_el_content_type():
+    from utils import validate_upload
+
+    falso = FileStorage(stream=io.BytesIO(b"no soy un pdf"), filename="soporte.pdf",
+                        content_type="application/pdf")
+    real = FileStorage(stream=io.BytesIO(_pdf_en_blanco()), filename="soporte.pdf",
+                       content_type="application/octet-stream")
+
+    assert validate_upload(falso, file_type="document")[0] is False
+    assert validate_upload(real, file_type="document") == (True, "")
+    assert real.stream.tell() == 0
+
+
+def test_validate_file_size_mide_el_stream_sin_leerlo(app):
+    from utils import validate_content_size, validate_file_size
+
+    archivo = FileStorage(stream=io.BytesIO(b"x" * 1000), filename="soporte.pdf")
+
+    assert validate_file_size(archivo, max_size=1000) is True
+    assert validate_file_size(archivo, max_size=999) is False
+    assert archivo.stream.tell() == 0
+    with app.app_context():
+        assert validate_content_size(b"x" * 10) == (True, None)
+
+
+def test_sanitize_and_save_file_usa_el_almacen(almacen, tmp_path):
+    from utils import sanitize_and_save_file
+
+    contenido = _pdf_en_blanco()
+    for carpeta in ("TUTELAS", "INCAPACIDADES"):
+        archivo = FileStorage(stream=io.BytesIO(contenido), filename="soporte.pdf",
+                              content_type="application/pdf")
+        ruta = sanitize_and_save_file(archivo, str(tmp_path / "USUARIOS" / "123" / carpeta))
+        assert open(ruta, "rb").read() == contenido
+
+    reporte = blob_store.reporte_deduplicacion()
+    assert reporte["blobs"] == 1
+    assert reporte["referencias"] == 2
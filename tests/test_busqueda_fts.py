@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Búsqueda de Texto Completo
+======================================
+Verifica los índices FTS5 de usuarios y empresas: búsqueda por prefijos
+sin distinguir tildes, sincronización por triggers, la vuelta al LIKE
+mientras falta el índice y los endpoints de autocompletado y búsqueda de
+empresas.
+"""
+import sqlite3
+
+import pytest
+from flask import g
+
+from busqueda_fts import expresion_match, fts_disponible, instalar_fts, sugerencias
+
+COLUMNAS = ("id", "numeroId", "primerNombre", "primerApellido")
+
+
+@pytest.fixture
+def conexion():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE usuarios (
+            id INTEGER PRIMARY KEY, tipoId TEXT, numeroId TEXT, primerNombre TEXT, segundoNombre TEXT,
+            primerApellido TEXT, segundoApellido TEXT, correoElectronico TEXT, empresa_nit TEXT
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO usuarios (tipoId, numeroId, primerNombre, primerApellido, correoElectronico) VALUES ('CC', ?, ?, ?, ?)",
+        [
+            ("1010123456", "José", "Peña", "jose.pena@correo.co"),
+            ("1020987654", "María", "Gómez", "mgomez@correo.co"),
+            ("52111222", "Ángela", "Ordóñez", "angela@empresa.com"),
+        ],
+    )
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def _ids(conn, texto):
+    return [fila["numeroId"] for fila in sugerencias(conn, "usuarios", texto, COLUMNAS)]
+
+
+def test_expresion_match():
+    assert expresion_match("José Góm") == '"José"* AND "Góm"*'
+    assert expresion_match('a" OR NEAR(b') == '"a"* AND "OR"* AND "NEAR"* AND "b"*'
+    assert expresion_match("  -- ") is None
+
+
+def test_sin_indice_no_lo_construye(conexion):
+    assert not fts_disponible(conexion, "usuarios")
+    assert conexion.execute("SELECT 1 FROM sqlite_master WHERE name = 'usuarios_fts'").fetchone() is None
+
+
+def test_busqueda_sin_tildes_y_por_prefijo(conexion):
+    instalar_fts(conexion, "usuarios")
+    assert fts_disponible(conexion, "usuarios")
+
+    assert _ids(conexion, "jose pe") == ["1010123456"]
+    assert _ids(conexion, "ANGELA ordon") == ["52111222"]
+    assert _ids(conexion, "Gómez") == ["1020987654"]
+    assert _ids(conexion, "10209") == ["1020987654"]
+    assert _ids(conexion, "mgomez@correo") == ["1020987654"]
+    assert sorted(_ids(conexion, "correo")) == ["1010123456", "1020987654"]
+    assert _ids(conexion, "") == []
+    # Prefijos de menos de 3 caracteres: casi todo coincide, no se sugiere
+    assert _ids(conexion, "jo pe") == []
+
+
+def test_sugerencias_ordenan_todas_las_coincidencias(conexion):
+    # 600 coincidencias débiles antes (por rowid) de la mejor: el término
+    # aparece una vez entre muchas palabras frente a dos veces en pocas
+    conexion.executemany(
+        "INSERT INTO usuarios (numeroId, primerNombre, segundoNombre, primerApellido, segundoApellido) "
+        "VALUES (?, 'Andrés', 'Felipe Santiago', 'Castaño', 'Londoño Quiñónez')",
+        [(str(i),) for i in range(600)],
+    )
+    conexion.execute("INSERT INTO usuarios (numeroId, primerNombre, primerApellido) VALUES ('99', 'Andrés', 'Andrés')")
+    conexion.commit()
+    instalar_fts(conexion, "usuarios")
+
+    assert _ids(conexion, "andres")[0] == "99"
+
+
+def test_triggers_mantienen_el_indice(conexion):
+    instalar_fts(conexion, "usuarios")
+
+    conexion.execute("INSERT INTO usuarios (numeroId, primerNombre, primerApellido) VALUES ('7', 'Núñez', 'Ruiz')")
+    conexion.execute("UPDATE usuarios SET primerApellido = 'Zúñiga' WHERE numeroId = '1010123456'")
+    conexion.execute("DELETE FROM usuarios WHERE numeroId = '52111222'")
+    conexion.commit()
+
+    assert _ids(conexion, "nunez") == ["7"]
+    assert _ids(conexion, "jose zuniga") == ["1010123456"]
+    assert _ids(conexion, "angela") == []
+    # Falla con 'database disk image is malformed' si el índice no coincide con la tabla
+    conexion.execute("INSERT INTO usuarios_fts (usuarios_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_tabla_recreada_reconstruye_el_indice(conexion):
+    instalar_fts(conexion, "usuarios")
+    conexion.execute("ALTER TABLE usuarios RENAME TO usuarios_viejos")
+    conexion.execute("CREATE TABLE usuarios AS SELECT * FROM usuarios_viejos WHERE numeroId = '52111222'")
+    conexion.execute("DROP TABLE usuarios_viejos")
+
+    assert not fts_disponible(conexion, "usuarios")
+    instalar_fts(conexion, "usuarios")
+    assert fts_disponible(conexion, "usuarios")
+    assert _ids(conexion, "jose") == []
+    assert _ids(conexion, "angela") == ["52111222"]
+
+
+@pytest.fixture
+def empresas(test_db):
+    test_db.execute("""
+        CREATE TABLE IF NOT EXISTS empresas (
+            id INTEGER PRIMARY KEY, nit TEXT UNIQUE, nombre_empresa TEXT, correo_empresa TEXT,
+            ciudad_empresa TEXT, created_at TEXT
+        )
+    """)
+    test_db.executemany(
+        "INSERT INTO empresas (nit, nombre_empresa, ciudad_empresa) VALUES (?, ?, ?)",
+        [("900123456-7", "Construcciones Peñalosa S.A.S", "Bogotá"),
+         ("800555111-2", "Logística Andina Ltda", "Medellín"),
+         ("901000222-3", "Andes Café", "Manizales")],
+    )
+    test_db.commit()
+    instalar_fts(test_db, "empresas")
+    return test_db
+
+
+def _get(client, url):
+    # Las vistas cierran g.db y el contexto de la app se reutiliza entre peticiones
+    g.pop("db", None)
+    return client.get(url)
+
+
+def test_endpoint_sugerencias_empresas(logged_in_client, empresas):
+    respuesta = _get(logged_in_client, "/api/empresas/sugerencias?q=penal")
+
+    assert respuesta.status_code == 200
+    assert [e["nit"] for e in respuesta.get_json()["items"]] == ["900123456-7"]
+
+    por_nit = _get(logged_in_client, "/api/empresas/sugerencias?q=800555").get_json()
+    assert por_nit["items"][0]["nombre_empresa"] == "Logística Andina Ltda"
+
+
+def test_get_empresas_busca_con_fts(logged_in_client, empresas):
+    respuesta = _get(logged_in_client, "/api/empresas?search=and")
+
+    datos = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert datos["total_items"] == 2
+    assert [e["nombre_empresa"] for e in datos["items"]] == ["Andes Café", "Logística Andina Ltda"]
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del GET Condicional de Catálogos
+======================================
+Verifica los contadores de versiones_datos (triggers de la migración
+20251210) y que @respuesta_condicional responda 304 sin ejecutar la vista
+mientras los datos no cambien, y 200 con un ETag nuevo después de una
+escritura. Sin la migración se responde sin caché y sin escribir nada.
+"""
+import sqlite3
+from pathlib import Path
+
+import pytest
+from flask import g
+
+from cache_http import respuesta_condicional, versiones_tablas
+
+MIGRACION = Path(__file__).resolve().parent.parent / "migrations" / "20251210_versiones_datos.sql"
+
+SQL_DOCUMENTOS_GESTOR = """
+    CREATE TABLE IF NOT EXISTS documentos_gestor (
+        id INTEGER PRIMARY KEY, nombre_archivo TEXT, nombre_interno TEXT, ruta TEXT,
+        categoria TEXT, tipo_mime TEXT, tamano_bytes INTEGER, fecha_subida TEXT,
+        subido_por INTEGER, subido_por_nombre TEXT, descripcion TEXT
+    )
+"""
+
+
+def _migrar(conn):
+    conn.executescript(MIGRACION.read_text(encoding="utf-8"))
+
+
+@pytest.fixture
+def conexion():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE empresas (nit TEXT PRIMARY KEY, nombre_empresa TEXT)")
+    conn.execute("CREATE TABLE usuarios (id INTEGER PRIMARY KEY, nombre TEXT)")
+    conn.execute(SQL_DOCUMENTOS_GESTOR)
+    yield conn
+    conn.close()
+
+
+def _version(conn, tabla):
+    return versiones_tablas(conn, (tabla,))[tabla][0]
+
+
+def test_triggers_suben_la_version(conexion):
+    _migrar(conexion)
+    assert _version(conexion, "empresas") == 0
+
+    conexion.execute("INSERT INTO empresas VALUES ('900', 'Acme')")
+    conexion.execute("INSERT INTO empresas VALUES ('800', 'Beta')")
+    conexion.execute("UPDATE empresas SET nombre_empresa = 'Acme S.A.S' WHERE nit = '900'")
+    conexion.execute("DELETE FROM empresas WHERE nit = '800'")
+
+    assert _version(conexion, "empresas") == 4
+
+
+def test_sin_migracion_no_escribe_nada(conexion):
+    cambios = conexion.total_changes
+
+    assert versiones_tablas(conexion, ("empresas",)) is None
+    assert conexion.total_changes == cambios
+    assert conexion.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE name = 'versiones_datos' OR type = 'trigger'"
+    ).fetchone()[0] == 0
+
+
+def test_decorador_rechaza_tablas_no_versionadas():
+    with pytest.raises(ValueError):
+        respuesta_condicional("formularios")
+
+
+def test_tabla_recreada_sin_triggers_no_se_cachea_hasta_migrar(conexion):
+    _migrar(conexion)
+    conexion.execute("DROP TABLE empresas")
+    conexion.execute("CREATE TABLE empresas (nit TEXT PRIMARY KEY, nombre_empresa TEXT)")
+    conexion.execute("INSERT INTO empresas VALUES ('900', 'Acme')")
+
+    assert versiones_tablas(conexion, ("empresas",)) is None
+
+    _migrar(conexion)
+    # Reaplicar la migración sube la versión: los ETag previos dejan de valer
+    assert _version(conexion, "empresas") == 1
+
+
+@pytest.fixture
+def documentos(test_db):
+    # La migración instala triggers en las tres tablas versionadas
+    test_db.execute("CREATE TABLE IF NOT EXISTS empresas (nit TEXT PRIMARY KEY, nombre_empresa TEXT)")
+    test_db.execute("CREATE TABLE IF NOT EXISTS usuarios (id INTEGER PRIMARY KEY, nombre TEXT)")
+    test_db.execute(SQL_DOCUMENTOS_GESTOR)
+    test_db.execute("INSERT INTO documentos_gestor (nombre_archivo, categoria, fecha_subida) "
+                    "VALUES ('acta.pdf', 'Legal', '2025-12-01')")
+    test_db.commit()
+    _migrar(test_db)
+    return test_db
+
+
+def _get(client, url, **kwargs):
+    # Las vistas cierran g.db y el contexto de la app se reutiliza entre peticiones
+    g.pop("db", None)
+    return client.get(url, **kwargs)
+
+
+def test_etag_y_304_hasta_que_cambian_los_datos(logged_in_client, documentos):
+    primera = _get(logged_in_client, "/api/archivos")
+    assert primera.status_code == 200
+    etag = primera.headers["ETag"]
+    assert primera.headers["Cache-Control"] == "private, no-cache"
+    assert "Cookie" in primera.headers["Vary"]
+
+    repetida = _get(logged_in_client, "/api/archivos", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.get_data() == b""
+    assert repetida.headers["ETag"] == etag
+
+    documentos.execute("INSERT INTO documentos_gestor (nombre_archivo, categoria, fecha_subida) "
+                       "VALUES ('rut.pdf', 'Legal', '2025-12-02')")
+    documentos.commit()
+
+    nueva = _get(logged_in_client, "/api/archivos", headers={"If-None-Match": etag})
+    assert nueva.status_code == 200
+    assert nueva.headers["ETag"] != etag
+    assert len(nueva.get_json()) == 2
+
+
+def test_etag_distinto_por_query(logged_in_client, documentos):
+    todos = _get(logged_in_client, "/api/archivos").headers["ETag"]
+    legal = _get(logged_in_client, "/api/archivos?categoria=Legal").headers["ETag"]
+
+    assert todos != legal
+
+
+def test_if_modified_since(logged_in_client, documentos):
+    primera = _get(logged_in_client, "/api/archivos")
+
+    repetida = _get(logged_in_client, "/api/archivos",
+                     headers={"If-Modified-Since": primera.headers["Last-Modified"]})
+
+    assert repetida.status_code == 304
+
+
+def test_sin_migracion_responde_sin_cache(logged_in_client, test_db):
+    test_db.execute(SQL_DOCUMENTOS_GESTOR)
+    test_db.commit()
+
+    respuesta = _get(logged_in_client, "/api/archivos")
+
+    assert respuesta.status_code == 200
+    assert "ETag" not in respuesta.headers
+    assert test_db.execute("SELECT name FROM sqlite_master WHERE name = 'versiones_datos'").fetchone() is None
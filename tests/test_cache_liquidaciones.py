@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Caché LRU de Liquidaciones PILA
+===========================================
+Verifica que CalculadoraPILA.calcular() memoiza por (entradas, versión de
+parámetros), que la caché está acotada y que los resultados son inmutables.
+"""
+from dataclasses import FrozenInstanceError, replace
+
+import pytest
+
+from logic import pila_engine
+from logic.pila_engine import CacheLRU, CalculadoraPILA, cache_liquidaciones
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    cache_liquidaciones.limpiar()
+    yield
+    cache_liquidaciones.limpiar()
+
+
+def test_misma_entrada_devuelve_resultado_cacheado():
+    primero = CalculadoraPILA(2_000_000, 3).calcular()
+    segundo = CalculadoraPILA(2_000_000, 3).calcular()
+
+    assert segundo == replace(primero, fecha_calculo=segundo.fecha_calculo)
+    estadisticas = cache_liquidaciones.estadisticas()
+    assert (estadisticas["aciertos"], estadisticas["fallos"], estadisticas["tamano"]) == (1, 1, 1)
+    assert estadisticas["tasa_aciertos"] == 0.5
+
+
+def test_cada_parametro_forma_parte_de_la_clave():
+    base = CalculadoraPILA(2_000_000, 1).calcular()
+
+    assert CalculadoraPILA(2_000_000, 2).calcular() != base
+    assert CalculadoraPILA(2_000_000, 1, es_empresa_exonerada=False).calcular() != base
+    assert CalculadoraPILA(20_000_000, 1, es_salario_integral=True).calcular() != base
+    assert cache_liquidaciones.estadisticas()["aciertos"] == 0
+
+
+def test_clave_usa_salario_de_entrada():
+    # 900.000 se ajusta al SMMLV pero no comparte entrada con 1.300.000 (salario_ajustado)
+    ajustado = CalculadoraPILA(900_000, 1).calcular()
+    minimo = CalculadoraPILA(1_300_000, 1).calcular()
+    CalculadoraPILA(1_300_000.0, 1).calcular()
+
+    assert ajustado.salario_ajustado and not minimo.salario_ajustado
+    assert cache_liquidaciones.estadisticas()["aciertos"] == 1
+
+
+def test_version_de_parametros_invalida(monkeypatch):
+    CalculadoraPILA(2_000_000, 1).calcular()
+    monkeypatch.setattr(pila_engine, "VERSION_PARAMETROS_PILA", "2026")
+
+    CalculadoraPILA(2_000_000, 1).calcular()
+    assert cache_liquidaciones.estadisticas()["aciertos"] == 0
+
+
+def test_acierto_lleva_fecha_de_calculo_actual(monkeypatch):
+    primero = CalculadoraPILA(2_000_000, 3).calcular()
+
+    class Reloj(pila_engine.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return pila_engine.datetime(2030, 1, 1, 12, 0)
+
+    monkeypatch.setattr(pila_engine, "datetime", Reloj)
+    segundo = CalculadoraPILA(2_000_000, 3).calcular()
+
+    assert segundo.fecha_calculo == pila_engine.datetime(2030, 1, 1, 12, 0)
+    assert primero.fecha_calculo != segundo.fecha_calculo
+    assert cache_liquidaciones.estadisticas()["aciertos"] == 1
+
+
+def test_resultado_inmutable():
+    resultado = CalculadoraPILA(900_000, 1).calcular()
+
+    with pytest.raises(FrozenInstanceError):
+        resultado.total_general = 0
+    assert isinstance(resultado.advertencias, tuple)
+
+
+def test_resultado_cacheado_igual_al_calculo_directo():
+    calculadora = CalculadoraPILA(3_500_000, 4, es_empresa_exonerada=False)
+    calculadora.calcular()
+
+    cacheado = calculadora.calcular()
+    directo = calculadora._liquidar()
+
+    assert cacheado == replace(directo, fecha_calculo=cacheado.fecha_calculo)
+
+
+def test_lru_acotada_expulsa_la_menos_usada():
+    cache = CacheLRU(max_entradas=2)
+    cache.guardar("a", 1)
+    cache.guardar("b", 2)
+    cache.obtener("a")
+    cache.guardar("c", 3)
+
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == 1
+    assert cache.estadisticas()["tamano"] == 2
+
+
+def test_endpoint_estadisticas(logged_in_client):
+    CalculadoraPILA(2_000_000, 1).calcular()
+
+    respuesta = logged_in_client.get("/api/cotizaciones/simular-pila/cache")
+
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["liquidaciones"]["tamano"] == 1
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Carga Masiva de Cartera en Streaming
+================================================
+POST /api/cartera/carga-masiva con CSV y JSON: validación por lotes,
+resolución de usuario/empresa, upsert de deudas abiertas por periodo,
+reporte de errores por fila y la migración que depura duplicados.
+"""
+import io
+import random
+import sqlite3
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.schema import CreateTable
+
+from extensions import db
+from logic import carga_cartera
+from models.orm_models import DeudaCartera, Empresa, Usuario
+
+MIGRACION = Path(__file__).resolve().parent.parent / "migrations" / "20251205_deudas_cartera_carga_masiva.sql"
+
+
+def _migrar(conn):
+    conn.executescript(MIGRACION.read_text(encoding="utf-8"))
+
+
+@pytest.fixture(autouse=True)
+def migracion(app):
+    """La carga masiva requiere el índice de la migración 20251205."""
+    with app.app_context():
+        conn = db.engine.raw_connection()
+        try:
+            _migrar(conn.driver_connection)
+        finally:
+            conn.close()
+
+
+@pytest.fixture
+def referencias(app):
+    """Empresa con dos usuarios, con NIT y documentos únicos por test."""
+    nit = str(random.randint(800_000_000, 899_999_999))
+    documentos = [str(random.randint(10**9, 2 * 10**9)) for _ in range(2)]
+    with app.app_context():
+        db.session.add(Empresa(nit=nit, nombre_empresa="Cartera S.A.S"))
+        for i, documento in enumerate(documentos):
+            db.session.add(Usuario(tipoId="CC", numeroId=documento, primerNombre=f"Nombre{i}",
+                                   primerApellido="Prueba", empresa_nit=nit))
+        db.session.commit()
+    yield nit, documentos
+    with app.app_context():
+        DeudaCartera.query.filter_by(empresa_nit=nit).delete()
+        Usuario.query.filter_by(empresa_nit=nit).delete()
+        Empresa.query.filter_by(nit=nit).delete()
+        db.session.commit()
+
+
+def _subir(cliente, contenido, nombre="reporte.csv"):
+    return cliente.post(
+        "/api/cartera/carga-masiva",
+        data={"archivo": (io.BytesIO(contenido.encode("utf-8")), nombre)},
+        content_type="multipart/form-data",
+    )
+
+
+def _deudas(app, nit):
+    with app.app_context():
+        return {(d.usuario_id, d.entidad): d.to_dict() for d in DeudaCartera.query.filter_by(empresa_nit=nit)}
+
+
+class FlujoSoloLectura:
+    """Como el SpooledTemporaryFile de Python 3.10: sin readable()/seekable()."""
+
+    def __init__(self, contenido):
+        self._datos = io.BytesIO(contenido)
+
+    def read(self, *args):
+        return self._datos.read(*args)
+
+
+def test_json_resuelve_empresa_y_nombres(logged_in_client, app, referencias):
+    nit, (doc1, doc2) = referencias
+
+    respuesta = logged_in_client.post("/api/cartera/carga-masiva", json={"deudas": [
+        {"usuario_id": doc1, "entidad": "eps", "monto": 500000, "dias_mora": 15},
+        {"usuario_id": doc2, "empresa_nit": nit, "entidad": "ARL", "monto": 750000},
+    ]})
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 201
+    assert (cuerpo["guardadas"], cuerpo["insertadas"], cuerpo["errores"]) == (2, 2, 0)
+    deudas = _deudas(app, nit)
+    assert deudas[(doc1, "EPS")]["nombre_usuario"] == "Nombre0 Prueba"
+    assert deudas[(doc1, "EPS")]["nombre_empresa"] == "Cartera S.A.S"
+    assert deudas[(doc1, "EPS")]["estado"] == "Vencido"
+    assert deudas[(doc2, "ARL")]["estado"] == "Pendiente"
+
+
+def test_csv_con_errores_por_fila_y_lotes(logged_in_client, app, referencias, monkeypatch):
+    monkeypatch.setattr(carga_cartera, "TAMANO_LOTE_CARGA", 2)
+    nit, (doc1, doc2) = referencias
+    contenido = (
+        "Cédula;NIT;Entidad;Valor;Días mora;Vencimiento\n"
+        f"{doc1};{nit};AFP;1200000;30;15/10/2025\n"
+        f"{doc1};{nit};BANCO;1000;0;\n"
+        "\n"
+        f"999;{nit};EPS;1000;0;\n"
+        f"{doc2};{nit};CCF;-5;0;\n"
+        f"{doc2};;SENA;300000;;2099-01-01\n"
+    )
+
+    cuerpo = _subir(logged_in_client, contenido).get_json()
+
+    assert (cuerpo["total_procesadas"], cuerpo["guardadas"], cuerpo["errores"]) == (5, 2, 3)
+    assert [e["fila"] for e in cuerpo["detalles_errores"]] == [3, 5, 6]
+    assert cuerpo["detalles_errores"][0]["campos"] == ["entidad"]
+    assert "no existe" in cuerpo["detalles_errores"][1]["error"]
+    assert cuerpo["detalles_errores"][2]["campos"] == ["monto"]
+    deudas = _deudas(app, nit)
+    assert deudas[(doc1, "AFP")]["fecha_vencimiento"] == "2025-10-15"
+    assert deudas[(doc2, "SENA")]["estado"] == "Pendiente"
+
+
+def test_recarga_actualiza_deuda_abierta(logged_in_client, app, referencias):
+    nit, (doc1, _) = referencias
+    with app.app_context():
+        db.session.add(DeudaCartera(usuario_id=doc1, empresa_nit=nit, entidad="EPS", monto=1, estado="Pagado"))
+        db.session.commit()
+
+    _subir(logged_in_client, f"usuario_id,entidad,monto\n{doc1},EPS,1000\n")
+    cuerpo = _subir(logged_in_client, f"usuario_id,entidad,monto,dias_mora\n{doc1},EPS,2500,10\n").get_json()
+
+    assert (cuerpo["insertadas"], cuerpo["actualizadas"]) == (0, 1)
+    with app.app_context():
+        abiertas = DeudaCartera.query.filter(DeudaCartera.empresa_nit == nit, DeudaCartera.estado != "Pagado").all()
+        assert [(float(d.monto), d.dias_mora, d.estado) for d in abiertas] == [(2500.0, 10, "Vencido")]
+        assert DeudaCartera.query.filter_by(empresa_nit=nit, estado="Pagado").count() == 1
+
+
+def test_periodos_distintos_son_deudas_separadas(logged_in_client, app, referencias):
+    nit, (doc1, _) = referencias
+    encabezado = "usuario_id,entidad,monto,vencimiento\n"
+
+    _subir(logged_in_client, encabezado + f"{doc1},EPS,1000,2025-10-31\n{doc1},EPS,1500,2025-11-30\n")
+    cuerpo = _subir(logged_in_client, encabezado + f"{doc1},EPS,1800,2025-11-30\n").get_json()
+
+    assert (cuerpo["insertadas"], cuerpo["actualizadas"]) == (0, 1)
+    with app.app_context():
+        deudas = DeudaCartera.query.filter_by(empresa_nit=nit).order_by(DeudaCartera.fecha_vencimiento).all()
+        assert [(d.fecha_vencimiento, float(d.monto)) for d in deudas] == [("2025-10-31", 1000.0), ("2025-11-30", 1800.0)]
+
+
+def test_csv_desde_flujo_sin_readable_ni_seekable():
+    contenido = "\ufeffCédula;Entidad;Valor\n1;EPS;100\n\n2;\"ARL\";200\n".encode("utf-8")
+
+    filas = list(carga_cartera.leer_filas(FlujoSoloLectura(contenido), "reporte.csv"))
+
+    assert filas == [
+        (2, {"usuario_id": "1", "entidad": "EPS", "monto": "100"}),
+        (4, {"usuario_id": "2", "entidad": "ARL", "monto": "200"}),
+    ]
+
+
+def test_sin_migracion_responde_503(logged_in_client, app, referencias):
+    nit, (doc1, _) = referencias
+    with app.app_context():
+        db.session.execute(text("DROP INDEX uq_deudas_cartera_abierta"))
+        db.session.commit()
+
+    respuesta = _subir(logged_in_client, f"usuario_id,entidad,monto\n{doc1},EPS,1000\n")
+
+    assert respuesta.status_code == 503
+    assert "20251205" in respuesta.get_json()["error"]
+
+
+def test_migracion_respalda_y_elimina_duplicados(tmp_path):
+    ruta = tmp_path / "cartera.db"
+    engine = create_engine(f"sqlite:///{ruta}")
+    with engine.begin() as conn:
+        conn.execute(CreateTable(DeudaCartera.__table__))  # Sin el índice, como una base previa
+    engine.dispose()
+
+    conn = sqlite3.connect(ruta)
+    try:
+        conn.executemany(
+            "INSERT INTO deudas_cartera (id, usuario_id, empresa_nit, entidad, monto, estado, fecha_vencimiento) "
+            "VALUES (?, '1', '900', 'EPS', ?, ?, ?)",
+            [(1, 100, "Pendiente", "2025-10-31"), (2, 150, "Vencido", "2025-10-31"),
+             (3, 200, "Pendiente", "2025-11-30"), (4, 50, "Pagado", "2025-10-31"),
+             (5, 10, "Pendiente", None), (6, 20, "Pendiente", None)],
+        )
+        conn.commit()
+
+        _migrar(conn)
+        _migrar(conn)
+
+        assert [fila[0] for fila in conn.execute("SELECT id FROM deudas_cartera ORDER BY id")] == [2, 3, 4, 6]
+        assert [fila[0] for fila in conn.execute("SELECT id FROM deudas_cartera_duplicadas ORDER BY id")] == [1, 5]
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute(
+                "INSERT INTO deudas_cartera (usuario_id, empresa_nit, entidad, monto, estado) "
+                "VALUES ('1', '900', 'EPS', 1, 'Pendiente')"
+            )
+    finally:
+        conn.close()
+
+
+def test_reporte_de_errores_acotado(logged_in_client, referencias, monkeypatch):
+    monkeypatch.setattr(carga_cartera, "MAX_ERRORES_REPORTE", 2)
+    filas = "".join(f"{i},EPS,100\n" for i in range(5))
+
+    respuesta = _subir(logged_in_client, "usuario_id,entidad,monto\n" + filas)
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 400
+    assert cuerpo["errores"] == 5
+    assert len(cuerpo["detalles_errores"]) == 2 and cuerpo["errores_truncados"] is True
+
+
+@pytest.mark.parametrize("contenido, nombre", [
+    ("usuario_id,entidad,monto\n1,EPS,1\n", "reporte.pdf"),
+    ("usuario_id,monto\n1,1\n", "reporte.csv"),
+])
+def test_archivo_invalido(logged_in_client, contenido, nombre):
+    respuesta = _subir(logged_in_client, contenido, nombre)
+
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()["success"] is False
+
+
+def test_sin_datos(logged_in_client):
+    assert logged_in_client.post("/api/cartera/carga-masiva", json={}).status_code == 400
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Cola de Cartas de Depuración
+========================================
+Verifica el staging de anexos, el progreso y resultado de los jobs y los
+endpoints generar-carta (202), estado y descarga.
+"""
+import io
+import json
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+
+import blob_store
+import carta_jobs
+import cartas_depuracion
+from routes import depuraciones
+
+MIGRACION = Path(__file__).resolve().parents[1] / "migrations" / "20251204_carta_jobs.sql"
+
+DATOS_CARTA = {
+    "tipo_escenario": "BASICO",
+    "empresa_nombre": "Acme S.A.S",
+    "usuario_numero_id": "1020304050",
+    "usuario_nombre_completo": "Ana Pérez",
+    "usuario_tipo_id": "CC",
+    "ciudad": "Bogotá",
+    "senores": "EPS Salud",
+    "departamento_entidad": "Cartera",
+    "rep_legal_nombre": "Luis Gómez",
+}
+
+
+def _pdf_bytes(paginas=1):
+    writer = PdfWriter()
+    for _ in range(paginas):
+        writer.add_blank_page(width=612, height=792)
+    salida = io.BytesIO()
+    writer.write(salida)
+    return salida.getvalue()
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    """Empresa con CARTA.pdf y firma, blobs y BD temporales; backend síncrono."""
+    monkeypatch.setattr(depuraciones, "RUTA_BASE_EMPRESAS", str(tmp_path / "EMPRESAS"))
+    monkeypatch.setattr(depuraciones, "RUTA_BASE_USUARIOS", str(tmp_path / "USUARIOS"))
+    monkeypatch.setattr(blob_store, "BLOB_STORE_FOLDER", str(tmp_path / "BLOBS"))
+    monkeypatch.setattr(carta_jobs, "CARTAS_BACKEND", "sincrono")
+    carpeta = tmp_path / "EMPRESAS" / "ACME_SAS"
+    carpeta.mkdir(parents=True)
+    (carpeta / "CARTA.pdf").write_bytes(_pdf_bytes(2))
+    Image.new("RGBA", (300, 120), (0, 0, 0, 255)).save(carpeta / "firma_empresa.png")
+    cartas_depuracion.limpiar_cache_plantillas()
+    with sqlite3.connect(str(tmp_path / "jobs.db")) as conexion:
+        conexion.executescript(MIGRACION.read_text(encoding="utf-8"))
+    return tmp_path, carpeta
+
+
+@pytest.fixture
+def jobs_app(app):
+    """Aplica la migración de carta_jobs a la base de la app de pruebas."""
+    with sqlite3.connect(app.config["DATABASE_PATH"]) as conexion:
+        conexion.executescript(MIGRACION.read_text(encoding="utf-8"))
+    return app
+
+
+def _solicitud(tmp_path, carpeta, adjuntos=()):
+    textos, anexos = cartas_depuracion.construir_textos(DATOS_CARTA, [campo for campo, _ in adjuntos])
+    return {
+        "carta_base_path": str(carpeta / "CARTA.pdf"),
+        "firma_path": str(carpeta / "firma_empresa.png"),
+        "textos": list(textos),
+        "adjuntos": [list(a) for a in adjuntos],
+        "anexos": anexos,
+        "ruta_destino": str(tmp_path / "carta.pdf"),
+        "archivo": "carta.pdf",
+    }
+
+
+def test_preparar_anexos_omite_no_pdf(entorno):
+    tmp_path, _ = entorno
+    staging = str(tmp_path / "staging")
+
+    preparados, advertencias = carta_jobs.preparar_anexos(
+        [("estado_cuenta", io.BytesIO(_pdf_bytes())), ("cedula", io.BytesIO(b"no soy un pdf"))], staging
+    )
+
+    assert preparados == [["estado_cuenta", os.path.join(staging, "estado_cuenta.pdf")]]
+    assert len(advertencias) == 1
+    assert os.path.exists(preparados[0][1])
+
+
+def test_job_registra_progreso_y_resultado(entorno, monkeypatch):
+    tmp_path, carpeta = entorno
+    conn = sqlite3.connect(str(tmp_path / "jobs.db"))
+    conn.row_factory = sqlite3.Row
+    anexo = tmp_path / "estado.pdf"
+    anexo.write_bytes(_pdf_bytes(3))
+    etapas = []
+    original = carta_jobs._actualizar
+    monkeypatch.setattr(
+        carta_jobs, "_actualizar", lambda c, j, **campos: etapas.append(campos.get("etapa")) or original(c, j, **campos)
+    )
+
+    job_id = carta_jobs.crear_job(
+        conn, str(tmp_path / "jobs.db"), _solicitud(tmp_path, carpeta, [("estado_cuenta", str(anexo))])
+    )
+
+    job = carta_jobs.estado_job(conn, job_id)
+    assert job["estado"] == "completado"
+    assert job["progreso"] == 100
+    assert job["resultado"]["archivo"] == "carta.pdf"
+    assert len(PdfReader(job["resultado"]["ruta"]).pages) == 5
+    assert etapas[:3] == ["carta_base", "textos_y_firma", "anexos"]
+    conn.close()
+
+
+def test_despacho_duplicado_no_regenera_ni_borra_el_staging(entorno, monkeypatch):
+    tmp_path, carpeta = entorno
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    monkeypatch.setattr(carta_jobs, "_despachar", lambda *args: None)
+    staging = tmp_path / "staging"
+    preparados, _ = carta_jobs.preparar_anexos([("cedula", io.BytesIO(_pdf_bytes()))], str(staging))
+    job_id = carta_jobs.crear_job(conn, db_path, dict(_solicitud(tmp_path, carpeta, preparados), staging=str(staging)))
+    # Otro worker ya lo tomó
+    conn.execute("UPDATE carta_jobs SET estado = 'en_proceso', progreso = 40 WHERE job_id = ?", (job_id,))
+    conn.commit()
+    monkeypatch.setattr(carta_jobs, "generar_carta_pdf", lambda *args, **kwargs: pytest.fail("no debe regenerarse"))
+
+    job = carta_jobs.ejecutar_job(db_path, job_id)
+
+    assert job["estado"] == "en_proceso"
+    assert job["progreso"] == 40
+    assert staging.exists()
+    conn.close()
+
+
+def test_job_con_error_queda_en_error(entorno):
+    tmp_path, carpeta = entorno
+    conn = sqlite3.connect(str(tmp_path / "jobs.db"))
+    conn.row_factory = sqlite3.Row
+    solicitud = _solicitud(tmp_path, carpeta)
+    solicitud["carta_base_path"] = str(tmp_path / "no_existe.pdf")
+
+    job_id = carta_jobs.crear_job(conn, str(tmp_path / "jobs.db"), solicitud)
+
+    job = carta_jobs.estado_job(conn, job_id)
+    assert job["estado"] == "error"
+    assert job["error"]
+    conn.close()
+
+
+def test_job_con_error_elimina_el_staging(entorno):
+    tmp_path, carpeta = entorno
+    conn = sqlite3.connect(str(tmp_path / "jobs.db"))
+    conn.row_factory = sqlite3.Row
+    staging = tmp_path / "staging"
+    preparados, _ = carta_jobs.preparar_anexos([("cedula", io.BytesIO(_pdf_bytes()))], str(staging))
+    solicitud = dict(_solicitud(tmp_path, carpeta, preparados), staging=str(staging))
+    solicitud["carta_base_path"] = str(tmp_path / "no_existe.pdf")
+
+    job_id = carta_jobs.crear_job(conn, str(tmp_path / "jobs.db"), solicitud)
+
+    assert carta_jobs.estado_job(conn, job_id)["estado"] == "error"
+    assert not staging.exists()
+    conn.close()
+
+
+def test_endpoint_generar_carta_encola(logged_in_client, jobs_app, entorno):
+    tmp_path, _ = entorno
+    datos = dict(DATOS_CARTA)
+    datos["estado_cuenta"] = (io.BytesIO(_pdf_bytes(3)), "estado.pdf")
+
+    respuesta = logged_in_client.post(
+        "/api/depuraciones/generar-carta", data=datos, content_type="multipart/form-data"
+    )
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 202
+    assert cuerpo["status_url"] == f"/api/depuraciones/jobs/{cuerpo['job_id']}"
+    carpeta_usuario = tmp_path / "USUARIOS" / DATOS_CARTA["usuario_numero_id"] / "DEPURACIONES"
+    assert len(PdfReader(str(carpeta_usuario / cuerpo["archivo"])).pages) == 5
+    # El staging de anexos se elimina al terminar
+    assert os.listdir(carpeta_usuario / ".staging") == []
+
+
+def test_endpoint_estado_job_inexistente(logged_in_client, jobs_app):
+    respuesta = logged_in_client.get("/api/depuraciones/jobs/no-existe")
+
+    assert respuesta.status_code == 404
+
+
+def _insertar_job(app, estado, resultado=None):
+    conn = sqlite3.connect(app.config["DATABASE_PATH"])
+    conn.executescript(MIGRACION.read_text(encoding="utf-8"))
+    conn.execute(
+        "INSERT INTO carta_jobs (job_id, estado, progreso, solicitud, resultado, creado_en, actualizado_en) "
+        "VALUES (?, ?, 40, '{}', ?, '2025-01-01', '2025-01-01')",
+        (f"job-{estado}", estado, json.dumps(resultado) if resultado else None),
+    )
+    conn.commit()
+    conn.close()
+    return f"job-{estado}"
+
+
+def test_descargar_job_en_proceso(logged_in_client, app):
+    job_id = _insertar_job(app, "en_proceso")
+
+    respuesta = logged_in_client.get(f"/api/depuraciones/jobs/{job_id}/descargar")
+
+    assert respuesta.status_code == 409
+    assert respuesta.get_json()["progreso"] == 40
+
+
+def test_descargar_job_completado(logged_in_client, app, tmp_path):
+    ruta = tmp_path / "carta.pdf"
+    ruta.write_bytes(_pdf_bytes())
+    job_id = _insertar_job(app, "completado", {"archivo": "carta.pdf", "ruta": str(ruta)})
+
+    respuesta = logged_in_client.get(f"/api/depuraciones/jobs/{job_id}/descargar")
+
+    assert respuesta.status_code == 200
+    assert respuesta.data.startswith(b"%PDF")
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Pipeline de Cartas de Depuración
+==========================================
+Verifica el partidor de líneas con métricas precalculadas, la reutilización
+de la carta base cacheada y la escritura en una sola pasada con anexos.
+"""
+import io
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfbase import pdfmetrics
+
+import cartas_depuracion
+from routes import depuraciones
+
+MIGRACION_JOBS = Path(__file__).resolve().parents[1] / "migrations" / "20251204_carta_jobs.sql"
+
+DATOS_CARTA = {
+    "tipo_escenario": "COMPLETO",
+    "empresa_nombre": "Acme S.A.S",
+    "usuario_numero_id": "1020304050",
+    "usuario_nombre_completo": "Ana Pérez",
+    "usuario_tipo_id": "CC",
+    "numero_planilla": "987654",
+    "ciudad": "Bogotá",
+    "senores": "EPS Salud",
+    "departamento_entidad": "Cartera",
+    "fecha_inicio": "2024-01-01",
+    "fecha_fin": "2024-06-30",
+    "rep_legal_nombre": "Luis Gómez",
+    "rep_legal_cargo": "Gerente",
+    "rep_legal_celular": "3001234567",
+    "rep_legal_direccion": "Calle 1",
+    "rep_legal_correo": "luis@acme.co",
+}
+
+
+def _pdf_en_blanco(ruta, paginas=1):
+    writer = PdfWriter()
+    for _ in range(paginas):
+        writer.add_blank_page(width=612, height=792)
+    with open(ruta, "wb") as f:
+        writer.write(f)
+    return ruta
+
+
+@pytest.fixture
+def empresa(tmp_path, monkeypatch):
+    """Carpeta de empresa con CARTA.pdf y firma en rutas temporales."""
+    monkeypatch.setattr(depuraciones, "RUTA_BASE_EMPRESAS", str(tmp_path / "EMPRESAS"))
+    monkeypatch.setattr(depuraciones, "RUTA_BASE_USUARIOS", str(tmp_path / "USUARIOS"))
+    carpeta = tmp_path / "EMPRESAS" / "ACME_SAS"
+    carpeta.mkdir(parents=True)
+    _pdf_en_blanco(str(carpeta / "CARTA.pdf"), paginas=2)
+    Image.new("RGBA", (300, 120), (0, 0, 0, 255)).save(carpeta / "firma_empresa.png")
+    cartas_depuracion.limpiar_cache_plantillas()
+    return carpeta
+
+
+def _lineas_originales(texto, max_ancho):
+    """Algoritmo anterior (stringWidth por palabra) como referencia."""
+    lineas, linea = [], ""
+    for palabra in texto.split():
+        prueba = linea + palabra + " "
+        if pdfmetrics.stringWidth(prueba, "Helvetica", 10) < max_ancho:
+            linea = prueba
+        else:
+            lineas.append(linea.rstrip())
+            linea = palabra + " "
+    if linea:
+        lineas.append(linea.rstrip())
+    return lineas
+
+
+def test_partir_lineas_equivale_a_string_width():
+    (_, texto2, _, _), _ = cartas_depuracion.construir_textos(DATOS_CARTA)
+
+    assert cartas_depuracion.partir_lineas(texto2, 450) == _lineas_originales(texto2, 450)
+    assert cartas_depuracion.partir_lineas("ñandú €uro " * 40, 200) == _lineas_originales("ñandú €uro " * 40, 200)
+
+
+def test_construir_textos_escenario_invalido():
+    with pytest.raises(ValueError):
+        cartas_depuracion.construir_textos(dict(DATOS_CARTA, tipo_escenario="OTRO"))
+
+
+def test_anexo_cedula_solo_si_se_adjunta():
+    _, sin_cedula = cartas_depuracion.construir_textos(dict(DATOS_CARTA, tipo_escenario="BASICO"))
+    _, con_cedula = cartas_depuracion.construir_textos(dict(DATOS_CARTA, tipo_escenario="BASICO"), ["cedula"])
+
+    assert sin_cedula == ["Estado de cuenta"]
+    assert con_cedula == ["Estado de cuenta", "Cédula"]
+
+
+def test_carta_en_una_pasada_con_anexos(empresa, tmp_path):
+    textos, anexos = cartas_depuracion.construir_textos(DATOS_CARTA)
+    adjuntos = [("afiliacion", _pdf_en_blanco(str(tmp_path / "afiliacion.pdf"), paginas=3))]
+    destino = tmp_path / "carta.pdf"
+
+    cartas_depuracion.generar_carta_pdf(
+        str(empresa / "CARTA.pdf"), str(empresa / "firma_empresa.png"), textos, adjuntos, anexos, ruta_destino=str(destino)
+    )
+
+    lector = PdfReader(str(destino))
+    assert len(lector.pages) == 5
+    assert "Ana Pérez" in lector.pages[0].extract_text()
+    assert [n for n in os.listdir(tmp_path) if n.endswith(".part")] == []
+
+
+def test_plantilla_cacheada_no_acumula_overlays(empresa):
+    carta = str(empresa / "CARTA.pdf")
+    firma = str(empresa / "firma_empresa.png")
+    primera, _ = cartas_depuracion.construir_textos(DATOS_CARTA)
+    segunda, _ = cartas_depuracion.construir_textos(dict(DATOS_CARTA, usuario_nombre_completo="Beatriz Ruiz"))
+
+    cartas_depuracion.generar_carta_pdf(carta, firma, primera)
+    salida = cartas_depuracion.generar_carta_pdf(carta, firma, segunda)
+
+    texto = PdfReader(salida).pages[0].extract_text()
+    assert "Beatriz Ruiz" in texto
+    assert "Ana Pérez" not in texto
+    assert cartas_depuracion._plantilla(carta) is cartas_depuracion._plantilla(carta)
+
+
+def test_plantilla_se_recarga_si_cambia(empresa):
+    carta = str(empresa / "CARTA.pdf")
+    anterior = cartas_depuracion._plantilla(carta)
+
+    _pdf_en_blanco(carta, paginas=1)
+    os.utime(carta, ns=(0, os.stat(carta).st_mtime_ns + 10**9))
+
+    assert len(cartas_depuracion._plantilla(carta).pages) == 1
+    assert len(anterior.pages) == 2
+
+
+def test_adjuntos_en_stream_van_directo_al_destino(empresa, tmp_path):
+    from werkzeug.datastructures import FileStorage
+
+    textos, anexos = cartas_depuracion.construir_textos(dict(DATOS_CARTA, tipo_escenario="BASICO"), ["cedula"])
+    with open(_pdf_en_blanco(str(empresa / "cedula.pdf"), paginas=2), "rb") as f:
+        cedula = f.read()
+    adjuntos = [
+        ("cedula", FileStorage(stream=io.BytesIO(cedula), filename="cedula.pdf")),
+        ("afiliacion", FileStorage(stream=io.BytesIO(b"no es pdf"), filename="afiliacion.pdf")),
+    ]
+    destino = tmp_path / "salida" / "carta.pdf"
+    destino.parent.mkdir()
+
+    resultado = cartas_depuracion.generar_carta_pdf(
+        str(empresa / "CARTA.pdf"), str(empresa / "firma_empresa.png"), textos, adjuntos, anexos, ruta_destino=str(destino)
+    )
+
+    assert resultado == str(destino)
+    assert len(PdfReader(str(destino)).pages) == 4
+    assert os.listdir(destino.parent) == ["carta.pdf"]
+
+
+@pytest.fixture
+def jobs_app(app):
+    """Aplica la migración de carta_jobs a la base de la app de pruebas."""
+    with sqlite3.connect(app.config["DATABASE_PATH"]) as conexion:
+        conexion.executescript(MIGRACION_JOBS.read_text(encoding="utf-8"))
+    return app
+
+
+def test_endpoint_generar_carta(logged_in_client, jobs_app, empresa, tmp_path, monkeypatch):
+    import blob_store
+    import carta_jobs
+
+    monkeypatch.setattr(carta_jobs, "CARTAS_BACKEND", "sincrono")
+    monkeypatch.setattr(blob_store, "BLOB_STORE_FOLDER", str(tmp_path / "BLOBS"))
+    datos = dict(DATOS_CARTA)
+    datos["cedula"] = (io.BytesIO(open(empresa / "CARTA.pdf", "rb").read()), "cedula.pdf")
+
+    respuesta = logged_in_client.post(
+        "/api/depuraciones/generar-carta", data=datos, content_type="multipart/form-data"
+    )
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 202
+    carpeta = tmp_path / "USUARIOS" / DATOS_CARTA["usuario_numero_id"] / "DEPURACIONES"
+    assert len(PdfReader(str(carpeta / cuerpo["archivo"])).pages) == 4
+
+
+@pytest.fixture
+def lote(jobs_app, empresa, tmp_path, monkeypatch):
+    """Backend de cartas síncrono y un PDF propio (id 1) en el gestor documental."""
+    import carta_jobs
+
+    monkeypatch.setattr(carta_jobs, "CARTAS_BACKEND", "sincrono")
+    monkeypatch.setitem(jobs_app.config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+    docs = tmp_path / "uploads" / "docs"
+    docs.mkdir(parents=True)
+    _pdf_en_blanco(str(docs / "estado.pdf"), paginas=3)
+    fuera = _pdf_en_blanco(str(tmp_path / "ajeno.pdf"))
+
+    conn = sqlite3.connect(jobs_app.config["DATABASE_PATH"])
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS documentos_gestor (
+            id INTEGER PRIMARY KEY, ruta TEXT, tipo_mime TEXT, subido_por INTEGER
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO documentos_gestor (id, ruta, tipo_mime, subido_por) VALUES (?, ?, 'application/pdf', ?)",
+        [(1, str(docs / "estado.pdf"), 1), (2, str(docs / "estado.pdf"), 99), (3, fuera, 1)],
+    )
+    conn.commit()
+    conn.close()
+    return tmp_path
+
+
+def test_endpoint_lote_encola_cartas(logged_in_client, lote):
+    respuesta = logged_in_client.post(
+        "/api/depuraciones/generar-cartas-lote",
+        json={"cartas": [
+            dict(DATOS_CARTA, adjuntos={"estado_cuenta": 1}),
+            dict(DATOS_CARTA, empresa_nombre="No Existe"),
+        ]},
+    )
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 202
+    assert [c["indice"] for c in cuerpo["encoladas"]] == [0]
+    assert cuerpo["rechazadas"][0]["indice"] == 1
+    carta = lote / "USUARIOS" / DATOS_CARTA["usuario_numero_id"] / "DEPURACIONES" / cuerpo["encoladas"][0]["archivo"]
+    assert len(PdfReader(str(carta)).pages) == 5
+
+
+@pytest.mark.parametrize("adjuntos", [
+    {"estado_cuenta": "/etc/passwd.pdf"},   # ruta del servidor
+    {"estado_cuenta": 2},                   # documento de otro usuario
+    {"estado_cuenta": 3},                   # registro que apunta fuera del gestor
+    {"otro_campo": 1},
+])
+def test_endpoint_lote_rechaza_anexos_ajenos(logged_in_client, lote, adjuntos):
+    respuesta = logged_in_client.post(
+        "/api/depuraciones/generar-cartas-lote",
+        json={"cartas": [dict(DATOS_CARTA, adjuntos=adjuntos)]},
+    )
+
+    cuerpo = respuesta.get_json()
+    assert cuerpo["encoladas"] == []
+    assert cuerpo["rechazadas"][0]["indice"] == 0
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Programación de Celery Beat
+=======================================
+Verifica que las entradas de CELERY_BEAT_SCHEDULE sean objetos crontab
+(no texto) y que las variables *_SCHEDULE se interpreten por campos.
+"""
+import pytest
+
+celery_config = pytest.importorskip("celery_config")
+from celery.schedules import crontab  # noqa: E402
+
+from celery_config import programacion_desde_env  # noqa: E402
+
+
+def test_todas_las_entradas_son_crontab():
+    programa = celery_config.celery_app.conf.CELERY_BEAT_SCHEDULE
+
+    assert all(isinstance(entrada["schedule"], crontab) for entrada in programa.values())
+    assert programa["recalcular-mora-cartera-nightly"]["schedule"] == crontab(minute=30, hour=0)
+
+
+@pytest.mark.parametrize("valor", [
+    "minute=15, hour=1",
+    "crontab(minute=15, hour=1)",
+    "15 1 * * *",
+])
+def test_variable_de_entorno_por_campos(monkeypatch, valor):
+    monkeypatch.setenv("MORA_CARTERA_SCHEDULE", valor)
+
+    assert programacion_desde_env("MORA_CARTERA_SCHEDULE", minute=30, hour=0) == crontab(minute=15, hour=1)
+
+
+def test_sin_variable_usa_el_defecto(monkeypatch):
+    monkeypatch.delenv("MORA_CARTERA_SCHEDULE", raising=False)
+
+    assert programacion_desde_env("MORA_CARTERA_SCHEDULE", minute=30, hour=0) == crontab(minute=30, hour=0)
+
+
+@pytest.mark.parametrize("valor", ["segundos=5", "30 0 *"])
+def test_variable_invalida(monkeypatch, valor):
+    monkeypatch.setenv("MORA_CARTERA_SCHEDULE", valor)
+
+    with pytest.raises(ValueError):
+        programacion_desde_env("MORA_CARTERA_SCHEDULE")
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de Estadísticas con Agregación Condicional
+================================================
+Verifica los helpers de logic/consultas.py (contar_si, rango por prefijo
+equivalente a LIKE) y los endpoints que los usan: /api/tareas/stats,
+/api/tareas, /marketing/api/stats y /api/impuestos/balance.
+"""
+import random
+from datetime import date
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, Text, create_engine, func, select
+
+from extensions import db
+from logic.consultas import contar_si, rango_anio, rango_prefijo, siguiente_prefijo
+from models.orm_models import Empresa, PagoImpuesto, Prospecto, TareaUsuario
+
+
+def test_rango_prefijo_equivale_a_like():
+    engine = create_engine("sqlite://")
+    tabla = Table("t", MetaData(), Column("id", Integer, primary_key=True), Column("f", Text))
+    tabla.metadata.create_all(engine)
+    valores = ["2025", "2025-01-01", "2025-12-31 23:59:59", "2024-12-31", "2026-01-01", "20250", "202", None, ""]
+    with engine.begin() as conn:
+        conn.execute(tabla.insert(), [{"f": v} for v in valores])
+        for prefijo in ["2025", "2025-12-31", "2024-12"]:
+            por_like = conn.execute(select(tabla.c.id).where(tabla.c.f.like(f"{prefijo}%"))).scalars().all()
+            por_rango = conn.execute(select(tabla.c.id).where(rango_prefijo(tabla.c.f, prefijo))).scalars().all()
+            assert sorted(por_rango) == sorted(por_like), prefijo
+        assert conn.execute(select(func.count()).where(rango_anio(tabla.c.f, 2025))).scalar() == 4
+        fila = conn.execute(select(contar_si(tabla.c.f.is_(None)), contar_si(tabla.c.f == "x"))).one()
+        assert tuple(fila) == (1, 0)
+    assert siguiente_prefijo("2025-12-09") == "2025-12-0:"
+
+
+@pytest.fixture
+def usuario_tareas(app, client):
+    user_id = random.randint(900_000_000, 999_999_999)
+    with app.app_context():
+        db.session.add_all([TareaUsuario(user_id=user_id, descripcion=f"t{i}", completada=int(i < 3)) for i in range(8)])
+        db.session.commit()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+    yield client
+    with app.app_context():
+        TareaUsuario.query.filter_by(user_id=user_id).delete()
+        db.session.commit()
+
+
+def test_stats_y_listado_de_tareas(usuario_tareas):
+    stats = usuario_tareas.get("/api/tareas/stats").get_json()["stats"]
+    listado = usuario_tareas.get("/api/tareas?estado=todas").get_json()
+
+    assert stats == {"total": 8, "pendientes": 5, "completadas": 3, "porcentaje_completadas": 37.5}
+    assert (listado["total"], listado["pendientes"], listado["completadas"]) == (8, 5, 3)
+
+
+def test_marketing_stats_cuenta_nuevos_de_hoy(app, logged_in_client):
+    with app.app_context():
+        antes = logged_in_client.get("/marketing/api/stats").get_json()
+        hoy = date.today().strftime("%Y-%m-%d")
+        prospectos = [Prospecto(nombre_empresa="hoy", fecha_registro=f"{hoy} 08:00:00"),
+                      Prospecto(nombre_empresa="ayer", fecha_registro="2000-01-01 08:00:00")]
+        db.session.add_all(prospectos)
+        db.session.commit()
+        try:
+            despues = logged_in_client.get("/marketing/api/stats").get_json()
+        finally:
+            for prospecto in prospectos:
+                db.session.delete(prospecto)
+            db.session.commit()
+
+    assert despues["total_prospectos"] == antes["total_prospectos"] + 2
+    assert despues["nuevos_hoy"] == antes["nuevos_hoy"] + 1
+    assert despues["campanas_activas"] == antes["campanas_activas"]
+
+
+def test_balance_impuestos_resumen(app, logged_in_client):
+    nit = str(random.randint(600_000_000, 699_999_999))
+    estados = ["Pagado", "Pagado", "Pendiente de Pago", "Vencido"]
+    with app.app_context():
+        db.session.add(Empresa(nit=nit, nombre_empresa="Balance S.A.S"))
+        db.session.add_all([
+            PagoImpuesto(empresa_nit=nit, empresa_nombre="Balance S.A.S", tipo_impuesto="IVA", periodo=str(i),
+                         fecha_limite=f"2025-0{i + 1}-15", estado=estado)
+            for i, estado in enumerate(estados)
+        ])
+        db.session.add(PagoImpuesto(empresa_nit=nit, empresa_nombre="Balance S.A.S", tipo_impuesto="IVA",
+                                    periodo="x", fecha_limite="2024-12-31", estado="Pagado"))
+        db.session.commit()
+    try:
+        cuerpo = logged_in_client.get(f"/api/impuestos/balance?empresa_nit={nit}&anio=2025").get_json()
+        vacio = logged_in_client.get(f"/api/impuestos/balance?empresa_nit={nit}&anio=2030").get_json()
+    finally:
+        with app.app_context():
+            PagoImpuesto.query.filter_by(empresa_nit=nit).delete()
+            Empresa.query.filter_by(nit=nit).delete()
+            db.session.commit()
+
+    assert cuerpo["resumen"] == {"total_impuestos": 4, "pagados": 2, "pendientes": 1, "vencidos": 1,
+                                 "porcentaje_cumplimiento": 50.0}
+    assert [i["fecha_limite"] for i in cuerpo["impuestos"]] == sorted(i["fecha_limite"] for i in cuerpo["impuestos"])
+    assert vacio["resumen"]["total_impuestos"] == 0 and vacio["resumen"]["pagados"] == 0
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Generación Asíncrona de Expedientes
+===============================================
+Verifica la creación de directorios en lote, la idempotencia de los jobs
+(mismos datos -> mismo job_id, sin trabajo duplicado) y los endpoints de
+estado y alta masiva.
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import blob_store
+import expediente_jobs
+from routes import empresas, usuarios
+
+MIGRACION = Path(__file__).resolve().parents[1] / "migrations" / "20251203_expediente_jobs.sql"
+
+EMPRESA = {
+    "nit": "900123456-1",
+    "nombre_empresa": "Empresa de Prueba SA",
+    "email": "contacto@empresa.com",
+    "telefono": "3001234567",
+    "direccion": "Calle Falsa 123",
+    "ciudad": "Bogota",
+}
+
+USUARIO = {
+    "tipoId": "CC",
+    "numeroId": "1020304050",
+    "primerNombre": "Ana",
+    "primerApellido": "Pérez",
+}
+
+
+@pytest.fixture
+def entorno(tmp_path, monkeypatch):
+    """Carpetas de expedientes, blobs y BD temporales; backend síncrono."""
+    monkeypatch.setattr(usuarios, "RUTA_BASE_EXPEDIENTES", str(tmp_path / "USUARIOS"))
+    monkeypatch.setattr(empresas, "RUTA_BASE_EXPEDIENTES", str(tmp_path / "EMPRESAS"))
+    monkeypatch.setattr(blob_store, "BLOB_STORE_FOLDER", str(tmp_path / "BLOBS"))
+    monkeypatch.setattr(expediente_jobs, "EXPEDIENTES_BACKEND", "sincrono")
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(MIGRACION.read_text(encoding="utf-8"))
+    yield tmp_path, conn, db_path
+    conn.close()
+
+
+@pytest.fixture
+def jobs_app(app):
+    """Aplica la migración de expediente_jobs a la base de la app de pruebas."""
+    with sqlite3.connect(app.config["DATABASE_PATH"]) as conexion:
+        conexion.executescript(MIGRACION.read_text(encoding="utf-8"))
+    return app
+
+
+def test_crear_directorios_en_lote_es_idempotente(tmp_path):
+    rutas = [
+        str(tmp_path / "A"),
+        str(tmp_path / "A" / "X"),
+        str(tmp_path / "A" / "X" / "1"),
+        str(tmp_path / "B" / "Y"),
+    ]
+
+    assert expediente_jobs.crear_directorios(rutas) == 4
+    assert all(os.path.isdir(r) for r in rutas)
+    assert expediente_jobs.crear_directorios(rutas) == 0
+
+
+def test_plan_usuario_genera_expediente_con_firma(entorno):
+    tmp_path, _, _ = entorno
+    firma = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUg=="
+
+    plan = usuarios.planificar_expediente_usuario(USUARIO, firma)
+    resultado = expediente_jobs.ejecutar_plan(plan)
+
+    carpeta = tmp_path / "USUARIOS" / USUARIO["numeroId"]
+    assert resultado["success"] is True
+    assert (carpeta / "datos_usuario.txt").read_text(encoding="utf-8").count("Ana") == 1
+    for subcarpeta in usuarios.SUBCARPETAS_EXPEDIENTE_USUARIO:
+        assert (carpeta / subcarpeta).is_dir()
+    assert blob_store.reporte_deduplicacion()["referencias"] == 1
+
+
+def test_mismos_datos_mismo_job_sin_reejecutar(entorno):
+    _, conn, db_path = entorno
+    plan = usuarios.planificar_expediente_usuario(USUARIO)
+
+    primero = expediente_jobs.encolar_expediente(conn, db_path, plan)
+    segundo = expediente_jobs.encolar_expediente(conn, db_path, usuarios.planificar_expediente_usuario(USUARIO))
+
+    assert primero == segundo
+    job = expediente_jobs.estado_job(conn, primero)
+    assert job["estado"] == "completado"
+    assert job["intentos"] == 1
+    assert job["resultado"]["success"] is True
+
+
+def test_datos_distintos_generan_otro_job(entorno):
+    _, conn, db_path = entorno
+    otro = dict(USUARIO, primerNombre="Beatriz")
+
+    primero = expediente_jobs.encolar_expediente(conn, db_path, usuarios.planificar_expediente_usuario(USUARIO))
+    segundo = expediente_jobs.encolar_expediente(conn, db_path, usuarios.planificar_expediente_usuario(otro))
+
+    assert primero != segundo
+
+
+def test_lote_mezcla_usuarios_y_empresas(entorno):
+    tmp_path, conn, db_path = entorno
+    planes = [
+        usuarios.planificar_expediente_usuario(dict(USUARIO, numeroId=str(1000 + i))) for i in range(20)
+    ]
+    plan_empresa = empresas.planificar_expediente_empresa({"nit": "900123456", "nombre_empresa": "ACME SAS"})
+    plan_empresa.pop("rutas_bd", None)
+    planes.append(plan_empresa)
+
+    lote_id, job_ids = expediente_jobs.encolar_lote(conn, db_path, planes)
+    estado = expediente_jobs.estado_lote(conn, lote_id)
+
+    assert len(set(job_ids)) == 21
+    assert estado["total"] == 21
+    assert estado["estados"]["completado"] == 21
+    assert estado["terminado"] is True
+    assert len(os.listdir(tmp_path / "USUARIOS")) == 20
+
+
+def test_lote_incluye_jobs_existentes(entorno):
+    _, conn, db_path = entorno
+    ya_generado = usuarios.planificar_expediente_usuario(USUARIO)
+    expediente_jobs.encolar_expediente(conn, db_path, ya_generado)
+
+    nuevo = usuarios.planificar_expediente_usuario(dict(USUARIO, numeroId="777"))
+    lote_id, _ = expediente_jobs.encolar_lote(conn, db_path, [ya_generado, nuevo])
+    estado = expediente_jobs.estado_lote(conn, lote_id)
+
+    assert estado["total"] == 2
+    assert estado["estados"]["completado"] == 2
+
+
+def test_job_abandonado_en_proceso_se_reclama(entorno, monkeypatch):
+    _, conn, db_path = entorno
+    monkeypatch.setattr(expediente_jobs, "_despachar", lambda *args, **kwargs: None)
+    plan = usuarios.planificar_expediente_usuario(USUARIO)
+    job_id = expediente_jobs.encolar_expediente(conn, db_path, plan)
+
+    # Un worker lo tomó y murió sin terminarlo
+    conn.execute("UPDATE expediente_jobs SET estado = 'en_proceso', actualizado_en = ? WHERE job_id = ?",
+                 (expediente_jobs._ahora(), job_id))
+    conn.commit()
+    assert expediente_jobs.ejecutar_job(db_path, job_id) is None
+    assert expediente_jobs._registrar(conn, plan) == (job_id, False)
+
+    conn.execute("UPDATE expediente_jobs SET actualizado_en = '2000-01-01T00:00:00' WHERE job_id = ?", (job_id,))
+    assert expediente_jobs._registrar(conn, plan) == (job_id, True)
+    conn.commit()
+    assert expediente_jobs.ejecutar_job(db_path, job_id)["success"] is True
+
+
+def test_vinculo_fallido_deja_el_job_en_error(entorno):
+    _, conn, db_path = entorno
+    plan = usuarios.planificar_expediente_usuario(USUARIO)
+    plan["blobs"].append({"nombre": "rut.pdf", "ruta": os.path.join(plan["carpeta"], "rut.pdf"), "sha256": "0" * 64})
+
+    job_id = expediente_jobs.encolar_expediente(conn, db_path, plan)
+    job = expediente_jobs.estado_job(conn, job_id)
+
+    assert job["estado"] == "error"
+    assert job["resultado"]["success"] is False
+    assert any("rut.pdf" in e for e in job["resultado"]["errors"])
+
+
+def test_plan_sin_numero_id_no_se_encola(entorno):
+    plan = usuarios.planificar_expediente_usuario({"primerNombre": "Sin documento"})
+
+    assert plan["directorios"] == []
+    assert plan["errores"]
+
+
+def test_endpoint_lote_rechaza_invalidos(logged_in_client, jobs_app, entorno, monkeypatch):
+    _, _, db_path = entorno
+    monkeypatch.setitem(logged_in_client.application.config, "DATABASE_PATH", db_path)
+
+    respuesta = logged_in_client.post(
+        "/api/expedientes/lote",
+        json={"usuarios": [USUARIO, {"primerNombre": "Sin documento"}]},
+    )
+
+    datos = respuesta.get_json()
+    assert respuesta.status_code == 202
+    assert datos["encolados"] == 1
+    assert len(datos["rechazados"]) == 1
+    assert datos["status_url"].endswith(datos["lote_id"])
+
+
+def test_endpoint_job_inexistente(logged_in_client, jobs_app):
+    respuesta = logged_in_client.get("/api/expedientes/jobs/no-existe")
+
+    assert respuesta.status_code == 404
+
+
+COLUMNAS_EMPRESA = (
+    "nombre_empresa", "nit", "direccion_empresa", "telefono_empresa", "correo_empresa",
+    "ciudad_empresa", "departamento_empresa", "tipo_empresa", "sector_economico",
+    "num_empleados", "fecha_constitucion", "banco", "tipo_cuenta", "numero_cuenta",
+    "arl", "ccf", "ibc_empresa", "afp_empresa", "arl_empresa",
+    "rep_legal_nombre", "rep_legal_tipo_id", "rep_legal_numero_id",
+    "rep_legal_telefono", "rep_legal_correo",
+    "ruta_carpeta", "ruta_firma", "ruta_logo", "ruta_rut", "ruta_camara_comercio",
+    "ruta_cedula_representante", "ruta_arl", "ruta_cuenta_bancaria", "ruta_carta_autorizacion",
+)
+
+
+@pytest.fixture
+def empresas_app(jobs_app):
+    """Tabla empresas (columnas que usa POST /api/empresas) en la base de la app."""
+    columnas = ", ".join(f"{columna} TEXT" for columna in COLUMNAS_EMPRESA if columna != "nit")
+    with sqlite3.connect(jobs_app.config["DATABASE_PATH"]) as conexion:
+        conexion.execute(
+            f"CREATE TABLE IF NOT EXISTS empresas (id INTEGER PRIMARY KEY, nit TEXT UNIQUE, {columnas})"
+        )
+    return jobs_app
+
+
+def test_empresa_se_encola_despues_del_commit(logged_in_client, empresas_app, entorno, monkeypatch):
+    db_path = empresas_app.config["DATABASE_PATH"]
+    guardada_al_encolar = []
+
+    def encolar(conn, ruta_bd, plan):
+        with sqlite3.connect(db_path) as otra:
+            guardada_al_encolar.append(
+                otra.execute("SELECT COUNT(*) FROM empresas WHERE nit = ?", (plan["entidad_id"],)).fetchone()[0]
+            )
+        return "job-empresa"
+
+    monkeypatch.setattr(empresas, "encolar_expediente", encolar)
+
+    respuesta = logged_in_client.post("/api/empresas", json=EMPRESA)
+
+    assert respuesta.status_code == 201
+    assert respuesta.get_json()["expediente"]["job_id"] == "job-empresa"
+    assert guardada_al_encolar == [1]
+
+
+def test_empresa_que_no_se_guarda_no_encola(logged_in_client, empresas_app, entorno, monkeypatch):
+    monkeypatch.setattr(empresas, "encolar_expediente", lambda *args: pytest.fail("no debe encolarse"))
+    with sqlite3.connect(empresas_app.config["DATABASE_PATH"]) as conexion:
+        conexion.execute("CREATE TRIGGER rechazar BEFORE INSERT ON empresas BEGIN SELECT RAISE(ABORT, 'x'); END")
+
+    respuesta = logged_in_client.post("/api/empresas", json=EMPRESA)
+
+    assert respuesta.status_code == 409
+
+
+def test_empresa_sin_tabla_de_jobs_se_guarda(logged_in_client, empresas_app, entorno):
+    with sqlite3.connect(empresas_app.config["DATABASE_PATH"]) as conexion:
+        conexion.execute("DROP TABLE expediente_jobs")
+
+    respuesta = logged_in_client.post("/api/empresas", json=EMPRESA)
+
+    expediente = respuesta.get_json()["expediente"]
+    assert respuesta.status_code == 201
+    assert expediente["job_id"] is None
+    assert any("encolar" in error for error in expediente["errores"])
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Gestor de Archivos - Catálogo indexado
+=================================================
+Verifica que el árbol y la búsqueda servidos desde archivos_catalogo
+coinciden con el escaneo del disco, que los cambios en disco invalidan el índice
+y que las peticiones solo leen el catálogo (el reindexado va en segundo plano).
+"""
+import os
+import sqlite3
+from pathlib import Path
+
+import pytest
+from flask import g
+
+from routes import gestor_archivos as ga
+
+MIGRACION = Path(__file__).resolve().parent.parent / "migrations" / "20251201_archivos_catalogo.sql"
+
+
+@pytest.fixture
+def base_uploads(tmp_path, monkeypatch):
+    """Redirige BASE_UPLOADS_PATH a una carpeta temporal con un árbol de ejemplo."""
+    base = tmp_path / "usuarios"
+    usuario = base / "123"
+    (usuario / "2024" / "Recibos").mkdir(parents=True)
+    (usuario / "2024" / "Planillas").mkdir(parents=True)
+    (usuario / "2024" / "Recibos" / "recibo_enero.pdf").write_bytes(b"a" * 100)
+    (usuario / "2024" / "Recibos" / "recibo_febrero.pdf").write_bytes(b"b" * 50)
+    (usuario / "2024" / "Planillas" / "planilla_año.xlsx").write_bytes(b"c" * 10)
+    (usuario / "cedula.jpg").write_bytes(b"d" * 5)
+
+    monkeypatch.setattr(ga, "BASE_UPLOADS_PATH", str(base))
+    return base
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(MIGRACION.read_text(encoding="utf-8"))
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def catalogo_app(app):
+    """Aplica la migración del catálogo a la base de la app de pruebas."""
+    with sqlite3.connect(app.config["DATABASE_PATH"]) as conexion:
+        conexion.executescript(MIGRACION.read_text(encoding="utf-8"))
+        conexion.execute("DELETE FROM archivos_catalogo WHERE usuario_id = '123'")
+    yield app.config["DATABASE_PATH"]
+    with sqlite3.connect(app.config["DATABASE_PATH"]) as conexion:
+        conexion.execute("DELETE FROM archivos_catalogo WHERE usuario_id = '123'")
+
+
+def _get(client, url):
+    # Las vistas cierran g.db y el contexto de la app se reutiliza entre peticiones
+    g.pop("db", None)
+    return client.get(url)
+
+
+def test_arbol_desde_catalogo_igual_al_escaneo(base_uploads, conn):
+    ruta_usuario = os.path.join(ga.BASE_UPLOADS_PATH, "123")
+    ga.indexar_usuario(conn, "123")
+
+    arbol, tamano_total = ga.construir_arbol_desde_catalogo(conn, "123")
+
+    assert arbol == ga.construir_arbol_archivos(ruta_usuario)
+    assert arbol["total_archivos"] == 4
+    assert arbol["total_carpetas"] == 3
+    assert tamano_total == 165
+
+
+def test_arbol_respeta_nivel_maximo(base_uploads, conn):
+    ruta_usuario = os.path.join(ga.BASE_UPLOADS_PATH, "123")
+    ga.indexar_usuario(conn, "123")
+
+    arbol, _ = ga.construir_arbol_desde_catalogo(conn, "123", nivel_maximo=1)
+
+    assert arbol == ga.construir_arbol_archivos(ruta_usuario, nivel_maximo=1)
+    assert arbol["total_archivos"] == 1
+
+
+def test_busqueda_fts_prefijos_y_tildes(base_uploads, conn):
+    ga.indexar_usuario(conn, "123")
+
+    nombres = {r["nombre"] for r in ga.buscar_en_catalogo(conn, "123", "recib")}
+    assert nombres == {"recibo_enero.pdf", "recibo_febrero.pdf"}
+
+    nombres = {r["nombre"] for r in ga.buscar_en_catalogo(conn, "123", "ano")}
+    assert nombres == {"planilla_año.xlsx"}
+
+    nombres = {r["nombre"] for r in ga.buscar_en_catalogo(conn, "123", "", ".jpg")}
+    assert nombres == {"cedula.jpg"}
+
+
+def test_busqueda_sin_fts_usa_like(base_uploads, conn):
+    ga.indexar_usuario(conn, "123")
+
+    resultados = ga.buscar_en_catalogo(conn, "123", "febrero", fts_disponible=False)
+
+    assert [r["nombre"] for r in resultados] == ["recibo_febrero.pdf"]
+
+
+def test_vigencia_detecta_cambios_en_disco(base_uploads, conn):
+    ga.indexar_usuario(conn, "123")
+    assert ga.catalogo_vigente(conn, "123")
+
+    nuevo = base_uploads / "123" / "2025" / "recibo_marzo.pdf"
+    nuevo.parent.mkdir()
+    nuevo.write_bytes(b"e" * 7)
+    assert not ga.catalogo_vigente(conn, "123")
+
+    ga.indexar_usuario(conn, "123")
+    assert ga.catalogo_vigente(conn, "123")
+    arbol, tamano_total = ga.construir_arbol_desde_catalogo(conn, "123")
+    assert arbol["total_archivos"] == 5
+    assert tamano_total == 172
+    assert [r["nombre"] for r in ga.buscar_en_catalogo(conn, "123", "marzo")] == ["recibo_marzo.pdf"]
+
+
+def test_reindexado_nocturno_recoge_archivo_sobrescrito(base_uploads, conn):
+    ga.indexar_usuario(conn, "123")
+    conn.execute(
+        "INSERT INTO archivos_catalogo (usuario_id, ruta_relativa, nombre, tipo) VALUES ('borrado', 'x/borrado', 'borrado', 'carpeta')"
+    )
+    carpeta = base_uploads / "123" / "2024" / "Recibos"
+    mtime_carpeta = os.stat(carpeta).st_mtime_ns
+    (carpeta / "recibo_enero.pdf").write_bytes(b"z" * 300)
+    os.utime(carpeta, ns=(mtime_carpeta, mtime_carpeta))
+
+    # Sobrescribir en su lugar no toca el mtime de la carpeta: la petición no lo ve
+    assert ga.catalogo_vigente(conn, "123")
+
+    assert ga.reindexar_todos(conn) == {"usuarios": 1, "entradas": 8}
+    _, tamano_total = ga.construir_arbol_desde_catalogo(conn, "123")
+    assert tamano_total == 365
+    assert conn.execute("SELECT COUNT(*) FROM archivos_catalogo WHERE usuario_id = 'borrado'").fetchone()[0] == 0
+
+
+def test_reindexado_en_segundo_plano_una_vez_por_usuario(base_uploads, tmp_path, monkeypatch):
+    ruta_bd = tmp_path / "catalogo.db"
+    with sqlite3.connect(ruta_bd) as conexion:
+        conexion.executescript(MIGRACION.read_text(encoding="utf-8"))
+    monkeypatch.setattr(ga, "_reindexado_executor", None)
+
+    assert ga.programar_reindexado(str(ruta_bd), "123")
+    assert not ga.programar_reindexado(str(ruta_bd), "123")
+    ga._reindexado_executor.shutdown(wait=True)
+
+    conexion = sqlite3.connect(ruta_bd)
+    assert ga.catalogo_vigente(conexion, "123")
+    conexion.close()
+    # Terminado el anterior, se puede volver a programar
+    assert "123" not in ga._reindexado_pendientes
+
+
+@pytest.fixture
+def reindexados(monkeypatch):
+    """Reemplaza el hilo de fondo: registra el pedido y lo ejecuta en línea."""
+    pedidos = []
+
+    def programar(db_path, usuario_id, ruta_usuario=None):
+        pedidos.append(usuario_id)
+        ga._reindexar_en_segundo_plano(db_path, usuario_id, ruta_usuario)
+        return True
+
+    monkeypatch.setattr(ga, "programar_reindexado", programar)
+    return pedidos
+
+
+def test_endpoint_arbol_sin_catalogo_escanea_el_disco(base_uploads, logged_in_client, reindexados):
+    respuesta = _get(logged_in_client, "/api/archivos/arbol/123")
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    assert datos["estadisticas"]["total_archivos"] == 4
+    assert datos["estadisticas"]["tamano_total_bytes"] == 165
+
+
+def test_endpoint_arbol_lee_el_catalogo_y_reindexa_en_segundo_plano(base_uploads, logged_in_client,
+                                                                   catalogo_app, reindexados):
+    primera = _get(logged_in_client, "/api/archivos/arbol/123").get_json()
+    segunda = _get(logged_in_client, "/api/archivos/arbol/123").get_json()
+
+    assert (primera["indexando"], segunda["indexando"]) == (True, False)
+    assert reindexados == ["123"]
+    assert segunda["arbol"] == primera["arbol"]
+    assert segunda["estadisticas"]["tamano_total_bytes"] == 165
+
+
+@pytest.mark.parametrize("con_catalogo", [False, True])
+def test_endpoint_buscar(base_uploads, logged_in_client, request, reindexados, con_catalogo):
+    if con_catalogo:
+        request.getfixturevalue("catalogo_app")
+    for _ in range(2):
+        respuesta = _get(logged_in_client, "/api/archivos/buscar?usuario_id=123&query=enero")
+        assert respuesta.status_code == 200
+        assert [r["nombre"] for r in respuesta.get_json()["resultados"]] == ["recibo_enero.pdf"]
+    assert reindexados == (["123"] if con_catalogo else [])
+
+
+def test_escaneo_paralelo_igual_al_serial(base_uploads, monkeypatch):
+    for i in range(5):
+        carpeta = base_uploads / "123" / "ancha" / f"sub_{i}"
+        carpeta.mkdir(parents=True)
+        (carpeta / f"archivo_{i}.pdf").write_bytes(b"x" * i)
+    monkeypatch.setattr(ga, "UMBRAL_DIRECTORIO_ANCHO", 2)
+    ruta_usuario = os.path.join(ga.BASE_UPLOADS_PATH, "123")
+
+    paralelo = ga.construir_arbol_archivos(ruta_usuario, paralelo=True)
+    serial = ga.construir_arbol_archivos(ruta_usuario, paralelo=False)
+
+    assert paralelo == serial
+    assert paralelo["total_archivos"] == 9
+    assert paralelo["total_carpetas"] == 9
+    assert ga.contar_archivos(paralelo["hijos"]) == 9
+    assert ga.contar_carpetas(paralelo["hijos"]) == 9
+
+
+def test_endpoint_expandir_un_nivel(base_uploads, logged_in_client):
+    respuesta = logged_in_client.get("/api/archivos/expandir/123?ruta=2024")
+    assert respuesta.status_code == 200
+    hijos = respuesta.get_json()["hijos"]
+    assert [(h["nombre"], h["tipo"]) for h in hijos] == [("Planillas", "carpeta"), ("Recibos", "carpeta")]
+    assert all(h["expandible"] and "hijos" not in h for h in hijos)
+
+
+def test_endpoint_expandir_rechaza_path_traversal(base_uploads, logged_in_client):
+    respuesta = logged_in_client.get("/api/archivos/expandir/123?ruta=../../")
+    assert respuesta.status_code == 400
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Índice de Firmas de Empresas
+======================================
+Verifica que buscar_ruta_firma resuelve el NIT sin listar EMPRESAS, que el
+índice se invalida por mtime y que la imagen decodificada se reutiliza.
+"""
+import os
+
+import pytest
+from PIL import Image
+
+import indice_firmas
+from routes import formularios
+
+
+def _crear_firma(ruta, tamano=(1200, 400)):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    Image.new("RGBA", tamano, (0, 0, 0, 0)).save(ruta)
+
+
+@pytest.fixture
+def empresas(tmp_path, monkeypatch):
+    """BASE_DIR de formularios apuntando a una carpeta temporal."""
+    monkeypatch.setattr(formularios, "BASE_DIR", str(tmp_path))
+    carpeta = tmp_path / "EMPRESAS"
+    carpeta.mkdir()
+    return carpeta
+
+
+def test_busca_firma_por_nit(empresas):
+    _crear_firma(str(empresas / "900123456_ACME" / "firma_representante.png"))
+    (empresas / "9001234567_OTRA").mkdir()
+
+    ruta = formularios.buscar_ruta_firma("empresa", "900123456")
+
+    assert ruta == str(empresas / "900123456_ACME" / "firma_representante.png")
+    assert formularios.buscar_ruta_firma("empresa", "111") is None
+
+
+def test_indice_no_relista_si_mtime_no_cambia(empresas, monkeypatch):
+    _crear_firma(str(empresas / "800_ALFA" / "firma_representante.png"))
+    indice = indice_firmas.IndiceFirmasEmpresas(str(empresas))
+    indice.construir()
+
+    def _prohibido(*args, **kwargs):
+        raise AssertionError("No debe listar EMPRESAS con el índice vigente")
+
+    monkeypatch.setattr(indice_firmas.os, "scandir", _prohibido)
+    assert indice.buscar("800").endswith("firma_representante.png")
+
+
+def test_indice_detecta_carpeta_nueva(empresas):
+    indice = indice_firmas.IndiceFirmasEmpresas(str(empresas))
+    indice.construir()
+    assert indice.buscar("700") is None
+
+    _crear_firma(str(empresas / "700_NUEVA" / "firma_representante.png"))
+    # Asegura un mtime distinto aun en sistemas de archivos de baja resolución
+    os.utime(empresas, ns=(0, os.stat(empresas).st_mtime_ns + 10**9))
+
+    assert indice.buscar("700") == str(empresas / "700_NUEVA" / "firma_representante.png")
+
+
+def test_hook_registra_carpeta_preferida(empresas):
+    _crear_firma(str(empresas / "600_NOMBRE_VIEJO" / "firma_representante.png"))
+    _crear_firma(str(empresas / "600_NOMBRE_NUEVO" / "firma_representante.png"))
+    indice = indice_firmas.IndiceFirmasEmpresas(str(empresas))
+    indice.construir()
+
+    indice.registrar_carpeta("600", str(empresas / "600_NOMBRE_VIEJO"))
+
+    assert indice.buscar("600") == str(empresas / "600_NOMBRE_VIEJO" / "firma_representante.png")
+
+
+def test_cargar_firma_reduce_y_cachea(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "firma.png")
+    _crear_firma(ruta)
+    indice_firmas.limpiar_cache_firmas()
+    llamadas = []
+    original = indice_firmas._decodificar_firma
+    monkeypatch.setattr(indice_firmas, "_decodificar_firma", lambda r: llamadas.append(r) or original(r))
+
+    primera = indice_firmas.cargar_firma(ruta)
+    segunda = indice_firmas.cargar_firma(ruta)
+
+    assert primera is segunda
+    assert len(llamadas) == 1
+    assert max(primera.getSize()) == indice_firmas.MAX_PX_FIRMA
+
+
+def test_cargar_firma_recarga_si_cambia_el_archivo(tmp_path):
+    ruta = str(tmp_path / "firma.png")
+    _crear_firma(ruta)
+    indice_firmas.limpiar_cache_firmas()
+    primera = indice_firmas.cargar_firma(ruta)
+
+    _crear_firma(ruta, tamano=(100, 50))
+    os.utime(ruta, ns=(0, os.stat(ruta).st_mtime_ns + 10**9))
+
+    assert indice_firmas.cargar_firma(ruta).getSize() == (100, 50)
+    assert primera.getSize() != (100, 50)
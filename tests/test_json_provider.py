@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Capa de Serialización JSON
+======================================
+Verifica que OrjsonProvider produzca el mismo JSON que el proveedor por
+defecto de Flask (fechas HTTP, Decimal, UUID, claves no texto, respaldo
+para enteros grandes) y la ruta sqlite3.Row -> JSON de filas_json().
+"""
+import json
+import sqlite3
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask.json.provider import DefaultJSONProvider
+
+pytest.importorskip("orjson")
+
+from json_provider import OrjsonProvider, filas_json, respuesta_json  # noqa: E402
+
+OBJETO = {
+    "texto": "Años de cotización ñ",
+    "fecha": date(2025, 12, 1),
+    "momento": datetime(2025, 12, 1, 8, 30, 5),
+    "decimal": Decimal("1423500.00"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "lista": [1, 2.5, None, True],
+    "z": {"b": 1, "a": 2},
+    "enteros": {3: "c", 1: "a"},
+}
+
+
+def test_proveedor_registrado_en_la_app(app):
+    assert isinstance(app.json, OrjsonProvider)
+
+
+def test_mismo_json_que_el_proveedor_por_defecto(app):
+    rapido = app.json.dumps(OBJETO)
+    estandar = DefaultJSONProvider(app).dumps(OBJETO)
+
+    assert json.loads(rapido) == json.loads(estandar)
+    assert list(json.loads(rapido)) == sorted(map(str, OBJETO))
+
+
+def test_respaldo_para_enteros_grandes(app):
+    assert json.loads(app.json.dumps({"n": 2 ** 70})) == {"n": 2 ** 70}
+
+
+def test_response_y_loads(app):
+    with app.test_request_context():
+        respuesta = app.json.response(OBJETO)
+
+    assert respuesta.mimetype == "application/json"
+    assert app.json.loads(respuesta.get_data()) == json.loads(DefaultJSONProvider(app).dumps(OBJETO))
+
+
+@pytest.fixture
+def conexion():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute("CREATE TABLE empresas (nit TEXT, nombre_empresa TEXT, empleados INTEGER, tarifa REAL)")
+    conn.executemany("INSERT INTO empresas VALUES (?, ?, ?, ?)", [
+        ("900", 'Acme "Ñandú" S.A.S', 10, 0.522),
+        ("800", None, 0, 6.96),
+        ("700", "Beta\nLtda", None, 1423500.0),
+    ])
+    yield conn
+    conn.close()
+
+
+def test_filas_json_equivale_a_dict_row(conexion):
+    sql = "SELECT nit, nombre_empresa AS \"nombre 'x'\", empleados, tarifa FROM empresas WHERE nit > ? ORDER BY nit"
+
+    texto, total = filas_json(conexion, sql, ("750",))
+
+    esperado = [dict(fila) for fila in conexion.execute(sql, ("750",)).fetchall()]
+    assert json.loads(texto) == esperado
+    assert total == 2
+    assert list(json.loads(texto)[0]) == ["nit", "nombre 'x'", "empleados", "tarifa"]
+
+
+def test_filas_json_sin_filas(conexion):
+    assert filas_json(conexion, "SELECT nit FROM empresas WHERE 0") == ("[]", 0)
+
+
+def test_respuesta_json_con_fragmentos(app, conexion):
+    texto, total = filas_json(conexion, "SELECT nit FROM empresas ORDER BY nit")
+
+    with app.app_context():
+        cuerpo = json.loads(respuesta_json(app, {"total": total}, items=texto).get_data())
+        vacio = json.loads(respuesta_json(app, {}, items="[]").get_data())
+
+    assert cuerpo == {"total": 3, "items": [{"nit": "700"}, {"nit": "800"}, {"nit": "900"}]}
+    assert vacio == {"items": []}
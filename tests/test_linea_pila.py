@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de LineaPILA (líneas de planilla compactas)
+=================================================
+Verifica que calcular_linea_compacta produce los mismos valores que
+calcular_linea, que los montos se guardan en centavos enteros y que
+validar_planilla acepta ambas formas.
+"""
+import pytest
+
+from logic.pila_engine import LineaPILA, LiquidadorPILA
+
+
+@pytest.fixture
+def liquidador():
+    return LiquidadorPILA()
+
+
+EMPLEADO = {"numeroId": "123", "primerNombre": "Ana", "primerApellido": "Ruiz", "ibc": 2_345_678.9, "arlClase": 3}
+
+
+def test_to_dict_igual_a_calcular_linea(liquidador):
+    novedades = [{"tipo": "Ingreso", "fecha": "2025-01-11"}]
+
+    compacta = liquidador.calcular_linea_compacta(EMPLEADO, novedades=novedades)
+
+    assert compacta.to_dict() == liquidador.calcular_linea(EMPLEADO, novedades=novedades)
+    assert compacta.to_dict()["novedades_procesadas"] == ["INGRESO: Día 11, cotiza 20 días"]
+    assert compacta.marca_novedad == "IGE"
+
+
+def test_montos_en_centavos_enteros(liquidador):
+    linea = liquidador.calcular_linea_compacta(EMPLEADO, dias_trabajados=15)
+
+    assert isinstance(linea.salud_empleado_centavos, int)
+    assert linea.ibc_centavos == 117_283_945  # 2.345.678,9 / 30 * 15 = 1.172.839,45
+    assert linea.salud_empleado_centavos == 4_691_358
+    assert linea.total_aportes_centavos == (
+        linea.total_empleado_centavos + linea.total_empleador_centavos
+    )
+    assert linea.total_aportes == linea.total_aportes_centavos / 100
+
+
+def test_sin_dict_por_instancia(liquidador):
+    linea = liquidador.calcular_linea_compacta(EMPLEADO)
+
+    assert not hasattr(linea, "__dict__")
+    with pytest.raises(AttributeError):
+        linea.campo_nuevo = 1
+
+
+def test_alertas_y_validaciones(liquidador):
+    bajo_minimo = liquidador.calcular_linea_compacta({**EMPLEADO, "ibc": 900_000})
+
+    assert bajo_minimo.alertas == ("IBC $900,000 menor al SMMLV",)
+    assert bajo_minimo.validaciones == ()
+    assert liquidador.calcular_linea_compacta(EMPLEADO).validaciones == ("Liquidación correcta",)
+
+
+def test_validar_planilla_acepta_lineas_compactas(liquidador):
+    empleados = [{**EMPLEADO, "numeroId": str(i), "arlClase": 1 + i % 5} for i in range(20)]
+    empleados.append(dict(EMPLEADO, numeroId="3"))
+    compactas = [liquidador.calcular_linea_compacta(e, dias_trabajados=20 if i == 4 else 30)
+                 for i, e in enumerate(empleados)]
+
+    assert all(isinstance(linea, LineaPILA) for linea in compactas)
+    assert liquidador.validar_planilla(compactas) == liquidador.validar_planilla(
+        [linea.to_dict() for linea in compactas]
+    )
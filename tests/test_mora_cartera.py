@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Recálculo de Mora de Cartera
+======================================
+Verifica el UPDATE por conjuntos de logic/mora_cartera.py (dias_mora con
+julianday, paso a 'Vencido', bloques de rowid, conteo de filas cambiadas)
+y que /api/cartera/morosos lee los valores precalculados.
+"""
+import random
+from datetime import date
+
+import pytest
+
+from extensions import db
+from logic.mora_cartera import recalcular_mora, ultimo_recalculo
+from models.orm_models import DeudaCartera, Empresa
+
+CORTE = date(2025, 12, 1)
+
+
+@pytest.fixture
+def deudas(app):
+    """Deudas de una empresa única: {clave: id}."""
+    nit = str(random.randint(700_000_000, 799_999_999))
+    filas = {
+        "vencida": dict(fecha_vencimiento="2025-11-01", dias_mora=0, estado="Pendiente"),
+        "vencida_con_hora": dict(fecha_vencimiento="2025-11-21 10:30:00", dias_mora=3, estado="Vencido"),
+        "sin_cambios": dict(fecha_vencimiento="2025-11-21", dias_mora=10, estado="Vencido"),
+        "futura": dict(fecha_vencimiento="2026-01-15", dias_mora=5, estado="Pendiente"),
+        "pagada": dict(fecha_vencimiento="2025-01-01", dias_mora=0, estado="Pagado"),
+        "sin_fecha": dict(fecha_vencimiento=None, dias_mora=7, estado="Vencido"),
+        "fecha_invalida": dict(fecha_vencimiento="pronto", dias_mora=2, estado="Pendiente"),
+    }
+    with app.app_context():
+        db.session.add(Empresa(nit=nit, nombre_empresa="Mora S.A.S"))
+        ids = {}
+        for i, (clave, campos) in enumerate(filas.items()):
+            deuda = DeudaCartera(usuario_id=f"u{i}", empresa_nit=nit, entidad="EPS", monto=1000 * (i + 1), **campos)
+            db.session.add(deuda)
+            db.session.flush()
+            ids[clave] = deuda.id
+        db.session.commit()
+    yield nit, ids
+    with app.app_context():
+        DeudaCartera.query.filter_by(empresa_nit=nit).delete()
+        Empresa.query.filter_by(nit=nit).delete()
+        db.session.commit()
+
+
+def _estado(ids):
+    return {clave: (db.session.get(DeudaCartera, i).dias_mora, db.session.get(DeudaCartera, i).estado)
+            for clave, i in ids.items()}
+
+
+def test_recalculo_por_conjuntos(app, deudas):
+    _, ids = deudas
+    with app.app_context():
+        resultado = recalcular_mora(db.session, hoy=CORTE, tamano_bloque=2)
+
+        assert _estado(ids) == {
+            "vencida": (30, "Vencido"),
+            "vencida_con_hora": (10, "Vencido"),
+            "sin_cambios": (10, "Vencido"),
+            "futura": (0, "Pendiente"),
+            "pagada": (0, "Pagado"),
+            "sin_fecha": (7, "Vencido"),
+            "fecha_invalida": (2, "Pendiente"),
+        }
+        assert resultado["filas_actualizadas"] == 3
+        assert resultado["bloques"] >= 4
+        assert resultado["fecha_corte"] == "2025-12-01"
+
+
+def test_segunda_corrida_no_cambia_nada(app, deudas):
+    with app.app_context():
+        recalcular_mora(db.session, hoy=CORTE)
+
+        assert recalcular_mora(db.session, hoy=CORTE)["filas_actualizadas"] == 0
+        assert ultimo_recalculo(db.session)["filas_actualizadas"] == 0
+
+
+def test_morosos_lee_dias_precalculados(app, logged_in_client, deudas):
+    nit, ids = deudas
+    with app.app_context():
+        recalcular_mora(db.session, hoy=date.today())
+
+    cuerpo = logged_in_client.get(f"/api/cartera/morosos?empresa_nit={nit}").get_json()
+
+    assert [d["id"] for d in cuerpo["deudas"]][0] == ids["vencida"]
+    assert all(d["dias_mora_calculados"] == d["dias_mora"] for d in cuerpo["deudas"])
+    assert cuerpo["recalculo_mora"]["fecha_corte"] == date.today().isoformat()
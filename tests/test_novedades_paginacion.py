@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Paginación de Novedades
+===================================
+Verifica GET /api/novedades con keyset sobre (updateDate, id): recorrido
+completo por cursores (incluyendo updateDate NULL y fechas repetidas),
+filtros en servidor y selección de campos.
+"""
+import uuid
+
+import pytest
+
+from extensions import db
+from models.orm_models import Novedad
+
+URL_BASE = "/api/novedades"
+FECHAS = ["2025-12-01", "2025-12-03", "2025-12-03", None, "2025-12-02 10:00:00", "2025-12-03", None]
+
+
+@pytest.fixture
+def novedades_cliente(app):
+    """Novedades de un cliente único: (cliente, ids en el orden esperado)."""
+    cliente = f"Paginacion {uuid.uuid4().hex[:8]}"
+    with app.app_context():
+        novedades = [
+            Novedad(client=cliente, subject=f"n{i}", status="Abierto" if i % 2 else "Cerrado",
+                    history=[{"action": f"a{i}"}])
+            for i in range(len(FECHAS))
+        ]
+        db.session.add_all(novedades)
+        db.session.flush()
+        # updateDate tiene onupdate; se fija con UPDATE directo para controlar el orden
+        for novedad, fecha in zip(novedades, FECHAS):
+            db.session.execute(Novedad.__table__.update().where(Novedad.id == novedad.id).values(updateDate=fecha))
+        db.session.commit()
+        # DESC: fechas de mayor a menor, NULL al final; empates por id descendente
+        orden = sorted(zip(FECHAS, novedades), key=lambda par: (par[0] is not None, par[0] or "", par[1].id),
+                       reverse=True)
+        esperado = [novedad.id for _, novedad in orden]
+        ids = [n.id for n in novedades]
+    yield cliente, esperado
+    with app.app_context():
+        Novedad.query.filter(Novedad.id.in_(ids)).delete()
+        db.session.commit()
+
+
+def _todas_las_paginas(cliente_http, params):
+    vistas, cursor, paginas = [], None, 0
+    while True:
+        respuesta = cliente_http.get(URL_BASE, query_string={**params, **({"cursor": cursor} if cursor else {})})
+        assert respuesta.status_code == 200
+        vistas += respuesta.get_json()
+        paginas += 1
+        cursor = respuesta.headers.get("X-Next-Cursor")
+        if not cursor:
+            return vistas, paginas
+
+
+def test_recorrido_por_cursores(logged_in_client, novedades_cliente):
+    cliente, esperado = novedades_cliente
+
+    filas, paginas = _todas_las_paginas(logged_in_client, {"client": cliente, "limit": 2})
+
+    assert [f["id"] for f in filas] == esperado
+    assert paginas == 4
+    assert filas[0]["history"] == [{"action": filas[0]["subject"].replace("n", "a")}]
+
+
+def test_filtro_y_campos(logged_in_client, novedades_cliente):
+    cliente, _ = novedades_cliente
+
+    respuesta = logged_in_client.get(URL_BASE, query_string={"client": cliente, "status": "Abierto",
+                                                             "fields": "subject,status"})
+
+    filas = respuesta.get_json()
+    assert len(filas) == 3
+    assert {f["status"] for f in filas} == {"Abierto"}
+    assert set(filas[0]) == {"id", "updateDate", "subject", "status"}
+    assert "X-Next-Cursor" not in respuesta.headers
+
+
+def test_parametros_invalidos(logged_in_client):
+    assert logged_in_client.get(URL_BASE, query_string={"cursor": "no-es-un-cursor"}).status_code == 400
+    assert logged_in_client.get(URL_BASE, query_string={"fields": "subject,clave"}).status_code == 400
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Perfilado SQL
+=======================
+Verifica la normalización de sentencias, la medición de conexiones
+sqlite3 (execute + recorrido de filas), los eventos de SQLAlchemy, la
+captura de EXPLAIN para sentencias lentas y el endpoint de administración.
+"""
+import pytest
+from flask import Flask, g
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from perfil_sql import PerfilSQL, conectar, instalar_perfil_sql, normalizar_sql
+
+
+def test_normalizar_sql():
+    assert normalizar_sql("SELECT *  FROM usuarios\n WHERE id = 15 AND nombre = 'O''Hara'") == \
+        "SELECT * FROM usuarios WHERE id = ? AND nombre = ?"
+    assert normalizar_sql("DELETE FROM t WHERE id IN (1, 2, 3)") == "DELETE FROM t WHERE id IN (?...)"
+    assert normalizar_sql("SELECT * FROM t WHERE id IN (?,?)") == "SELECT * FROM t WHERE id IN (?...)"
+    assert normalizar_sql("SELECT col2 FROM t2") == "SELECT col2 FROM t2"
+
+
+@pytest.fixture
+def perfil():
+    return PerfilSQL(capacidad=100)
+
+
+@pytest.fixture
+def conexion(perfil):
+    conn = conectar(":memory:", perfil)
+    conn.execute("CREATE TABLE pagos (id INTEGER PRIMARY KEY, monto REAL)")
+    conn.executemany("INSERT INTO pagos (monto) VALUES (?)", [(i * 10.0,) for i in range(50)])
+    perfil.limpiar()
+    yield conn
+    conn.close()
+
+
+def test_conexion_sqlite3_registra_sentencias_y_filas(perfil, conexion):
+    conexion.execute("SELECT * FROM pagos WHERE monto > 100").fetchall()
+    conexion.execute("SELECT * FROM pagos WHERE monto > 400").fetchall()
+    cursor = conexion.cursor()
+    assert sum(1 for _ in cursor.execute("SELECT id FROM pagos WHERE id <= 5")) == 5
+    assert conexion.execute("UPDATE pagos SET monto = 0 WHERE id IN (1, 2, 3)").rowcount == 3
+
+    por_sentencia = {item["sentencia"]: item for item in perfil.top(10)}
+
+    mayor_que = por_sentencia["SELECT * FROM pagos WHERE monto > ?"]
+    assert mayor_que["llamadas"] == 2
+    assert mayor_que["filas"] == 39 + 9
+    assert mayor_que["origen"] == "sqlite3"
+    assert por_sentencia["SELECT id FROM pagos WHERE id <= ?"]["filas"] == 5
+    assert por_sentencia["UPDATE pagos SET monto = ? WHERE id IN (?...)"]["filas"] == 3
+    assert all(item["total_ms"] >= 0 for item in por_sentencia.values())
+
+
+def test_buffer_circular_y_orden():
+    chico = PerfilSQL(capacidad=3)
+    conn = conectar(":memory:", chico)
+    for i in range(5):
+        conn.execute(f"SELECT {i}").fetchone()
+
+    assert chico.resumen()["muestras"] == 3
+    assert chico.top(10, "llamadas")[0]["llamadas"] == 3
+    conn.close()
+
+
+def test_explain_de_sentencias_lentas(conexion):
+    perfil = conexion.perfil
+    perfil.umbral_explain_ms = 1e-9
+
+    conexion.execute("SELECT * FROM pagos WHERE id = ?", (3,)).fetchall()
+
+    item = perfil.top(1)[0]
+    assert item["plan"] and "INTEGER PRIMARY KEY" in item["plan"][0]
+
+
+def test_conexion_sin_perfil_es_sqlite3_normal():
+    conn = conectar(":memory:")
+    assert type(conn).__name__ == "Connection"
+    conn.close()
+
+
+def test_eventos_sqlalchemy():
+    app = Flask(__name__)
+    app.config.update(SQL_PROFILING=True, SQL_PROFILING_BUFFER=50, SQL_PROFILING_EXPLAIN_MS=1e-9)
+    engine = create_engine("sqlite://")
+
+    perfil = instalar_perfil_sql(app, engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)"))
+        conn.execute(text("INSERT INTO t (v) VALUES (:v)"), [{"v": "a"}, {"v": "b"}])
+        conn.execute(text("SELECT * FROM t WHERE id = :id"), {"id": 1}).fetchall()
+
+    por_sentencia = {item["sentencia"]: item for item in perfil.top(10)}
+    consulta = por_sentencia["SELECT * FROM t WHERE id = ?"]
+    assert consulta["origen"] == "orm"
+    assert "INTEGER PRIMARY KEY" in consulta["plan"][0]
+    assert por_sentencia["INSERT INTO t (v) VALUES (?)"]["filas"] == 2
+    assert app.extensions["perfil_sql"] is perfil
+
+
+def test_sentencia_con_error_no_deja_inicios_pendientes():
+    app = Flask(__name__)
+    app.config.update(SQL_PROFILING=True)
+    engine = create_engine("sqlite://")
+    perfil = instalar_perfil_sql(app, engine)
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_existe"))
+        conn.execute(text("SELECT 1")).fetchall()
+
+        assert "perfil_inicio" not in conn.info
+    assert [item["sentencia"] for item in perfil.top(10)] == ["SELECT ?"]
+
+
+def test_perfil_desactivado_por_defecto():
+    app = Flask(__name__)
+    assert instalar_perfil_sql(app, create_engine("sqlite://")) is None
+    assert "perfil_sql" not in app.extensions
+
+
+def _get(client, url):
+    # Las vistas cierran g.db y el contexto de la app se reutiliza entre peticiones
+    g.pop("db", None)
+    return client.get(url)
+
+
+def test_endpoint_admin(app, client):
+    app.extensions.pop("perfil_sql", None)  # Por si el entorno tiene SQL_PROFILING=true
+    with client.session_transaction() as sess:
+        sess["user_id"] = 1
+        sess["role"] = "empleado"
+    assert _get(client, "/api/admin/perfil-sql").status_code == 403
+
+    with client.session_transaction() as sess:
+        sess["role"] = "admin"
+    assert _get(client, "/api/admin/perfil-sql").get_json() == {"activo": False, "sentencias": []}
+
+    perfil = app.extensions["perfil_sql"] = PerfilSQL()
+    conn = conectar(":memory:", perfil)
+    conn.execute("SELECT 1").fetchall()
+    conn.close()
+
+    datos = _get(client, "/api/admin/perfil-sql?top=5&limpiar=1").get_json()
+    assert datos["activo"] is True
+    assert datos["sentencias"][0]["sentencia"] == "SELECT ?"
+    assert perfil.resumen()["muestras"] == 0
+    assert _get(client, "/api/admin/perfil-sql?orden=x").status_code == 400
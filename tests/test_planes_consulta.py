@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de Regresión de Planes de Consulta
+========================================
+Ejecuta EXPLAIN QUERY PLAN sobre las consultas calientes de usuarios y
+pagos con el esquema de orm_models (más la migración de índices) y falla
+si alguna vuelve a recorrer la tabla completa o a ordenar en memoria
+cuando existe un índice para evitarlo. Suele romperse al cambiar el texto
+de una condición sin actualizar la expresión del índice.
+"""
+import re
+import sqlite3
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+
+from extensions import db
+from logic.consultas import sql_sin_administradores
+from routes.analytics import SQL_TENDENCIA_PAGOS, SQL_TENDENCIA_USUARIOS
+from routes.asistente_ai import SQL_PAGOS_RECIENTES, SQL_USUARIOS_HOY
+from routes.unificacion import SQL_USUARIOS_MASTER, SQL_USUARIOS_MASTER_COMPLETO
+
+import models.orm_models  # noqa: F401  (registra las tablas en db.metadata)
+
+MIGRACION = Path(__file__).resolve().parent.parent / "migrations" / "20251212_indices_expresiones.sql"
+INDICES_MIGRACION = ("idx_usuarios_no_admin_nombre", "idx_usuarios_correo", "idx_pagos_fecha", "idx_pagos_mes")
+
+
+def _crear_esquema(ruta, con_indices=True):
+    """Tablas de orm_models (y sus índices, salvo los nombres reservados sqlite_*)."""
+    engine = create_engine(f"sqlite:///{ruta}")
+    with engine.begin() as conn:
+        for tabla in db.metadata.sorted_tables:
+            conn.execute(CreateTable(tabla))
+            for indice in tabla.indexes if con_indices else ():
+                if not indice.name.startswith("sqlite_"):
+                    indice.create(conn)
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def conexion(tmp_path_factory):
+    ruta = tmp_path_factory.mktemp("planes") / "esquema.db"
+    _crear_esquema(ruta)
+    conn = sqlite3.connect(ruta)
+    yield conn
+    conn.close()
+
+
+def plan(conn, sql, params=()):
+    return [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+
+
+def assert_sin_scan(pasos, ordenar_en_memoria=False):
+    recorridos = [p for p in pasos if re.fullmatch(r"SCAN \w+", p)]
+    assert not recorridos, f"Recorrido completo de tabla: {pasos}"
+    if not ordenar_en_memoria:
+        assert not [p for p in pasos if "TEMP B-TREE" in p], f"Orden en memoria: {pasos}"
+
+
+def test_master_completo_usa_indice_parcial(conexion):
+    pasos = plan(conexion, SQL_USUARIOS_MASTER_COMPLETO)
+
+    assert_sin_scan(pasos)
+    assert any("idx_usuarios_no_admin_nombre" in p for p in pasos), pasos
+    assert any(p.startswith("SEARCH e USING") for p in pasos), pasos
+
+
+def test_master_recorre_por_rowid_y_busca_empresa_por_indice(conexion):
+    pasos = plan(conexion, SQL_USUARIOS_MASTER)
+
+    # Devuelve todos los usuarios operativos: el recorrido por rowid es el plan
+    # correcto, lo que no debe aparecer es ordenar ni recorrer empresas
+    assert pasos[0] == "SCAN u"
+    assert_sin_scan(pasos[1:])
+    assert any(p.startswith("SEARCH e USING") for p in pasos), pasos
+
+
+def test_vincular_masivo_por_clave_primaria(conexion):
+    sql = f"""
+        UPDATE usuarios SET empresa_nit = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id IN (?, ?, ?) AND {sql_sin_administradores()}
+    """
+    pasos = plan(conexion, sql, ("900", 1, 2, 3))
+
+    assert_sin_scan(pasos)
+    assert any("INTEGER PRIMARY KEY" in p for p in pasos), pasos
+
+
+def test_tendencia_pagos_usa_indice_por_mes(conexion):
+    pasos = plan(conexion, SQL_TENDENCIA_PAGOS, ("2025-06",))
+
+    assert_sin_scan(pasos)
+    assert any("idx_pagos_mes" in p for p in pasos), pasos
+
+
+def test_tendencia_usuarios_rango_sobre_created_at(conexion):
+    pasos = plan(conexion, SQL_TENDENCIA_USUARIOS, ("2025-06-01",))
+
+    # Pocas filas (usuarios nuevos de 6 meses): agrupar en memoria es aceptable
+    assert_sin_scan(pasos, ordenar_en_memoria=True)
+    assert any("idx_usuarios_created" in p for p in pasos), pasos
+
+
+@pytest.mark.parametrize("sql, indice", [
+    (SQL_USUARIOS_HOY, "idx_usuarios_created"),
+    (SQL_PAGOS_RECIENTES, "idx_pagos_fecha"),
+    ("SELECT COUNT(*), COALESCE(SUM(monto), 0) FROM pagos WHERE fecha_pago >= '2025-12-01'", "idx_pagos_fecha"),
+    ("SELECT id, primerNombre, correoElectronico, password_hash, role FROM usuarios "
+     "WHERE correoElectronico = 'a@b.co'", "idx_usuarios_correo"),
+])
+def test_filtros_por_fecha_y_correo_usan_indice(conexion, sql, indice):
+    pasos = plan(conexion, sql)
+
+    assert_sin_scan(pasos)
+    assert any(f"INDEX {indice}" in p for p in pasos), pasos
+
+
+def test_migracion_crea_los_mismos_indices(conexion, tmp_path):
+    ruta = tmp_path / "migrada.db"
+    _crear_esquema(ruta, con_indices=False)
+    migrada = sqlite3.connect(ruta)
+    migrada.executescript(MIGRACION.read_text(encoding="utf-8"))
+
+    def definiciones(conn):
+        filas = conn.execute(
+            f"SELECT name, sql FROM sqlite_master WHERE name IN ({', '.join('?' * len(INDICES_MIGRACION))})",
+            INDICES_MIGRACION,
+        ).fetchall()
+        return {nombre: re.sub(r'[\s"]+', "", sql).lower().replace("ifnotexists", "") for nombre, sql in filas}
+
+    try:
+        assert definiciones(migrada) == definiciones(conexion)
+        assert len(definiciones(migrada)) == len(INDICES_MIGRACION)
+    finally:
+        migrada.close()
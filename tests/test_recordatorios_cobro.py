@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Agenda de Cobros (check_recordatorios_cobro)
+========================================================
+Verifica que la tarea inserta las alertas del día en un solo lote y que el
+índice único (origen_tipo, origen_id, origen_dia) evita duplicados cuando
+la tarea se ejecuta más de una vez el mismo día.
+"""
+import random
+from datetime import datetime
+
+import pytest
+
+import celery_tasks
+from extensions import db
+from models.orm_models import DeudaCartera, Empresa, Novedad
+
+
+@pytest.fixture
+def deudas_hoy(app):
+    """Dos deudas con recordatorio para hoy y una para otro día."""
+    nit = str(random.randint(800_000_000, 899_999_999))
+    hoy = datetime.now().strftime("%Y-%m-%d")
+    with app.app_context():
+        db.session.add(Empresa(nit=nit, nombre_empresa="Cobros S.A.S"))
+        deudas = [
+            DeudaCartera(usuario_id="c1", empresa_nit=nit, entidad="EPS", monto=150000,
+                         nombre_usuario="Ana", nombre_empresa="Cobros S.A.S", fecha_recordatorio_cobro=hoy),
+            DeudaCartera(usuario_id="c2", empresa_nit=nit, entidad="AFP", monto=90000, fecha_recordatorio_cobro=hoy),
+            DeudaCartera(usuario_id="c3", empresa_nit=nit, entidad="ARL", monto=1000,
+                         fecha_recordatorio_cobro="2000-01-01"),
+        ]
+        db.session.add_all(deudas)
+        db.session.commit()
+        ids = [str(d.id) for d in deudas]
+    yield ids
+    with app.app_context():
+        Novedad.query.filter(Novedad.origen_tipo == "deuda_cartera", Novedad.origen_id.in_(ids)).delete()
+        DeudaCartera.query.filter_by(empresa_nit=nit).delete()
+        Empresa.query.filter_by(nit=nit).delete()
+        db.session.commit()
+
+
+def _alertas(ids):
+    return Novedad.query.filter(Novedad.origen_tipo == "deuda_cartera", Novedad.origen_id.in_(ids)).all()
+
+
+def test_crea_alertas_una_sola_vez_por_dia(app, deudas_hoy):
+    primera = celery_tasks.check_recordatorios_cobro()
+    segunda = celery_tasks.check_recordatorios_cobro()
+
+    assert primera["status"] == "success"
+    assert primera["alertas_creadas"] >= 2
+    assert segunda["alertas_creadas"] == 0
+    assert segunda["alertas_duplicadas"] == segunda["recordatorios_encontrados"]
+    with app.app_context():
+        alertas = _alertas(deudas_hoy)
+        assert sorted(a.origen_id for a in alertas) == sorted(deudas_hoy[:2])
+        ana = next(a for a in alertas if a.origen_id == deudas_hoy[0])
+        assert ana.subject == f"⏰ RECORDATORIO COBRO: Ana (Cobros S.A.S) - deuda #{deudas_hoy[0]}"
+        assert ana.client == "Ana (Cobros S.A.S)"
+        assert ana.origen_dia == datetime.now().strftime("%Y-%m-%d")
+
+
+def test_novedades_manuales_no_chocan_en_el_indice(app):
+    with app.app_context():
+        manuales = [Novedad(subject="manual", client="x", status="Pendiente") for _ in range(2)]
+        db.session.add_all(manuales)
+        db.session.commit()
+        assert all(n.id for n in manuales)
+        for novedad in manuales:
+            db.session.delete(novedad)
+        db.session.commit()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Motor de Reglas PILA por Columnas
+===========================================
+Verifica cada regla de logic/reglas_pila.py sobre líneas reales de
+calcular_linea (sin falsos positivos por prorrateo) y el formato de
+validar_planilla: errores, advertencias e índices marcados.
+"""
+import random
+
+import pytest
+
+from logic.pila_engine import LiquidadorPILA
+from logic.reglas_pila import ColumnasPlanilla, evaluar_reglas
+
+
+@pytest.fixture
+def liquidador():
+    return LiquidadorPILA()
+
+
+def _linea(liquidador, documento="1", ibc=2_000_000, clase=1, dias=30, **extra):
+    linea = liquidador.calcular_linea(
+        {"numeroId": documento, "primerNombre": "E", "primerApellido": documento, "ibc": ibc, "arlClase": clase},
+        dias_trabajados=dias,
+    )
+    linea.update(extra)
+    return linea
+
+
+def _marcadas(liquidador, lineas):
+    return evaluar_reglas(ColumnasPlanilla(lineas), liquidador.config)
+
+
+def test_lineas_calculadas_no_generan_falsos_positivos(liquidador):
+    random.seed(3)
+    lineas = [
+        _linea(liquidador, str(i), ibc=random.randint(1_300_000, 9_000_000) + random.random(),
+               clase=random.randint(1, 5), marca_novedad="IGE" if i % 2 else "")
+        for i in range(500)
+    ]
+
+    marcadas = _marcadas(liquidador, lineas)
+
+    assert {regla: indices for regla, indices in marcadas.items() if indices} == {}
+
+
+def test_aportes_y_tarifa_arl(liquidador):
+    lineas = [_linea(liquidador, str(i), clase=2) for i in range(4)]
+    lineas[1]["salud_empleado"] += 0.02
+    lineas[2]["pension_empleado"] -= 100
+    lineas[3]["arl_tarifa"] = 0.522
+
+    marcadas = _marcadas(liquidador, lineas)
+
+    assert marcadas["salud_no_4"] == [1]
+    assert marcadas["pension_no_4"] == [2]
+    assert marcadas["tarifa_arl"] == [3]
+
+
+def test_valor_arl_y_clase_invalida(liquidador):
+    lineas = [_linea(liquidador, "1", clase=3), _linea(liquidador, "2"), _linea(liquidador, "3")]
+    lineas[0]["arl"] += 50
+    lineas[1]["arl_clase"] = 9
+    lineas[2]["arl_clase"] = "1"
+
+    assert _marcadas(liquidador, lineas)["tarifa_arl"] == [0, 1]
+
+
+def test_duplicados_por_empresa(liquidador):
+    lineas = [
+        _linea(liquidador, "10", empresa_nit="A"),
+        _linea(liquidador, "10", empresa_nit="B"),
+        _linea(liquidador, "10", empresa_nit="A"),
+        _linea(liquidador, "20", empresa_nit="A"),
+    ]
+
+    assert _marcadas(liquidador, lineas)["cotizante_duplicado"] == [0, 2]
+
+
+def test_ibc_atipico_por_empresa(liquidador):
+    lineas = [_linea(liquidador, f"a{i}", ibc=2_000_000, empresa_nit="A") for i in range(5)]
+    lineas += [_linea(liquidador, f"b{i}", ibc=30_000_000, empresa_nit="B") for i in range(5)]
+    lineas.append(_linea(liquidador, "a9", ibc=30_000_000, empresa_nit="A"))
+
+    assert _marcadas(liquidador, lineas)["ibc_atipico"] == [10]
+
+
+def test_dias_y_novedad(liquidador):
+    lineas = [
+        _linea(liquidador, "1", dias=15),
+        _linea(liquidador, "2", dias=15, marca_novedad="RET"),
+        _linea(liquidador, "3", dias_cotizados=31),
+    ]
+
+    marcadas = _marcadas(liquidador, lineas)
+
+    assert marcadas["dias_sin_novedad"] == [0]
+    assert marcadas["dias_invalidos"] == [2]
+
+
+def test_validar_planilla_formato(liquidador):
+    lineas = [_linea(liquidador, "1"), _linea(liquidador, "2", ibc_calculado=900_000), _linea(liquidador, "1")]
+    lineas[0]["dias_cotizados"] = 0
+
+    resultado = liquidador.validar_planilla(lineas)
+
+    assert resultado["valida"] is False
+    assert resultado["errores"] == [
+        "Línea 1: Días inválidos (0)",
+        "Línea 2: IBC menor al mínimo legal",
+    ]
+    assert "Línea 3: Cotizante duplicado en la planilla" in resultado["advertencias"]
+    assert resultado["indices_marcados"] == [0, 1, 2]
+    assert resultado["total_aportes"] == pytest.approx(sum(l["total_aportes"] for l in lineas), abs=0.01)
+    assert resultado["total_empleados"] == 3
+
+
+def test_valores_no_numericos_no_rompen(liquidador):
+    lineas = [{"ibc_calculado": "abc", "dias_cotizados": None, "total_aportes": "10.5"}]
+
+    resultado = liquidador.validar_planilla(lineas)
+
+    assert resultado["lineas_marcadas"]["ibc_bajo_minimo"] == [0]
+    assert resultado["total_aportes"] == 10.5
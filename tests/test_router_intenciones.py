@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Tests del Router de Intenciones del Asistente (fallback)
+========================================================
+Verifica la clasificación en una sola pasada (tildes, prefijos y límites de
+palabra), la prioridad de las reglas y que las consultas se sirvan desde la
+caché sin tocar la BD en saludos, ayuda o preguntas repetidas.
+"""
+import os
+
+import pytest
+from flask import session
+
+from cache_respuestas import CacheRespuestas
+from router_intenciones import RouterIntenciones
+from routes import asistente_ai
+
+
+@pytest.fixture
+def consultas(monkeypatch):
+    """Caché de consultas limpia y contador de conexiones a la BD."""
+    monkeypatch.setattr(asistente_ai, "cache_consultas", CacheRespuestas(ttl_segundos=60))
+    conexiones = []
+    original = asistente_ai.get_db_connection
+
+    def contar_conexion():
+        conexiones.append(1)
+        return original()
+
+    monkeypatch.setattr(asistente_ai, "get_db_connection", contar_conexion)
+    return conexiones
+
+
+def test_detecta_con_tildes_y_prefijos():
+    router = RouterIntenciones({"usuarios": ["usuario*"], "conteo": ["cuantos"], "saludo": ["buenos dias"]})
+
+    assert router.detectar("¿CUÁNTOS Usuarios hay?") == {"usuarios", "conteo"}
+    assert router.detectar("Buenos días") == {"saludo"}
+
+
+def test_respeta_limites_de_palabra():
+    # Antes "hi" en "archivos" o "activo" en "inactivos" disparaban la intención
+    assert asistente_ai.router_chat.detectar("archivos del expediente") == frozenset()
+    assert "activos" not in asistente_ai.router_chat.detectar("usuarios inactivos")
+
+
+def test_prioridad_de_reglas():
+    manejador, _ = asistente_ai.router_chat.enrutar("hola, ¿cuántos usuarios hay?")
+    assert manejador is asistente_ai._responder_saludo
+
+    manejador, _ = asistente_ai.router_chat.enrutar("usuarios activos")
+    assert manejador is asistente_ai._responder_usuarios_activos
+
+    manejador, _ = asistente_ai.router_chat.enrutar("algo sin sentido")
+    assert manejador is asistente_ai._responder_por_defecto
+
+
+def test_saludo_y_ayuda_no_consultan_bd(app, consultas):
+    with app.test_request_context():
+        session["user_name"] = "Ana"
+        saludo = asistente_ai.procesar_mensaje_inteligente("Hola")
+        ayuda = asistente_ai.procesar_mensaje_inteligente("¿Qué puedes hacer?")
+
+    assert saludo.startswith("¡Hola Ana!")
+    assert ayuda == asistente_ai.TEXTO_AYUDA
+    assert consultas == []
+
+
+def test_conteo_cacheado_hasta_que_cambian_los_datos(app, test_db, consultas):
+    db_path = app.config["DATABASE_PATH"]
+    test_db.execute("CREATE TABLE IF NOT EXISTS usuarios (id INTEGER PRIMARY KEY, primerNombre TEXT, estado TEXT)")
+    test_db.executemany("INSERT INTO usuarios (primerNombre, estado) VALUES (?, 'Activo')", [("Ana",), ("Luis",)])
+    test_db.commit()
+    with app.test_request_context():
+        primera = asistente_ai.procesar_mensaje_inteligente("¿Cuántos usuarios hay?")
+        segunda = asistente_ai.procesar_mensaje_inteligente("cantidad de empleados")
+        assert len(consultas) == 1
+
+        os.utime(db_path, ns=(0, os.stat(db_path).st_mtime_ns + 10**9))
+        asistente_ai.procesar_mensaje_inteligente("¿Cuántos usuarios hay?")
+
+    assert primera == segunda
+    assert "**2 usuarios**" in primera
+    assert len(consultas) == 2
+
+
+def test_endpoint_chat_usa_router(logged_in_client, monkeypatch):
+    monkeypatch.setattr(asistente_ai, "GEMINI_AVAILABLE", False)
+
+    respuesta = logged_in_client.post("/api/asistente/chat", json={"message": "muchas gracias"})
+
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["response"].startswith("¡De nada!")
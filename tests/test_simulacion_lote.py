@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Tests de la Simulación PILA por Lotes
+=====================================
+Verifica que cada fila de la matriz coincida con CalculadoraPILA.calcular(),
+la memoización por (versión de parámetros, entradas) y el endpoint
+POST /api/cotizaciones/simular-pila/lote.
+"""
+from itertools import product
+
+import pytest
+
+from logic import pila_engine
+from logic.pila_engine import COLUMNAS_SIMULACION, CalculadoraPILA, simular_escenarios
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    pila_engine._fila_simulacion.cache_clear()
+    pila_engine._base_simulacion.cache_clear()
+
+
+def _fila_esperada(salario, nivel, integral, exonerada):
+    r = CalculadoraPILA(salario, nivel, es_empresa_exonerada=exonerada, es_salario_integral=integral).calcular()
+    return {
+        "salario_base": float(r.salario_base),
+        "ibc": float(r.ibc),
+        "salud_empleado": float(r.salud_empleado),
+        "salud_empleador": float(r.salud_empleador),
+        "pension_empleado": float(r.pension_empleado),
+        "pension_empleador": float(r.pension_empleador),
+        "arl": float(r.arl_empleador),
+        "ccf": float(r.ccf),
+        "sena": float(r.sena),
+        "icbf": float(r.icbf),
+        "total_empleado": float(r.total_empleado),
+        "total_empleador": float(r.total_empleador),
+        "total_general": float(r.total_general),
+        "salario_neto": float(r.salario_base - r.total_empleado),
+        "salario_ajustado": r.salario_ajustado,
+        "ibc_limitado": r.ibc_limitado,
+    }
+
+
+def test_filas_coinciden_con_calculadora():
+    escenarios = list(product([900_000, 1_300_000, 13_000_000, 14_500_123.5, 50_000_000], range(1, 6),
+                              [False, True], [True, False]))
+
+    filas = simular_escenarios(escenarios)
+
+    for escenario, fila in zip(escenarios, filas):
+        obtenida = dict(zip(COLUMNAS_SIMULACION, fila))
+        for campo, valor in _fila_esperada(*escenario).items():
+            assert obtenida[campo] == valor, (escenario, campo)
+
+
+def test_base_compartida_y_memoizacion():
+    simular_escenarios(product([2_000_000, 3_000_000], range(1, 6), [False], [True, False]))
+    estadisticas = pila_engine.estadisticas_simulacion()
+    assert estadisticas["fallos"] == 20
+    assert estadisticas["bases_calculadas"] == 2
+
+    simular_escenarios([(2_000_000, 3, False, True)])
+    assert pila_engine.estadisticas_simulacion()["aciertos"] == 1
+
+
+def test_version_de_parametros_forma_parte_de_la_clave(monkeypatch):
+    simular_escenarios([(2_000_000, 1, False, True)])
+    monkeypatch.setattr(pila_engine, "VERSION_PARAMETROS_PILA", "2026")
+
+    simular_escenarios([(2_000_000, 1, False, True)])
+
+    assert pila_engine.estadisticas_simulacion()["fallos"] == 2
+
+
+def test_nivel_invalido():
+    with pytest.raises(ValueError):
+        simular_escenarios([(2_000_000, 7, False, True)])
+
+
+def test_endpoint_grilla(logged_in_client):
+    respuesta = logged_in_client.post(
+        "/api/cotizaciones/simular-pila/lote",
+        json={"salarios": [1_300_000, 2_500_000], "niveles_riesgo": [1, 5], "exonerada": [True, False]},
+    )
+
+    cuerpo = respuesta.get_json()
+    assert respuesta.status_code == 200
+    assert cuerpo["total_escenarios"] == 8
+    assert cuerpo["columnas"] == list(COLUMNAS_SIMULACION)
+    primera = dict(zip(cuerpo["columnas"], cuerpo["filas"][0]))
+    assert primera["total_general"] == _fila_esperada(1_300_000, 1, False, True)["total_general"]
+    assert cuerpo["version_parametros"] == pila_engine.VERSION_PARAMETROS_PILA
+
+
+def test_endpoint_escenarios_explicitos_y_errores(logged_in_client):
+    respuesta = logged_in_client.post(
+        "/api/cotizaciones/simular-pila/lote",
+        json={"escenarios": [{"salario_base": 2_000_000, "nivel_riesgo": 9}]},
+    )
+
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()["tipo"] == "error_validacion_motor_pila"
+
+
+def test_endpoint_rechaza_grilla_demasiado_grande(logged_in_client, monkeypatch):
+    from routes import cotizaciones
+
+    monkeypatch.setattr(cotizaciones, "MAX_ESCENARIOS_SIMULACION", 10)
+    # El límite se valida con el tamaño de las dimensiones, sin construir la grilla
+    monkeypatch.setattr(cotizaciones, "product", lambda *args: pytest.fail("no debe construirse la grilla"))
+
+    respuesta = logged_in_client.post(
+        "/api/cotizaciones/simular-pila/lote",
+        json={"salarios": list(range(1_300_000, 1_400_000, 10_000)), "niveles_riesgo": [1, 2]},
+    )
+
+    assert respuesta.status_code == 400
+    assert "Máximo 10 escenarios" in respuesta.get_json()["error"]
+
+
+@pytest.mark.parametrize("cuerpo", [
+    {"salarios": [2_000_000], "niveles_riesgo": [1], "integral": ["false"]},
+    {"salarios": [2_000_000], "niveles_riesgo": [1], "exonerada": [0]},
+    {"salarios": [2_000_000], "niveles_riesgo": [1], "exonerada": True},
+    {"escenarios": [{"salario_base": 2_000_000, "nivel_riesgo": 1, "es_salario_integral": "false"}]},
+    {"escenarios": [{"salario_base": 2_000_000, "nivel_riesgo": 1, "es_empresa_exonerada": None}]},
+])
+def test_endpoint_rechaza_booleanos_no_json(logged_in_client, cuerpo):
+    respuesta = logged_in_client.post("/api/cotizaciones/simular-pila/lote", json=cuerpo)
+
+    assert respuesta.status_code == 400
+    assert "Escenarios inválidos" in respuesta.get_json()["error"]
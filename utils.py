@@ -8,7 +8,9 @@ from functools import wraps
 from flask import current_app, g, jsonify, redirect, request, session, url_for
 from werkzeug.utils import secure_filename
 
+from blob_store import ArchivoDemasiadoGrande, detectar_mime, guardar_y_vincular, leer_cabecera
 from logger import logger  # Importa el logger global
+from perfil_sql import conectar
 
 # --- Definiciones de rutas necesarias ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -48,6 +50,22 @@ ALLOWED_DOCUMENT_MIMES = {
 }
 ALLOWED_ALL_MIMES = ALLOWED_IMAGE_MIMES | ALLOWED_DOCUMENT_MIMES
 
+# MIME que debe detectarse en el contenido según la extensión declarada
+EXTENSION_MIMES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "jpeg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+    "pdf": "application/pdf",
+    "doc": "application/msword",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "xls": "application/vnd.ms-excel",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "txt": "text/plain",
+}
+
 # Tamaño máximo de archivo (en bytes)
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB por defecto
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5 MB para imágenes
@@ -92,7 +110,8 @@ def get_db_connection():
         else:
             logger.debug(f"🔌 Conexión desde config: {db_path}")
 
-        conn = sqlite3.connect(db_path)
+        # Con SQL_PROFILING activo la conexión registra cada sentencia (ver perfil_sql.py)
+        conn = conectar(db_path, current_app.extensions.get("perfil_sql"))
         conn.row_factory = sqlite3.Row
 
         if hasattr(g, 'db'):
@@ -268,9 +287,12 @@ def validate_upload(file_storage, file_type="all", max_size=None):
     Realiza múltiples validaciones:
     - Verifica que el archivo exista y tenga nombre
     - Valida la extensión del archivo
-    - Valida el MIME type
+    - Valida el MIME type real (firma de los primeros bytes)
     - Valida el tamaño del archivo
 
+    No carga el archivo en memoria: solo lee la cabecera y mide el tamaño
+    con seek/tell sobre el stream de Werkzeug.
+
     Args:
         file_storage: Objeto FileStorage de Werkzeug
         file_type (str): Tipo de archivo ('image', 'document', 'all')
@@ -316,17 +338,19 @@ def validate_upload(file_storage, file_type="all", max_size=None):
             f"Tipo de archivo no permitido (.{ext}). Extensiones permitidas: {allowed_ext_str}",
         )
 
-    # 3. Validar MIME type
-    if not validate_file_type(file_storage, allowed_mimes):
-        mime = get_file_mimetype(file_storage)
+    # 3. Validar MIME type detectado en los primeros bytes (el Content-Type
+    #    declarado por el cliente no es confiable)
+    mime = detectar_mime(leer_cabecera(file_storage), filename)
+    if mime not in allowed_mimes or mime != EXTENSION_MIMES.get(get_file_extension(filename)):
         return (
             False,
             f"Tipo MIME no permitido ({mime}). El archivo puede estar corrupto o ser malicioso.",
         )
 
-    # 4. Validar tamaño
-    if not validate_file_size(file_storage, max_size):
-        size_mb = get_file_size(file_storage) / (1024 * 1024)
+    # 4. Validar tamaño (seek/tell: no lee el contenido)
+    size = get_file_size(file_storage)
+    if size > max_size:
+        size_mb = size / (1024 * 1024)
         max_mb = max_size / (1024 * 1024)
         return (
             False,
@@ -383,9 +407,10 @@ def sanitize_and_save_file(file_storage, destination_folder, custom_filename=Non
             filepath = os.path.join(destination_folder, filename)
             counter += 1
 
-    # Guardar el archivo
+    # Guardar el archivo en streaming (enlace al almacén de blobs: contenido
+    # repetido no ocupa disco dos veces)
     try:
-        file_storage.save(filepath)
+        guardar_y_vincular(file_storage, filepath, max_bytes=MAX_FILE_SIZE)
         logger.info(f"✓ Archivo guardado: {filepath}")
         return filepath
     except Exception as e:
@@ -566,9 +591,10 @@ def is_file_allowed(filename):
     return extension in allowed_extensions
 
 
-def validate_file_size(file_content):
+def validate_content_size(file_content):
     """
-    Valida que el tamaño del archivo no exceda el límite configurado.
+    Valida que el tamaño de un contenido ya leído en memoria no exceda el
+    límite configurado. Para FileStorage usar validate_file_size().
     
     Args:
         file_content (bytes): Contenido del archivo en bytes
@@ -577,7 +603,7 @@ def validate_file_size(file_content):
         tuple: (bool, str) - (es_válido, mensaje_error)
     
     Example:
-        >>> validate_file_size(b'contenido')
+        >>> validate_content_size(b'contenido')
         (True, None)
     """
     max_size = get_max_file_size()
@@ -616,15 +642,6 @@ def save_uploaded_file(file, subdir, custom_filename=None):
         if not is_file_allowed(file.filename):
             return None, None, f"Tipo de archivo no permitido. Extensiones válidas: {', '.join(get_allowed_extensions())}"
         
-        # Leer contenido para validar tamaño
-        file_content = file.read()
-        is_valid, error_msg = validate_file_size(file_content)
-        if not is_valid:
-            return None, None, error_msg
-        
-        # Resetear puntero del archivo
-        file.seek(0)
-        
         # Obtener carpeta de destino
         upload_folder = get_upload_folder(subdir)
         
@@ -637,8 +654,12 @@ def save_uploaded_file(file, subdir, custom_filename=None):
         # Construir ruta completa
         filepath = os.path.join(upload_folder, filename)
         
-        # Guardar archivo
-        file.save(filepath)
+        # Guardar archivo en streaming; el tamaño se valida bloque a bloque
+        max_size = get_max_file_size()
+        try:
+            guardar_y_vincular(file, filepath, max_bytes=max_size)
+        except ArchivoDemasiadoGrande:
+            return None, None, f"Archivo demasiado grande. Máximo permitido: {max_size / (1024 * 1024):.0f}MB"
         
         # Calcular ruta relativa desde static/
         relative_path = os.path.relpath(filepath, os.path.join(BASE_DIR, 'static'))